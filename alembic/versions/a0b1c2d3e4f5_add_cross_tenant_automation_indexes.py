@@ -0,0 +1,45 @@
+"""add indexes for cross-tenant automation checks
+
+Revision ID: a0b1c2d3e4f5
+Revises: f9a0b1c2d3e4
+Create Date: 2026-03-12 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a0b1c2d3e4f5'
+down_revision: Union[str, None] = 'f9a0b1c2d3e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (имя, таблица, колонки, условие частичного индекса)
+INDEXES = [
+    ('ix_requests_urgent_new_created', 'requests', ['created_at'], "status = 'new' AND priority = 'urgent'"),
+    ('ix_requests_in_progress_updated', 'requests', ['updated_at'], "status = 'in_progress'"),
+    ('ix_request_daily_stats_day_tenant', 'request_daily_stats', ['day', 'tenant_id'], None),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY не блокирует запись в таблицу,
+    # но не может выполняться внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _columns, _where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,90 @@
+"""add request daily stats rollup
+
+Revision ID: a4b5c6d7e8f9
+Revises: f3a4b5c6d7e8
+Create Date: 2026-02-02 12:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4b5c6d7e8f9'
+down_revision: Union[str, None] = 'f3a4b5c6d7e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'request_daily_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('priority', sa.String(length=10), nullable=False),
+        sa.Column('category', sa.String(length=100), nullable=False),
+        sa.Column('created', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rejected', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('taken', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tenant_id', 'day', 'status', 'priority', 'category', name='uq_request_daily_stats_key')
+    )
+    _backfill()
+
+
+def _backfill() -> None:
+    """
+    Заполнить rollup по существующим заявкам (правила RequestStatsService.rebuild)
+
+    - created - в день создания, в строке текущего статуса;
+    - taken - заявки в работе, в день updated_at;
+    - completed - выполненные с completed_at, в день completed_at;
+    - rejected - отклоненные, в день updated_at.
+
+    Дни считаются по смещению локального времени сервера приложения, как
+    local_day(). Переходы на летнее время не учитываются - при необходимости
+    rollup пересчитывается python scripts/rebuild_request_stats.py.
+    """
+    offset = datetime.now().astimezone().utcoffset()
+    sign = "-" if offset.total_seconds() < 0 else "+"
+    minutes = int(abs(offset.total_seconds()) // 60)
+    utc_offset = f"{sign}{minutes // 60:02d}:{minutes % 60:02d}"
+
+    op.execute(sa.text("""
+        INSERT INTO request_daily_stats
+            (tenant_id, day, status, priority, category, created, completed, rejected, taken)
+        SELECT tenant_id, day, status, priority, category,
+               SUM(created), SUM(completed), SUM(rejected), SUM(taken)
+        FROM (
+            SELECT tenant_id, (created_at AT TIME ZONE CAST(:utc_offset AS interval))::date AS day,
+                   status, priority, category,
+                   1 AS created, 0 AS completed, 0 AS rejected, 0 AS taken
+            FROM requests
+            UNION ALL
+            SELECT tenant_id, (updated_at AT TIME ZONE CAST(:utc_offset AS interval))::date,
+                   status, priority, category, 0, 0, 0, 1
+            FROM requests
+            WHERE status = 'in_progress'
+            UNION ALL
+            SELECT tenant_id, (completed_at AT TIME ZONE CAST(:utc_offset AS interval))::date,
+                   status, priority, category, 0, 1, 0, 0
+            FROM requests
+            WHERE status = 'completed' AND completed_at IS NOT NULL
+            UNION ALL
+            SELECT tenant_id, (updated_at AT TIME ZONE CAST(:utc_offset AS interval))::date,
+                   status, priority, category, 0, 0, 1, 0
+            FROM requests
+            WHERE status = 'rejected'
+        ) AS counters
+        GROUP BY tenant_id, day, status, priority, category
+    """).bindparams(utc_offset=utc_offset))
+
+
+def downgrade() -> None:
+    op.drop_table('request_daily_stats')
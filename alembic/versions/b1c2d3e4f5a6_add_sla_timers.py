@@ -0,0 +1,57 @@
+"""add sla timers for urgent requests
+
+Revision ID: b1c2d3e4f5a6
+Revises: a0b1c2d3e4f5
+Create Date: 2026-03-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1c2d3e4f5a6'
+down_revision: Union[str, None] = 'a0b1c2d3e4f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sla_timers',
+        sa.Column('request_id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('due_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['request_id'], ['requests.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('request_id')
+    )
+    op.create_index('ix_sla_timers_due_at', 'sla_timers', ['due_at'])
+
+    # Таймеры для уже существующих необработанных срочных заявок
+    # (просроченные сработают сразу после запуска бота)
+    op.execute(
+        "INSERT INTO sla_timers (request_id, tenant_id, due_at) "
+        "SELECT id, tenant_id, created_at + interval '2 hours' FROM requests "
+        "WHERE status = 'new' AND priority = 'urgent'"
+    )
+
+    # Почасовая проверка срочных заявок заменена таймерами - индекс больше не нужен
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_requests_urgent_new_created', table_name='requests',
+            postgresql_concurrently=True, if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_requests_urgent_new_created', 'requests', ['created_at'],
+            postgresql_concurrently=True,
+            postgresql_where=sa.text("status = 'new' AND priority = 'urgent'"),
+            if_not_exists=True,
+        )
+    op.drop_index('ix_sla_timers_due_at', table_name='sla_timers')
+    op.drop_table('sla_timers')
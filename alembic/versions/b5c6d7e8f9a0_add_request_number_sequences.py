@@ -0,0 +1,52 @@
+"""add per-tenant daily request number sequences
+
+Revision ID: b5c6d7e8f9a0
+Revises: a4b5c6d7e8f9
+Create Date: 2026-02-09 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5c6d7e8f9a0'
+down_revision: Union[str, None] = 'a4b5c6d7e8f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'request_number_sequences',
+        sa.Column('tenant_id', sa.BigInteger(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('last_value', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('tenant_id', 'day')
+    )
+
+    # Счетчики продолжают уже выданные номера (ЗХ-ДДММГГ-№№№);
+    # номера с суффиксом-timestamp из прежней генерации не учитываются
+    op.execute("""
+        INSERT INTO request_number_sequences (tenant_id, day, last_value)
+        SELECT tenant_id,
+               to_date(split_part(number, '-', 2), 'DDMMYY'),
+               max(split_part(number, '-', 3)::integer)
+        FROM requests
+        WHERE number ~ '^ЗХ-[0-9]{6}-[0-9]{3,5}$'
+        GROUP BY 1, 2
+    """)
+
+    # Номер уникален в рамках тенанта, а не глобально
+    op.drop_index('ix_requests_number', table_name='requests')
+    op.create_index('ix_requests_number', 'requests', ['number'], unique=False)
+    op.create_unique_constraint('uq_requests_tenant_number', 'requests', ['tenant_id', 'number'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_requests_tenant_number', 'requests', type_='unique')
+    op.drop_index('ix_requests_number', table_name='requests')
+    op.create_index('ix_requests_number', 'requests', ['number'], unique=True)
+    op.drop_table('request_number_sequences')
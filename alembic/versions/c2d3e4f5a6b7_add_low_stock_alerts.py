@@ -0,0 +1,41 @@
+"""add low stock alert state and partial index
+
+Revision ID: c2d3e4f5a6b7
+Revises: b1c2d3e4f5a6
+Create Date: 2026-03-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d3e4f5a6b7'
+down_revision: Union[str, None] = 'b1c2d3e4f5a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('warehouse_items', sa.Column('low_stock_alerted_at', sa.DateTime(timezone=True), nullable=True))
+
+    # CREATE INDEX CONCURRENTLY не блокирует запись в таблицу,
+    # но не может выполняться внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_warehouse_items_low_stock', 'warehouse_items', ['tenant_id', 'name'],
+            postgresql_concurrently=True,
+            postgresql_where=sa.text('current_quantity <= min_quantity'),
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_warehouse_items_low_stock', table_name='warehouse_items',
+            postgresql_concurrently=True, if_exists=True,
+        )
+    op.drop_column('warehouse_items', 'low_stock_alerted_at')
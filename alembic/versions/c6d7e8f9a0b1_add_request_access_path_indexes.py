@@ -0,0 +1,47 @@
+"""add composite and partial indexes for request access paths
+
+Revision ID: c6d7e8f9a0b1
+Revises: b5c6d7e8f9a0
+Create Date: 2026-02-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6d7e8f9a0b1'
+down_revision: Union[str, None] = 'b5c6d7e8f9a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (имя, таблица, колонки, условие частичного индекса)
+INDEXES = [
+    ('ix_requests_tenant_created_id', 'requests', ['tenant_id', 'created_at', 'id'], None),
+    ('ix_requests_tenant_user_created_id', 'requests', ['tenant_id', 'user_id', 'created_at', 'id'], None),
+    ('ix_requests_tenant_status_priority_created', 'requests', ['tenant_id', 'status', 'priority', 'created_at'], None),
+    ('ix_requests_tenant_in_progress_updated', 'requests', ['tenant_id', 'updated_at'], "status = 'in_progress'"),
+    ('ix_complaints_tenant_created', 'complaints', ['tenant_id', 'created_at'], None),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY не блокирует запись в таблицу,
+    # но не может выполняться внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _columns, _where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,44 @@
+"""notify on allowed_users changes
+
+Revision ID: d1e2f3a4b5c6
+Revises: c9d8e7f6a5b4
+Create Date: 2026-01-12 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1e2f3a4b5c6'
+down_revision: Union[str, None] = 'c9d8e7f6a5b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Триггер отправляет NOTIFY allowed_users_changed с payload "<TG_OP>:<id>",
+    # на который подписан AllowedUserRegistry
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_allowed_users_changed() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('allowed_users_changed', TG_OP || ':' || OLD.id);
+                RETURN OLD;
+            END IF;
+            PERFORM pg_notify('allowed_users_changed', TG_OP || ':' || NEW.id);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_allowed_users_notify
+        AFTER INSERT OR DELETE ON allowed_users
+        FOR EACH ROW EXECUTE FUNCTION notify_allowed_users_changed()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_allowed_users_notify ON allowed_users")
+    op.execute("DROP FUNCTION IF EXISTS notify_allowed_users_changed()")
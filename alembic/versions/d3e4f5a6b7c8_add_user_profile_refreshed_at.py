@@ -0,0 +1,31 @@
+"""add users.profile_refreshed_at
+
+Revision ID: d3e4f5a6b7c8
+Revises: c2d3e4f5a6b7
+Create Date: 2026-03-23 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3e4f5a6b7c8'
+down_revision: Union[str, None] = 'c2d3e4f5a6b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('profile_refreshed_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Профили, сохраненные до появления колонки, считаются подтвержденными
+    # в момент последнего изменения строки - иначе после миграции каждый
+    # профиль старше PROFILE_STALE_AFTER запросился бы через get_chat разом
+    op.execute("UPDATE users SET profile_refreshed_at = updated_at")
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'profile_refreshed_at')
@@ -0,0 +1,68 @@
+"""add warehouse movements ledger and monthly balance snapshots
+
+Revision ID: d7e8f9a0b1c2
+Revises: c6d7e8f9a0b1
+Create Date: 2026-02-23 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7e8f9a0b1c2'
+down_revision: Union[str, None] = 'c6d7e8f9a0b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'warehouse_movements',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('delta', sa.Integer(), nullable=False),
+        sa.Column('reason', sa.String(length=20), nullable=False),
+        sa.Column('request_id', sa.Integer(), nullable=True),
+        sa.Column('actor_id', sa.BigInteger(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['item_id'], ['warehouse_items.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['request_id'], ['requests.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_warehouse_movements_item_created', 'warehouse_movements', ['item_id', 'created_at'])
+    op.create_index('ix_warehouse_movements_tenant_created', 'warehouse_movements', ['tenant_id', 'created_at'])
+
+    op.create_table(
+        'warehouse_balance_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('period_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('balance', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('consumed', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['item_id'], ['warehouse_items.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('item_id', 'period_start', name='uq_warehouse_balance_snapshots_item_period')
+    )
+    op.create_index('ix_warehouse_balance_snapshots_tenant_period', 'warehouse_balance_snapshots', ['tenant_id', 'period_start'])
+
+    # Текущие остатки переносятся в журнал как начальные движения,
+    # чтобы сумма движений позиции совпадала с current_quantity
+    op.execute("""
+        INSERT INTO warehouse_movements (tenant_id, item_id, delta, reason, created_at)
+        SELECT tenant_id, id, current_quantity, 'opening', now()
+        FROM warehouse_items
+        WHERE current_quantity <> 0
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_warehouse_balance_snapshots_tenant_period', table_name='warehouse_balance_snapshots')
+    op.drop_table('warehouse_balance_snapshots')
+    op.drop_index('ix_warehouse_movements_tenant_created', table_name='warehouse_movements')
+    op.drop_index('ix_warehouse_movements_item_created', table_name='warehouse_movements')
+    op.drop_table('warehouse_movements')
@@ -0,0 +1,64 @@
+"""add broadcast jobs and deliveries
+
+Revision ID: e2f3a4b5c6d7
+Revises: d1e2f3a4b5c6
+Create Date: 2026-01-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2f3a4b5c6d7'
+down_revision: Union[str, None] = 'd1e2f3a4b5c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'broadcast_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('author_id', sa.BigInteger(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sent_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('failed_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_recipient_id', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('progress_chat_id', sa.BigInteger(), nullable=True),
+        sa.Column('progress_message_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_broadcast_jobs_tenant_id', 'broadcast_jobs', ['tenant_id'])
+    op.create_index('ix_broadcast_jobs_status', 'broadcast_jobs', ['status'])
+
+    op.create_table(
+        'broadcast_deliveries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['job_id'], ['broadcast_jobs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('job_id', 'user_id', name='uq_broadcast_deliveries_job_user')
+    )
+    op.create_index('ix_broadcast_deliveries_job_status', 'broadcast_deliveries', ['job_id', 'status'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_broadcast_deliveries_job_status', table_name='broadcast_deliveries')
+    op.drop_table('broadcast_deliveries')
+    op.drop_index('ix_broadcast_jobs_status', table_name='broadcast_jobs')
+    op.drop_index('ix_broadcast_jobs_tenant_id', table_name='broadcast_jobs')
+    op.drop_table('broadcast_jobs')
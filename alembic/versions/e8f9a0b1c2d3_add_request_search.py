@@ -0,0 +1,54 @@
+"""add full-text search column and indexes for requests
+
+Revision ID: e8f9a0b1c2d3
+Revises: d7e8f9a0b1c2
+Create Date: 2026-03-02 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8f9a0b1c2d3'
+down_revision: Union[str, None] = 'd7e8f9a0b1c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Номер весомее категории, категория - описания (для ts_rank_cd)
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('russian', coalesce(number, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Генерируемая колонка пересчитывается самим PostgreSQL при INSERT/UPDATE.
+    # Добавление STORED-колонки перезаписывает таблицу (блокировка на время миграции)
+    op.execute(
+        "ALTER TABLE requests ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPRESSION}) STORED"
+    )
+
+    # Индексы - CONCURRENTLY, вне транзакции (как в c6d7e8f9a0b1)
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_requests_search_vector "
+            "ON requests USING gin (search_vector)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_requests_number_trgm "
+            "ON requests USING gin (number gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_requests_number_trgm")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_requests_search_vector")
+    op.execute("ALTER TABLE requests DROP COLUMN IF EXISTS search_vector")
@@ -36,6 +36,17 @@ def _get_env_int(name: str) -> int:
         raise ValueError(f"{name} должен быть числом (Telegram ID). Получено: '{value}'") from e
 
 
+def _get_env_int_default(name: str, default: int) -> int:
+    """Получить необязательную числовую переменную окружения (default, если не задана)."""
+    value = _get_env_str(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError as e:
+        raise ValueError(f"{name} должен быть числом. Получено: '{value}'") from e
+
+
 def _get_env_bool(name: str, default: bool = False) -> bool:
     """Получить булеву переменную окружения.
 
@@ -82,6 +93,16 @@ class Config:
     # Timezone
     timezone: str = "Europe/Moscow"
     
+    # Database pool (только PostgreSQL)
+    # - db_pool_recycle: переоткрывать соединения старше N секунд (Render рвет простаивающие соединения)
+    # - db_pre_ping: проверять соединение перед выдачей из пула
+    # - db_statement_cache_size: кэш подготовленных запросов asyncpg (0 - выключен, нужно для PgBouncer)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_recycle: int = 1800
+    db_pre_ping: bool = True
+    db_statement_cache_size: int = 100
+    
     # Logging
     log_level: str = "INFO"
     
@@ -123,6 +144,11 @@ class Config:
             timezone=_get_env_str("TIMEZONE", "Europe/Moscow") or "Europe/Moscow",
             log_level=_get_env_str("LOG_LEVEL", "INFO") or "INFO",
             bot_public_url=_get_env_str("BOT_PUBLIC_URL"),
+            db_pool_size=_get_env_int_default("DB_POOL_SIZE", 5),
+            db_max_overflow=_get_env_int_default("DB_MAX_OVERFLOW", 10),
+            db_pool_recycle=_get_env_int_default("DB_POOL_RECYCLE", 1800),
+            db_pre_ping=_get_env_bool("DB_PRE_PING", default=True),
+            db_statement_cache_size=_get_env_int_default("DB_STATEMENT_CACHE_SIZE", 100),
         )
     
     def is_allowed_user(self, user_id: int) -> bool:
@@ -0,0 +1,186 @@
+"""Advisory-блокировки PostgreSQL для координации реплик бота
+
+Несколько экземпляров бота (main.py / bot/web.py) работают с одной БД.
+Чтобы фоновая работа выполнялась одной репликой, используется
+pg_try_advisory_lock: блокировка уровня сессии держится, пока открыто
+соединение, и снимается сервером автоматически, если реплика упала или
+потеряла соединение.
+
+Каждая блокировка занимает отдельное соединение asyncpg вне пула
+SQLAlchemy (как подписка в allowed_user_registry) и не держит открытой
+транзакцию.
+
+Занятая блокировка и ошибка БД различаются: try_acquire() возвращает
+False, только если блокировку держит другая сессия, а при ошибке
+соединения или запроса выбрасывает AdvisoryLockError - вызывающий код
+повторяет попытку, а не считает работу выполненной другой репликой.
+
+В SQLite (тесты, локальный запуск) - заглушка: блокировки учитываются
+только внутри процесса.
+"""
+import contextlib
+import hashlib
+import logging
+from typing import AsyncIterator, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from bot.database.engine import engine, get_connect_args
+
+logger = logging.getLogger(__name__)
+
+# Блокировки, захваченные в процессе (заглушка для SQLite)
+_local_locks: set[int] = set()
+
+
+class AdvisoryLockError(Exception):
+    """Не удалось проверить блокировку (ошибка соединения или запроса к БД)"""
+
+
+def advisory_lock_key(name: str) -> int:
+    """
+    Ключ advisory-блокировки по имени
+
+    Args:
+        name: Имя блокировки (например, "scheduler:leader")
+
+    Returns:
+        Знаковое 64-битное число (стабильное между процессами)
+    """
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class AdvisoryLock:
+    """Session-level advisory-блокировка на выделенном соединении"""
+
+    def __init__(self, name: str, bind: Optional[AsyncEngine] = None):
+        self.name = name
+        self.key = advisory_lock_key(name)
+        self._engine = bind if bind is not None else engine
+        self._connection = None
+        self._held = False
+
+    @property
+    def is_postgresql(self) -> bool:
+        return self._engine.dialect.name == "postgresql"
+
+    @property
+    def held(self) -> bool:
+        """Захвачена ли блокировка этим объектом (и не потеряно ли соединение)"""
+        if self.is_postgresql:
+            return self._held and self._connection is not None and not self._connection.is_closed()
+        return self._held
+
+    async def try_acquire(self) -> bool:
+        """
+        Попытаться захватить блокировку без ожидания
+
+        Returns:
+            True если блокировка захвачена (или уже была захвачена этим объектом),
+            False если ее держит другая сессия
+
+        Raises:
+            AdvisoryLockError: Ошибка подключения или запроса к БД
+        """
+        if self.held:
+            return True
+
+        if not self.is_postgresql:
+            if self.key in _local_locks:
+                return False
+            _local_locks.add(self.key)
+            self._held = True
+            return True
+
+        import asyncpg
+
+        await self.release()
+        dsn = self._engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        try:
+            connection = await asyncpg.connect(dsn, **get_connect_args())
+        except Exception as e:
+            raise AdvisoryLockError(f"Не удалось подключиться для блокировки {self.name}: {e}") from e
+
+        try:
+            acquired = await connection.fetchval("SELECT pg_try_advisory_lock($1)", self.key)
+        except Exception as e:
+            with contextlib.suppress(Exception):
+                await connection.close()
+            raise AdvisoryLockError(f"Ошибка захвата блокировки {self.name}: {e}") from e
+
+        if not acquired:
+            with contextlib.suppress(Exception):
+                await connection.close()
+            return False
+
+        self._connection = connection
+        self._held = True
+        return True
+
+    async def release(self) -> None:
+        """Снять блокировку и закрыть соединение"""
+        if not self.is_postgresql:
+            if self._held:
+                _local_locks.discard(self.key)
+            self._held = False
+            return
+
+        connection, self._connection = self._connection, None
+        was_held, self._held = self._held, False
+        if connection is None:
+            return
+        # Закрытие соединения снимает блокировку и на стороне сервера
+        with contextlib.suppress(Exception):
+            if was_held and not connection.is_closed():
+                await connection.execute("SELECT pg_advisory_unlock($1)", self.key)
+        with contextlib.suppress(Exception):
+            await connection.close()
+
+    async def check(self) -> bool:
+        """
+        Проверить, что блокировка все еще удерживается (соединение живо)
+
+        Returns:
+            False если блокировка потеряна
+        """
+        if not self.held:
+            return False
+        if not self.is_postgresql:
+            return True
+        try:
+            await self._connection.fetchval("SELECT 1")
+            return True
+        except Exception as e:
+            logger.warning(f"Соединение блокировки {self.name} потеряно: {e}")
+            await self.release()
+            return False
+
+
+@contextlib.asynccontextmanager
+async def try_advisory_lock(name: str, bind: Optional[AsyncEngine] = None) -> AsyncIterator[bool]:
+    """
+    Захватить блокировку на время блока, если она свободна
+
+    Пример:
+        async with try_advisory_lock("scheduler:job:daily_report") as acquired:
+            if acquired:
+                ...
+
+    Args:
+        name: Имя блокировки
+        bind: Engine (по умолчанию - основной)
+
+    Yields:
+        True если блокировка захвачена, False если ее держит другая сессия
+
+    Raises:
+        AdvisoryLockError: Ошибка подключения или запроса к БД
+    """
+    lock = AdvisoryLock(name, bind)
+    acquired = await lock.try_acquire()
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            await lock.release()
@@ -0,0 +1,42 @@
+"""Вспомогательные функции для различий между диалектами БД
+
+В продакшене используется PostgreSQL (asyncpg), в тестах - SQLite (aiosqlite).
+Оба поддерживают INSERT ... ON CONFLICT, но через разные конструкции SQLAlchemy.
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def get_dialect_name(session: AsyncSession) -> str:
+    """
+    Получить имя диалекта БД, к которой привязана сессия
+
+    Args:
+        session: Сессия БД
+
+    Returns:
+        Имя диалекта ('postgresql', 'sqlite', ...)
+    """
+    return session.get_bind().dialect.name
+
+
+def is_postgresql(session: AsyncSession) -> bool:
+    """Проверить, что сессия работает с PostgreSQL"""
+    return get_dialect_name(session) == "postgresql"
+
+
+def upsert_insert(session: AsyncSession, table):
+    """
+    Создать INSERT с поддержкой on_conflict_do_update / on_conflict_do_nothing
+    для диалекта сессии
+
+    Args:
+        session: Сессия БД
+        table: Модель или таблица
+
+    Returns:
+        Insert-конструкция PostgreSQL или SQLite
+    """
+    if is_postgresql(session):
+        return postgresql.insert(table)
+    return sqlite.insert(table)
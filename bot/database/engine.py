@@ -2,6 +2,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from bot.config import config
+from bot.database.pool_metrics import InstrumentedQueuePool
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
 
@@ -71,14 +72,38 @@ def get_connect_args():
     return connect_args
 
 
+def get_engine_options(database_url: str) -> dict:
+    """Параметры create_async_engine: пул и кэш запросов из конфига (для PostgreSQL)"""
+    options = {"connect_args": get_connect_args()}
+    
+    # SQLite (тесты, локальный запуск) - пул SQLAlchemy по умолчанию
+    if not database_url.startswith("postgresql+asyncpg"):
+        return options
+    
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        pool_recycle=config.db_pool_recycle,
+        pool_pre_ping=config.db_pre_ping,
+    )
+    # Кэш asyncpg и кэш подготовленных запросов диалекта SQLAlchemy
+    options["connect_args"].update(
+        statement_cache_size=config.db_statement_cache_size,
+        prepared_statement_cache_size=config.db_statement_cache_size,
+    )
+    return options
+
+
 # Создание async engine
 # echo=False для production - SQL запросы не логируются
 # Для отладки можно установить echo=True в .env через LOG_LEVEL=DEBUG
+_database_url = normalize_database_url(config.database_url)
 engine = create_async_engine(
-    normalize_database_url(config.database_url),
+    _database_url,
     echo=config.log_level.upper() == "DEBUG",  # Логирование SQL только в DEBUG режиме
     future=True,
-    connect_args=get_connect_args(),
+    **get_engine_options(_database_url),
 )
 
 # Создание session factory
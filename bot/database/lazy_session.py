@@ -0,0 +1,118 @@
+"""Ленивая сессия БД для middleware
+
+Многие обновления (/cancel, выбор категории, шаги FSM) вообще не обращаются
+к БД. LazySession создает AsyncSession только при первом обращении к ней,
+а при завершении обработки коммитит транзакцию только если были изменения.
+
+Это единственный commit при обработке обновления (см. unit_of_work):
+сервисы только делают flush.
+"""
+from typing import Callable, Optional
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, ORMExecuteState
+
+from bot.database.unit_of_work import has_post_commit_hooks, run_post_commit_hooks
+
+
+# Ключ в session.info: в транзакции были изменения, нужен commit
+HAS_WRITES_KEY = "has_writes"
+
+
+def mark_written(session: AsyncSession) -> None:
+    """
+    Пометить, что в транзакции сессии были изменения.
+
+    Нужен для запросов, которые выглядят как SELECT, но изменяют данные
+    (например, SELECT поверх INSERT ... RETURNING в CTE).
+
+    Args:
+        session: Сессия БД (AsyncSession или LazySession)
+    """
+    session.info[HAS_WRITES_KEY] = True
+
+
+def _on_flush(session: Session, flush_context) -> None:
+    session.info[HAS_WRITES_KEY] = True
+
+
+def _on_execute(orm_execute_state: ORMExecuteState) -> None:
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info[HAS_WRITES_KEY] = True
+
+
+def _on_transaction_end(session: Session) -> None:
+    session.info.pop(HAS_WRITES_KEY, None)
+
+
+class LazySession:
+    """
+    Прокси над AsyncSession, создающий сессию при первом обращении.
+
+    Все атрибуты и методы (execute, add, flush, ...) перенаправляются
+    в настоящую сессию, поэтому объект можно передавать в сервисы
+    вместо AsyncSession.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self._session_factory = session_factory
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def is_acquired(self) -> bool:
+        """Была ли сессия создана (т.е. handler обращался к БД)"""
+        return self._session is not None
+
+    @property
+    def has_writes(self) -> bool:
+        """Были ли в текущей транзакции изменения, требующие commit"""
+        return self._session is not None and bool(self._session.info.get(HAS_WRITES_KEY))
+
+    def _get_session(self) -> AsyncSession:
+        if self._session is None:
+            session = self._session_factory()
+            sync_session = session.sync_session
+            event.listen(sync_session, "after_flush", _on_flush)
+            event.listen(sync_session, "do_orm_execute", _on_execute)
+            event.listen(sync_session, "after_commit", _on_transaction_end)
+            event.listen(sync_session, "after_soft_rollback", lambda s, t: _on_transaction_end(s))
+            self._session = session
+        return self._session
+
+    def __getattr__(self, name: str):
+        return getattr(self._get_session(), name)
+
+    async def finish(self) -> bool:
+        """
+        Завершить работу с сессией: commit, если были изменения
+
+        Действия, отложенные через after_commit(), выполняются после
+        commit (или сразу, если изменений не было).
+
+        Returns:
+            True если был выполнен commit
+        """
+        if self._session is None:
+            return False
+
+        if self._session.new or self._session.dirty or self._session.deleted:
+            # Несброшенные изменения - commit их запишет
+            mark_written(self._session)
+
+        if not self.has_writes:
+            if has_post_commit_hooks(self._session):
+                run_post_commit_hooks(self._session)
+            return False
+
+        await self._session.commit()
+        return True
+
+    async def rollback(self) -> None:
+        """Откатить транзакцию, если сессия была создана"""
+        if self._session is not None:
+            await self._session.rollback()
+
+    async def close(self) -> None:
+        """Закрыть сессию (вернуть соединение в пул), если она была создана"""
+        if self._session is not None:
+            await self._session.close()
@@ -1,8 +1,8 @@
 """SQLAlchemy модели базы данных"""
-from datetime import datetime
-from sqlalchemy import BigInteger, Integer, String, Text, DateTime, ForeignKey, JSON, UniqueConstraint, Index, Boolean
+from datetime import date, datetime, timezone
+from sqlalchemy import BigInteger, Integer, String, Text, DateTime, Date, ForeignKey, JSON, UniqueConstraint, Index, Boolean
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from bot.database.engine import Base
 
 
@@ -29,6 +29,7 @@ class User(Base):
     is_premium: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
     first_seen_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     last_seen_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    profile_refreshed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)  # Когда профиль последний раз подтвержден через get_chat
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -40,10 +41,34 @@ class User(Base):
 class Request(Base):
     """Модель заявки"""
     __tablename__ = "requests"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "number", name="uq_requests_tenant_number"),
+        # Списки заявок тенанта от новых к старым (keyset по created_at, id)
+        Index("ix_requests_tenant_created_id", "tenant_id", "created_at", "id"),
+        # Заявки пользователя ("Мои заявки")
+        Index("ix_requests_tenant_user_created_id", "tenant_id", "user_id", "created_at", "id"),
+        # Очередь новых заявок (сначала срочные) и проверка просроченных срочных
+        Index("ix_requests_tenant_status_priority_created", "tenant_id", "status", "priority", "created_at"),
+        # Заявки, давно находящиеся в работе
+        Index(
+            "ix_requests_tenant_in_progress_updated", "tenant_id", "updated_at",
+            postgresql_where=text("status = 'in_progress'"),
+            sqlite_where=text("status = 'in_progress'"),
+        ),
+        # Проверка зависших в работе заявок по всем тенантам (automation_service)
+        Index(
+            "ix_requests_in_progress_updated", "updated_at",
+            postgresql_where=text("status = 'in_progress'"),
+            sqlite_where=text("status = 'in_progress'"),
+        ),
+        # Поиск (только PostgreSQL): генерируемая колонка search_vector (tsvector)
+        # и GIN-индексы ix_requests_search_vector / ix_requests_number_trgm
+        # создаются миграцией e8f9a0b1c2d3, см. request_search_service
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tenant_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, index=True)
-    number: Mapped[str] = mapped_column(String(50), unique=True, nullable=False, index=True)  # ЗХ-ДДММГГ-№№№
+    number: Mapped[str] = mapped_column(String(50), nullable=False, index=True)  # ЗХ-ДДММГГ-№№№ (уникален в рамках тенанта)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"), nullable=False, index=True)
     category: Mapped[str] = mapped_column(String(100), nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=False)
@@ -79,6 +104,12 @@ class WarehouseItem(Base):
     __table_args__ = (
         UniqueConstraint("tenant_id", "name", name="uq_warehouse_items_tenant_name"),
         Index("ix_warehouse_items_tenant_name", "tenant_id", "name"),
+        # Позиции с низким остатком (ежедневная сводка и оповещения о пересечении минимума)
+        Index(
+            "ix_warehouse_items_low_stock", "tenant_id", "name",
+            postgresql_where=text("current_quantity <= min_quantity"),
+            sqlite_where=text("current_quantity <= min_quantity"),
+        ),
     )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -86,6 +117,7 @@ class WarehouseItem(Base):
     name: Mapped[str] = mapped_column(String(200), nullable=False)
     current_quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     min_quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    low_stock_alerted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)  # Оповещение о низком остатке отправлено (сбрасывается при пополнении)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -93,6 +125,9 @@ class WarehouseItem(Base):
 class Complaint(Base):
     """Модель жалобы"""
     __tablename__ = "complaints"
+    __table_args__ = (
+        Index("ix_complaints_tenant_created", "tenant_id", "created_at"),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tenant_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, index=True)
@@ -141,3 +176,177 @@ class TechnicianAssignment(Base):
     manager: Mapped["User"] = relationship("User", foreign_keys=[manager_id])
     technician: Mapped["User"] = relationship("User", foreign_keys=[technician_id])
 
+
+
+class BroadcastJob(Base):
+    """Задание на рассылку (прогресс сохраняется, чтобы продолжить после перезапуска)"""
+    __tablename__ = "broadcast_jobs"
+    __table_args__ = (
+        Index("ix_broadcast_jobs_status", "status"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tenant_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, index=True)
+    author_id: Mapped[int] = mapped_column(BigInteger, nullable=False)  # Telegram ID автора рассылки
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")  # pending, running, completed
+    total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # Получателей на момент запуска
+    sent_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    failed_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_recipient_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)  # Курсор (keyset) по users.id
+    progress_chat_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)  # Сообщение с прогрессом
+    progress_message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class BroadcastDelivery(Base):
+    """Доставка рассылки одному получателю"""
+    __tablename__ = "broadcast_deliveries"
+    __table_args__ = (
+        UniqueConstraint("job_id", "user_id", name="uq_broadcast_deliveries_job_user"),
+        Index("ix_broadcast_deliveries_job_status", "job_id", "status"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    job_id: Mapped[int] = mapped_column(Integer, ForeignKey("broadcast_jobs.id", ondelete="CASCADE"), nullable=False)
+    user_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")  # pending, sent, failed
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class NotificationOutboxMessage(Base):
+    """Уведомление, ожидающее отправки (transactional outbox)"""
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index("ix_notification_outbox_status_available_at", "status", "available_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tenant_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)  # new_request, request_status_changed, manager_complaint
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")  # pending, sent, failed
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    available_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))  # Не раньше этого времени (lease / backoff)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class RequestDailyStat(Base):
+    """
+    Дневная статистика заявок (rollup), обновляется вместе с заявками
+
+    created - заявки, созданные в day и сейчас находящиеся в status;
+    taken / completed / rejected - переходы статуса, произошедшие в day.
+    """
+    __tablename__ = "request_daily_stats"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "day", "status", "priority", "category", name="uq_request_daily_stats_key"),
+        # Ежедневный отчет по всем тенантам (GROUP BY tenant_id за день)
+        Index("ix_request_daily_stats_day_tenant", "day", "tenant_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tenant_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)
+    priority: Mapped[str] = mapped_column(String(10), nullable=False)
+    category: Mapped[str] = mapped_column(String(100), nullable=False)
+    created: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    completed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    rejected: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    taken: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class RequestNumberSequence(Base):
+    """
+    Дневной счетчик номеров заявок тенанта
+
+    Увеличивается одним INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+    в транзакции создания заявки, поэтому номера идут без пропусков.
+    """
+    __tablename__ = "request_number_sequences"
+
+    tenant_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    last_value: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class WarehouseMovement(Base):
+    """
+    Движение по складу (журнал только на добавление)
+
+    delta > 0 - приход, delta < 0 - расход. Текущий остаток позиции
+    равен сумме всех ее движений.
+    """
+    __tablename__ = "warehouse_movements"
+    __table_args__ = (
+        Index("ix_warehouse_movements_item_created", "item_id", "created_at"),
+        Index("ix_warehouse_movements_tenant_created", "tenant_id", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tenant_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    item_id: Mapped[int] = mapped_column(Integer, ForeignKey("warehouse_items.id", ondelete="CASCADE"), nullable=False)
+    delta: Mapped[int] = mapped_column(Integer, nullable=False)
+    reason: Mapped[str] = mapped_column(String(20), nullable=False)  # opening, receipt, writeoff, request
+    request_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("requests.id", ondelete="SET NULL"), nullable=True)
+    actor_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)  # Telegram ID автора движения
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=datetime.now)
+
+
+class WarehouseBalanceSnapshot(Base):
+    """
+    Остаток позиции на начало месяца
+
+    balance - сумма движений до period_start, consumed - накопленный
+    расход (writeoff + request) до period_start. Запросы «на дату» читают
+    снимок и движения после него, а не весь журнал.
+    """
+    __tablename__ = "warehouse_balance_snapshots"
+    __table_args__ = (
+        UniqueConstraint("item_id", "period_start", name="uq_warehouse_balance_snapshots_item_period"),
+        Index("ix_warehouse_balance_snapshots_tenant_period", "tenant_id", "period_start"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tenant_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    item_id: Mapped[int] = mapped_column(Integer, ForeignKey("warehouse_items.id", ondelete="CASCADE"), nullable=False)
+    period_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    balance: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    consumed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class ScheduledJobRun(Base):
+    """
+    Последний запуск задачи планировщика
+
+    По last_run_at после перезапуска определяется, пропущено ли
+    срабатывание (тогда задача выполняется сразу).
+    """
+    __tablename__ = "scheduled_job_runs"
+
+    job_name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    last_run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_status: Mapped[str] = mapped_column(String(20), nullable=False)  # ok, failed, timeout
+    last_duration_ms: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+
+class SlaTimer(Base):
+    """
+    Таймер SLA срочной заявки
+
+    Создается вместе со срочной заявкой, удаляется при выходе заявки из
+    статуса "Новая" или при эскалации (поэтому эскалация - не больше одной).
+    """
+    __tablename__ = "sla_timers"
+
+    request_id: Mapped[int] = mapped_column(Integer, ForeignKey("requests.id", ondelete="CASCADE"), primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    due_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,90 @@
+"""Метрики пула соединений с БД
+
+InstrumentedQueuePool замеряет, сколько времени запрос соединения ждал
+свободного слота в пуле (включая открытие нового соединения), и
+отслеживает пиковое число одновременно выданных соединений. Вместе с
+текущими значениями пула это позволяет подбирать DB_POOL_SIZE и
+DB_MAX_OVERFLOW по данным, а не наугад.
+"""
+import time
+from collections import deque
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+
+# Сколько последних ожиданий хранить для перцентилей
+WAIT_SAMPLES = 1000
+
+
+class PoolMetrics:
+    """Накопленные метрики ожидания соединений"""
+
+    def __init__(self, samples: int = WAIT_SAMPLES):
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.in_use_peak = 0
+        self._recent = deque(maxlen=samples)
+
+    def observe_checkout(self, wait_seconds: float, in_use: int) -> None:
+        """
+        Учесть выдачу соединения
+
+        Args:
+            wait_seconds: Сколько ждали соединение
+            in_use: Сколько соединений выдано после выдачи этого
+        """
+        self.checkouts += 1
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+        self.in_use_peak = max(self.in_use_peak, in_use)
+        self._recent.append(wait_seconds)
+
+    def stats(self) -> dict:
+        """Метрики ожидания (секунды)"""
+        recent = sorted(self._recent)
+        p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+        return {
+            "checkouts": self.checkouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+            "wait_seconds_p95": round(p95, 6),
+            "in_use_peak": self.in_use_peak,
+        }
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool с замером ожидания соединения"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        connection = super()._do_get()
+        self.metrics.observe_checkout(time.perf_counter() - started, self.checkedout())
+        return connection
+
+
+def pool_stats(pool: Pool) -> dict:
+    """
+    Текущее состояние пула и накопленные метрики ожидания
+
+    Args:
+        pool: Пул соединений engine (engine.pool)
+
+    Returns:
+        Словарь метрик (для /metrics)
+    """
+    stats = {"pool": type(pool).__name__}
+    if hasattr(pool, "checkedout"):
+        stats.update({
+            "size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": pool.overflow(),
+        })
+    metrics = getattr(pool, "metrics", None)
+    if isinstance(metrics, PoolMetrics):
+        stats.update(metrics.stats())
+    return stats
@@ -0,0 +1,110 @@
+"""Облегченные проекции для списков
+
+Списки заявок не загружают ORM-объекты Request с полным описанием и
+фото (selectinload - еще два запроса). Вместо этого один SELECT по
+нужным колонкам с подзапросом количества фото возвращает неизменяемые
+RequestListRow (dataclass со __slots__) - без identity map и отслеживания
+изменений сессией.
+
+Фоновые проверки по всем тенантам читают те же строки потоком вместе
+с tenant_id (tenant_request_list_query / stream_tenant_request_rows).
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator
+
+from sqlalchemy import Select, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.models import Request, RequestPhoto
+
+# Сколько символов описания нужно списку (format_request_short обрезает до 50)
+DESCRIPTION_PREFIX_LENGTH = 51
+
+# Сколько строк читать за раз при потоковом чтении
+STREAM_BATCH_SIZE = 500
+
+
+@dataclass(frozen=True, slots=True)
+class RequestListRow:
+    """Заявка в списке: только поля, нужные для краткого отображения"""
+
+    id: int
+    number: str
+    user_id: int
+    status: str
+    priority: str
+    category: str
+    description: str  # Первые DESCRIPTION_PREFIX_LENGTH символов
+    created_at: datetime
+    updated_at: datetime
+    photo_count: int
+
+
+def request_list_query() -> Select:
+    """
+    SELECT колонок RequestListRow (к нему добавляются WHERE / ORDER BY)
+
+    Returns:
+        Select по requests с подзапросом количества фото
+    """
+    photo_count = (
+        select(func.count(RequestPhoto.id))
+        .where(RequestPhoto.request_id == Request.id)
+        .correlate(Request)
+        .scalar_subquery()
+    )
+    return select(
+        Request.id,
+        Request.number,
+        Request.user_id,
+        Request.status,
+        Request.priority,
+        Request.category,
+        func.substr(Request.description, 1, DESCRIPTION_PREFIX_LENGTH).label("description"),
+        Request.created_at,
+        Request.updated_at,
+        photo_count.label("photo_count"),
+    )
+
+
+def to_request_rows(result) -> list[RequestListRow]:
+    """
+    Преобразовать результат request_list_query() в RequestListRow
+
+    Args:
+        result: Результат session.execute()
+
+    Returns:
+        Список строк
+    """
+    return [RequestListRow(*row) for row in result]
+
+
+def tenant_request_list_query() -> Select:
+    """
+    request_list_query() с последней колонкой tenant_id (для запросов по всем тенантам)
+
+    Returns:
+        Select по requests (упорядочивать нужно по tenant_id)
+    """
+    return request_list_query().add_columns(Request.tenant_id)
+
+
+async def stream_tenant_request_rows(
+    session: AsyncSession,
+    query: Select
+) -> AsyncIterator[tuple[int, RequestListRow]]:
+    """
+    Прочитать результат tenant_request_list_query() потоком
+
+    Args:
+        session: Сессия БД
+        query: Запрос из tenant_request_list_query()
+
+    Yields:
+        (tenant_id, строка заявки)
+    """
+    result = await session.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+    async for row in result:
+        yield row[-1], RequestListRow(*row[:-1])
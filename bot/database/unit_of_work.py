@@ -0,0 +1,76 @@
+"""Unit of work: одна транзакция на обработку обновления
+
+Границу транзакции задает вызывающий код (для handlers - RoleMiddleware,
+для фоновых задач - владелец сессии), а сервисы только добавляют объекты
+в сессию и делают flush. Поэтому действия handler, затрагивающие
+несколько сервисов (заявка + статистика + outbox, списание + журнал
+движений), фиксируются одним COMMIT или откатываются целиком.
+
+Побочные эффекты, которые нельзя откатить (сброс кэша, запуск фоновой
+задачи, сигнал relay), регистрируются через after_commit() и выполняются
+только после успешного commit транзакции; при откате они отбрасываются.
+"""
+import logging
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, SessionTransaction
+
+logger = logging.getLogger(__name__)
+
+# Ключи в session.info
+POST_COMMIT_HOOKS_KEY = "post_commit_hooks"
+_LISTENING_KEY = "post_commit_listening"
+
+
+def _sync_session(session) -> Session:
+    return getattr(session, "sync_session", session)
+
+
+def after_commit(session, callback: Callable[[], None]) -> None:
+    """
+    Выполнить callback после commit текущей транзакции сессии
+
+    Если транзакция будет откачена, callback не выполнится.
+
+    Args:
+        session: Сессия БД (AsyncSession, LazySession или Session)
+        callback: Функция без аргументов (синхронная)
+    """
+    sync_session = _sync_session(session)
+    if not sync_session.info.get(_LISTENING_KEY):
+        event.listen(sync_session, "after_commit", _run_hooks)
+        event.listen(sync_session, "after_soft_rollback", _discard_hooks)
+        sync_session.info[_LISTENING_KEY] = True
+    sync_session.info.setdefault(POST_COMMIT_HOOKS_KEY, []).append(callback)
+
+
+def has_post_commit_hooks(session) -> bool:
+    """Есть ли отложенные до commit действия"""
+    return bool(_sync_session(session).info.get(POST_COMMIT_HOOKS_KEY))
+
+
+def run_post_commit_hooks(session) -> None:
+    """
+    Выполнить отложенные действия без commit
+
+    Нужен, когда транзакция не содержала изменений и commit пропущен.
+
+    Args:
+        session: Сессия БД
+    """
+    _run_hooks(_sync_session(session))
+
+
+def _run_hooks(session: Session) -> None:
+    for callback in session.info.pop(POST_COMMIT_HOOKS_KEY, []):
+        try:
+            callback()
+        except Exception as e:
+            # Commit уже выполнен - ошибка побочного эффекта не должна его "отменять"
+            logger.error(f"Ошибка действия после commit {callback!r}: {e}")
+
+
+def _discard_hooks(session: Session, previous_transaction: SessionTransaction) -> None:
+    if not previous_transaction.nested:
+        session.info.pop(POST_COMMIT_HOOKS_KEY, None)
@@ -2,7 +2,9 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
+from bot.database.unit_of_work import after_commit
 from bot.services.broadcast_service import broadcast_service
+from bot.services.broadcast_engine import BroadcastEngine, get_broadcast_engine, format_broadcast_progress
 from bot.keyboards.warehouseman import get_warehouseman_keyboard
 from bot.keyboards.inline import get_confirmation_keyboard, get_cancel_keyboard
 from bot.states.broadcast import BroadcastStates
@@ -41,8 +43,7 @@ async def process_broadcast_message(message: Message, state: FSMContext, db_sess
     await state.set_state(BroadcastStates.waiting_for_confirmation)
     
     # Получаем количество получателей
-    employees = await broadcast_service.get_all_employees(db_session)
-    count = len(employees)
+    count = await broadcast_service.count_employees(db_session)
     
     preview_text = f"📢 <b>Предпросмотр рассылки</b>\n\n"
     preview_text += f"<b>Сообщение:</b>\n{text}\n\n"
@@ -58,8 +59,8 @@ async def process_broadcast_message(message: Message, state: FSMContext, db_sess
 
 
 @router.callback_query(F.data == "broadcast_confirm", BroadcastStates.waiting_for_confirmation)
-async def confirm_broadcast(callback: CallbackQuery, state: FSMContext, db_session, bot, base_role: str):
-    """Подтверждение и отправка рассылки"""
+async def confirm_broadcast(callback: CallbackQuery, state: FSMContext, tenant_id: int, db_session, bot, base_role: str):
+    """Подтверждение рассылки: создаем задание, отправкой занимается BroadcastEngine"""
     data = await state.get_data()
     text = data.get("broadcast_text")
     
@@ -68,53 +69,43 @@ async def confirm_broadcast(callback: CallbackQuery, state: FSMContext, db_sessi
         await state.clear()
         return
     
-    # Получаем всех пользователей
-    employees = await broadcast_service.get_all_employees(db_session)
+    total = await broadcast_service.count_employees(db_session)
     
-    if not employees:
+    if total == 0:
         await callback.answer("❌ Нет пользователей для рассылки", show_alert=True)
         await state.clear()
         return
     
-    # Формируем сообщение
-    broadcast_message = f"📢 <b>Рассылка от техника</b>\n\n{text}"
-    
-    # Отправляем сообщение всем пользователям
-    success_count = 0
-    failed_count = 0
-    
-    for employee in employees:
-        try:
-            await bot.send_message(
-                chat_id=employee.id,
-                text=broadcast_message,
-                parse_mode="HTML"
-            )
-            success_count += 1
-        except Exception as e:
-            failed_count += 1
-            print(f"Ошибка отправки рассылки пользователю {employee.id}: {e}")
+    # Сообщение с превью становится сообщением с прогрессом
+    job = await broadcast_service.create_job(
+        db_session,
+        tenant_id=tenant_id,
+        author_id=callback.from_user.id,
+        text=text,
+        total=total,
+        progress_chat_id=callback.message.chat.id,
+        progress_message_id=callback.message.message_id
+    )
     
     # Очищаем состояние
     await state.clear()
     
-    # Отправляем отчет
-    report_text = f"✅ <b>Рассылка завершена</b>\n\n"
-    report_text += f"✅ Успешно отправлено: {success_count}\n"
-    if failed_count > 0:
-        report_text += f"❌ Ошибок: {failed_count}"
-    
     await callback.message.edit_text(
-        report_text,
+        format_broadcast_progress(job),
         parse_mode="HTML"
     )
     
+    # Движок читает задание в своей сессии - запускаем после commit обновления
+    engine = get_broadcast_engine() or BroadcastEngine(bot)
+    job_id = job.id
+    after_commit(db_session, lambda: engine.submit(job_id))
+    
     await callback.message.answer(
         "Выберите действие:",
         reply_markup=get_warehouseman_keyboard(is_manager=(base_role == "manager"))
     )
     
-    await callback.answer(f"Рассылка отправлена {success_count} пользователям")
+    await callback.answer(f"Рассылка запущена: {total} получателей")
 
 
 @router.callback_query(F.data == "broadcast_cancel")
@@ -7,7 +7,7 @@ from aiogram.fsm.context import FSMContext
 from bot.states.complaint_creation import ComplaintCreationStates
 from bot.services.complaint_service import complaint_service
 from bot.services.request_service import request_service
-from bot.services.notification_service import NotificationService
+from bot.services.notification_outbox import notification_outbox
 from bot.keyboards.complaints import get_complaint_reasons_keyboard, COMPLAINT_REASONS
 from bot.keyboards.employee import get_employee_keyboard
 from bot.keyboards.inline import get_cancel_keyboard
@@ -197,13 +197,8 @@ async def process_complaint_text(message: Message, state: FSMContext, user_id: i
         
         logger.info(f"Жалоба создана: ID={complaint.id}, user_id={user_id}, request_id={request_id}")
         
-        # Отправляем уведомление только руководителю
-        notification_service = NotificationService(bot)
-        try:
-            await notification_service.notify_manager_complaint(complaint, request)
-            logger.debug("Уведомление руководителю отправлено")
-        except Exception as notify_error:
-            logger.error(f"Ошибка отправки уведомления руководителю: {notify_error}")
+        # Уведомление только руководителю (отправит relay после commit)
+        await notification_outbox.enqueue_manager_complaint(db_session, complaint)
         
         # Очищаем состояние
         await state.clear()
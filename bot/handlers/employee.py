@@ -1,12 +1,17 @@
 """Обработчики для пользователей"""
+from typing import Optional
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from bot.services.request_service import request_service
+from bot.services.outbound_dispatcher import dispatch
 from bot.utils.request_formatter import format_request_list, format_request_full
+from bot.utils.photo_delivery import send_request_photos
+from bot.utils.pagination import PageCursor
 from bot.keyboards.employee import get_employee_keyboard
 from bot.keyboards.complaints import get_complaint_button_keyboard
-from bot.keyboards.inline import get_cancel_keyboard
+from bot.keyboards.inline import get_cancel_keyboard, get_request_page_keyboard
 from bot.states.contact_warehouseman import ContactWarehousemanStates
 
 router = Router(name="employee")
@@ -14,51 +19,57 @@ router = Router(name="employee")
 
 # ==================== МОИ ЗАЯВКИ ====================
 
-@router.message(F.text == "Мои заявки")
-async def show_my_requests(message: Message, user_id: int, tenant_id: int, db_session):
-    """Показать список заявок пользователя"""
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+async def render_my_requests_page(db_session, tenant_id: int, user_id: int, cursor: Optional[PageCursor] = None):
+    """
+    Сформировать страницу списка заявок пользователя
     
-    requests = await request_service.get_user_requests(
+    Returns:
+        (текст, клавиатура); текст None, если при листании заявок не осталось
+    """
+    page = await request_service.get_user_requests_page(
         session=db_session,
         tenant_id=tenant_id,
         user_id=user_id,
-        limit=10  # Последние 10 заявок
+        cursor=cursor
     )
     
-    text, request_ids = format_request_list(requests, title="Мои заявки")
-    
-    # Создаем inline кнопки для просмотра деталей
-    keyboard = None
-    if request_ids:
-        buttons = []
-        # Группируем по 2 кнопки в ряд
-        for i in range(0, min(len(request_ids), 10), 2):
-            row = []
-            request = requests[i]
-            row.append(InlineKeyboardButton(
-                text=f"📋 {request.number}",
-                callback_data=f"view_request_{request.id}"
-            ))
-            
-            if i + 1 < len(request_ids):
-                request = requests[i + 1]
-                row.append(InlineKeyboardButton(
-                    text=f"📋 {request.number}",
-                    callback_data=f"view_request_{request.id}"
-                ))
-            
-            buttons.append(row)
-        
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    if cursor is not None and not page.items:
+        return None, None
     
+    text, _ = format_request_list(page.items, title="Мои заявки")
+    keyboard = get_request_page_keyboard(page, view_prefix="view_request_", page_prefix="my")
+    return text, keyboard
+
+
+@router.message(F.text == "Мои заявки")
+async def show_my_requests(message: Message, user_id: int, tenant_id: int, db_session):
+    """Показать список заявок пользователя (постранично)"""
+    text, keyboard = await render_my_requests_page(db_session, tenant_id, user_id)
     await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
 
 
+@router.callback_query(F.data.startswith("my:"))
+async def paginate_my_requests(callback: CallbackQuery, user_id: int, tenant_id: int, db_session):
+    """Листание списка заявок пользователя (◀/▶) - редактируем то же сообщение"""
+    cursor = PageCursor.decode(callback.data)
+    if cursor is None:
+        await callback.answer()
+        return
+    
+    text, keyboard = await render_my_requests_page(db_session, tenant_id, user_id, cursor)
+    
+    if text is None:
+        await callback.answer("Больше заявок нет")
+        return
+    
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    await callback.answer()
+
+
 # ==================== ПРОСМОТР ДЕТАЛЕЙ ЗАЯВКИ ====================
 
 @router.callback_query(F.data.startswith("view_request_"))
-async def view_request_details(callback: CallbackQuery, user_id: int, tenant_id: int, db_session):
+async def view_request_details(callback: CallbackQuery, user_id: int, tenant_id: int, db_session, bot):
     """Просмотр деталей заявки"""
     request_id = int(callback.data.split("_")[-1])
     
@@ -80,25 +91,14 @@ async def view_request_details(callback: CallbackQuery, user_id: int, tenant_id:
     if request.status in ["new", "in_progress"]:
         keyboard = get_complaint_button_keyboard(request.id)
     
-    # Отправляем фото если есть
-    if request.photos:
-        # Отправляем первое фото с текстом
-        await callback.message.answer_photo(
-            photo=request.photos[0].file_id,
-            caption=text,
-            reply_markup=keyboard,
-            parse_mode="HTML"
-        )
-        
-        # Отправляем остальные фото
-        for photo in request.photos[1:]:
-            await callback.message.answer_photo(photo=photo.file_id)
-    else:
-        await callback.message.answer(
-            text,
-            reply_markup=keyboard,
-            parse_mode="HTML"
-        )
+    # Текст и фото одним альбомом (кнопки - следующим сообщением)
+    await send_request_photos(
+        bot,
+        chat_id=callback.message.chat.id,
+        text=text,
+        photo_file_ids=[photo.file_id for photo in request.photos],
+        reply_markup=keyboard
+    )
     
     await callback.answer()
 
@@ -139,7 +139,8 @@ async def send_message_to_warehouseman(message: Message, state: FSMContext, user
         # В demo режиме отправляем сообщение "технику" самому пользователю,
         # чтобы тестировщик не писал реальному технику.
         target_chat_id = user_id if config.demo_mode else config.warehouseman_id
-        await bot.send_message(
+        await dispatch(
+            bot, "send_message",
             chat_id=target_chat_id,
             text=text,
             parse_mode="HTML"
@@ -1,99 +1,91 @@
 """Обработчики для руководителя"""
-from typing import Optional
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from datetime import datetime, timedelta
+from typing import Optional
 from bot.services.manager_service import manager_service
 from bot.services.request_service import request_service
+from bot.services.user_profile_service import user_profile_service
 from bot.services.complaint_service import complaint_service
 from bot.services.role_service import role_service
 from bot.utils.request_formatter import format_request_list, format_request_full
+from bot.utils.photo_delivery import send_request_photos
+from bot.utils.pagination import PageCursor
 from bot.keyboards.manager import get_manager_keyboard
-from bot.keyboards.inline import get_request_details_keyboard
+from bot.keyboards.inline import get_request_details_keyboard, get_request_page_keyboard
 from bot.states.manager_period import PeriodReportStates
 
 router = Router(name="manager")
 
 
-async def get_users_info_map(bot, user_ids: set[int]) -> dict[int, tuple[str, str, Optional[str]]]:
+# Списки с постраничной навигацией: префикс callback data -> (заголовок, период в днях)
+REQUEST_LISTS = {
+    "mg_all": ("Все заявки", None),
+    "mg_week": ("Заявки за неделю", 7),
+}
+
+
+async def render_requests_page(db_session, bot, tenant_id: int, list_key: str, cursor: Optional[PageCursor] = None):
     """
-    Получить информацию о пользователях через Telegram API
+    Сформировать страницу списка заявок
     
-    Args:
-        bot: Экземпляр бота
-        user_ids: Множество user_id для получения информации
-        
     Returns:
-        Словарь {user_id: (full_name, username, phone)}
+        (текст, клавиатура) или (None, None), если заявок нет
     """
-    user_info_map = {}
-    for user_id in user_ids:
-        try:
-            chat = await bot.get_chat(user_id)
-            # Формируем полное имя (first_name + last_name если есть)
-            full_name_parts = []
-            if chat.first_name:
-                full_name_parts.append(chat.first_name)
-            if chat.last_name:
-                full_name_parts.append(chat.last_name)
-            full_name = " ".join(full_name_parts) if full_name_parts else f"ID: {user_id}"
-            username = f"@{chat.username}" if chat.username else f"ID: {user_id}"
-            # Пытаемся получить номер телефона (доступен не всегда)
-            phone = None
-            if hasattr(chat, 'phone_number') and chat.phone_number:
-                phone = chat.phone_number
-            user_info_map[user_id] = (full_name, username, phone)
-        except Exception:
-            # Если не удалось получить - используем ID
-            user_info_map[user_id] = (f"ID: {user_id}", f"ID: {user_id}", None)
-    return user_info_map
+    title, days = REQUEST_LISTS[list_key]
+    since = datetime.now() - timedelta(days=days) if days else None
+    page = await manager_service.get_requests_page(db_session, tenant_id=tenant_id, cursor=cursor, since=since)
+    
+    if not page.items:
+        return None, None
+    
+    # Получаем информацию о пользователях для отображения
+    user_ids = {request.user_id for request in page.items}
+    user_info_map = await user_profile_service.get_info_map(db_session, bot, user_ids)
+    
+    text, _ = format_request_list(page.items, title=title, user_info_map=user_info_map)
+    keyboard = get_request_page_keyboard(page, view_prefix="manager_view_", page_prefix=list_key)
+    return text, keyboard
 
 
 @router.message(F.text == "Все заявки")
 async def show_all_requests(message: Message, user_role: str, tenant_id: int, db_session, bot):
-    """Показать все заявки с кнопками для просмотра деталей"""
+    """Показать все заявки (постранично) с кнопками для просмотра деталей"""
     if user_role != "manager":
         await message.answer("❌ У вас нет доступа к этой функции.")
         return
     
-    requests = await manager_service.get_all_requests(db_session, tenant_id=tenant_id, limit=20)  # Последние 20 заявок
+    text, keyboard = await render_requests_page(db_session, bot, tenant_id, "mg_all")
     
-    if not requests:
+    if text is None:
         await message.answer("📋 Заявок пока нет.", parse_mode="HTML")
         return
     
-    # Получаем информацию о пользователях для отображения
-    user_ids = {request.user_id for request in requests}
-    user_info_map = await get_users_info_map(bot, user_ids)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@router.callback_query(F.data.startswith("mg_all:") | F.data.startswith("mg_week:"))
+async def paginate_requests(callback: CallbackQuery, user_role: str, tenant_id: int, db_session, bot):
+    """Листание списка заявок (◀/▶) - редактируем то же сообщение"""
+    if user_role != "manager":
+        await callback.answer("❌ У вас нет доступа к этой функции.", show_alert=True)
+        return
     
-    text, request_ids = format_request_list(requests, title="Все заявки", user_info_map=user_info_map)
+    cursor = PageCursor.decode(callback.data)
+    if cursor is None:
+        await callback.answer()
+        return
     
-    # Создаем inline кнопки для просмотра деталей
-    keyboard = None
-    if request_ids:
-        buttons = []
-        # Группируем по 2 кнопки в ряд
-        for i in range(0, min(len(request_ids), 20), 2):
-            row = []
-            request = requests[i]
-            row.append(InlineKeyboardButton(
-                text=f"📋 {request.number}",
-                callback_data=f"manager_view_{request.id}"
-            ))
-            
-            if i + 1 < len(request_ids):
-                request = requests[i + 1]
-                row.append(InlineKeyboardButton(
-                    text=f"📋 {request.number}",
-                    callback_data=f"manager_view_{request.id}"
-                ))
-            
-            buttons.append(row)
-        
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    list_key = callback.data.split(":", 1)[0]
+    text, keyboard = await render_requests_page(db_session, bot, tenant_id, list_key, cursor)
     
-    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+    if text is None:
+        await callback.answer("Больше заявок нет")
+        return
+    
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    await callback.answer()
 
 
 @router.callback_query(F.data.startswith("manager_view_"))
@@ -109,45 +101,21 @@ async def manager_view_request_details(callback: CallbackQuery, tenant_id: int,
         await callback.message.answer("❌ Заявка не найдена.")
         return
     
-    # Получаем ФИО, username и номер телефона отправителя через Telegram API
-    try:
-        chat = await bot.get_chat(request.user_id)
-        # Формируем полное имя (first_name + last_name если есть)
-        full_name_parts = []
-        if chat.first_name:
-            full_name_parts.append(chat.first_name)
-        if chat.last_name:
-            full_name_parts.append(chat.last_name)
-        full_name = " ".join(full_name_parts) if full_name_parts else f"ID: {request.user_id}"
-        username = f"@{chat.username}" if chat.username else f"ID: {request.user_id}"
-        # Пытаемся получить номер телефона (доступен не всегда)
-        phone = None
-        if hasattr(chat, 'phone_number') and chat.phone_number:
-            phone = chat.phone_number
-    except Exception as e:
-        full_name = f"ID: {request.user_id}"
-        username = f"ID: {request.user_id}"
-        phone = None
+    # Получаем ФИО и username отправителя (кэш профилей, при необходимости - Telegram API)
+    profile = await user_profile_service.get_profile(db_session, bot, request.user_id)
+    full_name = profile.full_name
+    username = profile.display_username
+    phone = None
     
     text = format_request_full(request, user_full_name=full_name, user_username=username, user_phone=phone)
     
-    # Отправляем фото если есть
-    if request.photos:
-        # Отправляем первое фото с текстом
-        await callback.message.answer_photo(
-            photo=request.photos[0].file_id,
-            caption=text,
-            parse_mode="HTML"
-        )
-        
-        # Отправляем остальные фото
-        for photo in request.photos[1:]:
-            await callback.message.answer_photo(photo=photo.file_id)
-    else:
-        await callback.message.answer(
-            text,
-            parse_mode="HTML"
-        )
+    # Текст и фото одним альбомом (кнопки - следующим сообщением)
+    await send_request_photos(
+        bot,
+        chat_id=callback.message.chat.id,
+        text=text,
+        photo_file_ids=[photo.file_id for photo in request.photos]
+    )
 
 
 @router.message(F.text == "Заявки за сегодня")
@@ -169,7 +137,7 @@ async def show_requests_today(message: Message, user_role: str, tenant_id: int,
     
     # Получаем информацию о пользователях для отображения
     user_ids = {request.user_id for request in requests}
-    user_info_map = await get_users_info_map(bot, user_ids)
+    user_info_map = await user_profile_service.get_info_map(db_session, bot, user_ids)
     
     text, request_ids = format_request_list(requests, title="Заявки за сегодня", user_info_map=user_info_map)
     
@@ -201,14 +169,14 @@ async def show_requests_today(message: Message, user_role: str, tenant_id: int,
 
 @router.message(F.text == "Заявки за неделю")
 async def show_requests_week(message: Message, user_role: str, tenant_id: int, db_session, bot):
-    """Показать заявки за неделю"""
+    """Показать заявки за неделю (постранично)"""
     if user_role != "manager":
         await message.answer("❌ У вас нет доступа к этой функции.")
         return
     
-    requests = await manager_service.get_requests_week(db_session, tenant_id=tenant_id)
+    text, keyboard = await render_requests_page(db_session, bot, tenant_id, "mg_week")
     
-    if not requests:
+    if text is None:
         await message.answer(
             "📋 <b>Заявки за неделю</b>\n\n"
             "За неделю заявок нет.",
@@ -216,35 +184,6 @@ async def show_requests_week(message: Message, user_role: str, tenant_id: int, d
         )
         return
     
-    # Получаем информацию о пользователях для отображения
-    user_ids = {request.user_id for request in requests}
-    user_info_map = await get_users_info_map(bot, user_ids)
-    
-    text, request_ids = format_request_list(requests, title="Заявки за неделю", user_info_map=user_info_map)
-    
-    # Создаем inline кнопки для просмотра деталей
-    keyboard = None
-    if request_ids:
-        buttons = []
-        for i in range(0, min(len(request_ids), 20), 2):
-            row = []
-            request = requests[i]
-            row.append(InlineKeyboardButton(
-                text=f"📋 {request.number}",
-                callback_data=f"manager_view_{request.id}"
-            ))
-            
-            if i + 1 < len(request_ids):
-                request = requests[i + 1]
-                row.append(InlineKeyboardButton(
-                    text=f"📋 {request.number}",
-                    callback_data=f"manager_view_{request.id}"
-                ))
-            
-            buttons.append(row)
-        
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-    
     await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
 
 
@@ -268,7 +207,7 @@ async def show_requests_over_3_days(message: Message, user_role: str, tenant_id:
     if len(requests) > 0:
         # Получаем информацию о пользователях для отображения
         user_ids = {request.user_id for request in requests}
-        user_info_map = await get_users_info_map(bot, user_ids)
+        user_info_map = await user_profile_service.get_info_map(db_session, bot, user_ids)
         
         text, request_ids = format_request_list(requests, title=f"Заявки в работе более 3 дней (найдено: {len(requests)})", user_info_map=user_info_map)
         
@@ -321,7 +260,7 @@ async def show_requests_over_7_days(message: Message, user_role: str, tenant_id:
     if len(requests) > 0:
         # Получаем информацию о пользователях для отображения
         user_ids = {request.user_id for request in requests}
-        user_info_map = await get_users_info_map(bot, user_ids)
+        user_info_map = await user_profile_service.get_info_map(db_session, bot, user_ids)
         
         text, request_ids = format_request_list(requests, title=f"Заявки в работе более 7 дней (найдено: {len(requests)})", user_info_map=user_info_map)
         
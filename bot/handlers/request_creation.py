@@ -308,11 +308,7 @@ async def confirm_request(callback: CallbackQuery, state: FSMContext, user_id: i
             quantity=data.quantity,
             photo_file_ids=data.photos if data.photos else None
         )
-        
-        # Отправляем уведомление технику
-        from bot.services.notification_service import NotificationService
-        notification_service = NotificationService(bot)
-        await notification_service.notify_warehouseman_new_request(request)
+        # Уведомление технику записано в outbox вместе с заявкой
         
         # Очищаем состояние
         await state.clear()
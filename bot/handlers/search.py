@@ -0,0 +1,160 @@
+"""Обработчики поиска заявок (кнопка "🔍 Поиск" и inline-режим)"""
+from html import escape
+from aiogram import Router, F
+from aiogram.types import (
+    Message,
+    CallbackQuery,
+    InlineQuery,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+)
+from aiogram.fsm.context import FSMContext
+from bot.services.request_search_service import request_search_service, normalize_query
+from bot.services.user_profile_service import user_profile_service
+from bot.utils.request_formatter import format_request_list, format_request_short
+from bot.keyboards.inline import get_search_results_keyboard
+from bot.states.search import SearchStates
+
+router = Router(name="search")
+
+# Роли, которым доступен поиск по всем заявкам тенанта -> префикс просмотра заявки
+SEARCH_VIEW_PREFIXES = {
+    "warehouseman": "warehouseman_view_",
+    "manager": "manager_view_",
+}
+
+# Префикс callback data листания результатов
+SEARCH_PAGE_PREFIX = "srch"
+
+# Время кэширования результатов inline-запроса на стороне Telegram (секунды)
+INLINE_CACHE_TIME = 5
+
+SEARCH_PROMPT = (
+    "🔍 <b>Поиск заявок</b>\n\n"
+    "Введите номер заявки (или его часть) либо слова из категории или описания.\n\n"
+    "Искать можно и из любого чата: наберите @имя_бота и запрос."
+)
+
+
+async def render_search_page(db_session, bot, tenant_id: int, user_role: str, query: str, page: int = 0):
+    """
+    Сформировать страницу результатов поиска
+
+    Returns:
+        (текст, клавиатура)
+    """
+    results = await request_search_service.search(db_session, tenant_id=tenant_id, query=query, page=page)
+
+    if not results.items:
+        text = f"🔍 По запросу «{escape(query)}» ничего не найдено."
+    else:
+        user_ids = {request.user_id for request in results.items}
+        user_info_map = await user_profile_service.get_info_map(db_session, bot, user_ids)
+        text, _ = format_request_list(
+            results.items,
+            title=f"Поиск: {escape(query)} (стр. {page + 1})",
+            user_info_map=user_info_map
+        )
+
+    keyboard = get_search_results_keyboard(results, view_prefix=SEARCH_VIEW_PREFIXES[user_role], page_prefix=SEARCH_PAGE_PREFIX)
+    return text, keyboard
+
+
+@router.message(F.text == "🔍 Поиск")
+async def start_search(message: Message, state: FSMContext, user_role: str):
+    """Начало поиска: запрашиваем текст запроса"""
+    if user_role not in SEARCH_VIEW_PREFIXES:
+        await message.answer("❌ Поиск по заявкам доступен только технику и руководителю.")
+        return
+
+    await state.clear()
+    await state.set_state(SearchStates.waiting_for_query)
+    await message.answer(SEARCH_PROMPT, parse_mode="HTML")
+
+
+@router.message(SearchStates.waiting_for_query)
+async def process_search_query(message: Message, state: FSMContext, user_role: str, tenant_id: int, db_session, bot):
+    """Выполнение поиска по введенному запросу"""
+    if user_role not in SEARCH_VIEW_PREFIXES:
+        await state.clear()
+        return
+
+    query = normalize_query(message.text or "")
+    if not query:
+        await message.answer("❌ Введите текст запроса.")
+        return
+
+    # Запрос нужен для листания: состояние сбрасываем, данные оставляем
+    await state.set_state(None)
+    await state.update_data(search_query=query)
+
+    text, keyboard = await render_search_page(db_session, bot, tenant_id, user_role, query)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@router.callback_query(F.data == f"{SEARCH_PAGE_PREFIX}:new")
+async def new_search(callback: CallbackQuery, state: FSMContext, user_role: str):
+    """Новый поиск из результатов"""
+    if user_role not in SEARCH_VIEW_PREFIXES:
+        await callback.answer("❌ Нет доступа", show_alert=True)
+        return
+
+    await state.set_state(SearchStates.waiting_for_query)
+    await callback.message.answer(SEARCH_PROMPT, parse_mode="HTML")
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith(f"{SEARCH_PAGE_PREFIX}:"))
+async def paginate_search(callback: CallbackQuery, state: FSMContext, user_role: str, tenant_id: int, db_session, bot):
+    """Листание результатов поиска (◀/▶) - редактируем то же сообщение"""
+    if user_role not in SEARCH_VIEW_PREFIXES:
+        await callback.answer("❌ Нет доступа", show_alert=True)
+        return
+
+    try:
+        page = int(callback.data.split(":", 1)[1])
+    except ValueError:
+        await callback.answer()
+        return
+
+    query = (await state.get_data()).get("search_query")
+    if not query:
+        await callback.answer("Поиск устарел - начните новый", show_alert=True)
+        return
+
+    text, keyboard = await render_search_page(db_session, bot, tenant_id, user_role, query, max(page, 0))
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    await callback.answer()
+
+
+@router.inline_query()
+async def inline_search(inline_query: InlineQuery, user_role: str, tenant_id: int, db_session):
+    """Поиск в inline-режиме: @имя_бота запрос"""
+    query = normalize_query(inline_query.query)
+    if user_role not in SEARCH_VIEW_PREFIXES or not query:
+        await inline_query.answer([], cache_time=INLINE_CACHE_TIME, is_personal=True)
+        return
+
+    # offset - номер следующей страницы (выдается Telegram из next_offset)
+    page = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    results = await request_search_service.search(db_session, tenant_id=tenant_id, query=query, page=page)
+
+    articles = [
+        InlineQueryResultArticle(
+            id=str(request.id),
+            title=f"{request.number} · {request.category}",
+            description=request.description,
+            input_message_content=InputTextMessageContent(
+                message_text=format_request_short(request),
+                parse_mode="HTML"
+            ),
+        )
+        for request in results.items
+    ]
+
+    await inline_query.answer(
+        articles,
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=True,
+        next_offset=str(page + 1) if results.has_next else ""
+    )
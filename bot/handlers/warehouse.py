@@ -211,7 +211,7 @@ async def start_subtract_quantity(callback: CallbackQuery, state: FSMContext, us
 
 
 @router.message(WarehouseManagementStates.waiting_for_add_quantity)
-async def process_add_quantity(message: Message, state: FSMContext, tenant_id: int, db_session, user_role: str):
+async def process_add_quantity(message: Message, state: FSMContext, user_id: int, tenant_id: int, db_session, user_role: str):
     """Обработка добавления количества"""
     try:
         quantity = int(message.text.strip())
@@ -228,7 +228,7 @@ async def process_add_quantity(message: Message, state: FSMContext, tenant_id: i
             await state.clear()
             return
         
-        item = await warehouse_service.add_quantity(db_session, tenant_id=tenant_id, item_id=item_id, quantity=quantity)
+        item = await warehouse_service.add_quantity(db_session, tenant_id=tenant_id, item_id=item_id, quantity=quantity, actor_id=user_id)
         
         if not item:
             await message.answer("❌ Позиция не найдена.")
@@ -252,7 +252,7 @@ async def process_add_quantity(message: Message, state: FSMContext, tenant_id: i
 
 
 @router.message(WarehouseManagementStates.waiting_for_subtract_quantity)
-async def process_subtract_quantity(message: Message, state: FSMContext, tenant_id: int, db_session, user_role: str):
+async def process_subtract_quantity(message: Message, state: FSMContext, user_id: int, tenant_id: int, db_session, user_role: str):
     """Обработка списания количества"""
     # Дополнительная проверка роли
     if user_role != "manager":
@@ -275,7 +275,7 @@ async def process_subtract_quantity(message: Message, state: FSMContext, tenant_
             await state.clear()
             return
         
-        item = await warehouse_service.subtract_quantity(db_session, tenant_id=tenant_id, item_id=item_id, quantity=quantity)
+        item = await warehouse_service.subtract_quantity(db_session, tenant_id=tenant_id, item_id=item_id, quantity=quantity, actor_id=user_id)
         
         if not item:
             # Проверяем, недостаточно ли товара
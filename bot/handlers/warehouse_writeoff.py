@@ -4,7 +4,7 @@ from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from bot.services.warehouse_service import warehouse_service
 from bot.services.warehouseman_service import warehouseman_service
-from bot.services.notification_service import NotificationService
+from bot.services.notification_outbox import notification_outbox
 from bot.utils.request_formatter import format_request_full
 from bot.keyboards.warehouseman import get_warehouseman_keyboard
 from bot.states.warehouse_management import WarehouseManagementStates
@@ -30,7 +30,7 @@ async def process_writeoff_item(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "writeoff_cancel")
-async def cancel_writeoff(callback: CallbackQuery, state: FSMContext, db_session, bot, base_role: str):
+async def cancel_writeoff(callback: CallbackQuery, state: FSMContext, tenant_id: int, db_session, bot, base_role: str):
     """Отмена списания, просто завершаем заявку"""
     data = await state.get_data()
     request_id = data.get("request_id")
@@ -41,7 +41,7 @@ async def cancel_writeoff(callback: CallbackQuery, state: FSMContext, db_session
         return
     
     # Завершаем заявку без списания
-    request = await warehouseman_service.complete_request(db_session, request_id)
+    request = await warehouseman_service.complete_request(db_session, tenant_id=tenant_id, request_id=request_id)
     
     if not request:
         await callback.answer("❌ Не удалось завершить заявку", show_alert=True)
@@ -49,8 +49,7 @@ async def cancel_writeoff(callback: CallbackQuery, state: FSMContext, db_session
         return
     
     # Уведомляем пользователя
-    notification_service = NotificationService(bot)
-    await notification_service.notify_employee_request_status_changed(request, "Выполнено")
+    await notification_outbox.enqueue_request_status_changed(db_session, request, "Выполнено")
     
     await callback.message.edit_text(
         f"✅ Заявка {request.number} завершена.\n"
@@ -62,7 +61,7 @@ async def cancel_writeoff(callback: CallbackQuery, state: FSMContext, db_session
 
 
 @router.message(WarehouseManagementStates.waiting_for_writeoff_quantity)
-async def process_writeoff_quantity(message: Message, state: FSMContext, db_session, bot, base_role: str):
+async def process_writeoff_quantity(message: Message, state: FSMContext, user_id: int, tenant_id: int, db_session, bot, base_role: str):
     """Обработка количества для списания"""
     try:
         quantity = int(message.text.strip())
@@ -81,11 +80,14 @@ async def process_writeoff_quantity(message: Message, state: FSMContext, db_sess
             return
         
         # Сначала списываем со склада
-        item = await warehouse_service.subtract_quantity(db_session, item_id, quantity)
+        item = await warehouse_service.subtract_quantity(
+            db_session, tenant_id=tenant_id, item_id=item_id, quantity=quantity,
+            request_id=request_id, actor_id=user_id
+        )
         
         if not item:
             # Проверяем, недостаточно ли товара
-            existing_item = await warehouse_service.get_item_by_id(db_session, item_id)
+            existing_item = await warehouse_service.get_item_by_id(db_session, tenant_id=tenant_id, item_id=item_id)
             if existing_item and existing_item.current_quantity < quantity:
                 await message.answer(
                     f"❌ Недостаточно товара на складе!\n"
@@ -97,16 +99,15 @@ async def process_writeoff_quantity(message: Message, state: FSMContext, db_sess
                 await message.answer("❌ Позиция не найдена на складе.")
             
             # Все равно завершаем заявку
-            request = await warehouseman_service.complete_request(db_session, request_id)
+            request = await warehouseman_service.complete_request(db_session, tenant_id=tenant_id, request_id=request_id)
             if request:
-                notification_service = NotificationService(bot)
-                await notification_service.notify_employee_request_status_changed(request, "Выполнено")
+                await notification_outbox.enqueue_request_status_changed(db_session, request, "Выполнено")
             
             await state.clear()
             return
         
         # Теперь завершаем заявку
-        request = await warehouseman_service.complete_request(db_session, request_id)
+        request = await warehouseman_service.complete_request(db_session, tenant_id=tenant_id, request_id=request_id)
         
         if not request:
             await message.answer("❌ Не удалось завершить заявку.")
@@ -114,8 +115,7 @@ async def process_writeoff_quantity(message: Message, state: FSMContext, db_sess
             return
         
         # Уведомляем пользователя
-        notification_service = NotificationService(bot)
-        await notification_service.notify_employee_request_status_changed(request, "Выполнено")
+        await notification_outbox.enqueue_request_status_changed(db_session, request, "Выполнено")
         
         await message.answer(
             f"✅ Заявка {request.number} завершена!\n"
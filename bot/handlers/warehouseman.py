@@ -1,14 +1,19 @@
 """Обработчики для техника"""
+from datetime import datetime, timedelta
 from typing import Optional
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from bot.services.warehouseman_service import warehouseman_service
 from bot.services.request_service import request_service
-from bot.services.notification_service import NotificationService
+from bot.services.user_profile_service import user_profile_service
+from bot.services.notification_outbox import notification_outbox
+from bot.services.outbound_dispatcher import dispatch
 from bot.utils.request_formatter import format_request_full, format_request_list
+from bot.utils.photo_delivery import send_request_photos
+from bot.utils.pagination import PageCursor
 from bot.keyboards.warehouseman import get_warehouseman_keyboard
-from bot.keyboards.inline import get_request_actions_keyboard, get_cancel_keyboard
+from bot.keyboards.inline import get_request_actions_keyboard, get_cancel_keyboard, get_request_page_keyboard
 from bot.states.warehouseman_actions import WarehousemanActionStates
 
 router = Router(name="warehouseman")
@@ -16,84 +21,65 @@ router = Router(name="warehouseman")
 
 # ==================== ВСЕ ЗАЯВКИ ====================
 
-async def get_users_info_map(bot, user_ids: set[int]) -> dict[int, tuple[str, str, Optional[str]]]:
+# Списки с постраничной навигацией: префикс callback data -> (заголовок, период в днях)
+REQUEST_LISTS = {
+    "wh_all": ("Все заявки", None),
+    "wh_week": ("Заявки за неделю", 7),
+}
+
+
+async def render_requests_page(db_session, bot, tenant_id: int, list_key: str, cursor: Optional[PageCursor] = None):
     """
-    Получить информацию о пользователях через Telegram API
+    Сформировать страницу списка заявок
     
-    Args:
-        bot: Экземпляр бота
-        user_ids: Множество user_id для получения информации
-        
     Returns:
-        Словарь {user_id: (full_name, username, phone)}
+        (текст, клавиатура) или (None, None), если заявок нет
     """
-    from typing import Optional
+    title, days = REQUEST_LISTS[list_key]
+    since = datetime.now() - timedelta(days=days) if days else None
+    page = await warehouseman_service.get_requests_page(db_session, tenant_id=tenant_id, cursor=cursor, since=since)
     
-    user_info_map = {}
-    for user_id in user_ids:
-        try:
-            chat = await bot.get_chat(user_id)
-            # Формируем полное имя (first_name + last_name если есть)
-            full_name_parts = []
-            if chat.first_name:
-                full_name_parts.append(chat.first_name)
-            if chat.last_name:
-                full_name_parts.append(chat.last_name)
-            full_name = " ".join(full_name_parts) if full_name_parts else f"ID: {user_id}"
-            username = f"@{chat.username}" if chat.username else f"ID: {user_id}"
-            # Пытаемся получить номер телефона (доступен не всегда)
-            phone = None
-            if hasattr(chat, 'phone_number') and chat.phone_number:
-                phone = chat.phone_number
-            user_info_map[user_id] = (full_name, username, phone)
-        except Exception:
-            # Если не удалось получить - используем ID
-            user_info_map[user_id] = (f"ID: {user_id}", f"ID: {user_id}", None)
-    return user_info_map
+    if not page.items:
+        return None, None
+    
+    # Получаем информацию о пользователях для отображения
+    user_ids = {request.user_id for request in page.items}
+    user_info_map = await user_profile_service.get_info_map(db_session, bot, user_ids)
+    
+    text, _ = format_request_list(page.items, title=title, user_info_map=user_info_map)
+    keyboard = get_request_page_keyboard(page, view_prefix="warehouseman_view_", page_prefix=list_key)
+    return text, keyboard
 
 
 @router.message(F.text == "Все заявки")
 async def show_all_requests(message: Message, tenant_id: int, db_session, bot):
-    """Показать все заявки с кнопками для просмотра деталей"""
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-    
-    requests = await warehouseman_service.get_all_requests(db_session, tenant_id=tenant_id, limit=20)  # Последние 20 заявок
+    """Показать все заявки (постранично) с кнопками для просмотра деталей"""
+    text, keyboard = await render_requests_page(db_session, bot, tenant_id, "wh_all")
     
-    if not requests:
+    if text is None:
         await message.answer("📋 Заявок пока нет.")
         return
     
-    # Получаем информацию о пользователях для отображения
-    user_ids = {request.user_id for request in requests}
-    user_info_map = await get_users_info_map(bot, user_ids)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@router.callback_query(F.data.startswith("wh_all:") | F.data.startswith("wh_week:"))
+async def paginate_requests(callback: CallbackQuery, tenant_id: int, db_session, bot):
+    """Листание списка заявок (◀/▶) - редактируем то же сообщение"""
+    cursor = PageCursor.decode(callback.data)
+    if cursor is None:
+        await callback.answer()
+        return
     
-    text, request_ids = format_request_list(requests, title="Все заявки", user_info_map=user_info_map)
+    list_key = callback.data.split(":", 1)[0]
+    text, keyboard = await render_requests_page(db_session, bot, tenant_id, list_key, cursor)
     
-    # Создаем inline кнопки для просмотра деталей (как у пользователя)
-    keyboard = None
-    if request_ids:
-        buttons = []
-        # Группируем по 2 кнопки в ряд
-        for i in range(0, min(len(request_ids), 20), 2):
-            row = []
-            request = requests[i]
-            row.append(InlineKeyboardButton(
-                text=f"📋 {request.number}",
-                callback_data=f"warehouseman_view_{request.id}"
-            ))
-            
-            if i + 1 < len(request_ids):
-                request = requests[i + 1]
-                row.append(InlineKeyboardButton(
-                    text=f"📋 {request.number}",
-                    callback_data=f"warehouseman_view_{request.id}"
-                ))
-            
-            buttons.append(row)
-        
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    if text is None:
+        await callback.answer("Больше заявок нет")
+        return
     
-    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    await callback.answer()
 
 
 # ==================== ПРОСМОТР ДЕТАЛЕЙ ЗАЯВКИ ====================
@@ -111,50 +97,25 @@ async def view_request_details(callback: CallbackQuery, tenant_id: int, db_sessi
         await callback.message.answer("❌ Заявка не найдена.")
         return
     
-    # Получаем ФИО, username и номер телефона отправителя через Telegram API
-    try:
-        chat = await bot.get_chat(request.user_id)
-        # Формируем полное имя (first_name + last_name если есть)
-        full_name_parts = []
-        if chat.first_name:
-            full_name_parts.append(chat.first_name)
-        if chat.last_name:
-            full_name_parts.append(chat.last_name)
-        full_name = " ".join(full_name_parts) if full_name_parts else f"ID: {request.user_id}"
-        username = f"@{chat.username}" if chat.username else f"ID: {request.user_id}"
-        # Пытаемся получить номер телефона (доступен не всегда)
-        phone = None
-        if hasattr(chat, 'phone_number') and chat.phone_number:
-            phone = chat.phone_number
-    except Exception as e:
-        full_name = f"ID: {request.user_id}"
-        username = f"ID: {request.user_id}"
-        phone = None
+    # Получаем ФИО и username отправителя (кэш профилей, при необходимости - Telegram API)
+    profile = await user_profile_service.get_profile(db_session, bot, request.user_id)
+    full_name = profile.full_name
+    username = profile.display_username
+    phone = None
     
     text = format_request_full(request, user_full_name=full_name, user_username=username, user_phone=phone)
     
     # Добавляем кнопки для изменения статуса
     keyboard = get_request_actions_keyboard(request.id)
     
-    # Отправляем фото если есть
-    if request.photos:
-        # Отправляем первое фото с текстом
-        await callback.message.answer_photo(
-            photo=request.photos[0].file_id,
-            caption=text,
-            reply_markup=keyboard,
-            parse_mode="HTML"
-        )
-        
-        # Отправляем остальные фото
-        for photo in request.photos[1:]:
-            await callback.message.answer_photo(photo=photo.file_id)
-    else:
-        await callback.message.answer(
-            text,
-            reply_markup=keyboard,
-            parse_mode="HTML"
-        )
+    # Текст и фото одним альбомом (кнопки - следующим сообщением)
+    await send_request_photos(
+        bot,
+        chat_id=callback.message.chat.id,
+        text=text,
+        photo_file_ids=[photo.file_id for photo in request.photos],
+        reply_markup=keyboard
+    )
 
 
 # ==================== ЗАЯВКИ ЗА СЕГОДНЯ ====================
@@ -172,7 +133,7 @@ async def show_requests_today(message: Message, tenant_id: int, db_session, bot)
     
     # Получаем информацию о пользователях для отображения
     user_ids = {request.user_id for request in requests}
-    user_info_map = await get_users_info_map(bot, user_ids)
+    user_info_map = await user_profile_service.get_info_map(db_session, bot, user_ids)
     
     text, request_ids = format_request_list(requests, title="Заявки за сегодня", user_info_map=user_info_map)
     
@@ -207,45 +168,13 @@ async def show_requests_today(message: Message, tenant_id: int, db_session, bot)
 
 @router.message(F.text == "Все заявки за неделю")
 async def show_requests_week(message: Message, tenant_id: int, db_session, bot):
-    """Показать все заявки за неделю с кнопками для просмотра"""
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+    """Показать все заявки за неделю (постранично) с кнопками для просмотра"""
+    text, keyboard = await render_requests_page(db_session, bot, tenant_id, "wh_week")
     
-    requests = await warehouseman_service.get_requests_week(db_session, tenant_id=tenant_id)
-    
-    if not requests:
+    if text is None:
         await message.answer("📋 Заявок за неделю нет.")
         return
     
-    # Получаем информацию о пользователях для отображения
-    user_ids = {request.user_id for request in requests}
-    user_info_map = await get_users_info_map(bot, user_ids)
-    
-    text, request_ids = format_request_list(requests, title="Заявки за неделю", user_info_map=user_info_map)
-    
-    # Создаем inline кнопки для просмотра деталей
-    keyboard = None
-    if request_ids:
-        buttons = []
-        # Группируем по 2 кнопки в ряд
-        for i in range(0, min(len(request_ids), 20), 2):
-            row = []
-            request = requests[i]
-            row.append(InlineKeyboardButton(
-                text=f"📋 {request.number}",
-                callback_data=f"warehouseman_view_{request.id}"
-            ))
-            
-            if i + 1 < len(request_ids):
-                request = requests[i + 1]
-                row.append(InlineKeyboardButton(
-                    text=f"📋 {request.number}",
-                    callback_data=f"warehouseman_view_{request.id}"
-                ))
-            
-            buttons.append(row)
-        
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-    
     await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
 
 
@@ -262,19 +191,13 @@ async def take_request_in_work(callback: CallbackQuery, tenant_id: int, db_sessi
         await callback.answer("❌ Не удалось взять заявку в работу", show_alert=True)
         return
     
-    # Уведомляем пользователя
-    from bot.services.notification_service import NotificationService
-    notification_service = NotificationService(bot)
-    await notification_service.notify_employee_request_status_changed(request, "В работе")
+    # Уведомляем пользователя (отправит relay после commit)
+    await notification_outbox.enqueue_request_status_changed(db_session, request, "В работе")
     
     # Обновляем сообщение
     request_text = format_request_full(request)
-    # Получаем имя пользователя через Telegram API
-    try:
-        chat = await bot.get_chat(request.user_id)
-        user_name = chat.first_name or chat.username or f"ID: {request.user_id}"
-    except:
-        user_name = f"ID: {request.user_id}"
+    # Получаем имя пользователя (кэш профилей, при необходимости - Telegram API)
+    user_name = (await user_profile_service.get_profile(db_session, bot, request.user_id)).short_name
     request_text += f"\n👤 <b>От:</b> {user_name}"
     
     keyboard = get_request_actions_keyboard(request.id)
@@ -332,18 +255,13 @@ async def complete_request(callback: CallbackQuery, tenant_id: int, db_session,
             await callback.answer("❌ Не удалось завершить заявку", show_alert=True)
             return
         
-        # Уведомляем пользователя
-        notification_service = NotificationService(bot)
-        await notification_service.notify_employee_request_status_changed(request, "Выполнено")
+        # Уведомляем пользователя (отправит relay после commit)
+        await notification_outbox.enqueue_request_status_changed(db_session, request, "Выполнено")
         
         # Обновляем сообщение
         request_text = format_request_full(request)
-        # Получаем имя пользователя через Telegram API
-        try:
-            chat = await bot.get_chat(request.user_id)
-            user_name = chat.first_name or chat.username or f"ID: {request.user_id}"
-        except:
-            user_name = f"ID: {request.user_id}"
+        # Получаем имя пользователя (кэш профилей, при необходимости - Telegram API)
+        user_name = (await user_profile_service.get_profile(db_session, bot, request.user_id)).short_name
         request_text += f"\n👤 <b>От:</b> {user_name}"
         
         # Убираем кнопки действий, так как заявка завершена
@@ -416,9 +334,8 @@ async def process_rejection_reason(message: Message, state: FSMContext, tenant_i
         await state.clear()
         return
     
-    # Уведомляем пользователя
-    notification_service = NotificationService(bot)
-    await notification_service.notify_employee_request_status_changed(request, "Отклонено")
+    # Уведомляем пользователя (отправит relay после commit)
+    await notification_outbox.enqueue_request_status_changed(db_session, request, "Отклонено")
     
     await message.answer(
         f"✅ Заявка {request.number} отклонена.\n"
@@ -447,12 +364,8 @@ async def start_message_to_employee(callback: CallbackQuery, state: FSMContext,
     await state.update_data(request_id=request_id, employee_id=request.user_id)
     await state.set_state(WarehousemanActionStates.waiting_for_message_to_employee)
     
-    # Получаем имя пользователя через Telegram API
-    try:
-        chat = await bot.get_chat(request.user_id)
-        user_name = chat.first_name or chat.username or f"ID: {request.user_id}"
-    except:
-        user_name = f"ID: {request.user_id}"
+    # Получаем имя пользователя (кэш профилей, при необходимости - Telegram API)
+    user_name = (await user_profile_service.get_profile(db_session, bot, request.user_id)).short_name
     
     await callback.message.answer(
         f"💬 <b>Написать пользователю</b>\n\n"
@@ -497,7 +410,8 @@ async def send_message_to_employee(message: Message, state: FSMContext, tenant_i
         text += f"💬 <b>Сообщение:</b>\n{message.text}"
         
         try:
-            await bot.send_message(
+            await dispatch(
+                bot, "send_message",
                 chat_id=employee_id,
                 text=text,
                 parse_mode="HTML"
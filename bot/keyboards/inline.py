@@ -1,6 +1,8 @@
 """Inline клавиатуры для всех ролей"""
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from typing import Optional
+from bot.utils.pagination import RequestPage
+from bot.services.request_search_service import SearchPage
 
 
 def get_request_actions_keyboard(request_id: int) -> InlineKeyboardMarkup:
@@ -92,3 +94,61 @@ def get_request_details_keyboard(request_id: int) -> InlineKeyboardMarkup:
         ]
     )
     return keyboard
+
+
+def get_request_page_keyboard(page: RequestPage, view_prefix: str, page_prefix: str) -> Optional[InlineKeyboardMarkup]:
+    """
+    Получить inline клавиатуру страницы списка заявок: кнопки заявок и ◀/▶
+    
+    Args:
+        page: Страница заявок
+        view_prefix: Префикс callback data просмотра заявки (например, 'manager_view_')
+        page_prefix: Префикс callback data листания (например, 'mg_all')
+    """
+    buttons = []
+    # Группируем по 2 кнопки в ряд
+    for i in range(0, len(page.items), 2):
+        buttons.append([
+            InlineKeyboardButton(text=f"📋 {request.number}", callback_data=f"{view_prefix}{request.id}")
+            for request in page.items[i:i + 2]
+        ])
+    
+    navigation = []
+    if page.prev_cursor:
+        navigation.append(InlineKeyboardButton(text="◀ Новее", callback_data=page.prev_cursor.encode(page_prefix)))
+    if page.next_cursor:
+        navigation.append(InlineKeyboardButton(text="Старее ▶", callback_data=page.next_cursor.encode(page_prefix)))
+    if navigation:
+        buttons.append(navigation)
+    
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def get_search_results_keyboard(page: SearchPage, view_prefix: str, page_prefix: str = "srch") -> InlineKeyboardMarkup:
+    """
+    Получить inline клавиатуру страницы результатов поиска: кнопки заявок, ◀/▶ и новый поиск
+    
+    Args:
+        page: Страница результатов
+        view_prefix: Префикс callback data просмотра заявки (например, 'manager_view_')
+        page_prefix: Префикс callback data листания (callback data - "<prefix>:<страница>")
+    """
+    buttons = []
+    for i in range(0, len(page.items), 2):
+        buttons.append([
+            InlineKeyboardButton(text=f"📋 {request.number}", callback_data=f"{view_prefix}{request.id}")
+            for request in page.items[i:i + 2]
+        ])
+    
+    navigation = []
+    if page.has_prev:
+        navigation.append(InlineKeyboardButton(text="◀ Назад", callback_data=f"{page_prefix}:{page.page - 1}"))
+    if page.has_next:
+        navigation.append(InlineKeyboardButton(text="Дальше ▶", callback_data=f"{page_prefix}:{page.page + 1}"))
+    if navigation:
+        buttons.append(navigation)
+    
+    buttons.append([InlineKeyboardButton(text="🔍 Новый поиск", callback_data=f"{page_prefix}:new")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
@@ -10,6 +10,7 @@ def get_manager_keyboard() -> ReplyKeyboardMarkup:
             [KeyboardButton(text="Все заявки")],
             [KeyboardButton(text="Заявки за сегодня")],
             [KeyboardButton(text="Заявки за неделю")],
+            [KeyboardButton(text="🔍 Поиск")],
             [KeyboardButton(text="В работе > 3 дней")],
             [KeyboardButton(text="В работе > 7 дней")],
             [KeyboardButton(text="Отчёт за период")],
@@ -15,6 +15,7 @@ def get_warehouseman_keyboard(new_requests_count: Optional[int] = None, is_manag
         [KeyboardButton(text="Все заявки")],
         [KeyboardButton(text="Все заявки за сегодня")],
         [KeyboardButton(text="Все заявки за неделю")],
+        [KeyboardButton(text="🔍 Поиск")],
         [KeyboardButton(text="Склад")],
         [KeyboardButton(text="Рассылка всем пользователям")],
     ]
@@ -0,0 +1,191 @@
+"""Реестр разрешенных пользователей (белый список в памяти)
+
+Таблица allowed_users целиком загружается в память при старте, после чего
+проверка доступа в RoleMiddleware выполняется без запросов к БД.
+
+Актуальность поддерживается двумя способами:
+- в PostgreSQL триггер на allowed_users отправляет NOTIFY в канал
+  ALLOWED_USERS_CHANNEL с payload вида "INSERT:<id>" / "DELETE:<id>";
+- периодическая полная пересинхронизация (страховка на случай потери
+  уведомлений, например при разрыве соединения).
+
+Уведомления, пришедшие, пока пересинхронизация ждет SELECT, запоминаются
+и применяются поверх прочитанного снимка: снимок не затирает изменения,
+закоммиченные после его чтения.
+"""
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import select
+
+from bot.database.engine import engine, async_session_maker, get_connect_args
+from bot.database.models import AllowedUser
+from bot.services.identity_cache import identity_cache
+
+logger = logging.getLogger(__name__)
+
+# Канал NOTIFY (создается триггером в миграции)
+ALLOWED_USERS_CHANNEL = "allowed_users_changed"
+
+# Интервал полной пересинхронизации (секунды)
+RESYNC_INTERVAL_SECONDS = 300
+
+
+class AllowedUserRegistry:
+    """Множество Telegram ID из allowed_users, синхронизируемое с БД"""
+
+    def __init__(self, resync_interval: float = RESYNC_INTERVAL_SECONDS):
+        self.resync_interval = resync_interval
+        self._ids: set[int] = set()
+        self._loaded = False
+        self._last_sync_at: Optional[float] = None
+        self._last_event_at: Optional[float] = None
+        self._listener = None
+        self._resync_task: Optional[asyncio.Task] = None
+        # Уведомления (операция, ID), пришедшие во время пересинхронизации
+        self._pending_events: Optional[list[tuple[str, int]]] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        """Загружен ли реестр (до загрузки проверка идет через БД)"""
+        return self._loaded
+
+    @property
+    def is_listening(self) -> bool:
+        """Есть ли активная подписка на NOTIFY"""
+        return self._listener is not None and not self._listener.is_closed()
+
+    def contains(self, user_id: int) -> bool:
+        """
+        Проверить, есть ли пользователь в белом списке
+
+        Args:
+            user_id: Telegram ID пользователя
+
+        Returns:
+            True если пользователь разрешен
+        """
+        return user_id in self._ids
+
+    async def resync(self) -> None:
+        """Полностью перечитать allowed_users из БД"""
+        events: list[tuple[str, int]] = []
+        self._pending_events = events
+        try:
+            async with async_session_maker() as session:
+                result = await session.execute(select(AllowedUser.id))
+                ids = set(result.scalars().all())
+        finally:
+            self._pending_events = None
+
+        # Изменения, пришедшие во время чтения, могли не попасть в снимок
+        for operation, user_id in events:
+            _apply(ids, operation, user_id)
+
+        # Удаленные пользователи не должны оставаться в кэше middleware
+        for user_id in self._ids - ids:
+            identity_cache.invalidate(user_id)
+
+        self._ids = ids
+        self._loaded = True
+        self._last_sync_at = time.monotonic()
+
+    async def start(self) -> None:
+        """Загрузить реестр, подписаться на NOTIFY и запустить пересинхронизацию"""
+        await self.resync()
+        await self._listen()
+        self._resync_task = asyncio.create_task(self._resync_loop())
+        logger.info(f"Реестр allowed_users загружен: {len(self._ids)} пользователей")
+
+    async def stop(self) -> None:
+        """Остановить пересинхронизацию и закрыть соединение подписки"""
+        if self._resync_task:
+            self._resync_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._resync_task
+            self._resync_task = None
+        await self._close_listener()
+
+    def stats(self) -> dict:
+        """
+        Метрики реестра
+
+        Returns:
+            Словарь: размер, признак загрузки и подписки, возраст данных
+        """
+        now = time.monotonic()
+        return {
+            "size": len(self._ids),
+            "loaded": self._loaded,
+            "listening": self.is_listening,
+            "staleness_seconds": round(now - self._last_sync_at, 1) if self._last_sync_at else None,
+            "last_event_seconds_ago": round(now - self._last_event_at, 1) if self._last_event_at else None,
+        }
+
+    async def _listen(self) -> None:
+        """Подписаться на канал NOTIFY отдельным соединением (только PostgreSQL)"""
+        if engine.dialect.name != "postgresql" or self.is_listening:
+            return
+
+        import asyncpg
+
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        try:
+            connection = await asyncpg.connect(dsn, **get_connect_args())
+            await connection.add_listener(ALLOWED_USERS_CHANNEL, self._on_notify)
+            connection.add_termination_listener(self._on_listener_closed)
+        except Exception as e:
+            logger.warning(f"Не удалось подписаться на {ALLOWED_USERS_CHANNEL}, работаем только на пересинхронизации: {e}")
+            return
+        self._listener = connection
+
+    async def _close_listener(self) -> None:
+        if self._listener is not None:
+            with contextlib.suppress(Exception):
+                await self._listener.close()
+            self._listener = None
+
+    def _on_listener_closed(self, connection) -> None:
+        logger.warning("Соединение подписки allowed_users закрыто, переподключимся при пересинхронизации")
+        self._listener = None
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        """Применить уведомление "INSERT:<id>" / "DELETE:<id>" к реестру"""
+        operation, _, raw_id = payload.partition(":")
+        try:
+            user_id = int(raw_id)
+        except ValueError:
+            logger.warning(f"Некорректный payload в {channel}: {payload!r}")
+            return
+
+        _apply(self._ids, operation, user_id)
+        if operation == "DELETE":
+            identity_cache.invalidate(user_id)
+        if self._pending_events is not None:
+            self._pending_events.append((operation, user_id))
+        self._last_event_at = time.monotonic()
+
+    async def _resync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.resync_interval)
+            try:
+                if not self.is_listening:
+                    await self._listen()
+                await self.resync()
+            except Exception as e:
+                logger.error(f"Ошибка пересинхронизации allowed_users: {e}")
+
+
+def _apply(ids: set[int], operation: str, user_id: int) -> None:
+    """Применить операцию уведомления к множеству ID"""
+    if operation == "DELETE":
+        ids.discard(user_id)
+    else:
+        ids.add(user_id)
+
+
+# Глобальный экземпляр реестра
+allowed_user_registry = AllowedUserRegistry()
@@ -1,193 +1,268 @@
-"""Сервис для автоматических проверок и уведомлений"""
+"""Сервис для автоматических проверок и уведомлений
+
+Проверки выполняются сразу по всем тенантам: каждая делает один запрос,
+упорядоченный (или сгруппированный) по tenant_id, и читает результат
+потоком. Строки одного тенанта собираются в сводку, которая уходит
+получателям этого тенанта:
+- тенант 0 (обычный режим) - техник и руководитель из конфигурации;
+- тенант руководителя (demo-режим, назначенные техники) - сам руководитель,
+  а складские напоминания - его техники (если их нет - руководитель,
+  который в demo-режиме сам работает со складом).
+
+Получатели определяются одним запросом на пачку из TENANT_BATCH_SIZE
+тенантов, поэтому число запросов растет с объемом результата, а не с
+количеством тенантов. Тенанты без результатов не стоят ничего.
+
+Просроченные срочные заявки не ищутся опросом - их эскалирует
+sla_timer_service в момент истечения срока.
+"""
+import logging
 from datetime import datetime, timedelta
+from typing import AsyncIterable, AsyncIterator, Callable, TypeVar
+
+import pytz
 from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import get_config
 from bot.services.warehouse_service import warehouse_service
+from bot.services.warehouse_ledger_service import warehouse_ledger_service, month_start
 from bot.services.manager_service import manager_service
+from bot.services.request_stats_service import request_stats_service, local_day, PERIOD_TOTAL_KEYS
+from bot.services.technician_service import technician_service
 from bot.services.notification_service import NotificationService
+from bot.services.outbound_dispatcher import dispatch
 from bot.database.engine import async_session_maker
 
+logger = logging.getLogger(__name__)
+
+# Кому адресована сводка тенанта
+AUDIENCE_MANAGER = "manager"
+AUDIENCE_TECHNICIAN = "technician"
+
+# Сколько сводок тенантов копить перед определением получателей
+TENANT_BATCH_SIZE = 100
+
+# Заявка считается зависшей, если находится в работе дольше (дни)
+STALE_IN_PROGRESS_DAYS = 7
+
+T = TypeVar("T")
+
+
+async def group_by_tenant(rows: AsyncIterable[tuple[int, T]]) -> AsyncIterator[tuple[int, list[T]]]:
+    """
+    Сгруппировать поток строк по тенантам
+
+    Args:
+        rows: Поток (tenant_id, строка), упорядоченный по tenant_id
+
+    Yields:
+        (tenant_id, строки тенанта) - по мере чтения потока
+    """
+    current_tenant, group = None, []
+    async for tenant_id, row in rows:
+        if group and tenant_id != current_tenant:
+            yield current_tenant, group
+            group = []
+        current_tenant = tenant_id
+        group.append(row)
+    if group:
+        yield current_tenant, group
+
+
+def _elapsed(moment: datetime) -> timedelta:
+    """Сколько прошло с момента (naive из SQLite или aware из PostgreSQL)"""
+    return datetime.now(moment.tzinfo) - moment
+
 
 class AutomationService:
     """Сервис для автоматических проверок и уведомлений"""
-    
+
     def __init__(self, notification_service: NotificationService):
         self.notification_service = notification_service
-    
+
     async def check_warehouse_minimum(self):
         """
-        Проверить минимальные остатки на складе и уведомить техника
-        
-        Вызывается ежедневно в 8:30
+        Сводка позиций с низким остатком для техников
+
+        Вызывается ежедневно в 8:30. Сами пересечения минимума оповещаются
+        сразу при списании (warehouse_service); сводка читает только позиции
+        с низким остатком по частичному индексу ix_warehouse_items_low_stock.
         """
         async with async_session_maker() as session:
-            try:
-                from bot.config import get_config
-                config = get_config()
-                if config.demo_mode:
-                    return
-
-                low_stock_items = await warehouse_service.get_low_stock_items(session, tenant_id=0)
-                
-                if not low_stock_items:
-                    return  # Нет позиций с низким остатком
-                
-                text = "⚠️ <b>Напоминание: низкие остатки на складе</b>\n\n"
-                text += "Следующие позиции требуют пополнения:\n\n"
-                
-                for item in low_stock_items:
-                    text += f"📦 <b>{item.name}</b>\n"
-                    text += f"   Текущий остаток: {item.current_quantity}\n"
-                    text += f"   Минимальный: {item.min_quantity}\n\n"
-                
-                try:
-                    await self.notification_service.bot.send_message(
-                        chat_id=config.warehouseman_id,
-                        text=text,
-                        parse_mode="HTML"
-                    )
-                except Exception as e:
-                    print(f"Ошибка отправки уведомления о низких остатках: {e}")
-            except Exception as e:
-                print(f"Ошибка проверки минимальных остатков: {e}")
-    
-    async def send_daily_report_to_manager(self):
+            items = ((item.tenant_id, item) async for item in warehouse_service.stream_low_stock_items(session))
+            sent = await self._send_digests(
+                session, group_by_tenant(items), AUDIENCE_TECHNICIAN, self._format_low_stock
+            )
+        logger.info(f"Напоминания о низких остатках отправлены: {sent} тенантов")
+
+    async def send_daily_report_to_manager(self, tz: pytz.BaseTzInfo):
         """
-        Отправить ежедневный отчет руководителю за предыдущий день
-        
-        Вызывается ежедневно в 9:00
+        Отправить ежедневный отчет руководителям за предыдущий день
+
+        Вызывается ежедневно в 9:00 по часовому поясу планировщика. Отчет
+        получают тенанты, у которых за день были заявки; в обычном режиме
+        руководитель получает отчет всегда. "Вчера" считается в том же
+        поясе, что и дни строк rollup (local_day), а не по часам сервера.
+
+        Args:
+            tz: Часовой пояс планировщика (pytz)
         """
+        yesterday = local_day(None, tz) - timedelta(days=1)
+        date_str = yesterday.strftime("%d.%m.%Y")
+
         async with async_session_maker() as session:
-            try:
-                from bot.config import get_config
-                config = get_config()
-                if config.demo_mode:
-                    return
-
-                # Получаем вчерашний день
-                yesterday = datetime.now() - timedelta(days=1)
-                start_date = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
-                end_date = yesterday.replace(hour=23, minute=59, second=59, microsecond=999999)
-                
-                # Получаем отчет за вчера
-                report = await manager_service.get_period_report(session, tenant_id=0, start_date=start_date, end_date=end_date)
-                
-                date_str = yesterday.strftime("%d.%m.%Y")
-                
-                text = f"📊 <b>Ежедневный отчет за {date_str}</b>\n\n"
-                text += f"📋 <b>Статистика:</b>\n"
-                text += f"• Новые: {report['new']}\n"
-                text += f"• В работе: {report['in_progress']}\n"
-                text += f"• Выполнено: {report['completed']}\n"
-                text += f"• Отклонено: {report['rejected']}\n"
-                text += f"• <b>Всего:</b> {report['total']}\n"
-                
-                try:
-                    await self.notification_service.bot.send_message(
-                        chat_id=config.manager_id,
-                        text=text,
-                        parse_mode="HTML"
-                    )
-                except Exception as e:
-                    print(f"Ошибка отправки ежедневного отчета: {e}")
-            except Exception as e:
-                print(f"Ошибка генерации ежедневного отчета: {e}")
-    
-    async def check_urgent_requests(self):
+            totals = request_stats_service.stream_period_totals_by_tenant(
+                session, start_day=yesterday, end_day=yesterday
+            )
+            if not get_config().demo_mode:
+                totals = self._with_empty_report(totals, tenant_id=0)
+            sent = await self._send_digests(
+                session, group_by_tenant(totals), AUDIENCE_MANAGER,
+                lambda reports: self._format_daily_report(reports[0], date_str)
+            )
+        logger.info(f"Ежедневные отчеты отправлены: {sent} тенантов")
+
+    async def check_old_in_progress_requests(self):
         """
-        Проверить срочные заявки, которые висят "Новая" > 2 часов
-        
-        Уведомляет руководителя
+        Проверить заявки в работе > 7 дней
+
+        Уведомляет руководителей
         """
         async with async_session_maker() as session:
-            try:
-                from bot.config import get_config
-                config = get_config()
-                if config.demo_mode:
-                    return
-
-                # Получаем все новые срочные заявки
-                from sqlalchemy import select, and_
-                from sqlalchemy.orm import selectinload
-                from bot.database.models import Request
-                
-                two_hours_ago = datetime.now() - timedelta(hours=2)
-                
-                result = await session.execute(
-                    select(Request)
-                    .where(
-                        and_(
-                            Request.tenant_id == 0,
-                            Request.status == "new",
-                            Request.priority == "urgent",
-                            Request.created_at <= two_hours_ago
-                        )
-                    )
-                    .options(selectinload(Request.user))
-                    .order_by(Request.created_at.asc())
-                )
-                
-                urgent_requests = list(result.scalars().all())
-                
-                if not urgent_requests:
-                    return  # Нет срочных заявок старше 2 часов
-                
-                text = "🚨 <b>Внимание: срочные заявки без обработки</b>\n\n"
-                text += f"Найдено {len(urgent_requests)} срочных заявок, которые не обработаны более 2 часов:\n\n"
-                
-                for request in urgent_requests:
-                    hours_ago = (datetime.now() - request.created_at).total_seconds() / 3600
-                    text += f"📋 <b>{request.number}</b>\n"
-                    text += f"   Категория: {request.category}\n"
-                    text += f"   Создана: {request.created_at.strftime('%d.%m.%Y %H:%M')}\n"
-                    text += f"   Прошло: {int(hours_ago)} ч.\n\n"
-                
-                try:
-                    await self.notification_service.bot.send_message(
-                        chat_id=config.manager_id,
-                        text=text,
-                        parse_mode="HTML"
-                    )
-                except Exception as e:
-                    print(f"Ошибка отправки уведомления о срочных заявках: {e}")
-            except Exception as e:
-                print(f"Ошибка проверки срочных заявок: {e}")
-    
-    async def check_old_in_progress_requests(self):
+            rows = manager_service.stream_requests_in_work_over_days(session, days=STALE_IN_PROGRESS_DAYS)
+            sent = await self._send_digests(
+                session, group_by_tenant(rows), AUDIENCE_MANAGER, self._format_old_in_progress_requests
+            )
+        logger.info(f"Уведомления о заявках в работе отправлены: {sent} тенантов")
+
+    async def create_stock_snapshots(self, tz: pytz.BaseTzInfo):
         """
-        Проверить заявки в работе > 7 дней
-        
-        Уведомляет руководителя
+        Сохранить снимки остатков склада на начало текущего месяца
+
+        Вызывается 1-го числа каждого месяца в 00:05 по часовому поясу
+        планировщика. Месяц и его начало берутся в том же поясе, а не по
+        часам сервера: на сервере в UTC 00:05 по Москве - еще предыдущий
+        месяц. Начало месяца передается как aware datetime, поэтому
+        сравнивается с created_at движений (timestamptz) без сдвига.
+
+        Args:
+            tz: Часовой пояс планировщика (pytz)
         """
+        period_start = tz.localize(month_start(datetime.now(tz).replace(tzinfo=None)))
+
         async with async_session_maker() as session:
-            try:
-                from bot.config import get_config
-                config = get_config()
-                if config.demo_mode:
-                    return
-
-                old_requests = await manager_service.get_requests_in_work_over_days(session, tenant_id=0, days=7)
-                
-                if not old_requests:
-                    return  # Нет заявок в работе более 7 дней
-                
-                text = "⏰ <b>Внимание: заявки в работе более 7 дней</b>\n\n"
-                text += f"Найдено {len(old_requests)} заявок, которые находятся в работе более 7 дней:\n\n"
-                
-                for request in old_requests:
-                    days_ago = (datetime.now() - request.updated_at).days
-                    text += f"📋 <b>{request.number}</b>\n"
-                    text += f"   Категория: {request.category}\n"
-                    text += f"   Взята в работу: {request.updated_at.strftime('%d.%m.%Y %H:%M')}\n"
-                    text += f"   Прошло: {days_ago} дн.\n\n"
-                
+            await warehouse_ledger_service.create_snapshots(session, period_start)
+            await session.commit()
+
+    async def _send_digests(
+        self,
+        session: AsyncSession,
+        groups: AsyncIterable[tuple[int, list]],
+        audience: str,
+        render: Callable[[list], str]
+    ) -> int:
+        """
+        Отправить сводки тенантов по мере чтения потока
+
+        Args:
+            session: Сессия БД
+            groups: Поток (tenant_id, строки тенанта)
+            audience: AUDIENCE_MANAGER или AUDIENCE_TECHNICIAN
+            render: Текст сводки по строкам тенанта
+
+        Returns:
+            Количество тенантов, которым сформирована сводка
+        """
+        batch: list[tuple[int, str]] = []
+        sent = 0
+        async for tenant_id, rows in groups:
+            batch.append((tenant_id, render(rows)))
+            if len(batch) >= TENANT_BATCH_SIZE:
+                await self._deliver(session, batch, audience)
+                sent += len(batch)
+                batch = []
+        if batch:
+            await self._deliver(session, batch, audience)
+            sent += len(batch)
+        return sent
+
+    async def _deliver(self, session: AsyncSession, batch: list[tuple[int, str]], audience: str) -> None:
+        """Отправить пачку сводок (ошибка отправки одному получателю не прерывает остальные)"""
+        recipients = await self.get_recipients(session, [tenant_id for tenant_id, _ in batch], audience)
+        for tenant_id, text in batch:
+            for chat_id in recipients[tenant_id]:
                 try:
-                    await self.notification_service.bot.send_message(
-                        chat_id=config.manager_id,
+                    await dispatch(
+                        self.notification_service.bot, "send_message",
+                        chat_id=chat_id,
                         text=text,
                         parse_mode="HTML"
                     )
                 except Exception as e:
-                    print(f"Ошибка отправки уведомления о старых заявках: {e}")
-            except Exception as e:
-                print(f"Ошибка проверки старых заявок: {e}")
+                    logger.error(f"Ошибка отправки сводки тенанта {tenant_id} пользователю {chat_id}: {e}")
+
+    async def get_recipients(self, session: AsyncSession, tenant_ids: list[int], audience: str) -> dict[int, list[int]]:
+        """
+        Получатели сводок для нескольких тенантов (не больше одного запроса)
+
+        Args:
+            session: Сессия БД
+            tenant_ids: ID тенантов
+            audience: AUDIENCE_MANAGER или AUDIENCE_TECHNICIAN
+
+        Returns:
+            Словарь tenant_id -> список Telegram ID получателей
+        """
+        if audience == AUDIENCE_TECHNICIAN:
+            return await technician_service.get_warehouse_recipients(session, tenant_ids)
+
+        manager_id = get_config().manager_id
+        return {tenant_id: [tenant_id or manager_id] for tenant_id in tenant_ids}
+
+    @staticmethod
+    async def _with_empty_report(
+        totals: AsyncIterable[tuple[int, dict]],
+        tenant_id: int
+    ) -> AsyncIterator[tuple[int, dict]]:
+        """Дополнить поток отчетов пустым отчетом тенанта, если за день у него не было заявок"""
+        seen = False
+        async for row in totals:
+            seen = seen or row[0] == tenant_id
+            yield row
+        if not seen:
+            yield tenant_id, dict.fromkeys(PERIOD_TOTAL_KEYS, 0)
+
+    @staticmethod
+    def _format_low_stock(items: list) -> str:
+        text = "⚠️ <b>Сводка: низкие остатки на складе</b>\n\n"
+        text += "Следующие позиции требуют пополнения:\n\n"
+
+        for item in items:
+            text += f"📦 <b>{item.name}</b>\n"
+            text += f"   Текущий остаток: {item.current_quantity}\n"
+            text += f"   Минимальный: {item.min_quantity}\n\n"
+        return text
+
+    @staticmethod
+    def _format_daily_report(report: dict, date_str: str) -> str:
+        text = f"📊 <b>Ежедневный отчет за {date_str}</b>\n\n"
+        text += f"📋 <b>Статистика:</b>\n"
+        text += f"• Новые: {report['new']}\n"
+        text += f"• В работе: {report['in_progress']}\n"
+        text += f"• Выполнено: {report['completed']}\n"
+        text += f"• Отклонено: {report['rejected']}\n"
+        text += f"• <b>Всего:</b> {report['total']}\n"
+        return text
+
+    @staticmethod
+    def _format_old_in_progress_requests(requests: list) -> str:
+        text = f"⏰ <b>Внимание: заявки в работе более {STALE_IN_PROGRESS_DAYS} дней</b>\n\n"
+        text += f"Найдено {len(requests)} заявок, которые находятся в работе более {STALE_IN_PROGRESS_DAYS} дней:\n\n"
 
+        for request in requests:
+            days_ago = _elapsed(request.updated_at).days
+            text += f"📋 <b>{request.number}</b>\n"
+            text += f"   Категория: {request.category}\n"
+            text += f"   Взята в работу: {request.updated_at.strftime('%d.%m.%Y %H:%M')}\n"
+            text += f"   Прошло: {days_ago} дн.\n\n"
+        return text
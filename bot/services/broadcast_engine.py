@@ -0,0 +1,296 @@
+"""Фоновое выполнение рассылок
+
+Handler подтверждения рассылки только создает задание (broadcast_jobs)
+и сразу возвращает управление. Задание выполняет BroadcastEngine:
+- получатели читаются страницами по BROADCAST_CHUNK_SIZE (keyset по users.id),
+  список целиком в память не загружается;
+- страница регистрируется в broadcast_deliveries и курсор
+  last_recipient_id сохраняется до отправки (checkpoint);
+- сообщения страницы отправляются параллельно через OutboundDispatcher,
+  который соблюдает лимиты Telegram;
+- результаты и счетчики коммитятся после каждой страницы;
+- одно сообщение с прогрессом редактируется не чаще
+  PROGRESS_EDIT_INTERVAL_SECONDS.
+
+При старте бота незавершенные задания продолжаются с сохраненного курсора.
+Получатели страницы, прерванной перезапуском (status=pending), отправляются
+повторно - доставка "не менее одного раза".
+
+При нескольких репликах незавершенные задания видят все: задание
+выполняется под advisory-блокировкой JOB_LOCK_PREFIX + ID, и реплика,
+не захватившая ее, задание пропускает. Если блокировку не удалось
+проверить (ошибка БД), попытка повторяется через LOCK_RETRY_SECONDS.
+"""
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Optional
+
+from aiogram import Bot
+
+from bot.database.advisory_lock import AdvisoryLockError, try_advisory_lock
+from bot.database.engine import async_session_maker
+from bot.database.models import BroadcastJob
+from bot.services.broadcast_service import broadcast_service
+from bot.services.outbound_dispatcher import dispatch, get_outbound_dispatcher
+
+logger = logging.getLogger(__name__)
+
+# Размер страницы получателей
+BROADCAST_CHUNK_SIZE = 100
+
+# Минимальный интервал между редактированиями сообщения с прогрессом (секунды)
+PROGRESS_EDIT_INTERVAL_SECONDS = 3
+
+# Параллельность отправки, если диспетчер не запущен (тесты, скрипты)
+DIRECT_SEND_CONCURRENCY = 10
+
+# Префикс advisory-блокировки задания
+JOB_LOCK_PREFIX = "broadcast:job:"
+
+# Через сколько повторить запуск, если блокировку задания не удалось проверить (секунды)
+LOCK_RETRY_SECONDS = 15
+
+
+def format_broadcast_message(text: str) -> str:
+    """Текст сообщения, которое получают пользователи"""
+    return f"📢 <b>Рассылка от техника</b>\n\n{text}"
+
+
+def format_broadcast_progress(job: BroadcastJob) -> str:
+    """
+    Текст сообщения с прогрессом рассылки
+
+    Args:
+        job: Задание на рассылку
+
+    Returns:
+        HTML-текст
+    """
+    processed = job.sent_count + job.failed_count
+    if job.status == "completed":
+        text = "✅ <b>Рассылка завершена</b>\n\n"
+    else:
+        text = "⏳ <b>Рассылка выполняется</b>\n\n"
+    text += f"📨 Обработано: {processed} из {job.total}\n"
+    text += f"✅ Доставлено: {job.sent_count}\n"
+    if job.failed_count > 0:
+        text += f"❌ Ошибок: {job.failed_count}"
+    return text
+
+
+class BroadcastEngine:
+    """Фоновый исполнитель заданий на рассылку"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        chunk_size: int = BROADCAST_CHUNK_SIZE,
+        progress_interval: float = PROGRESS_EDIT_INTERVAL_SECONDS,
+    ):
+        self.bot = bot
+        self.chunk_size = chunk_size
+        self.progress_interval = progress_interval
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    async def start(self) -> None:
+        """Продолжить незавершенные задания (после перезапуска)"""
+        async with async_session_maker() as session:
+            job_ids = await broadcast_service.get_unfinished_job_ids(session)
+        for job_id in job_ids:
+            self.submit(job_id)
+        if job_ids:
+            logger.info(f"Возобновлено рассылок: {len(job_ids)}")
+
+    def submit(self, job_id: int) -> asyncio.Task:
+        """
+        Запустить выполнение задания в фоне
+
+        Args:
+            job_id: ID задания
+
+        Returns:
+            Задача asyncio (повторный вызов для того же задания вернет ту же задачу)
+        """
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._run_guarded(job_id), name=f"broadcast-{job_id}")
+            self._tasks[job_id] = task
+        return task
+
+    async def stop(self) -> None:
+        """Остановить выполнение; прогресс уже сохранен, задания продолжатся при старте"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks.clear()
+
+    def stats(self) -> dict:
+        """Метрики исполнителя"""
+        return {"active_jobs": sum(1 for task in self._tasks.values() if not task.done())}
+
+    async def _run_guarded(self, job_id: int) -> None:
+        try:
+            while True:
+                try:
+                    await self.run_job(job_id)
+                    break
+                except AdvisoryLockError as e:
+                    logger.warning(f"Рассылка {job_id}: {e}, повтор через {LOCK_RETRY_SECONDS} с")
+                    await asyncio.sleep(LOCK_RETRY_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Задание остается running и будет продолжено при следующем старте
+            logger.error(f"Ошибка выполнения рассылки {job_id}: {e}", exc_info=True)
+        finally:
+            self._tasks.pop(job_id, None)
+
+    async def run_job(self, job_id: int) -> None:
+        """
+        Выполнить задание до конца, начиная с сохраненного курсора
+
+        Если задание выполняет другая реплика (держит его блокировку),
+        запуск пропускается.
+
+        Args:
+            job_id: ID задания
+
+        Raises:
+            AdvisoryLockError: Не удалось проверить блокировку задания
+        """
+        async with try_advisory_lock(f"{JOB_LOCK_PREFIX}{job_id}") as acquired:
+            if not acquired:
+                logger.info(f"Рассылка {job_id} выполняется другой репликой, пропуск")
+                return
+            await self._run_job(job_id)
+
+    async def _run_job(self, job_id: int) -> None:
+        async with async_session_maker() as session:
+            job = await session.get(BroadcastJob, job_id)
+            if job is None or job.status == "completed":
+                return
+
+            job.status = "running"
+            await session.commit()
+
+            message_text = format_broadcast_message(job.text)
+            last_edit_at = time.monotonic()
+
+            while True:
+                # Сначала - страница, прерванная перезапуском
+                user_ids = await broadcast_service.get_pending_delivery_user_ids(session, job.id, self.chunk_size)
+                if not user_ids:
+                    user_ids = await broadcast_service.get_employee_ids_page(
+                        session, job.last_recipient_id, self.chunk_size
+                    )
+                    if not user_ids:
+                        break
+                    # Checkpoint до отправки: после перезапуска страница не потеряется
+                    await broadcast_service.claim_deliveries(session, job.id, user_ids)
+                    job.last_recipient_id = user_ids[-1]
+                    await session.commit()
+
+                sent_ids, failed = await self._send_chunk(message_text, user_ids)
+
+                await broadcast_service.record_deliveries(session, job.id, sent_ids, failed)
+                job.sent_count += len(sent_ids)
+                job.failed_count += len(failed)
+                # Получатели могли добавиться после запуска
+                job.total = max(job.total, job.sent_count + job.failed_count)
+                await session.commit()
+
+                if time.monotonic() - last_edit_at >= self.progress_interval:
+                    await self._update_progress(job)
+                    last_edit_at = time.monotonic()
+
+            await broadcast_service.finish_job(session, job)
+            await session.commit()
+            await self._update_progress(job)
+            logger.info(f"Рассылка {job.id} завершена: доставлено {job.sent_count}, ошибок {job.failed_count}")
+
+    async def _send_chunk(self, text: str, user_ids: list[int]) -> tuple[list[int], dict[int, str]]:
+        """
+        Отправить сообщение получателям страницы параллельно
+
+        Returns:
+            (доставленные ID, {ID: ошибка})
+        """
+        dispatcher = get_outbound_dispatcher()
+        if dispatcher is not None and dispatcher.bot is self.bot:
+            # Диспетчер сам соблюдает глобальный и per-chat лимиты
+            futures = [
+                dispatcher.enqueue("send_message", chat_id=user_id, text=text, parse_mode="HTML")
+                for user_id in user_ids
+            ]
+            results = await asyncio.gather(*futures, return_exceptions=True)
+        else:
+            semaphore = asyncio.Semaphore(DIRECT_SEND_CONCURRENCY)
+
+            async def send(user_id: int):
+                async with semaphore:
+                    return await self.bot.send_message(chat_id=user_id, text=text, parse_mode="HTML")
+
+            results = await asyncio.gather(*(send(user_id) for user_id in user_ids), return_exceptions=True)
+
+        sent_ids = []
+        failed = {}
+        for user_id, result in zip(user_ids, results):
+            if isinstance(result, BaseException):
+                failed[user_id] = str(result) or type(result).__name__
+            else:
+                sent_ids.append(user_id)
+        return sent_ids, failed
+
+    async def _update_progress(self, job: BroadcastJob) -> None:
+        """Отредактировать сообщение с прогрессом"""
+        if job.progress_chat_id is None or job.progress_message_id is None:
+            return
+        try:
+            await dispatch(
+                self.bot, "edit_message_text",
+                chat_id=job.progress_chat_id,
+                message_id=job.progress_message_id,
+                text=format_broadcast_progress(job),
+                parse_mode="HTML"
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось обновить прогресс рассылки {job.id}: {e}")
+
+
+# Исполнитель, привязанный к запущенному боту
+_engine: Optional[BroadcastEngine] = None
+
+
+def get_broadcast_engine() -> Optional[BroadcastEngine]:
+    """Получить запущенный исполнитель рассылок (None, если бот не запущен)"""
+    return _engine
+
+
+async def start_broadcast_engine(bot: Bot) -> BroadcastEngine:
+    """
+    Создать исполнитель рассылок и продолжить незавершенные задания
+
+    Args:
+        bot: Экземпляр бота
+
+    Returns:
+        BroadcastEngine
+    """
+    global _engine
+    engine = BroadcastEngine(bot)
+    _engine = engine
+    await engine.start()
+    return engine
+
+
+async def stop_broadcast_engine() -> None:
+    """Остановить исполнитель рассылок"""
+    global _engine
+    engine, _engine = _engine, None
+    if engine is not None:
+        await engine.stop()
@@ -1,13 +1,27 @@
 """Сервис для рассылок"""
-from typing import List
+from datetime import datetime, timezone
+from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from bot.database.models import User
+from sqlalchemy import select, update, func
+from bot.database.dialect import upsert_insert
+from bot.database.models import User, BroadcastJob, BroadcastDelivery
 
 
 class BroadcastService:
     """Сервис для рассылок сообщений"""
     
+    def _employees_query(self, *columns):
+        """SELECT по получателям рассылки: роль employee, кроме техника и руководителя"""
+        from bot.config import get_config
+        config = get_config()
+        
+        return (
+            select(*columns)
+            .where(User.role == "employee")
+            .where(User.id != config.warehouseman_id)
+            .where(User.id != config.manager_id)
+        )
+    
     async def get_all_employees(self, session: AsyncSession) -> List[User]:
         """
         Получить всех пользователей (роль employee), исключая техника и руководителя
@@ -18,14 +32,39 @@ class BroadcastService:
         Returns:
             Список пользователей
         """
-        from bot.config import get_config
-        config = get_config()
+        result = await session.execute(self._employees_query(User))
+        return list(result.scalars().all())
+    
+    async def count_employees(self, session: AsyncSession) -> int:
+        """
+        Посчитать получателей рассылки, не загружая их
+        
+        Args:
+            session: Сессия БД
+            
+        Returns:
+            Количество пользователей
+        """
+        result = await session.execute(self._employees_query(func.count(User.id)))
+        return result.scalar_one()
+    
+    async def get_employee_ids_page(self, session: AsyncSession, after_id: int, limit: int) -> List[int]:
+        """
+        Получить следующую страницу получателей (keyset-пагинация по users.id)
         
+        Args:
+            session: Сессия БД
+            after_id: ID последнего обработанного получателя (0 - с начала)
+            limit: Размер страницы
+            
+        Returns:
+            Список Telegram ID по возрастанию
+        """
         result = await session.execute(
-            select(User)
-            .where(User.role == "employee")
-            .where(User.id != config.warehouseman_id)
-            .where(User.id != config.manager_id)
+            self._employees_query(User.id)
+            .where(User.id > after_id)
+            .order_by(User.id)
+            .limit(limit)
         )
         return list(result.scalars().all())
     
@@ -41,8 +80,143 @@ class BroadcastService:
         """
         result = await session.execute(select(User))
         return list(result.scalars().all())
+    
+    async def create_job(
+        self,
+        session: AsyncSession,
+        tenant_id: int,
+        author_id: int,
+        text: str,
+        total: int,
+        progress_chat_id: Optional[int] = None,
+        progress_message_id: Optional[int] = None
+    ) -> BroadcastJob:
+        """
+        Создать задание на рассылку
+        
+        Без commit: фоновый BroadcastEngine читает задание в своей сессии,
+        поэтому запускать его нужно после commit (unit_of_work.after_commit).
+        
+        Args:
+            session: Сессия БД
+            tenant_id: ID тенанта
+            author_id: Telegram ID автора
+            text: Текст рассылки
+            total: Количество получателей на момент запуска
+            progress_chat_id: Чат сообщения с прогрессом
+            progress_message_id: ID сообщения с прогрессом
+            
+        Returns:
+            Созданное задание
+        """
+        job = BroadcastJob(
+            tenant_id=tenant_id,
+            author_id=author_id,
+            text=text,
+            status="pending",
+            total=total,
+            progress_chat_id=progress_chat_id,
+            progress_message_id=progress_message_id,
+        )
+        session.add(job)
+        await session.flush()
+        return job
+    
+    async def get_unfinished_job_ids(self, session: AsyncSession) -> List[int]:
+        """
+        Получить задания, которые нужно (до)выполнить (например, после перезапуска)
+        
+        Args:
+            session: Сессия БД
+            
+        Returns:
+            Список ID заданий
+        """
+        result = await session.execute(
+            select(BroadcastJob.id)
+            .where(BroadcastJob.status.in_(("pending", "running")))
+            .order_by(BroadcastJob.id)
+        )
+        return list(result.scalars().all())
+    
+    async def claim_deliveries(self, session: AsyncSession, job_id: int, user_ids: List[int]) -> None:
+        """
+        Зарегистрировать получателей страницы как ожидающих отправки
+        
+        Args:
+            session: Сессия БД
+            job_id: ID задания
+            user_ids: Telegram ID получателей
+        """
+        if not user_ids:
+            return
+        await session.execute(
+            upsert_insert(session, BroadcastDelivery)
+            .values([{"job_id": job_id, "user_id": user_id, "status": "pending"} for user_id in user_ids])
+            .on_conflict_do_nothing(index_elements=["job_id", "user_id"])
+        )
+    
+    async def get_pending_delivery_user_ids(self, session: AsyncSession, job_id: int, limit: int) -> List[int]:
+        """
+        Получить получателей, зарегистрированных, но не отправленных
+        (страница была прервана перезапуском)
+        
+        Args:
+            session: Сессия БД
+            job_id: ID задания
+            limit: Максимум получателей
+            
+        Returns:
+            Список Telegram ID
+        """
+        result = await session.execute(
+            select(BroadcastDelivery.user_id)
+            .where(BroadcastDelivery.job_id == job_id, BroadcastDelivery.status == "pending")
+            .order_by(BroadcastDelivery.user_id)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+    
+    async def record_deliveries(
+        self,
+        session: AsyncSession,
+        job_id: int,
+        sent_ids: List[int],
+        failed: dict[int, str]
+    ) -> None:
+        """
+        Сохранить результаты отправки страницы
+        
+        Args:
+            session: Сессия БД
+            job_id: ID задания
+            sent_ids: Получатели, которым сообщение доставлено
+            failed: Словарь {user_id: текст ошибки}
+        """
+        if sent_ids:
+            await session.execute(
+                update(BroadcastDelivery)
+                .where(BroadcastDelivery.job_id == job_id, BroadcastDelivery.user_id.in_(sent_ids))
+                .values(status="sent")
+            )
+        for user_id, error in failed.items():
+            await session.execute(
+                update(BroadcastDelivery)
+                .where(BroadcastDelivery.job_id == job_id, BroadcastDelivery.user_id == user_id)
+                .values(status="failed", error=error[:1000])
+            )
+    
+    async def finish_job(self, session: AsyncSession, job: BroadcastJob) -> None:
+        """
+        Отметить задание выполненным (без commit)
+        
+        Args:
+            session: Сессия БД
+            job: Задание
+        """
+        job.status = "completed"
+        job.finished_at = datetime.now(timezone.utc)
 
 
 # Глобальный экземпляр сервиса
 broadcast_service = BroadcastService()
-
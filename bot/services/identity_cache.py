@@ -0,0 +1,103 @@
+"""Кэш идентичности пользователей для RoleMiddleware
+
+Каждое обновление от Telegram проходит через RoleMiddleware, которому нужны
+роль, активная роль, tenant_id и дата первого визита пользователя. Эти данные
+меняются редко (переключение роли, назначение техника), поэтому держим их в
+ограниченном LRU-кэше с TTL и инвалидируем явно в местах, где они меняются.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+
+# Максимальное число пользователей в кэше
+IDENTITY_CACHE_MAX_SIZE = 10_000
+
+# Время жизни записи (секунды): страховка на случай изменений в обход сервисов
+IDENTITY_CACHE_TTL_SECONDS = 300
+
+
+@dataclass(frozen=True)
+class UserIdentity:
+    """Данные о пользователе, необходимые middleware для обработки обновления"""
+
+    role: str
+    active_role: str
+    tenant_id: int
+    first_seen_at: Optional[datetime] = None
+    manager_id: Optional[int] = None  # ID руководителя, если пользователь - назначенный техник
+
+
+class IdentityCache:
+    """Ограниченный LRU-кэш с TTL: Telegram ID -> UserIdentity"""
+
+    def __init__(
+        self,
+        max_size: int = IDENTITY_CACHE_MAX_SIZE,
+        ttl_seconds: float = IDENTITY_CACHE_TTL_SECONDS,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[int, tuple[float, UserIdentity]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[UserIdentity]:
+        """
+        Получить идентичность пользователя из кэша
+
+        Args:
+            user_id: Telegram ID пользователя
+
+        Returns:
+            UserIdentity или None, если записи нет или она устарела
+        """
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, identity = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return identity
+
+    def put(self, user_id: int, identity: UserIdentity) -> None:
+        """
+        Сохранить идентичность пользователя в кэш
+
+        Args:
+            user_id: Telegram ID пользователя
+            identity: Данные пользователя
+        """
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, identity)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Удалить запись пользователя из кэша (после изменения роли, назначения и т.п.)
+
+        Args:
+            user_id: Telegram ID пользователя
+        """
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        """Очистить кэш полностью"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Глобальный экземпляр кэша
+identity_cache = IdentityCache()
@@ -1,11 +1,21 @@
 """Сервис для работы руководителя с заявками и жалобами"""
 import logging
-from typing import Optional
+from typing import AsyncIterator, Optional
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, or_, case
 from sqlalchemy.orm import selectinload
 from bot.database.models import Request, Complaint
+from bot.database.projections import (
+    RequestListRow,
+    request_list_query,
+    to_request_rows,
+    tenant_request_list_query,
+    stream_tenant_request_rows,
+)
+from bot.database.dialect import is_postgresql
+from bot.services.request_stats_service import request_stats_service
+from bot.utils.pagination import PageCursor, RequestPage, fetch_request_page, PAGE_SIZE
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +23,7 @@ logger = logging.getLogger(__name__)
 class ManagerService:
     """Сервис для просмотра заявок и жалоб руководителем"""
     
-    async def get_requests_today(self, session: AsyncSession, tenant_id: int) -> list[Request]:
+    async def get_requests_today(self, session: AsyncSession, tenant_id: int) -> list[RequestListRow]:
         """
         Получить все заявки за сегодня
         
@@ -26,15 +36,14 @@ class ManagerService:
         today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
         result = await session.execute(
-            select(Request)
+            request_list_query()
             .where(Request.tenant_id == tenant_id)
             .where(Request.created_at >= today_start)
-            .options(selectinload(Request.user), selectinload(Request.photos))
             .order_by(Request.created_at.desc())
         )
-        return list(result.scalars().all())
+        return to_request_rows(result)
     
-    async def get_requests_week(self, session: AsyncSession, tenant_id: int) -> list[Request]:
+    async def get_requests_week(self, session: AsyncSession, tenant_id: int) -> list[RequestListRow]:
         """
         Получить все заявки за неделю
         
@@ -47,20 +56,19 @@ class ManagerService:
         week_start = datetime.now() - timedelta(days=7)
         
         result = await session.execute(
-            select(Request)
+            request_list_query()
             .where(Request.tenant_id == tenant_id)
             .where(Request.created_at >= week_start)
-            .options(selectinload(Request.user), selectinload(Request.photos))
             .order_by(Request.created_at.desc())
         )
-        return list(result.scalars().all())
+        return to_request_rows(result)
     
     async def get_requests_in_work_over_days(
         self,
         session: AsyncSession,
         tenant_id: int,
         days: int
-    ) -> list[Request]:
+    ) -> list[RequestListRow]:
         """
         Получить заявки в работе более указанного количества дней
         
@@ -74,7 +82,7 @@ class ManagerService:
         cutoff_date = datetime.now() - timedelta(days=days)
         
         result = await session.execute(
-            select(Request)
+            request_list_query()
             .where(
                 and_(
                     Request.tenant_id == tenant_id,
@@ -82,10 +90,39 @@ class ManagerService:
                     Request.updated_at <= cutoff_date
                 )
             )
-            .options(selectinload(Request.user), selectinload(Request.photos))
             .order_by(Request.updated_at.asc())  # Сначала самые старые
         )
-        return list(result.scalars().all())
+        return to_request_rows(result)
+    
+    async def stream_requests_in_work_over_days(
+        self,
+        session: AsyncSession,
+        days: int
+    ) -> AsyncIterator[tuple[int, RequestListRow]]:
+        """
+        Заявки всех тенантов в работе более указанного количества дней (для фоновой проверки)
+        
+        Args:
+            session: Сессия БД
+            days: Количество дней
+            
+        Yields:
+            (tenant_id, заявка) - по тенантам, внутри тенанта сначала самые старые
+        """
+        cutoff_date = datetime.now() - timedelta(days=days)
+        
+        query = (
+            tenant_request_list_query()
+            .where(
+                and_(
+                    Request.status == "in_progress",
+                    Request.updated_at <= cutoff_date
+                )
+            )
+            .order_by(Request.tenant_id, Request.updated_at.asc())
+        )
+        async for row in stream_tenant_request_rows(session, query):
+            yield row
     
     async def get_period_report(
         self,
@@ -95,7 +132,39 @@ class ManagerService:
         end_date: datetime
     ) -> dict:
         """
-        Получить отчет за период
+        Получить отчет за период из дневной статистики (request_daily_stats)
+        
+        Период округляется до дней: start_date и end_date задают первый
+        и последний день включительно.
+        
+        Args:
+            session: Сессия БД
+            start_date: Начало периода
+            end_date: Конец периода
+            
+        Returns:
+            Словарь с статистикой (см. get_period_report_from_requests)
+        """
+        return await request_stats_service.get_period_totals(
+            session,
+            tenant_id=tenant_id,
+            start_day=start_date.date(),
+            end_day=end_date.date()
+        )
+    
+    async def get_period_report_from_requests(
+        self,
+        session: AsyncSession,
+        tenant_id: int,
+        start_date: datetime,
+        end_date: datetime
+    ) -> dict:
+        """
+        Получить отчет за период напрямую по таблице requests
+        
+        Все счетчики считаются одним агрегирующим запросом:
+        COUNT(*) FILTER (WHERE ...) в PostgreSQL, SUM(CASE ...) в SQLite.
+        Используется для сверки с rollup.
         
         Args:
             session: Сессия БД
@@ -112,75 +181,44 @@ class ManagerService:
                 'total': общее количество
             }
         """
-        # Подсчет по статусам
-        new_count = await session.execute(
-            select(func.count(Request.id))
-            .where(
-                and_(
-                    Request.tenant_id == tenant_id,
-                    Request.status == "new",
-                    Request.created_at >= start_date,
-                    Request.created_at <= end_date
-                )
-            )
-        )
-        
-        in_progress_count = await session.execute(
-            select(func.count(Request.id))
-            .where(
-                and_(
-                    Request.tenant_id == tenant_id,
-                    Request.status == "in_progress",
-                    Request.created_at >= start_date,
-                    Request.created_at <= end_date
-                )
-            )
-        )
+        in_created_period = and_(Request.created_at >= start_date, Request.created_at <= end_date)
+        conditions = {
+            'new': and_(Request.status == "new", in_created_period),
+            'in_progress': and_(Request.status == "in_progress", in_created_period),
+            'completed': and_(
+                Request.status == "completed",
+                Request.completed_at >= start_date,
+                Request.completed_at <= end_date
+            ),
+            'rejected': and_(
+                Request.status == "rejected",
+                Request.updated_at >= start_date,
+                Request.updated_at <= end_date
+            ),
+            'total': in_created_period,
+        }
         
-        completed_count = await session.execute(
-            select(func.count(Request.id))
-            .where(
-                and_(
-                    Request.tenant_id == tenant_id,
-                    Request.status == "completed",
-                    Request.completed_at >= start_date,
-                    Request.completed_at <= end_date
-                )
-            )
-        )
+        # Все счетчики - одним проходом по заявкам тенанта
+        if is_postgresql(session):
+            columns = [func.count().filter(condition).label(key) for key, condition in conditions.items()]
+        else:
+            columns = [func.sum(case((condition, 1), else_=0)).label(key) for key, condition in conditions.items()]
         
-        rejected_count = await session.execute(
-            select(func.count(Request.id))
-            .where(
-                and_(
-                    Request.tenant_id == tenant_id,
-                    Request.status == "rejected",
-                    Request.updated_at >= start_date,
-                    Request.updated_at <= end_date
-                )
-            )
-        )
-        
-        total_count = await session.execute(
-            select(func.count(Request.id))
+        result = await session.execute(
+            select(*columns)
             .where(
-                and_(
-                    Request.tenant_id == tenant_id,
-                    Request.created_at >= start_date,
-                    Request.created_at <= end_date
+                Request.tenant_id == tenant_id,
+                or_(
+                    in_created_period,
+                    and_(Request.completed_at >= start_date, Request.completed_at <= end_date),
+                    and_(Request.updated_at >= start_date, Request.updated_at <= end_date)
                 )
             )
         )
-        
-        return {
-            'new': new_count.scalar() or 0,
-            'in_progress': in_progress_count.scalar() or 0,
-            'completed': completed_count.scalar() or 0,
-            'rejected': rejected_count.scalar() or 0,
-            'total': total_count.scalar() or 0
-        }
+        row = result.one()._mapping
+        return {key: row[key] or 0 for key in conditions}
     
-    async def get_all_requests(self, session: AsyncSession, tenant_id: int, limit: Optional[int] = None) -> list[Request]:
+    async def get_all_requests(self, session: AsyncSession, tenant_id: int, limit: Optional[int] = None) -> list[RequestListRow]:
         """
         Получить все заявки
         
@@ -192,9 +230,8 @@ class ManagerService:
             Список всех заявок, отсортированный по дате создания (новые сначала)
         """
         query = (
-            select(Request)
+            request_list_query()
             .where(Request.tenant_id == tenant_id)
-            .options(selectinload(Request.user), selectinload(Request.photos))
             .order_by(Request.created_at.desc())
         )
         
@@ -202,7 +239,32 @@ class ManagerService:
             query = query.limit(limit)
         
         result = await session.execute(query)
-        return list(result.scalars().all())
+        return to_request_rows(result)
+    
+    async def get_requests_page(
+        self,
+        session: AsyncSession,
+        tenant_id: int,
+        cursor: Optional[PageCursor] = None,
+        since: Optional[datetime] = None,
+        page_size: int = PAGE_SIZE
+    ) -> RequestPage:
+        """
+        Получить страницу заявок (keyset-пагинация, от новых к старым)
+        
+        Args:
+            session: Сессия БД
+            cursor: Курсор страницы (None - первая страница)
+            since: Только заявки, созданные начиная с этого момента (опционально)
+            page_size: Размер страницы
+            
+        Returns:
+            Страница заявок
+        """
+        query = request_list_query().where(Request.tenant_id == tenant_id)
+        if since is not None:
+            query = query.where(Request.created_at >= since)
+        return await fetch_request_page(session, query, cursor, page_size)
     
     async def get_all_complaints(self, session: AsyncSession, tenant_id: int) -> list[Complaint]:
         """
@@ -10,6 +10,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from bot.database.models import User, UserEvent
+from bot.database.unit_of_work import after_commit
+from bot.services.identity_cache import identity_cache
 
 
 class MarketingService:
@@ -47,6 +49,8 @@ class MarketingService:
         user.last_seen_at = now
         if user.first_seen_at is None:
             user.first_seen_at = now
+            # first_seen_at используется middleware для проверки срока demo-доступа
+            after_commit(session, lambda: identity_cache.invalidate(user_id))
 
         # Парсим payload (/start <payload>)
         start_payload: str | None = None
@@ -0,0 +1,481 @@
+"""Transactional outbox для уведомлений
+
+Handler не отправляет уведомление сам, а добавляет строку в
+notification_outbox в той же транзакции, что и изменение данных (новая
+заявка, смена статуса, жалоба). Поэтому:
+- при откате транзакции уведомление не уйдет;
+- отправка не держит транзакцию открытой;
+- после commit уведомление гарантированно будет отправлено (at-least-once).
+
+NotificationRelay забирает строки пачками через SELECT ... FOR UPDATE
+SKIP LOCKED, продлевает им аренду (available_at) и коммитит - несколько
+реплик бота могут работать с одной таблицей, не отправляя одно и то же
+одновременно. Если процесс упал после захвата, строка снова станет
+доступной по истечении аренды. В SQLite FOR UPDATE игнорируется.
+
+Отправка пачки может занять больше RELAY_LEASE_SECONDS (лимит ~1
+сообщение в секунду на чат), поэтому пока пачка отправляется, аренда еще
+не обработанных строк продлевается каждые RELAY_LEASE_RENEW_SECONDS, а
+результат каждой строки коммитится сразу после ее отправки.
+
+Строка помечается sent только после ответа Telegram API: relay
+отправляет через deliver() и ждет результата, ошибка отправки
+переносит строку на повтор. Отправленные строки хранятся
+SENT_RETENTION_DAYS и удаляются relay раз в PURGE_INTERVAL_SECONDS.
+
+Оповещения о низком остатке откладываются на LOW_STOCK_COALESCE_SECONDS:
+пока строка тенанта ждет отправки, новые пересечения минимума не
+добавляют строк, и серия списаний дает одно сообщение со всеми позициями.
+"""
+import asyncio
+import contextlib
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from aiogram import Bot
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from bot.database.engine import async_session_maker
+from bot.database.unit_of_work import after_commit
+from bot.database.models import NotificationOutboxMessage, Request, Complaint
+from bot.services.notification_service import NotificationService
+
+logger = logging.getLogger(__name__)
+
+# Типы уведомлений
+KIND_NEW_REQUEST = "new_request"
+KIND_REQUEST_STATUS_CHANGED = "request_status_changed"
+KIND_MANAGER_COMPLAINT = "manager_complaint"
+KIND_URGENT_REQUEST_OVERDUE = "urgent_request_overdue"
+KIND_LOW_STOCK_ALERT = "low_stock_alert"
+
+# Размер пачки, забираемой relay за раз
+RELAY_BATCH_SIZE = 50
+
+# Интервал опроса таблицы, если не было сигнала о новых строках (секунды)
+RELAY_POLL_INTERVAL_SECONDS = 2
+
+# На сколько строка закрепляется за relay при захвате (секунды)
+RELAY_LEASE_SECONDS = 60
+
+# Как часто продлевать аренду строк отправляемой пачки (секунды)
+RELAY_LEASE_RENEW_SECONDS = 20
+
+# Максимум попыток отправки, после чего строка помечается failed
+RELAY_MAX_ATTEMPTS = 5
+
+# Окно объединения оповещений о низком остатке одного тенанта (секунды)
+LOW_STOCK_COALESCE_SECONDS = 180
+
+# Сколько хранить отправленные уведомления (дни)
+SENT_RETENTION_DAYS = 7
+
+# Как часто удалять устаревшие отправленные уведомления (секунды)
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class NotificationOutbox:
+    """Запись уведомлений в outbox в транзакции вызывающего кода"""
+
+    async def enqueue(self, session: AsyncSession, kind: str, payload: dict, tenant_id: int = 0) -> None:
+        """
+        Добавить уведомление в outbox (без commit - его делает вызывающий код)
+
+        Args:
+            session: Сессия БД (транзакция изменения данных)
+            kind: Тип уведомления (KIND_*)
+            payload: Данные для формирования уведомления (ID сущностей)
+            tenant_id: ID тенанта
+        """
+        session.add(NotificationOutboxMessage(tenant_id=tenant_id, kind=kind, payload=payload))
+        # Разбудить relay сразу после commit, не дожидаясь опроса
+        after_commit(session, _wake_relay)
+
+    async def enqueue_new_request(self, session: AsyncSession, request: Request) -> None:
+        """Уведомить техника о новой заявке"""
+        await self.enqueue(session, KIND_NEW_REQUEST, {"request_id": request.id}, request.tenant_id)
+
+    async def enqueue_request_status_changed(self, session: AsyncSession, request: Request, status_text: str) -> None:
+        """Уведомить автора заявки о смене статуса"""
+        await self.enqueue(
+            session,
+            KIND_REQUEST_STATUS_CHANGED,
+            {"request_id": request.id, "status_text": status_text},
+            request.tenant_id
+        )
+
+    async def enqueue_manager_complaint(self, session: AsyncSession, complaint: Complaint) -> None:
+        """Уведомить руководителя о жалобе"""
+        await self.enqueue(session, KIND_MANAGER_COMPLAINT, {"complaint_id": complaint.id}, complaint.tenant_id)
+
+    async def enqueue_urgent_request_overdue(self, session: AsyncSession, request_id: int, tenant_id: int) -> None:
+        """Уведомить руководителя об истекшем SLA срочной заявки"""
+        await self.enqueue(session, KIND_URGENT_REQUEST_OVERDUE, {"request_id": request_id}, tenant_id)
+
+    async def enqueue_low_stock_alert(self, session: AsyncSession, tenant_id: int) -> bool:
+        """
+        Оповестить техников о низком остатке (отложенно, с объединением)
+
+        Состав сообщения определяется при отправке: все позиции тенанта,
+        опустившиеся до минимума и еще не попавшие в оповещение.
+
+        Args:
+            session: Сессия БД (транзакция списания)
+            tenant_id: ID тенанта
+
+        Returns:
+            False если оповещение тенанта уже ждет отправки (объединено с ним)
+        """
+        result = await session.execute(
+            select(NotificationOutboxMessage.id)
+            .where(NotificationOutboxMessage.status == "pending")
+            .where(NotificationOutboxMessage.kind == KIND_LOW_STOCK_ALERT)
+            .where(NotificationOutboxMessage.tenant_id == tenant_id)
+            .where(NotificationOutboxMessage.attempts == 0)  # Еще не захвачено relay
+            .limit(1)
+        )
+        if result.first() is not None:
+            return False
+
+        session.add(NotificationOutboxMessage(
+            tenant_id=tenant_id,
+            kind=KIND_LOW_STOCK_ALERT,
+            payload={},
+            available_at=datetime.now(timezone.utc) + timedelta(seconds=LOW_STOCK_COALESCE_SECONDS),
+        ))
+        # Следующая проверка в этой же транзакции должна увидеть строку (autoflush выключен)
+        await session.flush()
+        return True
+
+    async def claim_batch(self, session: AsyncSession, limit: int = RELAY_BATCH_SIZE) -> list[NotificationOutboxMessage]:
+        """
+        Захватить пачку готовых к отправке уведомлений и закоммитить аренду
+
+        Args:
+            session: Сессия БД
+            limit: Размер пачки
+
+        Returns:
+            Список захваченных уведомлений
+        """
+        now = datetime.now(timezone.utc)
+        result = await session.execute(
+            select(NotificationOutboxMessage)
+            .where(NotificationOutboxMessage.status == "pending")
+            .where(NotificationOutboxMessage.available_at <= now)
+            .order_by(NotificationOutboxMessage.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        messages = list(result.scalars().all())
+        lease_until = now + timedelta(seconds=RELAY_LEASE_SECONDS)
+        for message in messages:
+            message.attempts += 1
+            message.available_at = lease_until
+        await session.commit()
+        return messages
+
+    async def extend_lease(self, session: AsyncSession, message_ids: list[int]) -> None:
+        """
+        Продлить аренду захваченных строк, которые еще не отправлены
+
+        Args:
+            session: Сессия БД
+            message_ids: ID еще не обработанных строк пачки
+        """
+        if not message_ids:
+            return
+        await session.execute(
+            update(NotificationOutboxMessage)
+            .where(NotificationOutboxMessage.id.in_(message_ids))
+            .where(NotificationOutboxMessage.status == "pending")
+            .values(available_at=datetime.now(timezone.utc) + timedelta(seconds=RELAY_LEASE_SECONDS))
+        )
+
+    async def mark_sent(self, session: AsyncSession, message_ids: list[int]) -> None:
+        """
+        Отметить уведомления отправленными
+
+        Args:
+            session: Сессия БД
+            message_ids: ID уведомлений
+        """
+        if not message_ids:
+            return
+        await session.execute(
+            update(NotificationOutboxMessage)
+            .where(NotificationOutboxMessage.id.in_(message_ids))
+            .values(status="sent", sent_at=datetime.now(timezone.utc), last_error=None)
+        )
+
+    async def mark_retry(self, session: AsyncSession, message: NotificationOutboxMessage, error: str) -> None:
+        """
+        Отложить повторную отправку (экспоненциальная задержка) или пометить failed
+
+        Args:
+            session: Сессия БД
+            message: Уведомление
+            error: Текст ошибки
+        """
+        values = {"last_error": error[:1000]}
+        if message.attempts >= RELAY_MAX_ATTEMPTS:
+            values["status"] = "failed"
+        else:
+            values["available_at"] = datetime.now(timezone.utc) + timedelta(seconds=2 ** message.attempts)
+        await session.execute(
+            update(NotificationOutboxMessage)
+            .where(NotificationOutboxMessage.id == message.id)
+            .values(**values)
+        )
+
+    async def purge_sent(self, session: AsyncSession, older_than: timedelta) -> int:
+        """
+        Удалить давно отправленные уведомления (failed остаются для разбора)
+
+        Args:
+            session: Сессия БД
+            older_than: Возраст отправки, после которого строка удаляется
+
+        Returns:
+            Количество удаленных строк
+        """
+        result = await session.execute(
+            delete(NotificationOutboxMessage)
+            .where(NotificationOutboxMessage.status == "sent")
+            .where(NotificationOutboxMessage.sent_at < datetime.now(timezone.utc) - older_than)
+        )
+        return result.rowcount
+
+
+class NotificationRelay:
+    """Фоновая отправка уведомлений из outbox"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        batch_size: int = RELAY_BATCH_SIZE,
+        poll_interval: float = RELAY_POLL_INTERVAL_SECONDS,
+    ):
+        self.bot = bot
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.notification_service = NotificationService(bot)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+        self.sent = 0
+        self.failed = 0
+        self.purged = 0
+
+    async def start(self) -> None:
+        """Запустить фоновую отправку"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="notification-relay")
+            logger.info("Relay уведомлений запущен")
+
+    async def stop(self) -> None:
+        """Остановить фоновую отправку (неотправленное останется в outbox)"""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def wake(self) -> None:
+        """Сигнал о новых строках в outbox"""
+        self._wakeup.set()
+
+    def stats(self) -> dict:
+        """Метрики relay"""
+        return {
+            "running": self._task is not None,
+            "sent": self.sent,
+            "failed": self.failed,
+            "purged": self.purged,
+        }
+
+    async def run_once(self) -> int:
+        """
+        Захватить и отправить одну пачку уведомлений
+
+        Returns:
+            Количество обработанных уведомлений
+        """
+        async with async_session_maker() as session:
+            messages = await notification_outbox.claim_batch(session, self.batch_size)
+            if not messages:
+                return 0
+
+            # ID строк, которые еще не отправлены и не отложены на повтор
+            leased_ids = {message.id for message in messages}
+            heartbeat = asyncio.create_task(self._keep_lease(leased_ids), name="notification-relay-lease")
+            try:
+                for message in messages:
+                    try:
+                        await self._deliver(session, message)
+                    except Exception as e:
+                        self.failed += 1
+                        logger.error(f"Ошибка отправки уведомления {message.kind} (outbox ID={message.id}): {e}")
+                        await notification_outbox.mark_retry(session, message, str(e) or type(e).__name__)
+                    else:
+                        self.sent += 1
+                        await notification_outbox.mark_sent(session, [message.id])
+                    # Результат строки фиксируется сразу: упавший relay не отправит ее повторно
+                    await session.commit()
+                    leased_ids.discard(message.id)
+            finally:
+                heartbeat.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await heartbeat
+            return len(messages)
+
+    async def _keep_lease(self, leased_ids: set[int]) -> None:
+        """Продлевать аренду строк пачки, пока она отправляется"""
+        while True:
+            await asyncio.sleep(RELAY_LEASE_RENEW_SECONDS)
+            try:
+                async with async_session_maker() as session:
+                    await notification_outbox.extend_lease(session, sorted(leased_ids))
+                    await session.commit()
+            except Exception as e:
+                logger.error(f"Не удалось продлить аренду уведомлений outbox: {e}")
+
+    async def _deliver(self, session: AsyncSession, message: NotificationOutboxMessage) -> None:
+        """Сформировать и отправить уведомление по данным из outbox"""
+        payload = message.payload
+        if message.kind == KIND_NEW_REQUEST:
+            request = await self._load_request(session, payload["request_id"], load_photos=True)
+            if request is not None:
+                await self.notification_service.notify_warehouseman_new_request(request)
+        elif message.kind == KIND_REQUEST_STATUS_CHANGED:
+            request = await self._load_request(session, payload["request_id"])
+            if request is not None:
+                await self.notification_service.notify_employee_request_status_changed(request, payload["status_text"])
+        elif message.kind == KIND_MANAGER_COMPLAINT:
+            result = await session.execute(
+                select(Complaint)
+                .options(selectinload(Complaint.request))
+                .where(Complaint.id == payload["complaint_id"])
+            )
+            complaint = result.scalar_one_or_none()
+            if complaint is not None:
+                await self.notification_service.notify_manager_complaint(complaint, complaint.request)
+        elif message.kind == KIND_URGENT_REQUEST_OVERDUE:
+            request = await self._load_request(session, payload["request_id"])
+            # Заявку могли взять в работу, пока уведомление ждало отправки
+            if request is not None and request.status == "new":
+                await self.notification_service.notify_manager_urgent_request_overdue(request)
+        elif message.kind == KIND_LOW_STOCK_ALERT:
+            await self._deliver_low_stock_alert(session, message.tenant_id)
+        else:
+            raise ValueError(f"Неизвестный тип уведомления: {message.kind}")
+
+    async def _deliver_low_stock_alert(self, session: AsyncSession, tenant_id: int) -> None:
+        """
+        Отправить позиции тенанта, еще не попавшие в оповещение, и отметить их
+
+        Позиции отмечаются только после ответа Telegram: при ошибке отправки
+        они остаются неоповещенными, а строка outbox уходит на повтор.
+        """
+        from bot.services.warehouse_service import warehouse_service
+        from bot.services.technician_service import technician_service
+
+        items = await warehouse_service.get_unalerted_low_stock_items(session, tenant_id)
+        if not items:
+            return  # Уже отправлены другим оповещением или пополнены
+
+        recipients = await technician_service.get_warehouse_recipients(session, [tenant_id])
+        await self.notification_service.notify_low_stock(recipients[tenant_id], items)
+        await warehouse_service.mark_low_stock_alerted(session, [item.id for item in items])
+
+    async def purge_once(self) -> int:
+        """
+        Удалить отправленные уведомления старше SENT_RETENTION_DAYS
+
+        Returns:
+            Количество удаленных строк
+        """
+        async with async_session_maker() as session:
+            purged = await notification_outbox.purge_sent(session, timedelta(days=SENT_RETENTION_DAYS))
+            await session.commit()
+        self.purged += purged
+        return purged
+
+    async def _load_request(self, session: AsyncSession, request_id: int, load_photos: bool = False) -> Optional[Request]:
+        query = select(Request).where(Request.id == request_id)
+        if load_photos:
+            query = query.options(selectinload(Request.photos))
+        result = await session.execute(query)
+        request = result.scalar_one_or_none()
+        if request is None:
+            logger.warning(f"Заявка {request_id} для уведомления не найдена")
+        return request
+
+    async def _run(self) -> None:
+        while True:
+            if time.monotonic() - self._last_purge >= PURGE_INTERVAL_SECONDS:
+                self._last_purge = time.monotonic()
+                try:
+                    await self.purge_once()
+                except Exception as e:
+                    logger.error(f"Ошибка очистки outbox: {e}")
+
+            try:
+                processed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Ошибка relay уведомлений: {e}")
+                processed = 0
+
+            if processed >= self.batch_size:
+                # Есть еще строки - продолжаем без ожидания
+                continue
+
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            self._wakeup.clear()
+
+
+# Глобальный экземпляр сервиса
+notification_outbox = NotificationOutbox()
+
+# Relay, привязанный к запущенному боту
+_relay: Optional[NotificationRelay] = None
+
+
+def _wake_relay() -> None:
+    if _relay is not None:
+        _relay.wake()
+
+
+def get_notification_relay() -> Optional[NotificationRelay]:
+    """Получить запущенный relay (None, если бот не запущен)"""
+    return _relay
+
+
+async def start_notification_relay(bot: Bot) -> NotificationRelay:
+    """
+    Создать и запустить relay уведомлений
+
+    Args:
+        bot: Экземпляр бота
+
+    Returns:
+        NotificationRelay
+    """
+    global _relay
+    relay = NotificationRelay(bot)
+    await relay.start()
+    _relay = relay
+    return relay
+
+
+async def stop_notification_relay() -> None:
+    """Остановить relay уведомлений"""
+    global _relay
+    relay, _relay = _relay, None
+    if relay is not None:
+        await relay.stop()
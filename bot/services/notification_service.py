@@ -1,9 +1,18 @@
-"""Сервис для отправки уведомлений"""
+"""Сервис для отправки уведомлений
+
+Методы, которые вызывает relay outbox (новая заявка, смена статуса,
+жалоба руководителю, просроченная срочная заявка, низкий остаток),
+дожидаются ответа Telegram и пробрасывают ошибку отправки - relay
+повторит уведомление позже.
+"""
 import logging
 from aiogram import Bot
 from aiogram.types import Message
 from bot.config import get_config
 from bot.database.models import Request, Complaint
+from bot.services.user_profile_service import user_profile_service
+from bot.services.outbound_dispatcher import dispatch, deliver
+from bot.utils.photo_delivery import send_request_photos
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +26,7 @@ class NotificationService:
     
     async def _get_user_name(self, user_id: int) -> str:
         """
-        Получить имя пользователя через Telegram API
+        Получить имя пользователя (кэш профилей, при необходимости - Telegram API)
         
         Args:
             user_id: Telegram ID пользователя
@@ -25,31 +34,21 @@ class NotificationService:
         Returns:
             Имя пользователя или ID если не удалось получить
         """
-        try:
-            chat = await self.bot.get_chat(user_id)
-            return chat.first_name or chat.username or f"ID: {user_id}"
-        except Exception as e:
-            logger.warning(f"Не удалось получить имя пользователя {user_id}: {e}")
-            return f"ID: {user_id}"
+        profile = await user_profile_service.get_profile(None, self.bot, user_id)
+        return profile.short_name
     
     async def _get_user_full_info(self, user_id: int) -> tuple[str, str]:
         """
-        Получить полное имя и username пользователя через Telegram API
+        Получить полное имя и username пользователя (кэш профилей, при необходимости - Telegram API)
         
         Args:
             user_id: Telegram ID пользователя
             
         Returns:
-            Кортеж (full_name, username), где username может быть пустой строкой
+            Кортеж (full_name, username), где вместо отсутствующих значений - ID
         """
-        try:
-            chat = await self.bot.get_chat(user_id)
-            full_name = chat.first_name or f"ID: {user_id}"
-            username = f"@{chat.username}" if chat.username else f"ID: {user_id}"
-            return (full_name, username)
-        except Exception as e:
-            logger.warning(f"Не удалось получить информацию о пользователе {user_id}: {e}")
-            return (f"ID: {user_id}", f"ID: {user_id}")
+        profile = await user_profile_service.get_profile(None, self.bot, user_id)
+        return (profile.full_name, profile.display_username)
     
     async def notify_warehouseman_new_request(self, request: Request):
         """
@@ -57,6 +56,9 @@ class NotificationService:
         
         Args:
             request: Новая заявка
+            
+        Raises:
+            Exception: Ошибка отправки
         """
         from bot.utils.request_formatter import format_request_full
         from bot.keyboards.inline import get_request_actions_keyboard
@@ -74,57 +76,37 @@ class NotificationService:
         # чтобы не было пересечений между тестировщиками.
         target_warehouseman_chat_id = request.user_id if self.config.demo_mode else self.config.warehouseman_id
 
-        try:
-            # Получаем фото безопасным способом
-            # Сначала пробуем использовать закэшированные file_ids (если есть)
-            photo_file_ids = getattr(request, '_cached_photo_file_ids', None)
-            
-            if photo_file_ids is not None:
-                # Используем закэшированные file_ids
-                photos = [type('Photo', (), {'file_id': fid})() for fid in photo_file_ids]
-            else:
-                # Пытаемся получить через relationship (может не сработать после commit)
+        # Получаем фото безопасным способом
+        # Сначала пробуем использовать закэшированные file_ids (если есть)
+        photo_file_ids = getattr(request, '_cached_photo_file_ids', None)
+        
+        if photo_file_ids is not None:
+            # Используем закэшированные file_ids
+            photos = [type('Photo', (), {'file_id': fid})() for fid in photo_file_ids]
+        else:
+            # Пытаемся получить через relationship (может не сработать после commit)
+            photos = []
+            try:
+                from sqlalchemy import inspect
+                insp = inspect(request)
+                if 'photos' in insp.attrs:
+                    photos_attr = insp.attrs['photos']
+                    if photos_attr.loaded_value is not None:
+                        # Photos загружены, можно безопасно использовать
+                        photos = list(request.photos) if request.photos else []
+            except Exception:
+                # Если не удалось получить - значит фото нет или сессия закрыта
                 photos = []
-                try:
-                    from sqlalchemy import inspect
-                    insp = inspect(request)
-                    if 'photos' in insp.attrs:
-                        photos_attr = insp.attrs['photos']
-                        if photos_attr.loaded_value is not None:
-                            # Photos загружены, можно безопасно использовать
-                            photos = list(request.photos) if request.photos else []
-                except Exception:
-                    # Если не удалось получить - значит фото нет или сессия закрыта
-                    photos = []
-            
-            if photos:
-                # Отправляем первое фото с текстом и кнопками
-                await self.bot.send_photo(
-                    chat_id=target_warehouseman_chat_id,
-                    photo=photos[0].file_id,
-                    caption=text,
-                    reply_markup=keyboard,
-                    parse_mode="HTML"
-                )
-                
-                # Остальные фото отправляем отдельными сообщениями
-                if len(photos) > 1:
-                    for photo in photos[1:]:
-                        await self.bot.send_photo(
-                            chat_id=target_warehouseman_chat_id,
-                            photo=photo.file_id
-                        )
-            else:
-                # Нет фото - отправляем обычное текстовое сообщение
-                await self.bot.send_message(
-                    chat_id=target_warehouseman_chat_id,
-                    text=text,
-                    reply_markup=keyboard,
-                    parse_mode="HTML"
-                )
-        except Exception as e:
-            # Логируем ошибку, но не прерываем выполнение
-            logger.error(f"Ошибка отправки уведомления технику: {e}")
+        
+        # Текст, фото и кнопки - не более 2 вызовов API
+        await send_request_photos(
+            self.bot,
+            chat_id=target_warehouseman_chat_id,
+            text=text,
+            photo_file_ids=[photo.file_id for photo in photos],
+            reply_markup=keyboard,
+            wait=True
+        )
     
     async def notify_manager_complaint(self, complaint: Complaint, request: Request):
         """
@@ -133,6 +115,9 @@ class NotificationService:
         Args:
             complaint: Жалоба
             request: Заявка, на которую пожаловались
+            
+        Raises:
+            Exception: Ошибка отправки
         """
         from bot.utils.request_formatter import format_request_short
         
@@ -150,16 +135,63 @@ class NotificationService:
         
         target_manager_chat_id = complaint.user_id if self.config.demo_mode else self.config.manager_id
 
-        try:
-            await self.bot.send_message(
-                chat_id=target_manager_chat_id,
+        await deliver(
+            self.bot, "send_message",
+            chat_id=target_manager_chat_id,
+            text=text,
+            parse_mode="HTML"
+        )
+        logger.debug(f"Уведомление руководителю отправлено: жалоба ID={complaint.id}")
+    
+    async def notify_manager_urgent_request_overdue(self, request: Request):
+        """
+        Уведомить руководителя, что срочная заявка не взята в работу в срок (SLA)
+        
+        Args:
+            request: Срочная заявка в статусе "Новая"
+            
+        Raises:
+            Exception: Ошибка отправки
+        """
+        from bot.utils.request_formatter import format_request_short
+        
+        text = "🚨 <b>Срочная заявка не обработана вовремя</b>\n\n"
+        text += format_request_short(request)
+        text += f"\n\n📅 Создана: {request.created_at.strftime('%d.%m.%Y %H:%M')}"
+        
+        # Руководитель тенанта (в demo-режиме и для назначенных техников tenant_id - ID руководителя)
+        target_manager_chat_id = request.tenant_id or self.config.manager_id
+
+        await deliver(
+            self.bot, "send_message",
+            chat_id=target_manager_chat_id,
+            text=text,
+            parse_mode="HTML"
+        )
+        logger.debug(f"Уведомление руководителю отправлено: просрочена заявка ID={request.id}")
+    
+    async def notify_low_stock(self, chat_ids: list[int], items: list):
+        """
+        Оповестить техников, что позиции опустились до минимального остатка
+        
+        Args:
+            chat_ids: Telegram ID получателей (техники тенанта)
+            items: Позиции склада (WarehouseItem)
+            
+        Raises:
+            Exception: Ошибка отправки
+        """
+        text = "⚠️ <b>Остаток опустился до минимума</b>\n\n"
+        for item in items:
+            text += f"📦 <b>{item.name}</b>: {item.current_quantity} (минимум {item.min_quantity})\n"
+        
+        for chat_id in chat_ids:
+            await deliver(
+                self.bot, "send_message",
+                chat_id=chat_id,
                 text=text,
                 parse_mode="HTML"
             )
-            logger.debug(f"Уведомление руководителю отправлено: жалоба ID={complaint.id}")
-        except Exception as e:
-            logger.error(f"Ошибка отправки уведомления руководителю: {e}")
-            # Не прерываем выполнение - жалоба уже создана
     
     async def notify_warehouseman_complaint(self, complaint: Complaint, request: Request):
         """
@@ -186,7 +218,8 @@ class NotificationService:
         target_warehouseman_chat_id = complaint.user_id if self.config.demo_mode else self.config.warehouseman_id
 
         try:
-            await self.bot.send_message(
+            await dispatch(
+                self.bot, "send_message",
                 chat_id=target_warehouseman_chat_id,
                 text=text,
                 parse_mode="HTML"
@@ -203,6 +236,9 @@ class NotificationService:
         Args:
             request: Заявка
             status_text: Текст статуса
+            
+        Raises:
+            Exception: Ошибка отправки
         """
         from bot.utils.request_formatter import format_request_short
         
@@ -213,12 +249,10 @@ class NotificationService:
         if request.rejection_reason:
             text += f"\n\n❌ <b>Причина отклонения:</b> {request.rejection_reason}"
         
-        try:
-            await self.bot.send_message(
-                chat_id=request.user_id,
-                text=text,
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            print(f"Ошибка отправки уведомления пользователю: {e}")
+        await deliver(
+            self.bot, "send_message",
+            chat_id=request.user_id,
+            text=text,
+            parse_mode="HTML"
+        )
 
@@ -0,0 +1,358 @@
+"""Диспетчер исходящих сообщений с ограничением скорости
+
+Telegram ограничивает отправку примерно 30 сообщениями в секунду на бота
+и ~1 сообщением в секунду в один чат; при превышении API отвечает
+TelegramRetryAfter. Все исходящие отправки ставятся в очередь диспетчера:
+- сообщения одного чата отправляются строго по порядку;
+- пул воркеров соблюдает глобальный и per-chat token bucket;
+- при TelegramRetryAfter сообщение возвращается в начало очереди чата
+  и чат откладывается на указанное время;
+- сетевые/серверные ошибки повторяются с экспоненциальной задержкой.
+
+Диспетчер создается вместе с Bot в main.py / bot/web.py. Код, который
+отправляет сообщения, вызывает dispatch(bot, "send_message", ...):
+если диспетчер запущен - сообщение ставится в очередь, иначе
+(тесты, скрипты) отправляется сразу. Код, которому нужен результат
+отправки (relay outbox помечает строку отправленной только после ответа
+Telegram), вызывает deliver(): тот же путь через очередь, но с ожиданием
+ответа и пробросом ошибки.
+"""
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError, TelegramServerError
+
+logger = logging.getLogger(__name__)
+
+# Глобальный лимит бота (сообщений в секунду)
+GLOBAL_RATE_PER_SECOND = 30
+
+# Лимит на один чат (сообщений в секунду) и допустимая пачка подряд
+PER_CHAT_RATE_PER_SECOND = 1
+PER_CHAT_BURST = 3
+
+# Количество воркеров
+WORKERS_COUNT = 8
+
+# Максимум попыток при сетевых/серверных ошибках
+MAX_ATTEMPTS = 5
+
+# Сколько ждать доотправки очереди при остановке (секунды)
+DRAIN_TIMEOUT_SECONDS = 10
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не более capacity накопленных"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self) -> float:
+        """
+        Взять токен, если он есть
+
+        Returns:
+            0 если токен взят, иначе время (секунды) до появления токена
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    @property
+    def is_idle(self) -> bool:
+        """Bucket полностью восстановился (его можно удалить без потери состояния)"""
+        elapsed = time.monotonic() - self.updated_at
+        return self.tokens + elapsed * self.rate >= self.capacity
+
+
+@dataclass
+class OutboundMessage:
+    """Исходящий вызов Bot API"""
+
+    method: str
+    kwargs: dict
+    future: asyncio.Future
+    attempts: int = 0
+
+    @property
+    def chat_id(self) -> Any:
+        return self.kwargs.get("chat_id")
+
+
+@dataclass
+class _ChatQueue:
+    """Очередь сообщений одного чата"""
+
+    bucket: TokenBucket
+    messages: deque = field(default_factory=deque)
+    scheduled: bool = False
+
+
+class OutboundDispatcher:
+    """Очередь исходящих сообщений с пулом воркеров и ограничением скорости"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        workers: int = WORKERS_COUNT,
+        global_rate: float = GLOBAL_RATE_PER_SECOND,
+        per_chat_rate: float = PER_CHAT_RATE_PER_SECOND,
+        per_chat_burst: float = PER_CHAT_BURST,
+    ):
+        self.bot = bot
+        self.workers_count = workers
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chats: dict[Any, _ChatQueue] = {}
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers)
+
+    def enqueue(self, method: str, **kwargs) -> asyncio.Future:
+        """
+        Поставить вызов Bot API в очередь
+
+        Args:
+            method: Имя метода Bot ("send_message", "send_photo", ...)
+            **kwargs: Аргументы метода (обязательно chat_id)
+
+        Returns:
+            Future с результатом вызова (ожидать не обязательно)
+        """
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_exception)
+        message = OutboundMessage(method=method, kwargs=kwargs, future=future)
+
+        chat = self._chats.get(message.chat_id)
+        if chat is None:
+            chat = _ChatQueue(bucket=TokenBucket(self.per_chat_rate, self.per_chat_burst))
+            self._chats[message.chat_id] = chat
+        chat.messages.append(message)
+
+        self._pending += 1
+        self._idle.clear()
+        if not chat.scheduled:
+            chat.scheduled = True
+            self._ready.put_nowait(message.chat_id)
+        return future
+
+    async def start(self) -> None:
+        """Запустить воркеры"""
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"outbound-worker-{i}")
+            for i in range(self.workers_count)
+        ]
+        logger.info(f"Диспетчер исходящих сообщений запущен ({self.workers_count} воркеров)")
+
+    async def stop(self, drain_timeout: float = DRAIN_TIMEOUT_SECONDS) -> None:
+        """
+        Остановить воркеры, дав очереди доотправиться
+
+        Args:
+            drain_timeout: Сколько ждать опустошения очереди (секунды)
+        """
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Диспетчер остановлен, не отправлено сообщений: {self._pending}")
+
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._workers = []
+
+    def stats(self) -> dict:
+        """Метрики диспетчера"""
+        return {
+            "pending": self._pending,
+            "chats": len(self._chats),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            chat_id = await self._ready.get()
+            chat = self._chats[chat_id]
+
+            wait = chat.bucket.try_acquire()
+            if wait > 0:
+                loop.call_later(wait, self._ready.put_nowait, chat_id)
+                continue
+
+            while (wait := self._global_bucket.try_acquire()) > 0:
+                await asyncio.sleep(wait)
+
+            message = chat.messages.popleft()
+            delay = await self._deliver(message)
+            if delay is not None:
+                # Повтор: сообщение остается первым в очереди чата
+                chat.messages.appendleft(message)
+                loop.call_later(delay, self._ready.put_nowait, chat_id)
+                continue
+
+            self._pending -= 1
+            if chat.messages:
+                self._ready.put_nowait(chat_id)
+            else:
+                chat.scheduled = False
+                self._forget_idle_chats()
+                if self._pending == 0:
+                    self._idle.set()
+
+    async def _deliver(self, message: OutboundMessage) -> Optional[float]:
+        """
+        Выполнить вызов Bot API
+
+        Returns:
+            None если вызов завершен (успешно или окончательно неуспешно),
+            иначе задержка (секунды) перед повторной попыткой
+        """
+        message.attempts += 1
+        try:
+            result = await getattr(self.bot, message.method)(**message.kwargs)
+        except TelegramRetryAfter as e:
+            self.retried += 1
+            logger.warning(f"Flood control для чата {message.chat_id}: повтор через {e.retry_after} с")
+            return float(e.retry_after)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            if message.attempts < MAX_ATTEMPTS:
+                self.retried += 1
+                return float(2 ** message.attempts)
+            self._fail(message, e)
+            return None
+        except Exception as e:
+            self._fail(message, e)
+            return None
+
+        self.sent += 1
+        if not message.future.done():
+            message.future.set_result(result)
+        return None
+
+    def _fail(self, message: OutboundMessage, error: Exception) -> None:
+        self.failed += 1
+        logger.error(f"Ошибка отправки {message.method} в чат {message.chat_id}: {error}")
+        if not message.future.done():
+            message.future.set_exception(error)
+
+    def _forget_idle_chats(self) -> None:
+        """Удалить состояние чатов без сообщений, у которых bucket восстановился"""
+        if len(self._chats) < 1000:
+            return
+        for chat_id in [
+            chat_id for chat_id, chat in self._chats.items()
+            if not chat.scheduled and not chat.messages and chat.bucket.is_idle
+        ]:
+            del self._chats[chat_id]
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    """Ошибка уже залогирована диспетчером - не даем asyncio ругаться на неполученное исключение"""
+    if not future.cancelled():
+        future.exception()
+
+
+# Диспетчер, привязанный к запущенному боту
+_dispatcher: Optional[OutboundDispatcher] = None
+
+
+def get_outbound_dispatcher() -> Optional[OutboundDispatcher]:
+    """Получить запущенный диспетчер (None, если бот не запущен)"""
+    return _dispatcher
+
+
+async def start_outbound_dispatcher(bot: Bot) -> OutboundDispatcher:
+    """
+    Создать и запустить диспетчер для бота
+
+    Args:
+        bot: Экземпляр бота
+
+    Returns:
+        OutboundDispatcher
+    """
+    global _dispatcher
+    dispatcher = OutboundDispatcher(bot)
+    await dispatcher.start()
+    _dispatcher = dispatcher
+    return dispatcher
+
+
+async def stop_outbound_dispatcher() -> None:
+    """Доотправить очередь и остановить диспетчер"""
+    global _dispatcher
+    dispatcher, _dispatcher = _dispatcher, None
+    if dispatcher is not None:
+        await dispatcher.stop()
+
+
+async def dispatch(bot: Bot, method: str, **kwargs) -> None:
+    """
+    Отправить сообщение через диспетчер, не дожидаясь Telegram API
+
+    Если диспетчер для этого бота не запущен (тесты, скрипты),
+    вызов выполняется сразу, и ошибки пробрасываются вызывающему.
+
+    Args:
+        bot: Экземпляр бота
+        method: Имя метода Bot ("send_message", "send_photo", ...)
+        **kwargs: Аргументы метода
+    """
+    dispatcher = _dispatcher
+    if dispatcher is not None and dispatcher.bot is bot:
+        dispatcher.enqueue(method, **kwargs)
+        return
+    await getattr(bot, method)(**kwargs)
+
+
+async def deliver(bot: Bot, method: str, **kwargs) -> Any:
+    """
+    Отправить сообщение через диспетчер и дождаться ответа Telegram API
+
+    Лимиты и повторы сетевых ошибок - те же, что у dispatch(), но
+    окончательная ошибка пробрасывается вызывающему.
+
+    Args:
+        bot: Экземпляр бота
+        method: Имя метода Bot ("send_message", "send_photo", ...)
+        **kwargs: Аргументы метода
+
+    Returns:
+        Результат вызова Bot API
+    """
+    dispatcher = _dispatcher
+    if dispatcher is not None and dispatcher.bot is bot:
+        return await dispatcher.enqueue(method, **kwargs)
+    return await getattr(bot, method)(**kwargs)
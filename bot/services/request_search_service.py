@@ -0,0 +1,163 @@
+"""Сервис поиска заявок
+
+Ищет по номеру, категории и описанию заявки.
+
+В PostgreSQL:
+- слова запроса ищутся в генерируемой колонке requests.search_vector
+  (tsvector, конфигурация 'russian') по GIN-индексу; каждое слово
+  ищется как префикс, поэтому "рем" находит "ремонт";
+- номер (или его часть, например "170126") ищется через ILIKE по
+  GIN-индексу pg_trgm на requests.number;
+- результаты упорядочены: совпадения по номеру, затем по релевантности
+  (ts_rank_cd), затем от новых к старым.
+
+Колонка и индексы создаются миграцией e8f9a0b1c2d3 и в модели не
+описаны (в SQLite их нет). В SQLite (тесты) каждое слово ищется
+подстрокой (LIKE) в номере, категории или описании, результаты - от
+новых к старым (кириллицу SQLite сравнивает с учетом регистра).
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+
+from sqlalchemy import Select, and_, case, func, literal_column, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.dialect import is_postgresql
+from bot.database.models import Request
+from bot.database.projections import request_list_query, to_request_rows
+
+logger = logging.getLogger(__name__)
+
+# Результатов на одной странице
+SEARCH_PAGE_SIZE = 10
+
+# Ограничения запроса: длина и количество слов
+SEARCH_QUERY_MAX_LENGTH = 100
+SEARCH_MAX_TERMS = 8
+
+# Конфигурация полнотекстового поиска PostgreSQL
+SEARCH_CONFIG = "russian"
+
+# Генерируемая колонка tsvector (только PostgreSQL)
+search_vector = literal_column("requests.search_vector")
+
+_TERM_RE = re.compile(r"\w+")
+
+
+@dataclass
+class SearchPage:
+    """Страница результатов поиска (RequestListRow)"""
+
+    items: list = field(default_factory=list)
+    page: int = 0
+    has_next: bool = False
+
+    @property
+    def has_prev(self) -> bool:
+        return self.page > 0
+
+
+def normalize_query(query: str) -> str:
+    """
+    Привести поисковый запрос к виду для поиска и хранения
+
+    Args:
+        query: Текст пользователя
+
+    Returns:
+        Запрос без лишних пробелов, не длиннее SEARCH_QUERY_MAX_LENGTH
+    """
+    return " ".join((query or "").split())[:SEARCH_QUERY_MAX_LENGTH]
+
+
+def extract_terms(query: str) -> list[str]:
+    """
+    Разбить запрос на слова (без знаков препинания и спецсимволов tsquery)
+
+    Args:
+        query: Поисковый запрос
+
+    Returns:
+        Слова (не больше SEARCH_MAX_TERMS)
+    """
+    return _TERM_RE.findall(query)[:SEARCH_MAX_TERMS]
+
+
+def _contains_pattern(value: str) -> str:
+    """Шаблон LIKE "содержит" с экранированием спецсимволов"""
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class RequestSearchService:
+    """Сервис поиска заявок"""
+
+    async def search(
+        self,
+        session: AsyncSession,
+        tenant_id: int,
+        query: str,
+        page: int = 0,
+        page_size: int = SEARCH_PAGE_SIZE
+    ) -> SearchPage:
+        """
+        Найти заявки тенанта
+
+        Args:
+            session: Сессия БД
+            tenant_id: ID тенанта
+            query: Поисковый запрос (номер или слова)
+            page: Номер страницы (с 0)
+            page_size: Размер страницы
+
+        Returns:
+            SearchPage (пустая, если в запросе нет слов)
+        """
+        query = normalize_query(query)
+        terms = extract_terms(query)
+        if not terms:
+            return SearchPage(page=page)
+
+        stmt = request_list_query().where(Request.tenant_id == tenant_id)
+        if is_postgresql(session):
+            stmt = self._full_text_search(stmt, query, terms)
+        else:
+            stmt = self._substring_search(stmt, terms)
+
+        # Одна лишняя строка показывает, есть ли следующая страница
+        result = await session.execute(stmt.offset(max(page, 0) * page_size).limit(page_size + 1))
+        items = to_request_rows(result)
+        return SearchPage(items=items[:page_size], page=page, has_next=len(items) > page_size)
+
+    def _full_text_search(self, stmt: Select, query: str, terms: list[str]) -> Select:
+        """Полнотекстовый поиск PostgreSQL (GIN по search_vector и pg_trgm по номеру)"""
+        # Каждое слово - префикс: "рем:* & крыш:*"
+        tsquery = func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{term}:*" for term in terms))
+        number_match = Request.number.ilike(_contains_pattern(query), escape="\\")
+        return (
+            stmt
+            .where(or_(search_vector.op("@@")(tsquery), number_match))
+            .order_by(
+                case((number_match, 1), else_=0).desc(),
+                func.ts_rank_cd(search_vector, tsquery).desc(),
+                Request.created_at.desc(),
+                Request.id.desc(),
+            )
+        )
+
+    def _substring_search(self, stmt: Select, terms: list[str]) -> Select:
+        """Поиск подстрокой (SQLite): каждое слово - в номере, категории или описании"""
+        conditions = []
+        for term in terms:
+            pattern = _contains_pattern(term)
+            conditions.append(or_(
+                Request.number.ilike(pattern, escape="\\"),
+                Request.category.ilike(pattern, escape="\\"),
+                Request.description.ilike(pattern, escape="\\"),
+            ))
+        return stmt.where(and_(*conditions)).order_by(Request.created_at.desc(), Request.id.desc())
+
+
+# Глобальный экземпляр сервиса
+request_search_service = RequestSearchService()
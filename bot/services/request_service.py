@@ -1,66 +1,64 @@
 """Сервис для работы с заявками"""
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select
 from sqlalchemy.orm import selectinload
-from bot.database.models import Request, RequestPhoto, User
+from bot.database.dialect import upsert_insert
+from bot.database.models import Request, RequestPhoto, RequestNumberSequence, User
+from bot.database.projections import RequestListRow, request_list_query, to_request_rows
 from bot.utils.request_helpers import generate_request_number
+from bot.services.notification_outbox import notification_outbox
+from bot.services.request_stats_service import request_stats_service
+from bot.services.sla_timer_service import sla_timer_service
+from bot.utils.pagination import PageCursor, RequestPage, fetch_request_page, PAGE_SIZE
 
 
 class RequestService:
     """Сервис для управления заявками"""
     
+    async def next_sequence_value(self, session: AsyncSession, tenant_id: int, day: date) -> int:
+        """
+        Получить следующий порядковый номер заявки тенанта за день
+        
+        Один INSERT ... ON CONFLICT DO UPDATE ... RETURNING: строка счетчика
+        блокируется до конца транзакции, поэтому параллельные создания
+        получают разные значения, а откат транзакции возвращает значение.
+        
+        Args:
+            session: Сессия БД
+            tenant_id: ID тенанта
+            day: День
+            
+        Returns:
+            Порядковый номер (1, 2, ...)
+        """
+        sequence = RequestNumberSequence.__table__
+        stmt = upsert_insert(session, RequestNumberSequence).values(tenant_id=tenant_id, day=day, last_value=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["tenant_id", "day"],
+            set_={"last_value": sequence.c.last_value + 1}
+        ).returning(sequence.c.last_value)
+        result = await session.execute(stmt)
+        return result.scalar_one()
+    
     async def generate_request_number(self, session: AsyncSession, tenant_id: int) -> str:
         """
-        Сгенерировать уникальный номер заявки ЗХ-ДДММГГ-№№№
+        Сгенерировать номер заявки ЗХ-ДДММГГ-№№№
         
-        Глобально уникальный номер (не зависит от пользователя).
-        При конфликте (одновременные запросы) повторяет генерацию.
+        Номер уникален в рамках тенанта и выдается дневным счетчиком
+        (request_number_sequences) без повторов и пропусков.
         
         Args:
             session: Сессия БД
+            tenant_id: ID тенанта
             
         Returns:
             Полный номер заявки (например, ЗХ-271125-001)
         """
-        from sqlalchemy.exc import IntegrityError
-        
         today = datetime.now()
-        date_prefix = generate_request_number(today)
-        today_start = today.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Пытаемся сгенерировать номер до 10 раз (на случай конфликтов)
-        max_attempts = 10
-        for attempt in range(max_attempts):
-            # Найти все заявки за сегодня с таким префиксом
-            result = await session.execute(
-                select(func.count(Request.id))
-                .where(Request.created_at >= today_start)
-                .where(Request.tenant_id == tenant_id)
-                .where(Request.number.like(f"{date_prefix}-%"))
-            )
-            
-            count = result.scalar() or 0
-            sequence_number = count + 1
-            number = f"{date_prefix}-{sequence_number:03d}"
-            
-            # Проверяем, что такого номера еще нет (на случай race condition)
-            existing = await session.execute(
-                select(Request.id).where(Request.number == number)
-            )
-            if existing.scalar_one_or_none() is None:
-                # Номер свободен, возвращаем
-                return number
-            
-            # Номер занят (race condition), пробуем еще раз
-            # Сначала делаем flush чтобы увидеть последние изменения
-            await session.flush()
-        
-        # Если все попытки неудачны, используем timestamp для гарантированной уникальности
-        import time
-        timestamp_suffix = str(int(time.time()))[-6:]  # Последние 6 цифр timestamp
-        return f"{date_prefix}-{timestamp_suffix}"
+        sequence_number = await self.next_sequence_value(session, tenant_id=tenant_id, day=today.date())
+        return f"{generate_request_number(today)}-{sequence_number:03d}"
     
     async def create_request(
         self,
@@ -76,6 +74,9 @@ class RequestService:
         """
         Создать новую заявку
         
+        Дневная статистика, уведомление технику (outbox) и SLA-таймер
+        срочной заявки записываются в той же транзакции.
+        
         Args:
             session: Сессия БД
             user_id: Telegram ID пользователя
@@ -126,7 +127,12 @@ class RequestService:
             # Извлекаем file_ids пока сессия активна
             photo_file_ids = [photo.file_id for photo in request.photos] if request.photos else []
         
-        await session.commit()
+        # Дневная статистика, уведомление технику и SLA-таймер срочной заявки -
+        # в той же транзакции, что и заявка
+        await request_stats_service.record_created(session, request)
+        await notification_outbox.enqueue_new_request(session, request)
+        await sla_timer_service.schedule(session, request)
+        await session.flush()
         
         # Сохраняем file_ids в объекте request для использования после коммита
         # Это безопасный способ избежать lazy loading после закрытия сессии
@@ -141,7 +147,7 @@ class RequestService:
         tenant_id: int,
         user_id: int,
         limit: Optional[int] = None
-    ) -> list[Request]:
+    ) -> list[RequestListRow]:
         """
         Получить заявки пользователя
         
@@ -154,10 +160,9 @@ class RequestService:
             Список заявок пользователя
         """
         query = (
-            select(Request)
+            request_list_query()
             .where(Request.tenant_id == tenant_id)
             .where(Request.user_id == user_id)
-            .options(selectinload(Request.photos))
             .order_by(Request.created_at.desc())
         )
         
@@ -165,7 +170,34 @@ class RequestService:
             query = query.limit(limit)
         
         result = await session.execute(query)
-        return list(result.scalars().all())
+        return to_request_rows(result)
+    
+    async def get_user_requests_page(
+        self,
+        session: AsyncSession,
+        tenant_id: int,
+        user_id: int,
+        cursor: Optional[PageCursor] = None,
+        page_size: int = PAGE_SIZE
+    ) -> RequestPage:
+        """
+        Получить страницу заявок пользователя (keyset-пагинация, от новых к старым)
+        
+        Args:
+            session: Сессия БД
+            user_id: Telegram ID пользователя
+            cursor: Курсор страницы (None - первая страница)
+            page_size: Размер страницы
+            
+        Returns:
+            Страница заявок
+        """
+        query = (
+            request_list_query()
+            .where(Request.tenant_id == tenant_id)
+            .where(Request.user_id == user_id)
+        )
+        return await fetch_request_page(session, query, cursor, page_size)
     
     async def get_request_by_id(
         self,
@@ -0,0 +1,249 @@
+"""Сервис дневной статистики заявок (rollup request_daily_stats)
+
+Отчеты за период не сканируют таблицу requests: счетчики поддерживаются
+инкрементально в той же транзакции, что и создание заявки или смена
+ее статуса, и читаются из request_daily_stats. Объем чтения зависит от
+количества дней в периоде (и комбинаций статус/приоритет/категория),
+но не от количества заявок.
+
+Счетчики строки (tenant_id, day, status, priority, category):
+- created - заявки, созданные в day и сейчас находящиеся в status
+  (при смене статуса заявка переносится в строку нового статуса);
+- taken / completed / rejected - переходы, произошедшие в day.
+
+Пересчет с нуля по таблице requests - rebuild() или
+python scripts/rebuild_request_stats.py.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from typing import AsyncIterator, Optional
+
+import pytz
+from sqlalchemy import select, delete, func, case, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import get_config
+from bot.database.dialect import upsert_insert
+from bot.database.models import Request, RequestDailyStat
+from bot.utils.cron import get_scheduler_timezone
+
+logger = logging.getLogger(__name__)
+
+# Какой счетчик увеличивает переход в статус
+TRANSITION_COUNTERS = {
+    "in_progress": "taken",
+    "completed": "completed",
+    "rejected": "rejected",
+}
+
+# Счетчики отчета за период
+PERIOD_TOTAL_KEYS = ("new", "in_progress", "completed", "rejected", "total")
+
+# Ключ строки rollup
+STAT_KEY_COLUMNS = ["tenant_id", "day", "status", "priority", "category"]
+
+# Сколько строк requests читать за раз при пересчете
+REBUILD_BATCH_SIZE = 1000
+
+
+def local_day(value: Optional[datetime], tz: Optional[pytz.BaseTzInfo] = None) -> date:
+    """
+    День (в часовом поясе бота - config.timezone) для момента времени
+
+    Тот же пояс использует планировщик, поэтому "вчера" ежедневного
+    отчета совпадает с днями строк rollup при любом поясе сервера.
+
+    Args:
+        value: Момент времени (naive - уже локальное время; None - сейчас)
+        tz: Часовой пояс (по умолчанию - config.timezone)
+
+    Returns:
+        Дата
+    """
+    if tz is None:
+        tz = get_scheduler_timezone(get_config().timezone)
+    if value is None:
+        return datetime.now(tz).date()
+    if value.tzinfo is not None:
+        value = value.astimezone(tz)
+    return value.date()
+
+
+class RequestStatsService:
+    """Сервис дневной статистики заявок"""
+
+    async def record_created(self, session: AsyncSession, request: Request) -> None:
+        """
+        Учесть созданную заявку (вызывается в транзакции создания)
+
+        Args:
+            session: Сессия БД
+            request: Новая заявка
+        """
+        await self._increment(session, request, local_day(None), request.status, created=1)
+
+    async def record_transition(self, session: AsyncSession, request: Request, old_status: str) -> None:
+        """
+        Учесть смену статуса заявки (вызывается в транзакции перехода)
+
+        Args:
+            session: Сессия БД
+            request: Заявка (уже с новым статусом)
+            old_status: Статус до перехода
+        """
+        if request.status == old_status:
+            return
+
+        # Заявка переходит в строку нового статуса своего дня создания
+        created_day = local_day(request.created_at)
+        await self._increment(session, request, created_day, old_status, created=-1)
+        await self._increment(session, request, created_day, request.status, created=1)
+
+        counter = TRANSITION_COUNTERS.get(request.status)
+        if counter:
+            await self._increment(session, request, local_day(None), request.status, **{counter: 1})
+
+    async def get_period_totals(
+        self,
+        session: AsyncSession,
+        tenant_id: int,
+        start_day: date,
+        end_day: date
+    ) -> dict:
+        """
+        Получить отчет за период из rollup
+
+        Args:
+            session: Сессия БД
+            tenant_id: ID тенанта
+            start_day: Первый день периода
+            end_day: Последний день периода (включительно)
+
+        Returns:
+            Словарь {'new', 'in_progress', 'completed', 'rejected', 'total'}
+        """
+        stat = RequestDailyStat
+        result = await session.execute(
+            select(
+                func.sum(case((stat.status == "new", stat.created), else_=0)).label("new"),
+                func.sum(case((stat.status == "in_progress", stat.created), else_=0)).label("in_progress"),
+                func.sum(stat.completed).label("completed"),
+                func.sum(stat.rejected).label("rejected"),
+                func.sum(stat.created).label("total"),
+            )
+            .where(stat.tenant_id == tenant_id)
+            .where(stat.day >= start_day)
+            .where(stat.day <= end_day)
+        )
+        row = result.one()._mapping
+        return {key: row[key] or 0 for key in PERIOD_TOTAL_KEYS}
+
+    async def stream_period_totals_by_tenant(
+        self,
+        session: AsyncSession,
+        start_day: date,
+        end_day: date
+    ) -> AsyncIterator[tuple[int, dict]]:
+        """
+        Отчет за период по всем тенантам одним запросом (GROUP BY tenant_id)
+
+        Возвращаются только тенанты, у которых в периоде есть строки rollup.
+
+        Args:
+            session: Сессия БД
+            start_day: Первый день периода
+            end_day: Последний день периода (включительно)
+
+        Yields:
+            (tenant_id, словарь как в get_period_totals) по возрастанию tenant_id
+        """
+        stat = RequestDailyStat
+        result = await session.stream(
+            select(
+                stat.tenant_id,
+                func.sum(case((stat.status == "new", stat.created), else_=0)).label("new"),
+                func.sum(case((stat.status == "in_progress", stat.created), else_=0)).label("in_progress"),
+                func.sum(stat.completed).label("completed"),
+                func.sum(stat.rejected).label("rejected"),
+                func.sum(stat.created).label("total"),
+            )
+            .where(stat.day >= start_day)
+            .where(stat.day <= end_day)
+            .group_by(stat.tenant_id)
+            .order_by(stat.tenant_id)
+        )
+        async for row in result:
+            mapping = row._mapping
+            yield row.tenant_id, {key: mapping[key] or 0 for key in PERIOD_TOTAL_KEYS}
+
+    async def rebuild(self, session: AsyncSession, tenant_id: Optional[int] = None) -> int:
+        """
+        Пересчитать rollup по таблице requests (без commit)
+
+        Моменты взятия в работу не хранятся, поэтому taken восстанавливается
+        только для заявок, которые сейчас в работе (по updated_at).
+
+        Args:
+            session: Сессия БД
+            tenant_id: ID тенанта (None - все тенанты)
+
+        Returns:
+            Количество записанных строк rollup
+        """
+        counters: dict[tuple, dict[str, int]] = defaultdict(
+            lambda: {"created": 0, "completed": 0, "rejected": 0, "taken": 0}
+        )
+
+        query = select(
+            Request.tenant_id, Request.status, Request.priority, Request.category,
+            Request.created_at, Request.updated_at, Request.completed_at
+        )
+        if tenant_id is not None:
+            query = query.where(Request.tenant_id == tenant_id)
+
+        result = await session.stream(query.execution_options(yield_per=REBUILD_BATCH_SIZE))
+        async for row in result:
+            dims = (row.status, row.priority, row.category)
+            counters[(row.tenant_id, local_day(row.created_at), *dims)]["created"] += 1
+            if row.status == "in_progress":
+                counters[(row.tenant_id, local_day(row.updated_at), *dims)]["taken"] += 1
+            elif row.status == "completed" and row.completed_at is not None:
+                counters[(row.tenant_id, local_day(row.completed_at), *dims)]["completed"] += 1
+            elif row.status == "rejected":
+                counters[(row.tenant_id, local_day(row.updated_at), *dims)]["rejected"] += 1
+
+        clear = delete(RequestDailyStat)
+        if tenant_id is not None:
+            clear = clear.where(RequestDailyStat.tenant_id == tenant_id)
+        await session.execute(clear)
+
+        rows = [dict(zip(STAT_KEY_COLUMNS, key), **values) for key, values in counters.items()]
+        if rows:
+            await session.execute(insert(RequestDailyStat), rows)
+
+        logger.info(f"Rollup request_daily_stats пересчитан: {len(rows)} строк")
+        return len(rows)
+
+    async def _increment(self, session: AsyncSession, request: Request, day: date, status: str, **deltas: int) -> None:
+        """Атомарно прибавить deltas к строке rollup (создав ее при необходимости)"""
+        stmt = upsert_insert(session, RequestDailyStat).values(
+            tenant_id=request.tenant_id,
+            day=day,
+            status=status,
+            priority=request.priority,
+            category=request.category,
+            **deltas
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=STAT_KEY_COLUMNS,
+            set_={
+                column: getattr(RequestDailyStat.__table__.c, column) + getattr(stmt.excluded, column)
+                for column in deltas
+            }
+        )
+        await session.execute(stmt)
+
+
+# Глобальный экземпляр сервиса
+request_stats_service = RequestStatsService()
@@ -1,9 +1,14 @@
 """Сервис для работы с ролями пользователей"""
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, exists, case, literal, null, true, false, union_all, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from bot.database.models import User, TechnicianAssignment
+from bot.database.dialect import is_postgresql, upsert_insert
+from bot.database.lazy_session import mark_written
+from bot.database.unit_of_work import after_commit
 from bot.config import get_config
+from bot.services.identity_cache import identity_cache, UserIdentity
 
 
 class RoleService:
@@ -66,8 +71,7 @@ class RoleService:
             # Создаем нового пользователя
             user = User(id=user_id, role=role)
             session.add(user)
-            await session.commit()
-            await session.refresh(user)
+            await session.flush()
         else:
             # Обновляем роль: если назначен техником - принудительно warehouseman
             # Если не назначен техником - используем стандартную логику
@@ -76,14 +80,12 @@ class RoleService:
                 if user.role != "warehouseman":
                     user.role = "warehouseman"
                     user.active_role = None  # Сбрасываем active_role, т.к. техник не может быть менеджером
-                    await session.commit()
-                    await session.refresh(user)
+                    await session.flush()
             else:
                 # Стандартная логика обновления роли
                 if user.role != role:
                     user.role = role
-                    await session.commit()
-                    await session.refresh(user)
+                    await session.flush()
         
         return user
     
@@ -147,6 +149,189 @@ class RoleService:
         # Иначе возвращаем базовую роль
         return user.role
     
+    async def load_identity(self, session: AsyncSession, user_id: int, username: Optional[str] = None) -> UserIdentity:
+        """
+        Загрузить из БД всё, что нужно middleware для обработки обновления:
+        базовую и активную роль, tenant_id и дату первого визита.
+        Пользователь создается, если его еще нет; роль перезаписывается,
+        только если вычисленная роль отличается от сохраненной.
+        
+        В PostgreSQL выполняется одним запросом (INSERT ... ON CONFLICT ... RETURNING
+        вместе с поиском назначения техника), что исключает гонку при
+        одновременных первых обновлениях от нового пользователя.
+        
+        Args:
+            session: Сессия БД
+            user_id: Telegram ID пользователя
+            username: Имя пользователя (опционально)
+            
+        Returns:
+            UserIdentity
+        """
+        if is_postgresql(session):
+            row = (await session.execute(self.build_identity_upsert(user_id, username))).one_or_none()
+            if row is None:
+                # Строку вставила параллельная транзакция, которая не видна в снимке
+                # нашего запроса - повторяем, теперь сработает ветка конфликта
+                row = (await session.execute(self.build_identity_upsert(user_id, username))).one()
+            role, active_role, first_seen_at, written, manager_id = row
+            if written:
+                # Запрос выглядит как SELECT, но изменил users - нужен commit
+                mark_written(session)
+        else:
+            role, active_role, first_seen_at, manager_id = await self._resolve_identity_fallback(
+                session, user_id, username
+            )
+        
+        return self._make_identity(user_id, role, active_role, first_seen_at, manager_id)
+    
+    def build_identity_upsert(self, user_id: int, username: Optional[str] = None):
+        """
+        Построить запрос PostgreSQL для получения/создания пользователя
+        
+        Возвращает одну строку (role, active_role, first_seen_at, written, manager_id):
+        - INSERT создает пользователя с вычисленной ролью;
+        - при конфликте UPDATE выполняется только если роль изменилась;
+        - если UPDATE не понадобился, строка берется из users (written = false);
+        - manager_id - руководитель техника (только в DEMO_MODE, иначе NULL).
+        
+        Args:
+            user_id: Telegram ID пользователя
+            username: Имя пользователя (опционально)
+            
+        Returns:
+            SQLAlchemy Select
+        """
+        default_role = self.get_role_by_id(user_id)
+        
+        if self.config.demo_mode:
+            tech = (
+                select(TechnicianAssignment.manager_id)
+                .where(TechnicianAssignment.technician_id == user_id)
+                .order_by(TechnicianAssignment.id)
+                .limit(1)
+                .cte("tech")
+            )
+            is_technician = exists(select(tech.c.manager_id))
+            derived_role = case((is_technician, literal("warehouseman")), else_=literal(default_role))
+        else:
+            tech = None
+            is_technician = None
+            derived_role = literal(default_role)
+        
+        insert_stmt = pg_insert(User).values(id=user_id, role=derived_role, username=username)
+        update_values = {"role": insert_stmt.excluded.role, "updated_at": func.now()}
+        if is_technician is not None:
+            # Техник не может быть менеджером - сбрасываем active_role
+            update_values["active_role"] = case(
+                (insert_stmt.excluded.role == "warehouseman", null()),
+                else_=User.active_role,
+            )
+        upserted = (
+            insert_stmt.on_conflict_do_update(
+                index_elements=[User.id],
+                set_=update_values,
+                where=User.role.is_distinct_from(insert_stmt.excluded.role),
+            )
+            .returning(User.role, User.active_role, User.first_seen_at)
+            .cte("upserted")
+        )
+        
+        resolved = union_all(
+            select(
+                upserted.c.role, upserted.c.active_role, upserted.c.first_seen_at,
+                true().label("written"),
+            ),
+            select(
+                User.role, User.active_role, User.first_seen_at,
+                false().label("written"),
+            ).where(
+                User.id == user_id,
+                ~exists(select(upserted.c.role)),
+            ),
+        ).subquery("resolved")
+        
+        if tech is None:
+            return select(resolved, null().label("manager_id"))
+        return select(resolved, tech.c.manager_id).select_from(
+            resolved.outerjoin(tech, true())
+        )
+    
+    async def _resolve_identity_fallback(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        username: Optional[str] = None
+    ) -> tuple:
+        """
+        Получение/создание пользователя для БД без data-modifying CTE (SQLite)
+        
+        Returns:
+            Tuple (role, active_role, first_seen_at, manager_id)
+        """
+        default_role = self.get_role_by_id(user_id)
+        
+        query = select(User.role, User.active_role, User.first_seen_at)
+        if self.config.demo_mode:
+            query = query.add_columns(TechnicianAssignment.manager_id).outerjoin(
+                TechnicianAssignment, TechnicianAssignment.technician_id == User.id
+            ).order_by(TechnicianAssignment.id)
+        else:
+            query = query.add_columns(null().label("manager_id"))
+        query = query.where(User.id == user_id).limit(1)
+        
+        row = (await session.execute(query)).first()
+        if row is None:
+            inserted = (await session.execute(
+                upsert_insert(session, User)
+                .values(id=user_id, role=default_role, username=username)
+                .on_conflict_do_nothing(index_elements=[User.id])
+                .returning(User.id)
+            )).first()
+            if inserted is not None:
+                # Новый пользователь не может быть назначен техником:
+                # назначение требует существующего пользователя
+                return default_role, None, None, None
+            row = (await session.execute(query)).one()
+        
+        role, active_role, first_seen_at, manager_id = row
+        derived_role = "warehouseman" if manager_id is not None else default_role
+        if role != derived_role:
+            values = {"role": derived_role, "updated_at": func.now()}
+            if manager_id is not None:
+                # Техник не может быть менеджером - сбрасываем active_role
+                values["active_role"] = None
+                active_role = None
+            await session.execute(update(User).where(User.id == user_id).values(**values))
+            role = derived_role
+        
+        return role, active_role, first_seen_at, manager_id
+    
+    def _make_identity(
+        self,
+        user_id: int,
+        role: str,
+        active_role: Optional[str],
+        first_seen_at,
+        manager_id: Optional[int]
+    ) -> UserIdentity:
+        """Собрать UserIdentity из данных пользователя и назначения техника"""
+        if manager_id is not None:
+            # Техник всегда работает как техник, не может быть менеджером
+            effective_role = "warehouseman"
+            tenant_id = manager_id
+        else:
+            effective_role = active_role if role == "manager" and active_role else role
+            tenant_id = user_id if self.config.demo_mode else 0
+        
+        return UserIdentity(
+            role=role,
+            active_role=effective_role,
+            tenant_id=tenant_id,
+            first_seen_at=first_seen_at,
+            manager_id=manager_id,
+        )
+    
     async def switch_role(self, session: AsyncSession, user_id: int, target_role: str) -> bool:
         """
         Переключить активную роль для менеджера.
@@ -171,8 +356,8 @@ class RoleService:
         
         # Устанавливаем active_role
         user.active_role = target_role
-        await session.commit()
-        await session.refresh(user)
+        await session.flush()
+        after_commit(session, lambda: identity_cache.invalidate(user_id))
         
         return True
     
@@ -195,8 +380,8 @@ class RoleService:
         
         # Сбрасываем active_role
         user.active_role = None
-        await session.commit()
-        await session.refresh(user)
+        await session.flush()
+        after_commit(session, lambda: identity_cache.invalidate(user_id))
         
         return True
 
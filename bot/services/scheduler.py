@@ -1,96 +1,292 @@
-"""Планировщик задач для автоматических проверок"""
+"""Планировщик задач для автоматических проверок
+
+Каждая задача описывается cron-расписанием (bot.utils.cron) в часовом
+поясе config.timezone. Для каждой задачи работает своя корутина: она
+вычисляет ближайшее время срабатывания и спит до него, поэтому задачи
+выполняются параллельно, а медленная задача не сдвигает остальные.
+Каждый запуск ограничен таймаутом задачи.
+
+Время последнего запуска хранится в scheduled_job_runs. Если после
+перезапуска оказывается, что срабатывание пропущено, задача выполняется
+сразу - один раз, сколько бы срабатываний ни было пропущено.
+
+При нескольких репликах задачи выполняет только лидер - реплика,
+удерживающая advisory-блокировку LEADER_LOCK_NAME; остальные раз в
+LEADER_CHECK_INTERVAL_SECONDS пытаются ее захватить (горячий резерв).
+Кроме того, каждый запуск выполняется под блокировкой задачи и заново
+проверяет scheduled_job_runs: если при смене лидера задачу уже выполнила
+другая реплика, запуск пропускается.
+"""
 import asyncio
+import functools
 import logging
-from datetime import datetime
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from aiogram import Bot
+from sqlalchemy import select
+
+from bot.config import get_config
+from bot.database.advisory_lock import AdvisoryLock, AdvisoryLockError, try_advisory_lock
+from bot.database.dialect import upsert_insert
+from bot.database.engine import async_session_maker, engine
+from bot.database.models import ScheduledJobRun
 from bot.services.automation_service import AutomationService
 from bot.services.notification_service import NotificationService
-from bot.config import get_config
-from aiogram import Bot
+from bot.utils.cron import CronSpec, get_scheduler_timezone
 
 logger = logging.getLogger(__name__)
 
+# Таймаут задачи по умолчанию (секунды)
+DEFAULT_JOB_TIMEOUT_SECONDS = 300
+
+# Максимальный интервал сна (секунды): время срабатывания пересчитывается,
+# даже если системные часы перевели
+MAX_SLEEP_SECONDS = 300
+
+# Блокировка лидера планировщика и префикс блокировок задач
+LEADER_LOCK_NAME = "scheduler:leader"
+JOB_LOCK_PREFIX = "scheduler:job:"
+
+# Как часто резервная реплика пытается стать лидером, а лидер - проверяет блокировку (секунды)
+LEADER_CHECK_INTERVAL_SECONDS = 30
+
+# Через сколько повторить запуск, если блокировку задачи не удалось проверить (секунды)
+LOCK_RETRY_SECONDS = 15
+
+# Статусы запуска
+RUN_STATUS_OK = "ok"
+RUN_STATUS_FAILED = "failed"
+RUN_STATUS_TIMEOUT = "timeout"
+
+
+@dataclass(frozen=True)
+class ScheduledJob:
+    """Задача планировщика"""
+
+    name: str
+    schedule: CronSpec
+    run: Callable[[], Awaitable[None]]
+    timeout: float = DEFAULT_JOB_TIMEOUT_SECONDS
+
 
 class TaskScheduler:
     """Планировщик задач для автоматических проверок"""
-    
-    def __init__(self, bot: Bot):
+
+    def __init__(self, bot: Bot, jobs: Optional[list[ScheduledJob]] = None):
         self.bot = bot
         self.notification_service = NotificationService(bot)
         self.automation_service = AutomationService(self.notification_service)
         self.config = get_config()
+        self.tz = get_scheduler_timezone(self.config.timezone)
+        self.jobs = jobs if jobs is not None else self.default_jobs()
         self.running = False
-        self._task = None
-        # Флаги для предотвращения повторных запусков
-        self._warehouse_check_done = False
-        self._daily_report_done = False
-        self._old_requests_check_done = False
-        self._last_hour = None
-    
+        self._leader_lock = AdvisoryLock(LEADER_LOCK_NAME, engine)
+        self._leader_task: Optional[asyncio.Task] = None
+        self._tasks: list[asyncio.Task] = []
+
+    def default_jobs(self) -> list[ScheduledJob]:
+        """Расписание автоматических проверок"""
+        automation = self.automation_service
+        return [
+            # Снимки остатков склада на начало месяца
+            ScheduledJob(
+                "stock_snapshots", CronSpec.parse("5 0 1 * *"),
+                functools.partial(automation.create_stock_snapshots, self.tz), timeout=600
+            ),
+            # Проверка минимума на складе
+            ScheduledJob("warehouse_minimum", CronSpec.parse("30 8 * * *"), automation.check_warehouse_minimum),
+            # Ежедневный отчет руководителю
+            ScheduledJob(
+                "daily_report", CronSpec.parse("0 9 * * *"),
+                functools.partial(automation.send_daily_report_to_manager, self.tz)
+            ),
+            # Проверка заявок в работе >7 дней
+            ScheduledJob("old_in_progress_requests", CronSpec.parse("0 10 * * *"), automation.check_old_in_progress_requests),
+        ]
+
+    @property
+    def is_leader(self) -> bool:
+        """Выполняет ли эта реплика задачи"""
+        return bool(self._tasks)
+
     async def start(self):
-        """Запустить планировщик"""
+        """Запустить планировщик (задачи запустятся, когда реплика станет лидером)"""
         if self.running:
             logger.warning("Планировщик уже запущен")
             return
-        
+
         self.running = True
-        self._task = asyncio.create_task(self._scheduler_loop())
-        logger.info("Планировщик задач запущен")
-    
+        self._leader_task = asyncio.create_task(self._leadership_loop(), name="scheduler-leader")
+        logger.info(f"Планировщик задач запущен: {len(self.jobs)} задач, часовой пояс {self.tz.zone}")
+
     async def stop(self):
         """Остановить планировщик"""
         self.running = False
-        if self._task:
-            self._task.cancel()
-            try:
-                await self._task
-            except asyncio.CancelledError:
-                pass
+        if self._leader_task is not None:
+            self._leader_task.cancel()
+            await asyncio.gather(self._leader_task, return_exceptions=True)
+            self._leader_task = None
+        await self._stop_jobs()
+        await self._leader_lock.release()
         logger.info("Планировщик задач остановлен")
-    
-    async def _scheduler_loop(self):
-        """Основной цикл планировщика"""
+
+    def next_run_time(self, job: ScheduledJob, since: datetime) -> datetime:
+        """
+        Время следующего запуска задачи
+
+        Args:
+            job: Задача
+            since: Время последнего запуска (или запуска планировщика, если задача не запускалась)
+
+        Returns:
+            Время запуска (в прошлом - срабатывание пропущено, запускать сразу)
+        """
+        return job.schedule.next_after(since, self.tz)
+
+    async def run_job(self, job: ScheduledJob) -> datetime:
+        """
+        Выполнить задачу с таймаутом и сохранить результат запуска
+
+        Args:
+            job: Задача
+
+        Returns:
+            Время начала запуска
+        """
+        started_at = self._now()
+        started = time.monotonic()
+        status, error = RUN_STATUS_OK, None
+
+        logger.info(f"Запуск задачи {job.name}")
+        try:
+            await asyncio.wait_for(job.run(), timeout=job.timeout)
+        except asyncio.TimeoutError:
+            status, error = RUN_STATUS_TIMEOUT, f"Превышен таймаут {job.timeout} с"
+            logger.error(f"Задача {job.name}: превышен таймаут {job.timeout} с")
+        except Exception as e:
+            status, error = RUN_STATUS_FAILED, str(e) or type(e).__name__
+            logger.error(f"Ошибка задачи {job.name}: {e}")
+
+        duration_ms = int((time.monotonic() - started) * 1000)
+        await self._record_run(job.name, started_at, status, duration_ms, error)
+        return started_at
+
+    async def _leadership_loop(self) -> None:
+        while self.running:
+            if not self.is_leader:
+                try:
+                    acquired = await self._leader_lock.try_acquire()
+                except AdvisoryLockError as e:
+                    logger.warning(f"Не удалось проверить блокировку лидера планировщика: {e}")
+                    acquired = False
+                if acquired:
+                    logger.info("Реплика стала лидером планировщика")
+                    await self._start_jobs()
+            elif not await self._leader_lock.check():
+                logger.warning("Блокировка лидера планировщика потеряна, задачи остановлены")
+                await self._stop_jobs()
+                continue
+
+            await asyncio.sleep(LEADER_CHECK_INTERVAL_SECONDS)
+
+    async def _start_jobs(self) -> None:
+        # История запусков читается при получении лидерства: пропущенное
+        # прежним лидером будет выполнено
+        last_runs = await self._load_last_runs()
+        self._tasks = [
+            asyncio.create_task(self._job_loop(job, last_runs.get(job.name)), name=f"scheduler-{job.name}")
+            for job in self.jobs
+        ]
+
+    async def _stop_jobs(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_exclusive(self, job: ScheduledJob) -> Optional[datetime]:
+        """
+        Выполнить задачу, если ее не выполняет и уже не выполнила другая реплика
+
+        Returns:
+            Время последнего запуска (этого или другой реплики) или None,
+            если блокировку задачи не удалось проверить (ошибка БД) - запуск
+            нужно повторить
+        """
+        try:
+            async with try_advisory_lock(JOB_LOCK_PREFIX + job.name, engine) as acquired:
+                if not acquired:
+                    logger.info(f"Задача {job.name} выполняется другой репликой, пропуск")
+                    return self._now()
+
+                last_run_at = (await self._load_last_runs(job.name)).get(job.name)
+                if last_run_at is not None and self.next_run_time(job, last_run_at) > self._now():
+                    logger.info(f"Задача {job.name} уже выполнена другой репликой, пропуск")
+                    return last_run_at
+
+                return await self.run_job(job)
+        except AdvisoryLockError as e:
+            logger.warning(f"Задача {job.name}: {e}, повтор через {LOCK_RETRY_SECONDS} с")
+            return None
+
+    async def _job_loop(self, job: ScheduledJob, last_run_at: Optional[datetime]) -> None:
+        since = last_run_at or self._now()
         while self.running:
             try:
-                now = datetime.now()
-                current_hour = now.hour
-                current_minute = now.minute
-                
-                # Сброс флагов в начале нового дня
-                if current_hour == 0 and current_minute == 0:
-                    self._warehouse_check_done = False
-                    self._daily_report_done = False
-                    self._old_requests_check_done = False
-                
-                # Проверка минимума на складе (8:30)
-                if current_hour == 8 and current_minute == 30 and not self._warehouse_check_done:
-                    logger.info("Запуск проверки минимальных остатков на складе")
-                    await self.automation_service.check_warehouse_minimum()
-                    self._warehouse_check_done = True
-                
-                # Ежедневный отчет руководителю (9:00)
-                if current_hour == 9 and current_minute == 0 and not self._daily_report_done:
-                    logger.info("Отправка ежедневного отчета руководителю")
-                    await self.automation_service.send_daily_report_to_manager()
-                    self._daily_report_done = True
-                
-                # Проверка срочных заявок (каждый час в :00)
-                if current_minute == 0 and self._last_hour != current_hour:
-                    logger.info("Проверка срочных заявок")
-                    await self.automation_service.check_urgent_requests()
-                    self._last_hour = current_hour
-                
-                # Проверка заявок в работе >7 дней (каждый день в 10:00)
-                if current_hour == 10 and current_minute == 0 and not self._old_requests_check_done:
-                    logger.info("Проверка заявок в работе >7 дней")
-                    await self.automation_service.check_old_in_progress_requests()
-                    self._old_requests_check_done = True
-                
-                # Проверяем каждую минуту
-                await asyncio.sleep(60)
-                
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"Ошибка в планировщике задач: {e}")
-                await asyncio.sleep(60)  # Ждем минуту перед следующей попыткой
+                due = self.next_run_time(job, since)
+            except ValueError as e:
+                logger.error(f"Задача {job.name} отключена: {e}")
+                return
+
+            delay = (due - self._now()).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(min(delay, MAX_SLEEP_SECONDS))
+                continue
+
+            last_run_at = await self._run_exclusive(job)
+            if last_run_at is None:
+                # Срабатывание не выполнено и не пропущено - since не сдвигаем
+                await asyncio.sleep(LOCK_RETRY_SECONDS)
+                continue
+            since = last_run_at
+
+    async def _load_last_runs(self, job_name: Optional[str] = None) -> dict[str, datetime]:
+        """Время последнего запуска задач (или одной задачи) из scheduled_job_runs"""
+        query = select(ScheduledJobRun.job_name, ScheduledJobRun.last_run_at)
+        if job_name is not None:
+            query = query.where(ScheduledJobRun.job_name == job_name)
+        try:
+            async with async_session_maker() as session:
+                result = await session.execute(query)
+                return {name: self._as_aware(last_run_at) for name, last_run_at in result}
+        except Exception as e:
+            logger.error(f"Не удалось загрузить историю запусков задач, пропущенные запуски не будут выполнены: {e}")
+            return {}
+
+    async def _record_run(self, job_name: str, started_at: datetime, status: str, duration_ms: int, error: Optional[str]) -> None:
+        values = {
+            "last_run_at": started_at,
+            "last_status": status,
+            "last_duration_ms": duration_ms,
+            "last_error": error[:1000] if error else None,
+        }
+        try:
+            async with async_session_maker() as session:
+                stmt = upsert_insert(session, ScheduledJobRun).values(job_name=job_name, **values)
+                stmt = stmt.on_conflict_do_update(index_elements=["job_name"], set_=values)
+                await session.execute(stmt)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Не удалось сохранить запуск задачи {job_name}: {e}")
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
 
+    @staticmethod
+    def _as_aware(value: datetime) -> datetime:
+        # SQLite возвращает naive datetime (UTC)
+        return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
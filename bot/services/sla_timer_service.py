@@ -0,0 +1,291 @@
+"""SLA-таймеры срочных заявок
+
+Срочная заявка должна быть взята в работу за URGENT_SLA. При создании
+заявки в той же транзакции в sla_timers пишется строка со сроком, а после
+commit срок добавляется в min-heap запущенного SlaTimerRunner. Runner спит
+ровно до ближайшего срока (или до сигнала о новом таймере), поэтому
+эскалация приходит в момент истечения SLA, а не при очередном опросе.
+
+Таймер снимается в транзакции, переводящей заявку из статуса "Новая"
+(взята в работу, выполнена, отклонена). Срабатывание удаляет строку
+условным DELETE ... RETURNING и в той же транзакции добавляет уведомление
+руководителю в outbox: эскалация происходит один раз, даже если несколько
+реплик держат один и тот же таймер в памяти.
+
+Heap восстанавливается из таблицы при запуске и раз в RESYNC_INTERVAL_SECONDS
+(таймеры, созданные другими репликами).
+"""
+import asyncio
+import contextlib
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.engine import async_session_maker
+from bot.database.models import Request, SlaTimer
+from bot.database.unit_of_work import after_commit
+from bot.services.notification_outbox import notification_outbox
+
+logger = logging.getLogger(__name__)
+
+# Срок реакции на срочную заявку
+URGENT_SLA = timedelta(hours=2)
+
+# Как часто перечитывать таблицу таймеров (секунды)
+RESYNC_INTERVAL_SECONDS = 300
+
+# Через сколько повторить срабатывание после ошибки БД (секунды)
+FIRE_RETRY_SECONDS = 30
+
+
+class SlaTimerService:
+    """Запись и срабатывание SLA-таймеров в транзакции вызывающего кода"""
+
+    async def schedule(self, session: AsyncSession, request: Request) -> Optional[datetime]:
+        """
+        Поставить таймер срочной заявке (без commit - его делает вызывающий код)
+
+        Args:
+            session: Сессия БД (транзакция создания заявки)
+            request: Новая заявка (с ID)
+
+        Returns:
+            Срок реакции или None, если заявка не срочная
+        """
+        if request.priority != "urgent":
+            return None
+
+        due_at = datetime.now(timezone.utc) + URGENT_SLA
+        session.add(SlaTimer(request_id=request.id, tenant_id=request.tenant_id, due_at=due_at))
+        request_id = request.id
+        after_commit(session, lambda: _runner_push(request_id, due_at))
+        return due_at
+
+    async def cancel(self, session: AsyncSession, request: Request, old_status: str) -> None:
+        """
+        Снять таймер заявки, вышедшей из статуса "Новая" (без commit)
+
+        Args:
+            session: Сессия БД (транзакция смены статуса)
+            request: Заявка (уже с новым статусом)
+            old_status: Статус до перехода
+        """
+        if request.priority != "urgent" or old_status != "new" or request.status == "new":
+            return
+
+        await session.execute(delete(SlaTimer).where(SlaTimer.request_id == request.id))
+        request_id = request.id
+        after_commit(session, lambda: _runner_discard(request_id))
+
+    async def get_pending(self, session: AsyncSession) -> list[tuple[int, datetime]]:
+        """
+        Все несработавшие таймеры
+
+        Args:
+            session: Сессия БД
+
+        Returns:
+            Список (request_id, срок)
+        """
+        result = await session.execute(select(SlaTimer.request_id, SlaTimer.due_at))
+        return [(request_id, _as_aware(due_at)) for request_id, due_at in result]
+
+    async def fire(self, session: AsyncSession, request_id: int) -> bool:
+        """
+        Сработать таймер: удалить строку и поставить эскалацию в outbox (без commit)
+
+        Args:
+            session: Сессия БД
+            request_id: ID заявки
+
+        Returns:
+            True если эскалация поставлена (таймер существовал и истек)
+        """
+        result = await session.execute(
+            delete(SlaTimer)
+            .where(SlaTimer.request_id == request_id)
+            .where(SlaTimer.due_at <= datetime.now(timezone.utc))
+            .returning(SlaTimer.tenant_id)
+        )
+        tenant_id = result.scalar_one_or_none()
+        if tenant_id is None:
+            return False
+
+        await notification_outbox.enqueue_urgent_request_overdue(session, request_id, tenant_id)
+        return True
+
+
+class SlaTimerRunner:
+    """Фоновое срабатывание SLA-таймеров по min-heap сроков"""
+
+    def __init__(self):
+        self._heap: list[tuple[datetime, int]] = []
+        # Актуальный срок по заявке; записи heap с другим сроком устарели (ленивое удаление)
+        self._due: dict[int, datetime] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_resync = 0.0
+        self.escalated = 0
+        self.failed = 0
+
+    async def start(self) -> None:
+        """Восстановить таймеры из таблицы и запустить срабатывание"""
+        if self._task is None:
+            await self.reload()
+            self._task = asyncio.create_task(self._run(), name="sla-timers")
+            logger.info(f"SLA-таймеры запущены: {len(self._due)} активных")
+
+    async def stop(self) -> None:
+        """Остановить срабатывание (таймеры остаются в таблице)"""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict:
+        """Метрики таймеров"""
+        return {
+            "running": self._task is not None,
+            "pending": len(self._due),
+            "escalated": self.escalated,
+            "failed": self.failed,
+        }
+
+    def push(self, request_id: int, due_at: datetime) -> None:
+        """
+        Добавить (или перенести) таймер заявки
+
+        Args:
+            request_id: ID заявки
+            due_at: Срок (aware)
+        """
+        self._due[request_id] = due_at
+        heapq.heappush(self._heap, (due_at, request_id))
+        if self._heap[0] == (due_at, request_id):
+            # Новый ближайший срок - пересчитать время сна
+            self._wakeup.set()
+
+    def discard(self, request_id: int) -> None:
+        """Убрать таймер заявки (запись в heap удалится при извлечении)"""
+        self._due.pop(request_id, None)
+
+    async def reload(self) -> None:
+        """Перестроить heap по таблице sla_timers"""
+        try:
+            async with async_session_maker() as session:
+                pending = await sla_timer_service.get_pending(session)
+        except Exception as e:
+            logger.error(f"Не удалось загрузить SLA-таймеры: {e}")
+            return
+
+        self._due = dict(pending)
+        self._heap = [(due_at, request_id) for request_id, due_at in pending]
+        heapq.heapify(self._heap)
+        self._last_resync = time.monotonic()
+
+    async def run_due(self) -> int:
+        """
+        Сработать все истекшие таймеры
+
+        Returns:
+            Количество поставленных эскалаций
+        """
+        escalated = 0
+        now = datetime.now(timezone.utc)
+        while self._heap and self._heap[0][0] <= now:
+            due_at, request_id = heapq.heappop(self._heap)
+            if self._due.get(request_id) != due_at:
+                continue  # Таймер снят или перенесен
+            del self._due[request_id]
+
+            try:
+                async with async_session_maker() as session:
+                    fired = await sla_timer_service.fire(session, request_id)
+                    await session.commit()
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Ошибка срабатывания SLA-таймера заявки {request_id}: {e}")
+                self.push(request_id, now + timedelta(seconds=FIRE_RETRY_SECONDS))
+                continue
+
+            if fired:
+                escalated += 1
+                self.escalated += 1
+                logger.info(f"SLA срочной заявки {request_id} истек, руководитель уведомлен")
+        return escalated
+
+    def _seconds_until_next(self) -> float:
+        timeout = RESYNC_INTERVAL_SECONDS - (time.monotonic() - self._last_resync)
+        if self._heap:
+            until_due = (self._heap[0][0] - datetime.now(timezone.utc)).total_seconds()
+            timeout = min(timeout, until_due)
+        return max(timeout, 0)
+
+    async def _run(self) -> None:
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._seconds_until_next())
+            self._wakeup.clear()
+
+            if time.monotonic() - self._last_resync >= RESYNC_INTERVAL_SECONDS:
+                await self.reload()
+                self._last_resync = time.monotonic()
+            try:
+                await self.run_due()
+            except Exception as e:
+                logger.error(f"Ошибка SLA-таймеров: {e}")
+
+
+def _as_aware(value: datetime) -> datetime:
+    # SQLite возвращает naive datetime (UTC)
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+# Глобальный экземпляр сервиса
+sla_timer_service = SlaTimerService()
+
+# Runner, запущенный в этом процессе
+_runner: Optional[SlaTimerRunner] = None
+
+
+def _runner_push(request_id: int, due_at: datetime) -> None:
+    if _runner is not None:
+        _runner.push(request_id, due_at)
+
+
+def _runner_discard(request_id: int) -> None:
+    if _runner is not None:
+        _runner.discard(request_id)
+
+
+def get_sla_timer_runner() -> Optional[SlaTimerRunner]:
+    """Получить запущенный runner (None, если бот не запущен)"""
+    return _runner
+
+
+async def start_sla_timer_runner() -> SlaTimerRunner:
+    """
+    Создать и запустить runner SLA-таймеров
+
+    Returns:
+        SlaTimerRunner
+    """
+    global _runner
+    runner = SlaTimerRunner()
+    await runner.start()
+    _runner = runner
+    return runner
+
+
+async def stop_sla_timer_runner() -> None:
+    """Остановить runner SLA-таймеров"""
+    global _runner
+    runner, _runner = _runner, None
+    if runner is not None:
+        await runner.stop()
@@ -3,8 +3,12 @@ from typing import Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 from bot.database.models import TechnicianAssignment, User
+from bot.database.unit_of_work import after_commit
 from aiogram import Bot
+from bot.config import get_config
 from bot.services.role_service import role_service
+from bot.services.identity_cache import identity_cache
+from bot.services.user_profile_service import user_profile_service
 
 
 class TechnicianService:
@@ -72,12 +76,11 @@ class TechnicianService:
             tech_user.active_role = None  # Сбрасываем active_role, т.к. техник не может быть менеджером
             await session.flush()
         
+        # Роль и tenant_id техника изменились - сбрасываем кэш middleware после commit
+        after_commit(session, lambda: identity_cache.invalidate(technician_id))
+        
         # Получаем имя техника для сообщения
-        try:
-            chat = await bot.get_chat(technician_id)
-            tech_name = chat.first_name or chat.username or f"ID: {technician_id}"
-        except:
-            tech_name = f"ID: {technician_id}"
+        tech_name = (await user_profile_service.get_profile(session, bot, technician_id)).short_name
         
         return True, f"Техник {tech_name} успешно назначен. Он теперь работает с вашими заявками и складом."
     
@@ -114,14 +117,11 @@ class TechnicianService:
             return False, "Назначение не найдено"
         
         # Получаем имя техника для сообщения
-        try:
-            chat = await bot.get_chat(technician_id)
-            tech_name = chat.first_name or chat.username or f"ID: {technician_id}"
-        except:
-            tech_name = f"ID: {technician_id}"
+        tech_name = (await user_profile_service.get_profile(session, bot, technician_id)).short_name
         
         await session.delete(assignment)
         await session.flush()
+        after_commit(session, lambda: identity_cache.invalidate(technician_id))
         
         return True, f"Техник {tech_name} удален из списка"
     
@@ -149,17 +149,71 @@ class TechnicianService:
         )
         assignments = list(result.scalars().all())
         
-        technicians = []
-        for assignment in assignments:
-            try:
-                chat = await bot.get_chat(assignment.technician_id)
-                name = chat.first_name or chat.username or f"ID: {assignment.technician_id}"
-            except:
-                name = f"ID: {assignment.technician_id}"
-            technicians.append((assignment.technician_id, name))
+        profiles = await user_profile_service.get_profiles(
+            session, bot, [assignment.technician_id for assignment in assignments]
+        )
+        
+        return [
+            (assignment.technician_id, profiles[assignment.technician_id].short_name)
+            for assignment in assignments
+        ]
+    
+    async def get_technician_ids_by_manager(
+        self,
+        session: AsyncSession,
+        manager_ids: List[int]
+    ) -> dict[int, List[int]]:
+        """
+        Получить техников нескольких руководителей одним запросом
+        
+        Args:
+            session: Сессия БД
+            manager_ids: ID руководителей (tenant_id)
+            
+        Returns:
+            Словарь manager_id -> список ID техников (руководители без техников отсутствуют)
+        """
+        if not manager_ids:
+            return {}
         
+        result = await session.execute(
+            select(TechnicianAssignment.manager_id, TechnicianAssignment.technician_id)
+            .where(TechnicianAssignment.manager_id.in_(manager_ids))
+            .order_by(TechnicianAssignment.manager_id, TechnicianAssignment.technician_id)
+        )
+        technicians: dict[int, List[int]] = {}
+        for manager_id, technician_id in result:
+            technicians.setdefault(manager_id, []).append(technician_id)
         return technicians
     
+    async def get_warehouse_recipients(
+        self,
+        session: AsyncSession,
+        tenant_ids: List[int]
+    ) -> dict[int, List[int]]:
+        """
+        Кому отправлять складские уведомления тенантов (не больше одного запроса)
+        
+        Тенант 0 - техник из конфигурации; тенант руководителя - назначенные
+        ему техники, а если их нет - сам руководитель (в demo-режиме он
+        работает со складом сам).
+        
+        Args:
+            session: Сессия БД
+            tenant_ids: ID тенантов
+            
+        Returns:
+            Словарь tenant_id -> список Telegram ID получателей
+        """
+        technicians = await self.get_technician_ids_by_manager(
+            session, [tenant_id for tenant_id in tenant_ids if tenant_id != 0]
+        )
+        warehouseman_id = get_config().warehouseman_id
+        return {
+            tenant_id: [warehouseman_id] if tenant_id == 0 else technicians.get(tenant_id, [tenant_id])
+            for tenant_id in tenant_ids
+        }
+    
     async def is_technician_assigned(
         self,
         session: AsyncSession,
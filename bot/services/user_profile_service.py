@@ -0,0 +1,295 @@
+"""Сервис профилей пользователей (имя, фамилия, username)
+
+Профили хранятся в users.first_name / last_name / username и обновляются
+пассивно из event_from_user при каждом обновлении (RoleMiddleware).
+Перед БД стоит LRU-кэш в памяти; Bot.get_chat вызывается только для
+неизвестных или устаревших профилей и параллельно (с ограничением).
+Профиль устаревает через PROFILE_STALE_AFTER после последнего
+подтверждения через get_chat (users.profile_refreshed_at; для
+пользователей, еще не подтвержденных так, - после создания строки).
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from aiogram import Bot
+from aiogram.types import User as TelegramUser
+from sqlalchemy import select, update, or_, func, DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.engine import async_session_maker
+from bot.database.models import User
+
+logger = logging.getLogger(__name__)
+
+# Максимальное число профилей в кэше
+PROFILE_CACHE_MAX_SIZE = 10_000
+
+# Сколько профиль живет в кэше до повторного чтения из БД (секунды)
+PROFILE_CACHE_TTL_SECONDS = 3600
+
+# Профиль, не подтвержденный через get_chat дольше этого срока, обновляется
+PROFILE_STALE_AFTER = timedelta(days=30)
+
+# Максимум одновременных запросов get_chat
+GET_CHAT_CONCURRENCY = 5
+
+
+@dataclass(frozen=True)
+class UserProfile:
+    """Профиль пользователя Telegram"""
+
+    user_id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    username: Optional[str] = None
+
+    @property
+    def is_known(self) -> bool:
+        """Есть ли хоть какие-то данные о пользователе"""
+        return bool(self.first_name or self.last_name or self.username)
+
+    @property
+    def full_name(self) -> str:
+        """Полное имя (first_name + last_name) или ID"""
+        parts = [part for part in (self.first_name, self.last_name) if part]
+        return " ".join(parts) if parts else f"ID: {self.user_id}"
+
+    @property
+    def display_username(self) -> str:
+        """@username или ID"""
+        return f"@{self.username}" if self.username else f"ID: {self.user_id}"
+
+    @property
+    def short_name(self) -> str:
+        """Короткое имя для сообщений: first_name, username или ID"""
+        return self.first_name or self.username or f"ID: {self.user_id}"
+
+
+class UserProfileService:
+    """Сервис получения профилей пользователей с кэшированием"""
+
+    def __init__(self):
+        self._cache: OrderedDict[int, tuple[float, UserProfile]] = OrderedDict()
+        self._get_chat_semaphore = asyncio.Semaphore(GET_CHAT_CONCURRENCY)
+
+    async def remember(self, session: AsyncSession, telegram_user: TelegramUser) -> None:
+        """
+        Пассивно обновить профиль по данным из обновления Telegram.
+        В БД пишет только если данные изменились.
+
+        Args:
+            session: Сессия БД
+            telegram_user: Пользователь из event_from_user
+        """
+        profile = UserProfile(
+            user_id=telegram_user.id,
+            first_name=telegram_user.first_name,
+            last_name=telegram_user.last_name,
+            username=telegram_user.username,
+        )
+        if self._cache_get(profile.user_id) == profile:
+            return
+
+        await self._save(session, profile)
+        self._cache_put(profile)
+
+    async def get_profiles(
+        self,
+        session: Optional[AsyncSession],
+        bot: Bot,
+        user_ids: Iterable[int]
+    ) -> dict[int, UserProfile]:
+        """
+        Получить профили пользователей: кэш -> БД -> get_chat
+
+        Args:
+            session: Сессия БД (если None - открывается своя)
+            bot: Экземпляр бота (для get_chat)
+            user_ids: ID пользователей
+
+        Returns:
+            Словарь {user_id: UserProfile}
+        """
+        profiles: dict[int, UserProfile] = {}
+        missing = []
+        for user_id in set(user_ids):
+            cached = self._cache_get(user_id)
+            if cached is not None:
+                profiles[user_id] = cached
+            else:
+                missing.append(user_id)
+
+        if not missing:
+            return profiles
+
+        try:
+            if session is None:
+                async with async_session_maker() as own_session:
+                    stored = await self._load(own_session, missing)
+            else:
+                stored = await self._load(session, missing)
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить профили из БД: {e}")
+            stored = {}
+
+        stale_before = datetime.now(timezone.utc) - PROFILE_STALE_AFTER
+        to_fetch = []
+        for user_id in missing:
+            profile, refreshed_at = stored.get(user_id, (None, None))
+            if profile is not None and profile.is_known and (refreshed_at is None or refreshed_at >= stale_before):
+                profiles[user_id] = profile
+                self._cache_put(profile)
+            else:
+                to_fetch.append(user_id)
+
+        if to_fetch:
+            fetched = await asyncio.gather(*(self._fetch(bot, user_id) for user_id in to_fetch))
+            refreshed = []
+            for user_id, profile in zip(to_fetch, fetched):
+                if profile is None:
+                    # Telegram не ответил - используем то, что есть в БД
+                    profile = stored.get(user_id, (None, None))[0] or UserProfile(user_id=user_id)
+                elif user_id in stored:
+                    refreshed.append(profile)
+                profiles[user_id] = profile
+                self._cache_put(profile)
+
+            if refreshed:
+                try:
+                    if session is None:
+                        async with async_session_maker() as own_session:
+                            await self._save_refreshed(own_session, refreshed)
+                            await own_session.commit()
+                    else:
+                        await self._save_refreshed(session, refreshed)
+                except Exception as e:
+                    logger.warning(f"Не удалось сохранить обновленные профили: {e}")
+
+        return profiles
+
+    async def get_profile(self, session: Optional[AsyncSession], bot: Bot, user_id: int) -> UserProfile:
+        """
+        Получить профиль одного пользователя
+
+        Args:
+            session: Сессия БД (если None - открывается своя)
+            bot: Экземпляр бота
+            user_id: ID пользователя
+
+        Returns:
+            UserProfile
+        """
+        profiles = await self.get_profiles(session, bot, [user_id])
+        return profiles[user_id]
+
+    async def get_info_map(
+        self,
+        session: Optional[AsyncSession],
+        bot: Bot,
+        user_ids: Iterable[int]
+    ) -> dict[int, tuple[str, str, Optional[str]]]:
+        """
+        Получить информацию о пользователях в формате format_request_list
+
+        Args:
+            session: Сессия БД
+            bot: Экземпляр бота
+            user_ids: ID пользователей
+
+        Returns:
+            Словарь {user_id: (full_name, username, phone)}; телефон ботам недоступен, всегда None
+        """
+        profiles = await self.get_profiles(session, bot, user_ids)
+        return {
+            user_id: (profile.full_name, profile.display_username, None)
+            for user_id, profile in profiles.items()
+        }
+
+    def invalidate(self, user_id: int) -> None:
+        """Удалить профиль из кэша"""
+        self._cache.pop(user_id, None)
+
+    async def _load(self, session: AsyncSession, user_ids: list[int]) -> dict[int, tuple[UserProfile, Optional[datetime]]]:
+        """Загрузить профили и время их подтверждения из users одним запросом"""
+        refreshed_at = func.coalesce(User.profile_refreshed_at, User.created_at, type_=DateTime(timezone=True))
+        result = await session.execute(
+            select(User.id, User.first_name, User.last_name, User.username, refreshed_at)
+            .where(User.id.in_(user_ids))
+        )
+        stored = {}
+        for user_id, first_name, last_name, username, refreshed_at in result.all():
+            if refreshed_at is not None and refreshed_at.tzinfo is None:
+                # SQLite хранит CURRENT_TIMESTAMP в UTC без зоны
+                refreshed_at = refreshed_at.replace(tzinfo=timezone.utc)
+            stored[user_id] = (UserProfile(user_id, first_name, last_name, username), refreshed_at)
+        return stored
+
+    async def _save_refreshed(self, session: AsyncSession, profiles: list[UserProfile]) -> None:
+        """Записать профили, подтвержденные через get_chat, и отметить время подтверждения"""
+        for profile in profiles:
+            await self._save(session, profile)
+        await session.execute(
+            update(User)
+            .where(User.id.in_([profile.user_id for profile in profiles]))
+            .values(profile_refreshed_at=datetime.now(timezone.utc))
+        )
+
+    async def _save(self, session: AsyncSession, profile: UserProfile) -> None:
+        """Записать профиль в users, если он отличается от сохраненного"""
+        await session.execute(
+            update(User)
+            .where(
+                User.id == profile.user_id,
+                or_(
+                    User.first_name.is_distinct_from(profile.first_name),
+                    User.last_name.is_distinct_from(profile.last_name),
+                    User.username.is_distinct_from(profile.username),
+                ),
+            )
+            .values(
+                first_name=profile.first_name,
+                last_name=profile.last_name,
+                username=profile.username,
+            )
+        )
+
+    async def _fetch(self, bot: Bot, user_id: int) -> Optional[UserProfile]:
+        """Получить профиль через Telegram API (не более GET_CHAT_CONCURRENCY одновременно)"""
+        async with self._get_chat_semaphore:
+            try:
+                chat = await bot.get_chat(user_id)
+            except Exception as e:
+                logger.warning(f"Не удалось получить информацию о пользователе {user_id}: {e}")
+                return None
+        return UserProfile(
+            user_id=user_id,
+            first_name=chat.first_name,
+            last_name=chat.last_name,
+            username=chat.username,
+        )
+
+    def _cache_get(self, user_id: int) -> Optional[UserProfile]:
+        entry = self._cache.get(user_id)
+        if entry is None:
+            return None
+        expires_at, profile = entry
+        if expires_at <= time.monotonic():
+            del self._cache[user_id]
+            return None
+        self._cache.move_to_end(user_id)
+        return profile
+
+    def _cache_put(self, profile: UserProfile) -> None:
+        self._cache[profile.user_id] = (time.monotonic() + PROFILE_CACHE_TTL_SECONDS, profile)
+        self._cache.move_to_end(profile.user_id)
+        while len(self._cache) > PROFILE_CACHE_MAX_SIZE:
+            self._cache.popitem(last=False)
+
+
+# Глобальный экземпляр сервиса
+user_profile_service = UserProfileService()
@@ -0,0 +1,218 @@
+"""Журнал движений по складу и месячные снимки остатков
+
+Каждое изменение остатка (WarehouseService) пишет строку в
+warehouse_movements в той же транзакции. Раз в месяц для каждой позиции
+сохраняется снимок (остаток и накопленный расход на начало месяца),
+поэтому «остаток на дату» и «расход за период» читают один снимок и
+движения после него - не больше месяца журнала на каждую границу,
+независимо от его общего объема.
+"""
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, func, case, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.dialect import upsert_insert
+from bot.database.models import WarehouseItem, WarehouseMovement, WarehouseBalanceSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Причины движений
+REASON_OPENING = "opening"    # Начальный остаток (перенос при внедрении журнала)
+REASON_RECEIPT = "receipt"    # Приход
+REASON_WRITEOFF = "writeoff"  # Ручное списание
+REASON_REQUEST = "request"    # Списание при выполнении заявки
+
+# Какие движения считаются расходом
+CONSUMPTION_REASONS = (REASON_WRITEOFF, REASON_REQUEST)
+
+
+def month_start(value: datetime) -> datetime:
+    """Начало месяца (00:00 первого числа) для момента времени"""
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+class WarehouseLedgerService:
+    """Сервис журнала движений по складу"""
+
+    async def record(
+        self,
+        session: AsyncSession,
+        item: WarehouseItem,
+        delta: int,
+        reason: str,
+        request_id: Optional[int] = None,
+        actor_id: Optional[int] = None
+    ) -> WarehouseMovement:
+        """
+        Записать движение (без commit - в транзакции изменения остатка)
+
+        Args:
+            session: Сессия БД
+            item: Позиция
+            delta: Изменение остатка (+ приход, - расход)
+            reason: Причина (REASON_*)
+            request_id: ID заявки, по которой списано (опционально)
+            actor_id: Telegram ID пользователя (опционально)
+
+        Returns:
+            Движение
+        """
+        movement = WarehouseMovement(
+            tenant_id=item.tenant_id,
+            item_id=item.id,
+            delta=delta,
+            reason=reason,
+            request_id=request_id,
+            actor_id=actor_id,
+        )
+        session.add(movement)
+        return movement
+
+    async def get_totals_as_of(
+        self,
+        session: AsyncSession,
+        tenant_id: int,
+        at: datetime,
+        item_id: Optional[int] = None
+    ) -> dict[int, tuple[int, int]]:
+        """
+        Остаток и накопленный расход позиций на момент времени
+
+        Берется последний снимок не позже at и движения от него до at.
+
+        Args:
+            session: Сессия БД
+            tenant_id: ID тенанта
+            at: Момент времени (движения строго до него)
+            item_id: Только эта позиция (опционально)
+
+        Returns:
+            Словарь {item_id: (остаток, накопленный расход)}
+        """
+        snapshot = WarehouseBalanceSnapshot
+        latest = (
+            select(snapshot.item_id, func.max(snapshot.period_start).label("period_start"))
+            .where(snapshot.tenant_id == tenant_id)
+            .where(snapshot.period_start <= at)
+        )
+        if item_id is not None:
+            latest = latest.where(snapshot.item_id == item_id)
+        latest = latest.group_by(snapshot.item_id).subquery()
+
+        result = await session.execute(
+            select(snapshot.item_id, snapshot.balance, snapshot.consumed)
+            .join(latest, and_(snapshot.item_id == latest.c.item_id, snapshot.period_start == latest.c.period_start))
+        )
+        totals = {row.item_id: (row.balance, row.consumed) for row in result}
+
+        movement = WarehouseMovement
+        consumed = case((movement.reason.in_(CONSUMPTION_REASONS), -movement.delta), else_=0)
+        query = (
+            select(movement.item_id, func.sum(movement.delta).label("delta"), func.sum(consumed).label("consumed"))
+            .outerjoin(latest, movement.item_id == latest.c.item_id)
+            .where(movement.tenant_id == tenant_id)
+            .where(movement.created_at < at)
+            .where(or_(latest.c.period_start.is_(None), movement.created_at >= latest.c.period_start))
+            .group_by(movement.item_id)
+        )
+        if item_id is not None:
+            query = query.where(movement.item_id == item_id)
+
+        for row in await session.execute(query):
+            balance, total_consumed = totals.get(row.item_id, (0, 0))
+            totals[row.item_id] = (balance + (row.delta or 0), total_consumed + (row.consumed or 0))
+        return totals
+
+    async def get_stock_as_of(self, session: AsyncSession, tenant_id: int, item_id: int, at: datetime) -> int:
+        """
+        Остаток позиции на момент времени
+
+        Args:
+            session: Сессия БД
+            tenant_id: ID тенанта
+            item_id: ID позиции
+            at: Момент времени
+
+        Returns:
+            Остаток
+        """
+        totals = await self.get_totals_as_of(session, tenant_id, at, item_id=item_id)
+        return totals.get(item_id, (0, 0))[0]
+
+    async def get_consumption(
+        self,
+        session: AsyncSession,
+        tenant_id: int,
+        start: datetime,
+        end: datetime
+    ) -> dict[int, int]:
+        """
+        Расход по позициям за период [start, end)
+
+        Args:
+            session: Сессия БД
+            tenant_id: ID тенанта
+            start: Начало периода
+            end: Конец периода (не включая)
+
+        Returns:
+            Словарь {item_id: расход} (позиции без расхода не включаются)
+        """
+        at_start = await self.get_totals_as_of(session, tenant_id, start)
+        at_end = await self.get_totals_as_of(session, tenant_id, end)
+        consumption = {}
+        for item_id, (_, consumed_end) in at_end.items():
+            consumed = consumed_end - at_start.get(item_id, (0, 0))[1]
+            if consumed:
+                consumption[item_id] = consumed
+        return consumption
+
+    async def create_snapshots(
+        self,
+        session: AsyncSession,
+        period_start: datetime,
+        tenant_id: Optional[int] = None
+    ) -> int:
+        """
+        Сохранить снимки остатков на начало месяца (без commit, повторный вызов перезаписывает)
+
+        Args:
+            session: Сессия БД
+            period_start: Начало месяца
+            tenant_id: ID тенанта (None - все тенанты)
+
+        Returns:
+            Количество сохраненных снимков
+        """
+        tenants_query = select(WarehouseItem.tenant_id).distinct()
+        if tenant_id is not None:
+            tenants_query = tenants_query.where(WarehouseItem.tenant_id == tenant_id)
+        tenant_ids = list((await session.execute(tenants_query)).scalars().all())
+
+        saved = 0
+        for current_tenant_id in tenant_ids:
+            totals = await self.get_totals_as_of(session, current_tenant_id, period_start)
+            for item_id, (balance, consumed) in totals.items():
+                stmt = upsert_insert(session, WarehouseBalanceSnapshot).values(
+                    tenant_id=current_tenant_id,
+                    item_id=item_id,
+                    period_start=period_start,
+                    balance=balance,
+                    consumed=consumed,
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["item_id", "period_start"],
+                    set_={"balance": stmt.excluded.balance, "consumed": stmt.excluded.consumed}
+                )
+                await session.execute(stmt)
+                saved += 1
+
+        logger.info(f"Снимки остатков на {period_start:%d.%m.%Y}: {saved}")
+        return saved
+
+
+# Глобальный экземпляр сервиса
+warehouse_ledger_service = WarehouseLedgerService()
@@ -1,8 +1,24 @@
-"""Сервис для работы со складом"""
-from typing import Optional, List
+"""Сервис для работы со складом
+
+Списание или повышение минимума, после которого остаток впервые
+опускается до минимального (current_quantity <= min_quantity), ставит
+оповещение техникам в outbox в той же транзакции. Позиция отмечается
+low_stock_alerted_at при отправке и не оповещает повторно, пока ее
+не пополнят выше минимума.
+"""
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, case, null
 from bot.database.models import WarehouseItem
+from bot.database.projections import STREAM_BATCH_SIZE
+from bot.services.notification_outbox import notification_outbox
+from bot.services.warehouse_ledger_service import (
+    warehouse_ledger_service,
+    REASON_RECEIPT,
+    REASON_WRITEOFF,
+    REASON_REQUEST,
+)
 
 
 class WarehouseService:
@@ -97,8 +113,7 @@ class WarehouseService:
         )
         
         session.add(item)
-        await session.commit()
-        await session.refresh(item)
+        await session.flush()
         
         return item
     
@@ -107,7 +122,8 @@ class WarehouseService:
         session: AsyncSession,
         tenant_id: int,
         item_id: int,
-        quantity: int
+        quantity: int,
+        actor_id: Optional[int] = None
     ) -> Optional[WarehouseItem]:
         """
         Добавить количество к позиции
@@ -116,19 +132,25 @@ class WarehouseService:
             session: Сессия БД
             item_id: ID позиции
             quantity: Количество для добавления
+            actor_id: Telegram ID пользователя (для журнала движений)
             
         Returns:
             Обновленная позиция или None
         """
-        item = await self.get_item_by_id(session, tenant_id=tenant_id, item_id=item_id)
-        
-        if not item:
-            return None
-        
-        item.current_quantity += quantity
+        new_quantity = WarehouseItem.current_quantity + quantity
+        item = await self._update_returning(
+            session, tenant_id, item_id,
+            current_quantity=new_quantity,
+            # Пополнение выше минимума - следующее пересечение снова оповестит
+            low_stock_alerted_at=case(
+                (new_quantity > WarehouseItem.min_quantity, null()),
+                else_=WarehouseItem.low_stock_alerted_at
+            )
+        )
         
-        await session.commit()
-        await session.refresh(item)
+        if item:
+            await warehouse_ledger_service.record(session, item, quantity, REASON_RECEIPT, actor_id=actor_id)
+            await session.flush()
         
         return item
     
@@ -137,31 +159,41 @@ class WarehouseService:
         session: AsyncSession,
         tenant_id: int,
         item_id: int,
-        quantity: int
+        quantity: int,
+        request_id: Optional[int] = None,
+        actor_id: Optional[int] = None
     ) -> Optional[WarehouseItem]:
         """
         Списать количество с позиции
         
+        Проверка остатка и списание - одно условное UPDATE, поэтому
+        параллельные списания не уводят остаток в минус. Старый остаток
+        однозначно восстанавливается по новому, так что пересечение
+        минимума видит ровно одно из параллельных списаний.
+        
         Args:
             session: Сессия БД
             item_id: ID позиции
             quantity: Количество для списания
+            request_id: ID заявки, по которой списано (опционально)
+            actor_id: Telegram ID пользователя (для журнала движений)
             
         Returns:
-            Обновленная позиция или None (если недостаточно товара)
+            Обновленная позиция или None (если позиции нет или недостаточно товара)
         """
-        item = await self.get_item_by_id(session, tenant_id=tenant_id, item_id=item_id)
-        
-        if not item:
-            return None
-        
-        if item.current_quantity < quantity:
-            return None  # Недостаточно товара
-        
-        item.current_quantity -= quantity
+        item = await self._update_returning(
+            session, tenant_id, item_id,
+            WarehouseItem.current_quantity >= quantity,
+            current_quantity=WarehouseItem.current_quantity - quantity
+        )
         
-        await session.commit()
-        await session.refresh(item)
+        if item:
+            reason = REASON_REQUEST if request_id else REASON_WRITEOFF
+            await warehouse_ledger_service.record(
+                session, item, -quantity, reason, request_id=request_id, actor_id=actor_id
+            )
+            await self._check_low_stock_crossing(session, item, was_low=item.current_quantity + quantity <= item.min_quantity)
+            await session.flush()
         
         return item
     
@@ -188,10 +220,12 @@ class WarehouseService:
         if not item:
             return None
         
+        was_low = item.current_quantity <= item.min_quantity
         item.min_quantity = min_quantity
-        
-        await session.commit()
-        await session.refresh(item)
+        if item.current_quantity > min_quantity:
+            item.low_stock_alerted_at = None
+        await self._check_low_stock_crossing(session, item, was_low=was_low)
+        await session.flush()
         
         return item
     
@@ -212,6 +246,99 @@ class WarehouseService:
             .order_by(WarehouseItem.name)
         )
         return list(result.scalars().all())
+    
+    async def stream_low_stock_items(self, session: AsyncSession) -> AsyncIterator[WarehouseItem]:
+        """
+        Позиции всех тенантов с остатком <= минимального одним запросом (для фоновой проверки)
+        
+        Args:
+            session: Сессия БД
+            
+        Yields:
+            Позиции, упорядоченные по tenant_id и названию
+        """
+        result = await session.stream_scalars(
+            select(WarehouseItem)
+            .where(WarehouseItem.current_quantity <= WarehouseItem.min_quantity)
+            .order_by(WarehouseItem.tenant_id, WarehouseItem.name)
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        async for item in result:
+            yield item
+
+    
+    async def get_unalerted_low_stock_items(self, session: AsyncSession, tenant_id: int) -> List[WarehouseItem]:
+        """
+        Позиции тенанта с низким остатком, о которых еще не оповещали
+        
+        Args:
+            session: Сессия БД
+            tenant_id: ID тенанта
+            
+        Returns:
+            Список позиций
+        """
+        result = await session.execute(
+            select(WarehouseItem)
+            .where(WarehouseItem.tenant_id == tenant_id)
+            .where(WarehouseItem.current_quantity <= WarehouseItem.min_quantity)
+            .where(WarehouseItem.low_stock_alerted_at.is_(None))
+            .order_by(WarehouseItem.name)
+        )
+        return list(result.scalars().all())
+    
+    async def mark_low_stock_alerted(self, session: AsyncSession, item_ids: List[int]) -> None:
+        """
+        Отметить, что об этих позициях оповестили (без commit)
+        
+        Args:
+            session: Сессия БД
+            item_ids: ID позиций
+        """
+        if not item_ids:
+            return
+        await session.execute(
+            update(WarehouseItem)
+            .where(WarehouseItem.id.in_(item_ids))
+            .values(low_stock_alerted_at=datetime.now(timezone.utc))
+        )
+    
+    async def _check_low_stock_crossing(self, session: AsyncSession, item: WarehouseItem, was_low: bool) -> None:
+        """Поставить оповещение, если остаток только что опустился до минимума"""
+        if was_low or item.current_quantity > item.min_quantity or item.low_stock_alerted_at is not None:
+            return
+        await notification_outbox.enqueue_low_stock_alert(session, item.tenant_id)
+    
+    async def _update_returning(
+        self,
+        session: AsyncSession,
+        tenant_id: int,
+        item_id: int,
+        *conditions,
+        **values
+    ) -> Optional[WarehouseItem]:
+        """
+        UPDATE ... RETURNING позиции одним запросом
+        
+        Args:
+            session: Сессия БД
+            item_id: ID позиции
+            conditions: Дополнительные условия (строка не обновится, если не выполнены)
+            values: Новые значения колонок (выражения вычисляются в БД)
+            
+        Returns:
+            Обновленная позиция или None
+        """
+        result = await session.execute(
+            update(WarehouseItem)
+            .where(WarehouseItem.id == item_id)
+            .where(WarehouseItem.tenant_id == tenant_id)
+            .where(*conditions)
+            .values(**values)
+            .returning(WarehouseItem)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
 
 
 # Глобальный экземпляр сервиса
@@ -1,10 +1,19 @@
-"""Сервис для работы техника с заявками"""
+"""Сервис для работы техника с заявками
+
+Смена статуса - условный UPDATE ... WHERE status = <прочитанный статус>
+RETURNING: если два техника одновременно нажали кнопки по одной заявке,
+переход выполнит только один из них, и статистика и SLA-таймер
+учитывают его ровно один раз.
+"""
 from typing import Optional
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update, func
 from bot.database.models import Request
+from bot.database.projections import RequestListRow, request_list_query, to_request_rows
+from bot.services.request_stats_service import request_stats_service
+from bot.services.sla_timer_service import sla_timer_service
+from bot.utils.pagination import PageCursor, RequestPage, fetch_request_page, PAGE_SIZE
 
 
 class WarehousemanService:
@@ -27,7 +36,7 @@ class WarehousemanService:
         )
         return result.scalar() or 0
     
-    async def get_new_requests(self, session: AsyncSession, tenant_id: int) -> list[Request]:
+    async def get_new_requests(self, session: AsyncSession, tenant_id: int) -> list[RequestListRow]:
         """
         Получить все новые заявки
         
@@ -38,18 +47,17 @@ class WarehousemanService:
             Список новых заявок
         """
         result = await session.execute(
-            select(Request)
+            request_list_query()
             .where(Request.status == "new")
             .where(Request.tenant_id == tenant_id)
-            .options(selectinload(Request.user), selectinload(Request.photos))
             .order_by(
                 Request.priority.desc(),  # Сначала срочные
                 Request.created_at.asc()  # Потом по дате создания
             )
         )
-        return list(result.scalars().all())
+        return to_request_rows(result)
     
-    async def get_requests_today(self, session: AsyncSession, tenant_id: int) -> list[Request]:
+    async def get_requests_today(self, session: AsyncSession, tenant_id: int) -> list[RequestListRow]:
         """
         Получить все заявки за сегодня
         
@@ -62,15 +70,14 @@ class WarehousemanService:
         today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
         result = await session.execute(
-            select(Request)
+            request_list_query()
             .where(Request.tenant_id == tenant_id)
             .where(Request.created_at >= today_start)
-            .options(selectinload(Request.user), selectinload(Request.photos))
             .order_by(Request.created_at.desc())
         )
-        return list(result.scalars().all())
+        return to_request_rows(result)
     
-    async def get_requests_week(self, session: AsyncSession, tenant_id: int) -> list[Request]:
+    async def get_requests_week(self, session: AsyncSession, tenant_id: int) -> list[RequestListRow]:
         """
         Получить все заявки за неделю
         
@@ -83,15 +90,14 @@ class WarehousemanService:
         week_start = datetime.now() - timedelta(days=7)
         
         result = await session.execute(
-            select(Request)
+            request_list_query()
             .where(Request.tenant_id == tenant_id)
             .where(Request.created_at >= week_start)
-            .options(selectinload(Request.user), selectinload(Request.photos))
             .order_by(Request.created_at.desc())
         )
-        return list(result.scalars().all())
+        return to_request_rows(result)
     
-    async def get_all_requests(self, session: AsyncSession, tenant_id: int, limit: Optional[int] = None) -> list[Request]:
+    async def get_all_requests(self, session: AsyncSession, tenant_id: int, limit: Optional[int] = None) -> list[RequestListRow]:
         """
         Получить все заявки
         
@@ -103,9 +109,8 @@ class WarehousemanService:
             Список всех заявок, отсортированный по дате создания (новые сначала)
         """
         query = (
-            select(Request)
+            request_list_query()
             .where(Request.tenant_id == tenant_id)
-            .options(selectinload(Request.user), selectinload(Request.photos))
             .order_by(
                 Request.priority.desc(),  # Сначала срочные
                 Request.created_at.desc()  # Потом новые
@@ -116,7 +121,32 @@ class WarehousemanService:
             query = query.limit(limit)
         
         result = await session.execute(query)
-        return list(result.scalars().all())
+        return to_request_rows(result)
+    
+    async def get_requests_page(
+        self,
+        session: AsyncSession,
+        tenant_id: int,
+        cursor: Optional[PageCursor] = None,
+        since: Optional[datetime] = None,
+        page_size: int = PAGE_SIZE
+    ) -> RequestPage:
+        """
+        Получить страницу заявок (keyset-пагинация, от новых к старым)
+        
+        Args:
+            session: Сессия БД
+            cursor: Курсор страницы (None - первая страница)
+            since: Только заявки, созданные начиная с этого момента (опционально)
+            page_size: Размер страницы
+            
+        Returns:
+            Страница заявок
+        """
+        query = request_list_query().where(Request.tenant_id == tenant_id)
+        if since is not None:
+            query = query.where(Request.created_at >= since)
+        return await fetch_request_page(session, query, cursor, page_size)
     
     async def take_request_in_work(
         self,
@@ -134,25 +164,12 @@ class WarehousemanService:
         Returns:
             Обновленная заявка или None
         """
-        result = await session.execute(
-            select(Request).where(Request.id == request_id).where(Request.tenant_id == tenant_id)
+        # Можно взять в работу только новые заявки
+        return await self._change_status(
+            session, tenant_id, request_id, ("new",),
+            status="in_progress",
+            updated_at=datetime.now()
         )
-        request = result.scalar_one_or_none()
-        
-        if not request:
-            return None
-        
-        if request.status != "new":
-            return None  # Можно взять в работу только новые заявки
-        
-        request.status = "in_progress"
-        request.updated_at = datetime.now()
-        
-        # Используем flush() вместо commit() - commit сделает middleware
-        await session.flush()
-        await session.refresh(request)
-        
-        return request
     
     async def complete_request(
         self,
@@ -170,26 +187,14 @@ class WarehousemanService:
         Returns:
             Обновленная заявка или None
         """
-        result = await session.execute(
-            select(Request).where(Request.id == request_id).where(Request.tenant_id == tenant_id)
+        # Можно завершить только новые или в работе
+        now = datetime.now()
+        return await self._change_status(
+            session, tenant_id, request_id, ("new", "in_progress"),
+            status="completed",
+            completed_at=now,
+            updated_at=now
         )
-        request = result.scalar_one_or_none()
-        
-        if not request:
-            return None
-        
-        if request.status not in ["new", "in_progress"]:
-            return None  # Можно завершить только новые или в работе
-        
-        request.status = "completed"
-        request.completed_at = datetime.now()
-        request.updated_at = datetime.now()
-        
-        # Используем flush() вместо commit() - commit сделает middleware
-        await session.flush()
-        await session.refresh(request)
-        
-        return request
     
     async def reject_request(
         self,
@@ -209,28 +214,70 @@ class WarehousemanService:
         Returns:
             Обновленная заявка или None
         """
-        result = await session.execute(
-            select(Request).where(Request.id == request_id).where(Request.tenant_id == tenant_id)
+        # Можно отклонить только новые или в работе
+        return await self._change_status(
+            session, tenant_id, request_id, ("new", "in_progress"),
+            status="rejected",
+            rejection_reason=reason,
+            updated_at=datetime.now()
         )
-        request = result.scalar_one_or_none()
+    
+    async def _change_status(
+        self,
+        session: AsyncSession,
+        tenant_id: int,
+        request_id: int,
+        allowed_statuses: tuple[str, ...],
+        **values
+    ) -> Optional[Request]:
+        """
+        Перевести заявку в новый статус (compare-and-set)
         
-        if not request:
-            return None
+        Статус читается и обновляется условным UPDATE ... RETURNING только
+        если не изменился с момента чтения. Если заявку успели перевести
+        параллельно, статус перечитывается: переход либо выполняется из
+        нового статуса, либо становится недопустимым.
         
-        if request.status not in ["new", "in_progress"]:
-            return None  # Можно отклонить только новые или в работе
+        Args:
+            session: Сессия БД
+            tenant_id: ID тенанта
+            request_id: ID заявки
+            allowed_statuses: Статусы, из которых разрешен переход
+            values: Новые значения колонок (обязательно status)
+            
+        Returns:
+            Обновленная заявка или None (нет заявки или переход недопустим)
+        """
+        while True:
+            result = await session.execute(
+                select(Request.status).where(Request.id == request_id).where(Request.tenant_id == tenant_id)
+            )
+            old_status = result.scalar_one_or_none()
+            if old_status not in allowed_statuses:
+                return None
+            
+            result = await session.execute(
+                update(Request)
+                .where(Request.id == request_id)
+                .where(Request.tenant_id == tenant_id)
+                .where(Request.status == old_status)
+                .values(**values)
+                .returning(Request)
+                .execution_options(populate_existing=True)
+            )
+            request = result.scalar_one_or_none()
+            if request is not None:
+                break
         
-        request.status = "rejected"
-        request.rejection_reason = reason
-        request.updated_at = datetime.now()
+        # Статистика и снятие SLA-таймера - только для выполненного перехода, в той же транзакции
+        await request_stats_service.record_transition(session, request, old_status)
+        await sla_timer_service.cancel(session, request, old_status)
         
         # Используем flush() вместо commit() - commit сделает middleware
         await session.flush()
-        await session.refresh(request)
         
         return request
 
-
 # Глобальный экземпляр сервиса
 warehouseman_service = WarehousemanService()
 
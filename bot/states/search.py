@@ -0,0 +1,7 @@
+"""FSM состояния для поиска заявок"""
+from aiogram.fsm.state import State, StatesGroup
+
+
+class SearchStates(StatesGroup):
+    """Состояния поиска заявок"""
+    waiting_for_query = State()  # Ожидание поискового запроса
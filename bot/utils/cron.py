@@ -0,0 +1,174 @@
+"""Расписания в формате cron
+
+Поддерживается стандартная запись из пяти полей:
+"минута час день_месяца месяц день_недели", в каждом поле - "*",
+число, список через запятую, диапазон "a-b" и шаг "*/n" / "a-b/n".
+День недели: 0 или 7 - воскресенье. Если ограничены и день месяца,
+и день недели, подходит любой из них (как в cron).
+
+Время срабатывания вычисляется в заданном часовом поясе (pytz): при
+переходе на летнее время несуществующие минуты пропускаются, а
+неоднозначные (повтор часа) срабатывают один раз.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, date, time, timedelta
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+# (минимум, максимум) для полей по порядку
+FIELD_RANGES = [
+    (0, 59),  # минута
+    (0, 23),  # час
+    (1, 31),  # день месяца
+    (1, 12),  # месяц
+    (0, 7),   # день недели
+]
+
+# Сколько дней вперед искать время срабатывания (несуществующая дата вроде 31 февраля)
+MAX_LOOKAHEAD_DAYS = 366 * 5
+
+
+def get_scheduler_timezone(name: str) -> pytz.BaseTzInfo:
+    """
+    Часовой пояс расписаний
+
+    Args:
+        name: Название пояса (config.timezone), например "Europe/Moscow"
+
+    Returns:
+        Часовой пояс pytz (UTC, если название неизвестно)
+    """
+    try:
+        return pytz.timezone(name)
+    except pytz.UnknownTimeZoneError:
+        logger.warning(f"Неизвестный часовой пояс {name!r}, расписания считаются в UTC")
+        return pytz.utc
+
+
+def _parse_field(value: str, minimum: int, maximum: int) -> frozenset[int]:
+    values = set()
+    for part in value.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"Некорректный шаг: {value}")
+
+        if part == "*":
+            start, end = minimum, maximum
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = maximum if step > 1 else start
+
+        if start < minimum or end > maximum or start > end:
+            raise ValueError(f"Значение вне диапазона {minimum}-{maximum}: {value}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class CronSpec:
+    """Разобранное cron-расписание"""
+
+    expression: str
+    minutes: tuple[int, ...]
+    hours: tuple[int, ...]
+    days: frozenset[int]
+    months: frozenset[int]
+    weekdays: frozenset[int]  # 0 - воскресенье
+    any_day: bool
+    any_weekday: bool
+
+    @classmethod
+    def parse(cls, expression: str) -> "CronSpec":
+        """
+        Разобрать cron-выражение
+
+        Args:
+            expression: Строка из пяти полей, например "30 8 * * *"
+
+        Returns:
+            CronSpec
+
+        Raises:
+            ValueError: Если выражение некорректно
+        """
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Ожидается 5 полей cron, получено {len(fields)}: {expression!r}")
+
+        try:
+            minutes, hours, days, months, weekdays = (
+                _parse_field(field, *limits) for field, limits in zip(fields, FIELD_RANGES)
+            )
+        except ValueError as e:
+            raise ValueError(f"Некорректное cron-выражение {expression!r}: {e}") from e
+
+        return cls(
+            expression=expression,
+            minutes=tuple(sorted(minutes)),
+            hours=tuple(sorted(hours)),
+            days=days,
+            months=months,
+            weekdays=frozenset(day % 7 for day in weekdays),
+            any_day=fields[2] == "*",
+            any_weekday=fields[4] == "*",
+        )
+
+    def matches_day(self, day: date) -> bool:
+        """Подходит ли дата под поля дня месяца, месяца и дня недели"""
+        if day.month not in self.months:
+            return False
+        day_match = day.day in self.days
+        weekday_match = (day.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_match and weekday_match
+        return day_match or weekday_match
+
+    def next_after(self, after: datetime, tz: pytz.BaseTzInfo) -> datetime:
+        """
+        Ближайшее время срабатывания строго после момента after
+
+        Args:
+            after: Момент времени (aware)
+            tz: Часовой пояс расписания
+
+        Returns:
+            Время срабатывания (aware, в поясе tz)
+        """
+        local = after.astimezone(tz).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        day = local.date()
+
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            if self.matches_day(day):
+                first_day = day == local.date()
+                for hour in self.hours:
+                    if first_day and hour < local.hour:
+                        continue
+                    for minute in self.minutes:
+                        if first_day and hour == local.hour and minute < local.minute:
+                            continue
+                        candidate = self._localize(tz, datetime.combine(day, time(hour, minute)))
+                        if candidate is not None and candidate > after:
+                            return candidate
+            day += timedelta(days=1)
+
+        raise ValueError(f"Расписание {self.expression!r} не срабатывает в ближайшие {MAX_LOOKAHEAD_DAYS} дней")
+
+    @staticmethod
+    def _localize(tz: pytz.BaseTzInfo, naive: datetime):
+        try:
+            return tz.localize(naive, is_dst=None)
+        except pytz.NonExistentTimeError:
+            # Перевод часов вперед - этой минуты нет
+            return None
+        except pytz.AmbiguousTimeError:
+            # Перевод часов назад - срабатываем в первый из двух моментов
+            return tz.localize(naive, is_dst=True)
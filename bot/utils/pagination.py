@@ -0,0 +1,128 @@
+"""Keyset-пагинация списков заявок
+
+Списки сортируются по (created_at, id) от новых к старым. Страница
+выбирается условием (created_at, id) < (created_at, id) курсора, а не
+OFFSET, поэтому любая страница - один запрос с LIMIT по индексу,
+независимо от глубины пролистывания.
+
+Курсор - ID крайней заявки текущей страницы и направление; значение
+created_at берется подзапросом по первичному ключу, поэтому в callback
+data хранится только ID (лимит Telegram - 64 байта).
+"""
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from bot.database.models import Request
+from bot.database.projections import to_request_rows
+
+# Заявок на одной странице
+PAGE_SIZE = 10
+
+# Направления листания
+DIRECTION_NEXT = "n"  # К более старым
+DIRECTION_PREV = "p"  # К более новым
+
+
+@dataclass(frozen=True)
+class PageCursor:
+    """Позиция в списке: от какой заявки и в какую сторону листать"""
+
+    request_id: int
+    direction: str = DIRECTION_NEXT
+
+    def encode(self, prefix: str) -> str:
+        """Callback data вида "<prefix>:<direction>:<request_id>" """
+        return f"{prefix}:{self.direction}:{self.request_id}"
+
+    @classmethod
+    def decode(cls, data: str) -> Optional["PageCursor"]:
+        """
+        Разобрать callback data
+
+        Args:
+            data: Строка вида "<prefix>:<direction>:<request_id>"
+
+        Returns:
+            PageCursor или None, если данные некорректны
+        """
+        parts = data.split(":")
+        if len(parts) != 3 or parts[1] not in (DIRECTION_NEXT, DIRECTION_PREV):
+            return None
+        try:
+            return cls(request_id=int(parts[2]), direction=parts[1])
+        except ValueError:
+            return None
+
+
+@dataclass
+class RequestPage:
+    """Страница списка заявок (RequestListRow)"""
+
+    items: list = field(default_factory=list)
+    has_prev: bool = False
+    has_next: bool = False
+
+    @property
+    def prev_cursor(self) -> Optional[PageCursor]:
+        """Курсор на предыдущую (более новую) страницу"""
+        if not self.has_prev or not self.items:
+            return None
+        return PageCursor(self.items[0].id, DIRECTION_PREV)
+
+    @property
+    def next_cursor(self) -> Optional[PageCursor]:
+        """Курсор на следующую (более старую) страницу"""
+        if not self.has_next or not self.items:
+            return None
+        return PageCursor(self.items[-1].id, DIRECTION_NEXT)
+
+
+async def fetch_request_page(
+    session: AsyncSession,
+    query: Select,
+    cursor: Optional[PageCursor] = None,
+    page_size: int = PAGE_SIZE
+) -> RequestPage:
+    """
+    Выполнить запрос заявок постранично (keyset по created_at, id)
+
+    Args:
+        session: Сессия БД
+        query: request_list_query() с фильтрами (без ORDER BY и LIMIT)
+        cursor: Курсор (None - первая страница)
+        page_size: Размер страницы
+
+    Returns:
+        RequestPage
+    """
+    key = tuple_(Request.created_at, Request.id)
+
+    if cursor is not None:
+        anchor = aliased(Request)
+        anchor_created_at = select(anchor.created_at).where(anchor.id == cursor.request_id).scalar_subquery()
+        anchor_key = tuple_(anchor_created_at, cursor.request_id)
+        if cursor.direction == DIRECTION_PREV:
+            query = query.where(key > anchor_key)
+        else:
+            query = query.where(key < anchor_key)
+
+    backwards = cursor is not None and cursor.direction == DIRECTION_PREV
+    if backwards:
+        query = query.order_by(Request.created_at.asc(), Request.id.asc())
+    else:
+        query = query.order_by(Request.created_at.desc(), Request.id.desc())
+
+    # Одна лишняя строка показывает, есть ли страница дальше
+    result = await session.execute(query.limit(page_size + 1))
+    items = to_request_rows(result)
+    has_more = len(items) > page_size
+    items = items[:page_size]
+
+    if backwards:
+        items.reverse()
+        return RequestPage(items=items, has_prev=has_more, has_next=True)
+    return RequestPage(items=items, has_prev=cursor is not None, has_next=has_more)
@@ -0,0 +1,86 @@
+"""Отправка заявки с фотографиями
+
+Фото заявки отправляются одним альбомом (send_media_group) с текстом
+в подписи первого фото. Альбом не поддерживает inline-клавиатуру, поэтому
+кнопки отправляются следующим сообщением. Итого не более 2 вызовов
+Telegram API на заявку вместо одного вызова на каждое фото.
+"""
+from typing import Optional, Sequence
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup, InputMediaPhoto
+
+from bot.services.outbound_dispatcher import dispatch, deliver
+
+# Максимальная длина подписи к фото (ограничение Telegram)
+CAPTION_MAX_LENGTH = 1024
+
+# Максимум элементов в одном альбоме (ограничение Telegram)
+MEDIA_GROUP_MAX_SIZE = 10
+
+# Текст сообщения с кнопками после альбома
+ACTIONS_PROMPT = "⬆️ Действия с заявкой:"
+
+
+async def send_request_photos(
+    bot: Bot,
+    chat_id: int,
+    text: str,
+    photo_file_ids: Sequence[str],
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    parse_mode: str = "HTML",
+    wait: bool = False
+) -> None:
+    """
+    Отправить текст заявки вместе с ее фото
+
+    - без фото: одно текстовое сообщение с кнопками;
+    - одно фото: фото с подписью и кнопками;
+    - несколько фото: альбом с подписью на первом фото + сообщение с кнопками.
+
+    Если текст не помещается в подпись, он отправляется вместе с кнопками
+    отдельным сообщением после фото.
+
+    Args:
+        bot: Экземпляр бота
+        chat_id: ID чата
+        text: Текст заявки
+        photo_file_ids: file_id фотографий
+        reply_markup: Inline-клавиатура (кнопки действий)
+        parse_mode: Режим разметки текста
+        wait: Дождаться ответа Telegram API на каждый вызов (ошибки пробрасываются)
+    """
+    send = deliver if wait else dispatch
+    photo_file_ids = list(photo_file_ids)
+    if not photo_file_ids:
+        await send(bot, "send_message", chat_id=chat_id, text=text, reply_markup=reply_markup, parse_mode=parse_mode)
+        return
+
+    caption = text if len(text) <= CAPTION_MAX_LENGTH else None
+
+    if len(photo_file_ids) == 1:
+        if caption is not None:
+            await send(
+                bot, "send_photo",
+                chat_id=chat_id,
+                photo=photo_file_ids[0],
+                caption=caption,
+                reply_markup=reply_markup,
+                parse_mode=parse_mode
+            )
+            return
+        await send(bot, "send_photo", chat_id=chat_id, photo=photo_file_ids[0])
+    else:
+        for start in range(0, len(photo_file_ids), MEDIA_GROUP_MAX_SIZE):
+            media = [
+                InputMediaPhoto(media=file_id)
+                for file_id in photo_file_ids[start:start + MEDIA_GROUP_MAX_SIZE]
+            ]
+            if start == 0 and caption is not None:
+                media[0] = InputMediaPhoto(media=media[0].media, caption=caption, parse_mode=parse_mode)
+            await send(bot, "send_media_group", chat_id=chat_id, media=media)
+
+    if caption is None:
+        await send(bot, "send_message", chat_id=chat_id, text=text, reply_markup=reply_markup, parse_mode=parse_mode)
+    elif reply_markup is not None:
+        await send(bot, "send_message", chat_id=chat_id, text=ACTIONS_PROMPT, reply_markup=reply_markup)
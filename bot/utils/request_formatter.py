@@ -1,14 +1,15 @@
 """Утилиты для форматирования заявок для отображения"""
 from bot.database.models import Request
+from bot.database.projections import RequestListRow
 from typing import Optional
 
 
-def format_request_short(request: Request, user_full_name: Optional[str] = None, user_username: Optional[str] = None, user_phone: Optional[str] = None) -> str:
+def format_request_short(request: Request | RequestListRow, user_full_name: Optional[str] = None, user_username: Optional[str] = None, user_phone: Optional[str] = None) -> str:
     """
     Краткое форматирование заявки для списка
     
     Args:
-        request: Объект заявки
+        request: Объект заявки или строка списка (RequestListRow)
         user_full_name: ФИО создателя заявки (опционально)
         user_username: Username создателя заявки (опционально)
         user_phone: Номер телефона создателя заявки (опционально)
@@ -60,6 +61,11 @@ def format_request_short(request: Request, user_full_name: Optional[str] = None,
     
     text += f"📅 {request.created_at.strftime('%d.%m.%Y %H:%M')}"
     
+    # Количество фото есть только у строк списка (подзапрос в проекции)
+    photo_count = getattr(request, "photo_count", 0)
+    if photo_count:
+        text += f"  📷 {photo_count}"
+    
     return text
 
 
@@ -159,7 +165,7 @@ def format_request_full(request: Request, include_photos: bool = True, user_full
     return text
 
 
-def format_request_list(requests: list[Request], title: str = "Ваши заявки", user_info_map: Optional[dict[int, tuple[str, str, Optional[str]]]] = None) -> tuple[str, list]:
+def format_request_list(requests: list[Request | RequestListRow], title: str = "Ваши заявки", user_info_map: Optional[dict[int, tuple[str, str, Optional[str]]]] = None) -> tuple[str, list]:
     """
     Форматирование списка заявок
     
@@ -20,7 +20,8 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
 from bot.config import config
-from bot.database.engine import init_db, close_db
+from bot.database.engine import init_db, close_db, engine
+from bot.database.pool_metrics import pool_stats
 
 
 app = FastAPI(title="Housekeeper Bot")
@@ -63,11 +64,44 @@ async def _run_bot_polling() -> None:
         await bot.session.close()
         return
 
+    # Outbound message queue (Telegram rate limits)
+    from bot.services.outbound_dispatcher import start_outbound_dispatcher, stop_outbound_dispatcher
+
+    await start_outbound_dispatcher(bot)
+
+    # Background broadcasts (resume jobs interrupted by a restart)
+    from bot.services.broadcast_engine import start_broadcast_engine, stop_broadcast_engine
+
+    try:
+        await start_broadcast_engine(bot)
+    except Exception as e:
+        logger.error(f"Broadcast engine failed to start: {e}")
+
+    # Notification outbox relay
+    from bot.services.notification_outbox import start_notification_relay, stop_notification_relay
+
+    await start_notification_relay(bot)
+
+    # SLA timers for urgent requests (rebuilt from the database)
+    from bot.services.sla_timer_service import start_sla_timer_runner, stop_sla_timer_runner
+
+    await start_sla_timer_runner()
+
+    # Allowlist registry (private mode only)
+    from bot.services.allowed_user_registry import allowed_user_registry
+
+    if not (config.demo_mode or config.public_access):
+        try:
+            await allowed_user_registry.start()
+        except Exception as e:
+            logger.error(f"Allowed users registry failed to start, falling back to DB lookups: {e}")
+
     # Middlewares
     from bot.middlewares.role_middleware import RoleMiddleware
 
     dp.message.middleware(RoleMiddleware())
     dp.callback_query.middleware(RoleMiddleware())
+    dp.inline_query.middleware(RoleMiddleware())
 
     # Routers
     from bot.handlers import (
@@ -82,6 +116,7 @@ async def _run_bot_polling() -> None:
         warehouse_writeoff,
         broadcast,
         manager,
+        search,
     )
 
     dp.include_router(start.router)
@@ -95,6 +130,7 @@ async def _run_bot_polling() -> None:
     dp.include_router(warehouse_writeoff.router)
     dp.include_router(broadcast.router)
     dp.include_router(manager.router)
+    dp.include_router(search.router)
 
     # Scheduler
     from bot.services.scheduler import TaskScheduler
@@ -113,6 +149,26 @@ async def _run_bot_polling() -> None:
             await scheduler.stop()
         except Exception:
             pass
+        try:
+            await allowed_user_registry.stop()
+        except Exception:
+            pass
+        try:
+            await stop_broadcast_engine()
+        except Exception:
+            pass
+        try:
+            await stop_sla_timer_runner()
+        except Exception:
+            pass
+        try:
+            await stop_notification_relay()
+        except Exception:
+            pass
+        try:
+            await stop_outbound_dispatcher()
+        except Exception:
+            pass
         try:
             await close_db()
         except Exception:
@@ -147,8 +203,31 @@ async def health() -> dict:
     }
 
 
+@app.get("/metrics")
+async def metrics() -> dict:
+    from bot.services.allowed_user_registry import allowed_user_registry
+
+    from bot.services.outbound_dispatcher import get_outbound_dispatcher
+    from bot.services.broadcast_engine import get_broadcast_engine
+    from bot.services.notification_outbox import get_notification_relay
+    from bot.services.sla_timer_service import get_sla_timer_runner
+
+    dispatcher = get_outbound_dispatcher()
+    broadcast_engine = get_broadcast_engine()
+    relay = get_notification_relay()
+    sla_timers = get_sla_timer_runner()
+    return {
+        "allowed_users": allowed_user_registry.stats(),
+        "outbound": dispatcher.stats() if dispatcher else None,
+        "broadcasts": broadcast_engine.stats() if broadcast_engine else None,
+        "notification_outbox": relay.stats() if relay else None,
+        "sla_timers": sla_timers.stats() if sla_timers else None,
+        "db_pool": pool_stats(engine.pool),
+    }
+
+
 @app.get("/")
 async def root() -> dict:
-    return {"service": "housekeeper-bot", "health": "/health"}
+    return {"service": "housekeeper-bot", "health": "/health", "metrics": "/metrics"}
 
 
@@ -49,13 +49,35 @@ async def main():
         logger.error(f"Ошибка инициализации БД: {e}")
         return
     
+    # Очередь исходящих сообщений (ограничение скорости Telegram API)
+    from bot.services.outbound_dispatcher import start_outbound_dispatcher, stop_outbound_dispatcher
+    await start_outbound_dispatcher(bot)
+    
+    # Фоновые рассылки (продолжаем прерванные перезапуском)
+    from bot.services.broadcast_engine import start_broadcast_engine, stop_broadcast_engine
+    await start_broadcast_engine(bot)
+    
+    # Отправка уведомлений из outbox
+    from bot.services.notification_outbox import start_notification_relay, stop_notification_relay
+    await start_notification_relay(bot)
+    
+    # SLA-таймеры срочных заявок (восстанавливаются из БД)
+    from bot.services.sla_timer_service import start_sla_timer_runner, stop_sla_timer_runner
+    await start_sla_timer_runner()
+    
+    # Загрузка белого списка в память (нужен только в закрытом режиме)
+    from bot.services.allowed_user_registry import allowed_user_registry
+    if not (config.demo_mode or config.public_access):
+        await allowed_user_registry.start()
+    
     # Регистрация middleware
     from bot.middlewares.role_middleware import RoleMiddleware
     dp.message.middleware(RoleMiddleware())
     dp.callback_query.middleware(RoleMiddleware())
+    dp.inline_query.middleware(RoleMiddleware())
     
     # Регистрация routers (handlers)
-    from bot.handlers import start, common, settings, request_creation, employee, complaints, warehouseman, warehouse, warehouse_writeoff, broadcast, manager, technicians
+    from bot.handlers import start, common, settings, request_creation, employee, complaints, warehouseman, warehouse, warehouse_writeoff, broadcast, manager, technicians, search
     
     dp.include_router(start.router)
     dp.include_router(common.router)
@@ -69,6 +91,7 @@ async def main():
     dp.include_router(broadcast.router)
     dp.include_router(manager.router)
     dp.include_router(technicians.router)
+    dp.include_router(search.router)
     
     # Запуск планировщика задач
     from bot.services.scheduler import TaskScheduler
@@ -84,6 +107,11 @@ async def main():
         logger.error(f"Трейсбек: {traceback.format_exc()}")
     finally:
         await scheduler.stop()
+        await allowed_user_registry.stop()
+        await stop_broadcast_engine()
+        await stop_sla_timer_runner()
+        await stop_notification_relay()
+        await stop_outbound_dispatcher()
         await close_db()
         await bot.session.close()
 
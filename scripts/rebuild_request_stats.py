@@ -0,0 +1,40 @@
+"""Скрипт для заполнения / пересчета дневной статистики заявок (request_daily_stats)
+
+Использование:
+    python scripts/rebuild_request_stats.py              # все тенанты
+    python scripts/rebuild_request_stats.py --tenant 42  # один тенант
+"""
+import argparse
+import asyncio
+import sys
+import os
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bot.database.engine import async_session_maker
+from bot.services.request_stats_service import request_stats_service
+
+
+async def rebuild_request_stats(tenant_id=None):
+    """Пересчитать rollup по таблице requests одной транзакцией"""
+    scope = f"тенант {tenant_id}" if tenant_id is not None else "все тенанты"
+    print(f"📊 Пересчет request_daily_stats ({scope})...")
+    
+    async with async_session_maker() as session:
+        rows = await request_stats_service.rebuild(session, tenant_id=tenant_id)
+        await session.commit()
+    
+    print(f"✅ Готово: записано строк статистики: {rows}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересчет дневной статистики заявок")
+    parser.add_argument("--tenant", type=int, default=None, help="ID тенанта (по умолчанию - все)")
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(rebuild_request_stats(args.tenant))
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+        sys.exit(1)
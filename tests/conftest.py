@@ -66,6 +66,8 @@ from tests.fixtures.database import (
     test_session_maker,
     test_session,
     test_session_with_commit,
+    test_file_engine,
+    test_file_session_maker,
 )
 
 # Fixtures для моков Telegram Bot
@@ -22,6 +22,7 @@ def mock_bot() -> MagicMock:
     # Мокаем методы отправки
     bot.send_message = AsyncMock(return_value=MagicMock())
     bot.send_photo = AsyncMock(return_value=MagicMock())
+    bot.send_media_group = AsyncMock(return_value=[MagicMock()])
     bot.edit_message_text = AsyncMock(return_value=MagicMock())
     bot.edit_message_reply_markup = AsyncMock(return_value=MagicMock())
     bot.answer_callback_query = AsyncMock(return_value=True)
@@ -2,14 +2,33 @@
 import pytest
 import asyncio
 from typing import AsyncGenerator
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import StaticPool, NullPool
 
 # Используем собственный Base для тестов
 TestBase = declarative_base()
 
 
+class StatementCounter:
+    """Считает запросы (round-trips), отправленные в БД через engine"""
+
+    def __init__(self, engine):
+        self.engine = engine.sync_engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
 def get_test_database_url() -> str:
     """URL для тестовой базы данных (SQLite в памяти)"""
     return "sqlite+aiosqlite:///:memory:"
@@ -54,6 +73,46 @@ async def test_engine():
     await engine.dispose()
 
 
+@pytest.fixture(scope="function")
+async def test_file_engine(tmp_path):
+    """
+    Тестовый engine для SQLite в файле
+    
+    Каждая сессия получает собственное соединение, поэтому транзакции
+    действительно конкурируют за блокировки - для тестов параллельной
+    работы (в памяти все сессии делят одно соединение).
+    """
+    from bot.database.engine import Base
+    
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'test.db'}",
+        echo=False,
+        future=True,
+        # Ожидание блокировки записи вместо немедленного "database is locked"
+        connect_args={"check_same_thread": False, "timeout": 60},
+        poolclass=NullPool,
+    )
+    
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    yield engine
+    
+    await engine.dispose()
+
+
+@pytest.fixture(scope="function")
+async def test_file_session_maker(test_file_engine):
+    """Session maker для SQLite в файле (конкурентные тесты)"""
+    return async_sessionmaker(
+        test_file_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+
+
 @pytest.fixture(scope="function")
 async def test_session_maker(test_engine):
     """Создать session maker для тестов"""
@@ -0,0 +1,182 @@
+"""
+Регрессионные тесты планов запросов
+
+Каждый «горячий» запрос сервисов выполняется на заполненной БД, все
+отправленные SELECT перехватываются и прогоняются через EXPLAIN. Тест
+падает, если какая-либо таблица читается полным сканированием
+(SQLite: «SCAN <table>», PostgreSQL: «Seq Scan») - т.е. запрос потерял
+подходящий индекс.
+"""
+import json
+import re
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event, text
+
+from bot.database.models import User, Request, RequestPhoto, Complaint
+from bot.services.manager_service import ManagerService
+from bot.services.request_service import RequestService
+from bot.services.request_stats_service import request_stats_service
+from bot.services.warehouseman_service import WarehousemanService
+from bot.utils.pagination import PageCursor
+
+TENANTS = 5
+USERS_PER_TENANT = 10
+REQUESTS_PER_TENANT = 200
+
+STATUSES = ["new", "in_progress", "completed", "rejected"]
+
+# SQLite: полное сканирование таблицы или индекса целиком
+SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+class StatementRecorder:
+    """Перехватывает SELECT, отправленные в БД через engine"""
+
+    def __init__(self, engine):
+        self.engine = engine.sync_engine
+        self.statements: list[tuple[str, tuple]] = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+async def full_scans(connection, statement: str, parameters) -> list[str]:
+    """
+    Получить таблицы, которые запрос читает полным сканированием
+
+    Args:
+        connection: Соединение (AsyncConnection)
+        statement: SQL запроса
+        parameters: Параметры запроса
+
+    Returns:
+        Строки плана с полным сканированием
+    """
+    if connection.dialect.name == "postgresql":
+        result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = result.scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        scans = []
+
+        def walk(node):
+            if node.get("Node Type") == "Seq Scan":
+                scans.append(f"Seq Scan on {node.get('Relation Name')}")
+            for child in node.get("Plans", []):
+                walk(child)
+
+        walk(plan[0]["Plan"])
+        return scans
+
+    result = await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    return [row.detail for row in result if SQLITE_SCAN.match(row.detail)]
+
+
+@pytest.fixture
+async def seeded_session(test_engine, test_session_maker):
+    """БД с несколькими тенантами, заявками всех статусов, фото и жалобами"""
+    now = datetime.now()
+    async with test_session_maker() as session:
+        for tenant_id in range(TENANTS):
+            user_ids = [100000 + tenant_id * 100 + index for index in range(USERS_PER_TENANT)]
+            session.add_all(User(id=user_id, role="employee") for user_id in user_ids)
+            for index in range(REQUESTS_PER_TENANT):
+                created_at = now - timedelta(hours=index * 3)
+                session.add(Request(
+                    tenant_id=tenant_id,
+                    number=f"ЗХ-{index:05d}",
+                    user_id=user_ids[index % USERS_PER_TENANT],
+                    category="Ремонт",
+                    description="Тест",
+                    priority="urgent" if index % 5 == 0 else "normal",
+                    status=STATUSES[index % len(STATUSES)],
+                    created_at=created_at,
+                    updated_at=created_at + timedelta(hours=1),
+                ))
+        await session.flush()
+
+        result = await session.execute(text("SELECT id, tenant_id, user_id FROM requests"))
+        for request_id, tenant_id, user_id in result.all():
+            for photo in range(1 + request_id % 3):
+                session.add(RequestPhoto(request_id=request_id, file_id=f"photo_{request_id}_{photo}"))
+            if request_id % 7 == 0:
+                session.add(Complaint(tenant_id=tenant_id, request_id=request_id, user_id=user_id, reason="Долго", text="Тест"))
+        await session.commit()
+
+    # Статистика для планировщика, как на живой БД
+    async with test_engine.begin() as conn:
+        await conn.exec_driver_sql("ANALYZE")
+
+    async with test_session_maker() as session:
+        yield session
+
+
+warehouseman_service = WarehousemanService()
+manager_service = ManagerService()
+request_service = RequestService()
+
+
+async def second_page(service, session):
+    first = await service.get_requests_page(session, tenant_id=1, page_size=5)
+    return await service.get_requests_page(session, tenant_id=1, cursor=first.next_cursor, page_size=5)
+
+
+async def drain(stream) -> list:
+    return [row async for row in stream]
+
+
+HOT_QUERIES = {
+    "warehouseman.get_new_requests_count": lambda s: warehouseman_service.get_new_requests_count(s, tenant_id=1),
+    "warehouseman.get_new_requests": lambda s: warehouseman_service.get_new_requests(s, tenant_id=1),
+    "warehouseman.get_requests_today": lambda s: warehouseman_service.get_requests_today(s, tenant_id=1),
+    "warehouseman.get_requests_week": lambda s: warehouseman_service.get_requests_week(s, tenant_id=1),
+    "warehouseman.get_requests_page": lambda s: second_page(warehouseman_service, s),
+    "warehouseman.get_requests_page_prev": lambda s: warehouseman_service.get_requests_page(
+        s, tenant_id=1, cursor=PageCursor(request_id=300, direction="p"), page_size=5
+    ),
+    "manager.get_requests_in_work_over_days": lambda s: manager_service.get_requests_in_work_over_days(s, tenant_id=1, days=3),
+    "manager.get_requests_page": lambda s: second_page(manager_service, s),
+    "manager.get_all_complaints": lambda s: manager_service.get_all_complaints(s, tenant_id=1),
+    "manager.get_period_report": lambda s: manager_service.get_period_report(
+        s, tenant_id=1, start_date=datetime.now() - timedelta(days=7), end_date=datetime.now()
+    ),
+    # Фоновые проверки по всем тенантам (без условия на tenant_id)
+    "manager.stream_requests_in_work_over_days": lambda s: drain(
+        manager_service.stream_requests_in_work_over_days(s, days=3)
+    ),
+    "request_stats.stream_period_totals_by_tenant": lambda s: drain(request_stats_service.stream_period_totals_by_tenant(
+        s, start_day=datetime.now().date() - timedelta(days=1), end_day=datetime.now().date() - timedelta(days=1)
+    )),
+    "request.get_user_requests": lambda s: request_service.get_user_requests(s, tenant_id=1, user_id=100101, limit=10),
+    "request.get_user_requests_page": lambda s: request_service.get_user_requests_page(s, tenant_id=1, user_id=100101, page_size=5),
+}
+
+
+class TestHotQueryPlans:
+    """Горячие запросы сервисов используют индексы"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+    async def test_no_full_scan(self, test_engine, seeded_session, name):
+        """Ни один SELECT запроса не читает таблицу целиком"""
+        with StatementRecorder(test_engine) as recorder:
+            await HOT_QUERIES[name](seeded_session)
+
+        assert recorder.statements, f"{name}: запросы не перехвачены"
+
+        problems = []
+        async with test_engine.connect() as conn:
+            for statement, parameters in recorder.statements:
+                scans = await full_scans(conn, statement, parameters)
+                if scans:
+                    problems.append(f"{statement}\n  -> {scans}")
+
+        assert not problems, f"{name}: полное сканирование\n" + "\n".join(problems)
@@ -6,10 +6,11 @@
 - Добавление user_role в data
 - Создание пользователя в БД
 - Работа с сессией БД
+- Ответ на inline-запрос при отказе в доступе и истекшем доступе
 """
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
-from aiogram.types import User as TelegramUser, Message
+from aiogram.types import User as TelegramUser, Message, InlineQuery
 
 from bot.middlewares.role_middleware import RoleMiddleware
 from bot.database.models import User
@@ -225,3 +226,286 @@ class TestRoleMiddlewareEdgeCases:
         
         assert count == 1
 
+
+
+class _MiddlewareConfig:
+    """Минимальная конфигурация для прогона RoleMiddleware целиком"""
+    demo_mode = False
+    warehouseman_id = 999001
+    manager_id = 999002
+    
+    def is_allowed_user(self, user_id: int) -> bool:
+        return True
+
+
+@pytest.fixture
+def middleware_env(test_engine, test_session_maker):
+    """
+    Окружение для вызова RoleMiddleware: тестовая БД, чистый кэш
+    и счетчик SQL-запросов
+    """
+    from sqlalchemy import event
+    from bot.services.identity_cache import identity_cache
+    from bot.services.role_service import role_service
+    
+    statements = []
+    
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(test_engine.sync_engine, "before_cursor_execute", count_statement)
+    identity_cache.clear()
+    config = _MiddlewareConfig()
+    
+    with patch("bot.middlewares.role_middleware.async_session_maker", test_session_maker), \
+         patch("bot.middlewares.role_middleware.get_config", return_value=config), \
+         patch.object(role_service, "config", config):
+        yield statements
+    
+    identity_cache.clear()
+    event.remove(test_engine.sync_engine, "before_cursor_execute", count_statement)
+
+
+class TestRoleMiddlewareIdentityCache:
+    """Тесты кэширования идентичности пользователя"""
+    
+    @staticmethod
+    def _telegram_user(user_id: int) -> TelegramUser:
+        return TelegramUser(id=user_id, is_bot=False, first_name="Тест")
+    
+    @pytest.mark.asyncio
+    async def test_repeated_update_does_not_query_db(self, middleware_env):
+        """Повторное обновление от того же пользователя не обращается к БД"""
+        middleware = RoleMiddleware()
+        handler = AsyncMock(return_value="ok")
+        user = self._telegram_user(555001)
+        
+        await middleware(handler, MagicMock(), {"event_from_user": user})
+        queries_first = len(middleware_env)
+        assert queries_first > 0
+        
+        middleware_env.clear()
+        data = {"event_from_user": user}
+        result = await middleware(handler, MagicMock(), data)
+        
+        assert result == "ok"
+        assert middleware_env == []
+        assert data["user_role"] == "employee"
+        assert data["tenant_id"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_switch_role_invalidates_cache(self, middleware_env, test_session):
+        """После переключения роли middleware видит новую активную роль"""
+        from bot.services.role_service import role_service
+        
+        middleware = RoleMiddleware()
+        manager = self._telegram_user(999002)
+        
+        data = {"event_from_user": manager}
+        await middleware(AsyncMock(), MagicMock(), data)
+        assert data["user_role"] == "manager"
+        
+        await role_service.switch_role(test_session, 999002, "warehouseman")
+        await test_session.commit()
+        
+        data = {"event_from_user": manager}
+        await middleware(AsyncMock(), MagicMock(), data)
+        assert data["user_role"] == "warehouseman"
+        assert data["base_role"] == "manager"
+
+
+class TestRoleMiddlewareLazySession:
+    """Тесты ленивого создания сессии БД"""
+    
+    @staticmethod
+    def _telegram_user(user_id: int) -> TelegramUser:
+        return TelegramUser(id=user_id, is_bot=False, first_name="Тест")
+    
+    @pytest.mark.asyncio
+    async def test_session_not_acquired_when_unused(self, middleware_env):
+        """Если handler не обращается к БД, сессия не создается"""
+        middleware = RoleMiddleware()
+        user = self._telegram_user(555101)
+        await middleware(AsyncMock(), MagicMock(), {"event_from_user": user})
+        
+        middleware_env.clear()
+        data = {"event_from_user": user}
+        await middleware(AsyncMock(), MagicMock(), data)
+        
+        assert data["db_session"].is_acquired is False
+        assert middleware_env == []
+    
+    @pytest.mark.asyncio
+    async def test_read_only_handler_skips_commit(self, middleware_env, test_engine):
+        """Handler, который только читает, не приводит к COMMIT"""
+        from sqlalchemy import event, select
+        
+        middleware = RoleMiddleware()
+        user = self._telegram_user(555102)
+        await middleware(AsyncMock(), MagicMock(), {"event_from_user": user})
+        
+        commits = []
+        listener = lambda conn: commits.append(conn)
+        event.listen(test_engine.sync_engine, "commit", listener)
+        try:
+            async def handler(event_, data):
+                await data["db_session"].execute(select(User).where(User.id == 555102))
+            
+            await middleware(handler, MagicMock(), {"event_from_user": user})
+        finally:
+            event.remove(test_engine.sync_engine, "commit", listener)
+        
+        assert commits == []
+    
+    @pytest.mark.asyncio
+    async def test_writes_are_committed(self, middleware_env, test_session_maker):
+        """Изменения, сделанные handler, коммитятся"""
+        from sqlalchemy import select
+        from bot.database.models import WarehouseItem
+        
+        middleware = RoleMiddleware()
+        user = self._telegram_user(555103)
+        
+        async def handler(event_, data):
+            data["db_session"].add(WarehouseItem(tenant_id=0, name="Мыло", current_quantity=1))
+        
+        await middleware(handler, MagicMock(), {"event_from_user": user})
+        
+        async with test_session_maker() as session:
+            item = (await session.execute(
+                select(WarehouseItem).where(WarehouseItem.name == "Мыло")
+            )).scalar_one_or_none()
+        assert item is not None
+
+
+class TestRoleMiddlewareUnitOfWork:
+    """Тесты границы транзакции: один COMMIT на обновление"""
+    
+    @staticmethod
+    def _telegram_user(user_id: int) -> TelegramUser:
+        return TelegramUser(id=user_id, is_bot=False, first_name="Тест")
+    
+    @staticmethod
+    async def _handler(event_, data):
+        """Handler, меняющий данные через несколько сервисов"""
+        from bot.services.request_service import request_service
+        from bot.services.role_service import role_service
+        from bot.services.warehouse_service import warehouse_service
+        
+        session = data["db_session"]
+        await request_service.create_request(
+            session, tenant_id=data["tenant_id"], user_id=data["user_id"],
+            category="Ремонт", description="Тест", priority="normal"
+        )
+        item = await warehouse_service.create_item(session, tenant_id=data["tenant_id"], name="Мыло", min_quantity=1)
+        await warehouse_service.add_quantity(session, tenant_id=data["tenant_id"], item_id=item.id, quantity=5)
+        await warehouse_service.subtract_quantity(session, tenant_id=data["tenant_id"], item_id=item.id, quantity=2)
+        await role_service.switch_role(session, data["user_id"], "warehouseman")
+    
+    @pytest.mark.asyncio
+    async def test_single_commit_per_update(self, middleware_env, test_engine, test_session_maker):
+        """Все изменения handler фиксируются одним COMMIT, кэш сбрасывается после него"""
+        from sqlalchemy import event, select, func
+        from bot.database.models import Request, WarehouseItem, WarehouseMovement
+        from bot.services.identity_cache import identity_cache
+        
+        middleware = RoleMiddleware()
+        manager = self._telegram_user(999002)
+        await middleware(AsyncMock(), MagicMock(), {"event_from_user": manager})
+        
+        commits = []
+        listener = lambda conn: commits.append(identity_cache.get(999002))
+        event.listen(test_engine.sync_engine, "commit", listener)
+        try:
+            await middleware(self._handler, MagicMock(), {"event_from_user": manager})
+        finally:
+            event.remove(test_engine.sync_engine, "commit", listener)
+        
+        # Кэш еще не сброшен в момент COMMIT, но сброшен после него
+        assert len(commits) == 1
+        assert commits[0] is not None
+        assert identity_cache.get(999002) is None
+        
+        async with test_session_maker() as session:
+            assert (await session.execute(select(func.count(Request.id)))).scalar() == 1
+            assert (await session.execute(select(func.count(WarehouseMovement.id)))).scalar() == 2
+            item = (await session.execute(select(WarehouseItem))).scalar_one()
+            assert item.current_quantity == 3
+    
+    @pytest.mark.asyncio
+    async def test_error_rolls_back_whole_update(self, middleware_env, test_engine, test_session_maker):
+        """Ошибка в handler откатывает изменения всех сервисов; действия после commit не выполняются"""
+        from sqlalchemy import event, select, func
+        from bot.database.models import Request, WarehouseItem
+        from bot.services.identity_cache import identity_cache
+        
+        middleware = RoleMiddleware()
+        manager = self._telegram_user(999002)
+        await middleware(AsyncMock(), MagicMock(), {"event_from_user": manager})
+        
+        async def failing_handler(event_, data):
+            await self._handler(event_, data)
+            raise RuntimeError("boom")
+        
+        commits = []
+        listener = lambda conn: commits.append(conn)
+        event.listen(test_engine.sync_engine, "commit", listener)
+        try:
+            with pytest.raises(RuntimeError):
+                await middleware(failing_handler, MagicMock(), {"event_from_user": manager})
+        finally:
+            event.remove(test_engine.sync_engine, "commit", listener)
+        
+        assert commits == []
+        assert identity_cache.get(999002) is not None
+        async with test_session_maker() as session:
+            assert (await session.execute(select(func.count(Request.id)))).scalar() == 0
+            assert (await session.execute(select(func.count(WarehouseItem.id)))).scalar() == 0
+
+
+class TestRoleMiddlewareInlineQuery:
+    """Inline-запрос без доступа получает пустой ответ, а не зависает"""
+    
+    @staticmethod
+    def _inline_query() -> MagicMock:
+        inline_query = MagicMock(spec=InlineQuery)
+        inline_query.answer = AsyncMock()
+        return inline_query
+    
+    @pytest.mark.asyncio
+    async def test_denied_user_gets_empty_answer(self, middleware_env):
+        """Пользователь вне белого списка: пустой персональный ответ, handler не вызывается"""
+        middleware = RoleMiddleware()
+        handler = AsyncMock()
+        inline_query = self._inline_query()
+        user = TelegramUser(id=555201, is_bot=False, first_name="Тест")
+        
+        with patch.object(_MiddlewareConfig, "is_allowed_user", lambda self, user_id: False):
+            await middleware(handler, inline_query, {"event_from_user": user, "bot": MagicMock()})
+        
+        handler.assert_not_awaited()
+        inline_query.answer.assert_awaited_once()
+        assert inline_query.answer.call_args.args[0] == []
+        assert inline_query.answer.call_args.kwargs["is_personal"] is True
+    
+    @pytest.mark.asyncio
+    async def test_expired_demo_user_gets_empty_answer(self, middleware_env):
+        """Истекший тестовый доступ: пустой ответ вместо зависшего inline-запроса"""
+        from datetime import datetime, timedelta
+        from bot.services.identity_cache import identity_cache, UserIdentity
+        
+        middleware = RoleMiddleware()
+        handler = AsyncMock()
+        inline_query = self._inline_query()
+        user = TelegramUser(id=555202, is_bot=False, first_name="Тест")
+        identity_cache.put(555202, UserIdentity(
+            role="employee", active_role="employee", tenant_id=555202,
+            first_seen_at=datetime.now() - timedelta(days=10)
+        ))
+        
+        with patch.object(_MiddlewareConfig, "demo_mode", True):
+            await middleware(handler, inline_query, {"event_from_user": user, "bot": MagicMock()})
+        
+        handler.assert_not_awaited()
+        inline_query.answer.assert_awaited_once()
+        assert inline_query.answer.call_args.args[0] == []
@@ -0,0 +1 @@
+"""Unit тесты для подключения к БД"""
@@ -0,0 +1,115 @@
+"""
+Unit тесты для проекций списков
+
+Тестируемые функции:
+- request_list_query() / to_request_rows() - RequestListRow с количеством фото
+- списки сервисов - один запрос и меньше памяти, чем ORM с selectinload
+"""
+import tracemalloc
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from bot.database.models import User, Request, RequestPhoto
+from bot.database.projections import RequestListRow, request_list_query, to_request_rows
+from bot.services.warehouseman_service import WarehousemanService
+from bot.utils.request_formatter import format_request_list
+from tests.fixtures.database import StatementCounter
+
+LIST_SIZE = 200
+
+
+@pytest.fixture
+async def listed_requests(test_session):
+    """Заявки с длинными описаниями и фото"""
+    test_session.add(User(id=100001, role="employee"))
+    now = datetime.now()
+    for index in range(LIST_SIZE):
+        request = Request(
+            tenant_id=0,
+            number=f"ЗХ-{index:03d}",
+            user_id=100001,
+            category="Ремонт",
+            description=f"Заявка {index}: " + "очень подробное описание проблемы " * 20,
+            priority="urgent" if index % 10 == 0 else "normal",
+            status="new",
+            created_at=now - timedelta(minutes=index),
+            updated_at=now - timedelta(minutes=index),
+        )
+        request.photos = [RequestPhoto(file_id=f"photo_{index}_{photo}") for photo in range(index % 3)]
+        test_session.add(request)
+    await test_session.flush()
+    test_session.expunge_all()
+
+
+class TestRequestListRow:
+    """Тесты проекции"""
+
+    @pytest.mark.asyncio
+    async def test_row_fields(self, test_session, listed_requests):
+        """Строка содержит префикс описания и количество фото"""
+        result = await test_session.execute(
+            request_list_query().where(Request.number.in_(["ЗХ-001", "ЗХ-002"])).order_by(Request.number)
+        )
+        rows = to_request_rows(result)
+
+        assert [type(row) for row in rows] == [RequestListRow, RequestListRow]
+        assert [row.photo_count for row in rows] == [1, 2]
+        assert len(rows[0].description) == 51
+        assert not hasattr(rows[0], "__dict__")
+
+    @pytest.mark.asyncio
+    async def test_formatting_matches_orm(self, test_session, listed_requests):
+        """Список из проекции выглядит так же, как из ORM-объектов (плюс число фото)"""
+        service = WarehousemanService()
+
+        rows = await service.get_all_requests(test_session, tenant_id=0, limit=20)
+        result = await test_session.execute(
+            select(Request)
+            .where(Request.id.in_([row.id for row in rows]))
+            .order_by(Request.priority.desc(), Request.created_at.desc())
+        )
+        requests = list(result.scalars().all())
+
+        rows_text, rows_ids = format_request_list(rows)
+        orm_text, orm_ids = format_request_list(requests)
+
+        assert rows_ids == orm_ids
+        for row, request in zip(rows, requests):
+            assert row.description == request.description[:51]
+        assert rows_text.replace("  📷 1", "").replace("  📷 2", "") == orm_text
+
+    @pytest.mark.asyncio
+    async def test_list_cost(self, test_engine, test_session, listed_requests):
+        """Микро-бенчмарк: один запрос вместо трех и в разы меньше памяти"""
+        service = WarehousemanService()
+
+        with StatementCounter(test_engine) as legacy_counter:
+            tracemalloc.start()
+            result = await test_session.execute(
+                select(Request)
+                .where(Request.tenant_id == 0)
+                .options(selectinload(Request.user), selectinload(Request.photos))
+                .order_by(Request.priority.desc(), Request.created_at.desc())
+            )
+            requests = list(result.scalars().all())
+            _, legacy_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        test_session.expunge_all()
+
+        with StatementCounter(test_engine) as counter:
+            tracemalloc.start()
+            rows = await service.get_all_requests(test_session, tenant_id=0)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        print(
+            f"\nсписок из {LIST_SIZE} заявок: "
+            f"ORM {legacy_counter.count} запроса / {legacy_peak // 1024} КБ -> "
+            f"проекция {counter.count} запрос / {peak // 1024} КБ"
+        )
+        assert len(rows) == len(requests) == LIST_SIZE
+        assert legacy_counter.count == 3
+        assert counter.count == 1
+        assert peak * 2 < legacy_peak
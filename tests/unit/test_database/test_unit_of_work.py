@@ -0,0 +1,76 @@
+"""
+Unit тесты для unit of work
+
+Тестируемые функции:
+- after_commit() - действие выполняется только после commit
+- LazySession.finish() - действия выполняются и без изменений в транзакции
+"""
+import pytest
+
+from bot.database.lazy_session import LazySession
+from bot.database.models import WarehouseItem
+from bot.database.unit_of_work import after_commit, has_post_commit_hooks
+
+
+class TestAfterCommit:
+    """Тесты действий после commit"""
+
+    @pytest.mark.asyncio
+    async def test_runs_after_commit(self, test_session_maker):
+        """Действие выполняется после commit, а не при регистрации"""
+        calls = []
+        async with test_session_maker() as session:
+            session.add(WarehouseItem(tenant_id=0, name="Мыло", current_quantity=1))
+            after_commit(session, lambda: calls.append("done"))
+            await session.flush()
+            assert calls == []
+
+            await session.commit()
+
+        assert calls == ["done"]
+
+    @pytest.mark.asyncio
+    async def test_discarded_on_rollback(self, test_session_maker):
+        """При откате действие отбрасывается и не выполняется при следующем commit"""
+        calls = []
+        async with test_session_maker() as session:
+            session.add(WarehouseItem(tenant_id=0, name="Мыло", current_quantity=1))
+            after_commit(session, lambda: calls.append("rolled back"))
+            await session.flush()
+            await session.rollback()
+
+            assert not has_post_commit_hooks(session)
+            session.add(WarehouseItem(tenant_id=0, name="Шампунь", current_quantity=1))
+            await session.commit()
+
+        assert calls == []
+
+    @pytest.mark.asyncio
+    async def test_hook_error_does_not_break_commit(self, test_session_maker):
+        """Ошибка действия логируется, остальные действия выполняются"""
+        calls = []
+
+        def failing():
+            raise RuntimeError("boom")
+
+        async with test_session_maker() as session:
+            session.add(WarehouseItem(tenant_id=0, name="Мыло", current_quantity=1))
+            after_commit(session, failing)
+            after_commit(session, lambda: calls.append("second"))
+            await session.commit()
+
+        assert calls == ["second"]
+
+    @pytest.mark.asyncio
+    async def test_lazy_session_without_writes_runs_hooks(self, test_session_maker):
+        """Без изменений commit не выполняется, но действия выполняются"""
+        calls = []
+        session = LazySession(test_session_maker)
+        try:
+            after_commit(session, lambda: calls.append("done"))
+
+            assert await session.finish() is False
+        finally:
+            await session.close()
+
+        assert calls == ["done"]
@@ -0,0 +1,105 @@
+"""
+Unit тесты для AllowedUserRegistry
+
+Тестируемые методы:
+- resync() - загрузка белого списка из БД
+- contains() - проверка доступа без запроса к БД
+- _on_notify() - применение уведомлений INSERT/DELETE
+- resync() - уведомления, пришедшие во время чтения, не теряются
+- stats() - метрики размера и актуальности
+"""
+import contextlib
+import pytest
+from unittest.mock import patch
+
+from bot.database.models import AllowedUser
+from bot.services.allowed_user_registry import AllowedUserRegistry, ALLOWED_USERS_CHANNEL
+from bot.services.identity_cache import identity_cache, UserIdentity
+
+
+class TestAllowedUserRegistry:
+    """Тесты реестра разрешенных пользователей"""
+    
+    @pytest.mark.asyncio
+    async def test_resync_loads_ids(self, test_session_maker):
+        """resync загружает все ID из allowed_users"""
+        async with test_session_maker() as session:
+            session.add_all([
+                AllowedUser(id=101, full_name="Первый"),
+                AllowedUser(id=102, full_name="Второй"),
+            ])
+            await session.commit()
+        
+        registry = AllowedUserRegistry()
+        assert registry.is_loaded is False
+        
+        with patch("bot.services.allowed_user_registry.async_session_maker", test_session_maker):
+            await registry.resync()
+        
+        assert registry.is_loaded is True
+        assert registry.contains(101)
+        assert registry.contains(102)
+        assert not registry.contains(103)
+        assert registry.stats()["size"] == 2
+    
+    @pytest.mark.asyncio
+    async def test_resync_keeps_notifications_received_during_query(self, test_session_maker):
+        """Снимок resync не затирает INSERT/DELETE, пришедшие, пока шел SELECT"""
+        async with test_session_maker() as session:
+            session.add_all([
+                AllowedUser(id=101, full_name="Первый"),
+                AllowedUser(id=102, full_name="Второй"),
+            ])
+            await session.commit()
+        
+        registry = AllowedUserRegistry()
+        
+        @contextlib.asynccontextmanager
+        async def session_with_notifications():
+            async with test_session_maker() as session:
+                execute = session.execute
+                
+                async def execute_then_notify(*args, **kwargs):
+                    result = await execute(*args, **kwargs)
+                    # Изменения, закоммиченные после чтения снимка
+                    registry._on_notify(None, 1, ALLOWED_USERS_CHANNEL, "INSERT:103")
+                    registry._on_notify(None, 1, ALLOWED_USERS_CHANNEL, "DELETE:101")
+                    return result
+                
+                session.execute = execute_then_notify
+                yield session
+        
+        with patch("bot.services.allowed_user_registry.async_session_maker", session_with_notifications):
+            await registry.resync()
+        
+        assert not registry.contains(101)
+        assert registry.contains(102)
+        assert registry.contains(103)
+    
+    def test_notify_insert_and_delete(self):
+        """Уведомления INSERT/DELETE обновляют множество"""
+        registry = AllowedUserRegistry()
+        
+        registry._on_notify(None, 1, ALLOWED_USERS_CHANNEL, "INSERT:555")
+        assert registry.contains(555)
+        
+        registry._on_notify(None, 1, ALLOWED_USERS_CHANNEL, "DELETE:555")
+        assert not registry.contains(555)
+        assert registry.stats()["last_event_seconds_ago"] is not None
+    
+    def test_notify_delete_invalidates_identity_cache(self):
+        """Удаление из белого списка сбрасывает кэш middleware"""
+        registry = AllowedUserRegistry()
+        identity_cache.put(556, UserIdentity(role="employee", active_role="employee", tenant_id=0))
+        
+        registry._on_notify(None, 1, ALLOWED_USERS_CHANNEL, "DELETE:556")
+        
+        assert identity_cache.get(556) is None
+    
+    def test_notify_ignores_bad_payload(self):
+        """Некорректный payload игнорируется"""
+        registry = AllowedUserRegistry()
+        
+        registry._on_notify(None, 1, ALLOWED_USERS_CHANNEL, "INSERT:abc")
+        
+        assert registry.stats()["size"] == 0
@@ -0,0 +1,227 @@
+"""
+Unit тесты для AutomationService
+
+Тестируемые методы:
+- group_by_tenant() - группировка потока по тенантам
+- check_warehouse_minimum() - сводки по всем тенантам, получатели тенанта
+- check_old_in_progress_requests() - demo-режим: каждый руководитель получает свою сводку
+- send_daily_report_to_manager() - отчет по тенантам из rollup
+- send_daily_report_to_manager() - "вчера" по часовому поясу планировщика
+- число запросов не зависит от количества тенантов
+- create_stock_snapshots() - месяц снимка по часовому поясу планировщика
+"""
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytz
+from sqlalchemy import event
+
+from bot.database.models import User, Request, WarehouseItem, TechnicianAssignment, RequestDailyStat
+from bot.services.automation_service import AutomationService, group_by_tenant
+from bot.services.notification_service import NotificationService
+
+
+@pytest.fixture
+def automation_env(test_session_maker, mock_bot):
+    """AutomationService на тестовой БД; возвращает функцию смены режима"""
+    config = SimpleNamespace(demo_mode=False, warehouseman_id=999001, manager_id=999002)
+    with patch("bot.services.automation_service.async_session_maker", test_session_maker), \
+         patch("bot.services.automation_service.get_config", return_value=config):
+        yield AutomationService(NotificationService(mock_bot)), config
+
+
+def sent_messages(mock_bot) -> dict[int, list[str]]:
+    messages: dict[int, list[str]] = {}
+    for call in mock_bot.send_message.call_args_list:
+        messages.setdefault(call.kwargs["chat_id"], []).append(call.kwargs["text"])
+    return messages
+
+
+async def empty_stream():
+    return
+    yield
+
+
+def make_request(tenant_id: int, number: str, **fields) -> Request:
+    values = dict(
+        tenant_id=tenant_id,
+        number=number,
+        user_id=100001,
+        category="Ремонт",
+        description="Тест",
+        priority="normal",
+        status="new",
+    )
+    values.update(fields)
+    return Request(**values)
+
+
+class TestGroupByTenant:
+    """Тесты группировки потока"""
+
+    @pytest.mark.asyncio
+    async def test_groups_consecutive_rows(self):
+        async def rows():
+            for row in [(0, "a"), (0, "b"), (5, "c"), (7, "d"), (7, "e")]:
+                yield row
+
+        groups = [group async for group in group_by_tenant(rows())]
+
+        assert groups == [(0, ["a", "b"]), (5, ["c"]), (7, ["d", "e"])]
+
+
+class TestWarehouseMinimum:
+    """Тесты проверки минимальных остатков"""
+
+    @pytest.mark.asyncio
+    async def test_digest_per_tenant_and_recipients(self, automation_env, test_session_maker, mock_bot):
+        """Тенант 0 - технику из конфигурации, тенант руководителя - его техникам или ему самому"""
+        service, _config = automation_env
+        async with test_session_maker() as session:
+            session.add_all([User(id=uid, role="manager") for uid in (555, 666, 777)])
+            session.add(TechnicianAssignment(manager_id=555, technician_id=777))
+            session.add_all([
+                WarehouseItem(tenant_id=0, name="Лампы", current_quantity=1, min_quantity=5),
+                WarehouseItem(tenant_id=0, name="Бумага", current_quantity=50, min_quantity=5),
+                WarehouseItem(tenant_id=555, name="Мыло", current_quantity=0, min_quantity=2),
+                WarehouseItem(tenant_id=666, name="Клей", current_quantity=2, min_quantity=2),
+            ])
+            await session.commit()
+
+        await service.check_warehouse_minimum()
+
+        messages = sent_messages(mock_bot)
+        assert set(messages) == {999001, 777, 666}
+        assert "Лампы" in messages[999001][0] and "Бумага" not in messages[999001][0]
+        assert "Мыло" in messages[777][0]
+        assert "Клей" in messages[666][0]
+
+    @pytest.mark.asyncio
+    async def test_query_count_independent_of_tenants(self, automation_env, test_engine, test_session_maker, mock_bot):
+        """Один запрос позиций и один запрос получателей на пачку тенантов"""
+        service, _config = automation_env
+        async with test_session_maker() as session:
+            session.add_all(
+                WarehouseItem(tenant_id=tenant_id, name="Лампы", current_quantity=0, min_quantity=1)
+                for tenant_id in range(1, 31)
+            )
+            await session.commit()
+
+        statements = []
+
+        def on_execute(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith("SELECT"):
+                statements.append(statement)
+
+        event.listen(test_engine.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            await service.check_warehouse_minimum()
+        finally:
+            event.remove(test_engine.sync_engine, "before_cursor_execute", on_execute)
+
+        assert mock_bot.send_message.await_count == 30
+        assert len(statements) == 2
+
+
+class TestOldInProgressRequests:
+    """Тесты проверки зависших заявок"""
+
+    @pytest.mark.asyncio
+    async def test_demo_tenants_get_own_digest(self, automation_env, test_session_maker, mock_bot):
+        """В demo-режиме проверка не отключается: каждый руководитель получает сводку своего тенанта"""
+        service, config = automation_env
+        config.demo_mode = True
+        old = datetime.now() - timedelta(days=10)
+        async with test_session_maker() as session:
+            session.add(User(id=100001, role="employee"))
+            session.add_all([
+                make_request(555, "ЗХ-1", status="in_progress", updated_at=old),
+                make_request(555, "ЗХ-2", status="in_progress", updated_at=old),
+                make_request(666, "ЗХ-3", status="in_progress", updated_at=old),
+                make_request(666, "ЗХ-4", status="in_progress", updated_at=datetime.now()),  # взята недавно
+                make_request(777, "ЗХ-5", status="completed", updated_at=old),
+            ])
+            await session.commit()
+
+        await service.check_old_in_progress_requests()
+
+        messages = sent_messages(mock_bot)
+        assert set(messages) == {555, 666}
+        assert "ЗХ-1" in messages[555][0] and "ЗХ-2" in messages[555][0]
+        assert "ЗХ-3" in messages[666][0] and "ЗХ-4" not in messages[666][0]
+
+
+class TestDailyReport:
+    """Тесты ежедневного отчета"""
+
+    @pytest.mark.asyncio
+    async def test_reports_per_tenant(self, automation_env, test_session_maker, mock_bot):
+        """Тенант с заявками за вчера получает отчет; руководитель из конфигурации - всегда"""
+        service, _config = automation_env
+        moscow = pytz.timezone("Europe/Moscow")
+        yesterday = datetime.now(moscow).date() - timedelta(days=1)
+        async with test_session_maker() as session:
+            session.add(RequestDailyStat(
+                tenant_id=555, day=yesterday, status="new", priority="normal", category="Ремонт",
+                created=3, completed=0, rejected=0, taken=0,
+            ))
+            session.add(RequestDailyStat(
+                tenant_id=666, day=yesterday - timedelta(days=1), status="new", priority="normal", category="Ремонт",
+                created=1, completed=0, rejected=0, taken=0,
+            ))
+            await session.commit()
+
+        await service.send_daily_report_to_manager(moscow)
+
+        messages = sent_messages(mock_bot)
+        assert set(messages) == {999002, 555}
+        assert "Всего:</b> 3" in messages[555][0]
+        assert "Всего:</b> 0" in messages[999002][0]
+
+    @pytest.mark.asyncio
+    async def test_yesterday_in_scheduler_timezone(self, automation_env, mock_bot):
+        """01:00 2 марта по Москве - 1 марта по UTC: отчет за 1 марта, а не за 28 февраля"""
+        service, _ = automation_env
+        moscow = pytz.timezone("Europe/Moscow")
+        fire_time = datetime(2026, 3, 1, 22, 0, tzinfo=timezone.utc)
+
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return fire_time.astimezone(tz) if tz else fire_time.replace(tzinfo=None)
+
+        stream_totals = MagicMock(side_effect=lambda *args, **kwargs: empty_stream())
+        with patch("bot.services.request_stats_service.datetime", FrozenDatetime), \
+             patch("bot.services.automation_service.request_stats_service.stream_period_totals_by_tenant", stream_totals):
+            await service.send_daily_report_to_manager(moscow)
+
+        assert stream_totals.call_args.kwargs["start_day"] == date(2026, 3, 1)
+        assert stream_totals.call_args.kwargs["end_day"] == date(2026, 3, 1)
+        assert "01.03.2026" in sent_messages(mock_bot)[999002][0]
+
+
+class TestStockSnapshots:
+    """Тесты снимков остатков на начало месяца"""
+
+    @pytest.mark.asyncio
+    async def test_period_in_scheduler_timezone(self, automation_env):
+        """00:05 1 марта по Москве - 28 февраля по UTC: снимок на 1 марта 00:00 по Москве"""
+        service, _ = automation_env
+        moscow = pytz.timezone("Europe/Moscow")
+        fire_time = datetime(2026, 2, 28, 21, 5, tzinfo=timezone.utc)
+
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return fire_time.astimezone(tz) if tz else fire_time.replace(tzinfo=None)
+
+        create_snapshots = AsyncMock(return_value=0)
+        with patch("bot.services.automation_service.datetime", FrozenDatetime), \
+             patch("bot.services.automation_service.warehouse_ledger_service.create_snapshots", create_snapshots):
+            await service.create_stock_snapshots(moscow)
+
+        period_start = create_snapshots.call_args.args[1]
+        assert period_start == moscow.localize(datetime(2026, 3, 1))
+        assert period_start.astimezone(timezone.utc) == datetime(2026, 2, 28, 21, 0, tzinfo=timezone.utc)
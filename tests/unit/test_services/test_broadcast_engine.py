@@ -0,0 +1,210 @@
+"""
+Unit тесты для BroadcastEngine
+
+Тестируемые методы:
+- run_job() - постраничная отправка с сохранением прогресса
+- start() - продолжение незавершенных заданий после перезапуска
+- run_job() - задание, которое выполняет другая реплика, пропускается
+- start() - ошибка проверки блокировки задания - повтор, а не пропуск
+- format_broadcast_progress() - текст сообщения с прогрессом
+"""
+import contextlib
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import select
+
+from bot.database.models import User, BroadcastJob, BroadcastDelivery
+from bot.database.advisory_lock import AdvisoryLockError, try_advisory_lock
+from bot.services.broadcast_engine import BroadcastEngine, format_broadcast_progress, JOB_LOCK_PREFIX
+
+
+def make_bot(failing_ids=()):
+    """Мок бота: send_message падает для failing_ids"""
+    bot = MagicMock()
+
+    async def send_message(chat_id, **kwargs):
+        if chat_id in failing_ids:
+            raise RuntimeError("Forbidden: bot was blocked by the user")
+        return MagicMock()
+
+    bot.send_message = AsyncMock(side_effect=send_message)
+    bot.edit_message_text = AsyncMock()
+    return bot
+
+
+async def create_employees(session_maker, ids):
+    async with session_maker() as session:
+        session.add_all([User(id=user_id, role="employee") for user_id in ids])
+        await session.commit()
+
+
+async def create_job(session_maker, **kwargs):
+    async with session_maker() as session:
+        job = BroadcastJob(
+            tenant_id=0,
+            author_id=999001,
+            text="Плановое отключение воды",
+            total=kwargs.pop("total", 0),
+            progress_chat_id=999001,
+            progress_message_id=42,
+            **kwargs
+        )
+        session.add(job)
+        await session.commit()
+        return job.id
+
+
+class TestBroadcastEngineRunJob:
+    """Тесты выполнения задания"""
+
+    @pytest.mark.asyncio
+    async def test_run_job_sends_all_pages(self, test_session_maker, mock_config):
+        """Все получатели обрабатываются страницами, курсор и счетчики сохраняются"""
+        await create_employees(test_session_maker, range(100001, 100008))
+        job_id = await create_job(test_session_maker, total=7)
+        bot = make_bot(failing_ids={100003})
+        engine = BroadcastEngine(bot, chunk_size=3, progress_interval=0)
+
+        with patch("bot.services.broadcast_engine.async_session_maker", test_session_maker):
+            await engine.run_job(job_id)
+
+        assert bot.send_message.await_count == 7
+        async with test_session_maker() as session:
+            job = await session.get(BroadcastJob, job_id)
+            assert job.status == "completed"
+            assert job.finished_at is not None
+            assert job.sent_count == 6
+            assert job.failed_count == 1
+            assert job.last_recipient_id == 100007
+
+            result = await session.execute(
+                select(BroadcastDelivery.user_id, BroadcastDelivery.status)
+                .where(BroadcastDelivery.job_id == job_id)
+            )
+            statuses = dict(result.all())
+        assert len(statuses) == 7
+        assert statuses[100003] == "failed"
+        assert list(statuses.values()).count("sent") == 6
+
+        # Прогресс редактируется в одном и том же сообщении
+        last_edit = bot.edit_message_text.await_args
+        assert last_edit.kwargs["message_id"] == 42
+        assert "Рассылка завершена" in last_edit.kwargs["text"]
+
+    @pytest.mark.asyncio
+    async def test_run_job_resumes_from_checkpoint(self, test_session_maker, mock_config):
+        """После перезапуска отправляются только неотправленные получатели"""
+        await create_employees(test_session_maker, range(100001, 100006))
+        # До перезапуска: страница 100001-100002 отправлена, 100003 зарегистрирован, но не отправлен
+        job_id = await create_job(
+            test_session_maker, total=5, status="running", sent_count=2, last_recipient_id=100003
+        )
+        async with test_session_maker() as session:
+            session.add_all([
+                BroadcastDelivery(job_id=job_id, user_id=100001, status="sent"),
+                BroadcastDelivery(job_id=job_id, user_id=100002, status="sent"),
+                BroadcastDelivery(job_id=job_id, user_id=100003, status="pending"),
+            ])
+            await session.commit()
+
+        bot = make_bot()
+        engine = BroadcastEngine(bot, chunk_size=10)
+
+        with patch("bot.services.broadcast_engine.async_session_maker", test_session_maker):
+            await engine.start()
+            await engine._tasks[job_id]
+
+        recipients = [call.kwargs["chat_id"] for call in bot.send_message.await_args_list]
+        assert sorted(recipients) == [100003, 100004, 100005]
+
+        async with test_session_maker() as session:
+            job = await session.get(BroadcastJob, job_id)
+            assert job.status == "completed"
+            assert job.sent_count == 5
+
+    @pytest.mark.asyncio
+    async def test_completed_job_is_not_resumed(self, test_session_maker, mock_config):
+        """Завершенные задания при старте не запускаются"""
+        await create_employees(test_session_maker, [100001])
+        await create_job(test_session_maker, total=1, status="completed")
+        bot = make_bot()
+        engine = BroadcastEngine(bot)
+
+        with patch("bot.services.broadcast_engine.async_session_maker", test_session_maker):
+            await engine.start()
+
+        assert engine.stats()["active_jobs"] == 0
+        bot.send_message.assert_not_awaited()
+
+
+class TestBroadcastEngineReplicas:
+    """Тесты выполнения задания при нескольких репликах"""
+
+    @pytest.mark.asyncio
+    async def test_job_locked_by_other_replica_is_skipped(self, test_session_maker, mock_config):
+        """Пока блокировку задания держит другая реплика, задание не выполняется"""
+        await create_employees(test_session_maker, [100001, 100002])
+        job_id = await create_job(test_session_maker, total=2, status="running")
+        bot = make_bot()
+        engine = BroadcastEngine(bot)
+
+        with patch("bot.services.broadcast_engine.async_session_maker", test_session_maker):
+            async with try_advisory_lock(f"{JOB_LOCK_PREFIX}{job_id}") as acquired:
+                assert acquired is True
+                await engine.run_job(job_id)
+
+        bot.send_message.assert_not_awaited()
+        async with test_session_maker() as session:
+            job = await session.get(BroadcastJob, job_id)
+            assert job.status == "running"
+            assert job.sent_count == 0
+
+    @pytest.mark.asyncio
+    async def test_lock_error_retries_job(self, test_session_maker, mock_config):
+        """Ошибка проверки блокировки - задание запускается повторно"""
+        await create_employees(test_session_maker, [100001])
+        job_id = await create_job(test_session_maker, total=1, status="running")
+        bot = make_bot()
+        engine = BroadcastEngine(bot)
+        attempts = []
+
+        @contextlib.asynccontextmanager
+        async def flaky_lock(name, bind=None):
+            attempts.append(name)
+            if len(attempts) == 1:
+                raise AdvisoryLockError("connection refused")
+            async with try_advisory_lock(name, bind) as acquired:
+                yield acquired
+
+        with patch("bot.services.broadcast_engine.async_session_maker", test_session_maker), \
+             patch("bot.services.broadcast_engine.try_advisory_lock", flaky_lock), \
+             patch("bot.services.broadcast_engine.LOCK_RETRY_SECONDS", 0.01):
+            await engine.start()
+            await engine._tasks[job_id]
+
+        assert attempts == [f"{JOB_LOCK_PREFIX}{job_id}"] * 2
+        bot.send_message.assert_awaited_once()
+        async with test_session_maker() as session:
+            job = await session.get(BroadcastJob, job_id)
+            assert job.status == "completed"
+
+
+class TestFormatBroadcastProgress:
+    """Тесты текста прогресса"""
+
+    def test_progress_running(self):
+        job = BroadcastJob(status="running", total=10, sent_count=3, failed_count=1)
+
+        text = format_broadcast_progress(job)
+
+        assert "выполняется" in text
+        assert "4 из 10" in text
+        assert "Ошибок: 1" in text
+
+    def test_progress_completed_without_errors(self):
+        job = BroadcastJob(status="completed", total=2, sent_count=2, failed_count=0)
+
+        text = format_broadcast_progress(job)
+
+        assert "завершена" in text
+        assert "Ошибок" not in text
@@ -0,0 +1,76 @@
+"""
+Unit тесты для IdentityCache
+
+Тестируемые методы:
+- get() / put() - чтение и запись
+- вытеснение по LRU при превышении размера
+- истечение TTL
+- invalidate() - инвалидация записи
+"""
+import pytest
+from unittest.mock import patch
+
+from bot.services.identity_cache import IdentityCache, UserIdentity
+
+
+def _identity(role: str = "employee") -> UserIdentity:
+    return UserIdentity(role=role, active_role=role, tenant_id=0)
+
+
+class TestIdentityCache:
+    """Тесты кэша идентичности"""
+    
+    def test_put_and_get(self):
+        """Сохраненная запись возвращается"""
+        cache = IdentityCache()
+        identity = _identity("manager")
+        
+        cache.put(1, identity)
+        
+        assert cache.get(1) == identity
+        assert cache.hits == 1
+    
+    def test_missing_returns_none(self):
+        """Отсутствующая запись - промах"""
+        cache = IdentityCache()
+        
+        assert cache.get(1) is None
+        assert cache.misses == 1
+    
+    def test_lru_eviction(self):
+        """При переполнении вытесняется давно неиспользуемая запись"""
+        cache = IdentityCache(max_size=2)
+        cache.put(1, _identity())
+        cache.put(2, _identity())
+        
+        # Обращение к 1 делает её "свежей"
+        cache.get(1)
+        cache.put(3, _identity())
+        
+        assert len(cache) == 2
+        assert cache.get(2) is None
+        assert cache.get(1) is not None
+        assert cache.get(3) is not None
+    
+    def test_ttl_expiry(self):
+        """Запись с истекшим TTL не возвращается"""
+        cache = IdentityCache(ttl_seconds=10)
+        
+        with patch("bot.services.identity_cache.time.monotonic", return_value=100.0):
+            cache.put(1, _identity())
+        with patch("bot.services.identity_cache.time.monotonic", return_value=105.0):
+            assert cache.get(1) is not None
+        with patch("bot.services.identity_cache.time.monotonic", return_value=111.0):
+            assert cache.get(1) is None
+        
+        assert len(cache) == 0
+    
+    def test_invalidate(self):
+        """Инвалидация удаляет запись"""
+        cache = IdentityCache()
+        cache.put(1, _identity())
+        
+        cache.invalidate(1)
+        cache.invalidate(2)  # несуществующая запись - без ошибки
+        
+        assert cache.get(1) is None
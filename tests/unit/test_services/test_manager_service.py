@@ -0,0 +1,223 @@
+"""
+Unit тесты для ManagerService
+
+Тестируемые методы:
+- get_period_report() - отчет за период из дневной статистики (rollup)
+- get_period_report_from_requests() - отчет за период одним агрегирующим запросом
+- rollup при параллельной смене статуса одной заявки
+"""
+import asyncio
+import time
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, and_
+
+from bot.services.manager_service import ManagerService
+from bot.services.request_service import RequestService
+from bot.services.request_stats_service import request_stats_service
+from bot.services.warehouseman_service import WarehousemanService
+from bot.database.models import User, Request, RequestDailyStat
+from tests.fixtures.database import StatementCounter
+
+
+def make_request(number: str, status: str, created_at: datetime, **kwargs) -> Request:
+    return Request(
+        tenant_id=kwargs.pop("tenant_id", 0),
+        number=number,
+        user_id=100001,
+        category="Ремонт",
+        description="Тест",
+        priority="normal",
+        status=status,
+        created_at=created_at,
+        updated_at=kwargs.pop("updated_at", created_at),
+        **kwargs
+    )
+
+
+async def legacy_period_report(session, tenant_id: int, start_date: datetime, end_date: datetime) -> dict:
+    """Прежняя реализация: отдельный COUNT на каждый счетчик (эталон для сравнения)"""
+    async def count(*conditions):
+        result = await session.execute(select(func.count(Request.id)).where(and_(Request.tenant_id == tenant_id, *conditions)))
+        return result.scalar() or 0
+
+    return {
+        'new': await count(Request.status == "new", Request.created_at >= start_date, Request.created_at <= end_date),
+        'in_progress': await count(Request.status == "in_progress", Request.created_at >= start_date, Request.created_at <= end_date),
+        'completed': await count(Request.status == "completed", Request.completed_at >= start_date, Request.completed_at <= end_date),
+        'rejected': await count(Request.status == "rejected", Request.updated_at >= start_date, Request.updated_at <= end_date),
+        'total': await count(Request.created_at >= start_date, Request.created_at <= end_date),
+    }
+
+
+@pytest.fixture
+async def period_requests(test_session):
+    """Заявки разных статусов внутри и вне периода"""
+    now = datetime.now()
+    old = now - timedelta(days=30)
+    test_session.add_all([
+        make_request("ЗХ-1", "new", now),
+        make_request("ЗХ-2", "new", now),
+        make_request("ЗХ-3", "in_progress", now),
+        make_request("ЗХ-4", "completed", now, completed_at=now),
+        make_request("ЗХ-5", "completed", old, completed_at=now),  # Создана раньше, выполнена в периоде
+        make_request("ЗХ-6", "rejected", old, updated_at=now),
+        make_request("ЗХ-7", "new", old),  # Вне периода
+        make_request("ЗХ-8", "new", now, tenant_id=1),  # Другой тенант
+    ])
+    await test_session.flush()
+    return now - timedelta(days=1), now + timedelta(days=1)
+
+
+class TestManagerServicePeriodReport:
+    """Тесты отчета за период"""
+
+    @pytest.mark.asyncio
+    async def test_period_report_counts(self, test_session, period_requests):
+        """Счетчики считаются по своим датам и только для тенанта"""
+        start_date, end_date = period_requests
+
+        report = await ManagerService().get_period_report_from_requests(test_session, tenant_id=0, start_date=start_date, end_date=end_date)
+
+        assert report == {'new': 2, 'in_progress': 1, 'completed': 2, 'rejected': 1, 'total': 4}
+
+    @pytest.mark.asyncio
+    async def test_period_report_empty(self, test_session):
+        """Нет заявок - нули, а не None"""
+        now = datetime.now()
+
+        report = await ManagerService().get_period_report_from_requests(test_session, tenant_id=0, start_date=now - timedelta(days=1), end_date=now)
+
+        assert report == {'new': 0, 'in_progress': 0, 'completed': 0, 'rejected': 0, 'total': 0}
+
+    @pytest.mark.asyncio
+    async def test_period_report_round_trips(self, test_engine, test_session, period_requests):
+        """Микро-бенчмарк: один запрос вместо пяти, результат совпадает с прежней реализацией"""
+        start_date, end_date = period_requests
+        service = ManagerService()
+        iterations = 20
+
+        with StatementCounter(test_engine) as legacy_counter:
+            legacy_started = time.perf_counter()
+            for _ in range(iterations):
+                expected = await legacy_period_report(test_session, 0, start_date, end_date)
+            legacy_elapsed = time.perf_counter() - legacy_started
+
+        with StatementCounter(test_engine) as counter:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                report = await service.get_period_report_from_requests(test_session, tenant_id=0, start_date=start_date, end_date=end_date)
+            elapsed = time.perf_counter() - started
+
+        print(
+            f"\nget_period_report x{iterations}: "
+            f"{legacy_counter.count} запросов / {legacy_elapsed * 1000:.1f} мс -> "
+            f"{counter.count} запросов / {elapsed * 1000:.1f} мс"
+        )
+        assert report == expected
+        assert legacy_counter.count == 5 * iterations
+        assert counter.count == iterations
+
+
+class TestManagerServicePeriodReportRollup:
+    """Тесты отчета за период по rollup request_daily_stats"""
+
+    @pytest.mark.asyncio
+    async def test_rollup_follows_transitions(self, test_session, test_user):
+        """Создание и смена статусов обновляют rollup так же, как меняется таблица requests"""
+        request_service = RequestService()
+        warehouseman_service = WarehousemanService()
+
+        created = []
+        for priority in ("normal", "urgent", "normal", "normal"):
+            created.append(await request_service.create_request(
+                test_session, tenant_id=0, user_id=test_user.id,
+                category="Ремонт", description="Тест", priority=priority
+            ))
+
+        await warehouseman_service.take_request_in_work(test_session, tenant_id=0, request_id=created[0].id)
+        await warehouseman_service.take_request_in_work(test_session, tenant_id=0, request_id=created[1].id)
+        await warehouseman_service.complete_request(test_session, tenant_id=0, request_id=created[1].id)
+        await warehouseman_service.reject_request(test_session, tenant_id=0, request_id=created[2].id, reason="Дубль")
+
+        now = datetime.now()
+        start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_date = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+        report = await ManagerService().get_period_report(test_session, tenant_id=0, start_date=start_date, end_date=end_date)
+
+        assert report == {'new': 1, 'in_progress': 1, 'completed': 1, 'rejected': 1, 'total': 4}
+
+        result = await test_session.execute(select(func.sum(RequestDailyStat.taken)))
+        assert result.scalar() == 2
+
+    @pytest.mark.asyncio
+    async def test_parallel_transitions_counted_once(self, test_file_session_maker):
+        """Параллельные нажатия по одной заявке: выполняется один переход, rollup учитывает его один раз"""
+        warehouseman_service = WarehousemanService()
+
+        async with test_file_session_maker() as session:
+            session.add(User(id=100001, role="employee"))
+            request = await RequestService().create_request(
+                session, tenant_id=0, user_id=100001,
+                category="Ремонт", description="Тест", priority="urgent"
+            )
+            await session.commit()
+            request_id = request.id
+
+        async def click(action: str) -> bool:
+            async with test_file_session_maker() as session:
+                if action == "take":
+                    updated = await warehouseman_service.take_request_in_work(session, tenant_id=0, request_id=request_id)
+                elif action == "complete":
+                    updated = await warehouseman_service.complete_request(session, tenant_id=0, request_id=request_id)
+                else:
+                    updated = await warehouseman_service.reject_request(session, tenant_id=0, request_id=request_id, reason="Дубль")
+                await session.commit()
+                return updated is not None
+
+        taken = await asyncio.gather(*(click("take") for _ in range(10)))
+        finished = await asyncio.gather(*(click(action) for action in ("complete", "reject") * 5))
+
+        assert sum(taken) == 1
+        assert sum(finished) == 1
+
+        async with test_file_session_maker() as session:
+            stored = await session.get(Request, request_id)
+            result = await session.execute(select(
+                func.sum(RequestDailyStat.created),
+                func.sum(RequestDailyStat.taken),
+                func.sum(RequestDailyStat.completed) + func.sum(RequestDailyStat.rejected),
+            ))
+            created, taken_count, finished_count = result.one()
+            by_status = dict((await session.execute(
+                select(RequestDailyStat.status, func.sum(RequestDailyStat.created))
+                .group_by(RequestDailyStat.status)
+            )).all())
+
+        assert (created, taken_count, finished_count) == (1, 1, 1)
+        assert by_status[stored.status] == 1
+        assert by_status["new"] == 0 and by_status["in_progress"] == 0
+
+    @pytest.mark.asyncio
+    async def test_rebuild_matches_requests(self, test_session, period_requests):
+        """Пересчет rollup по requests дает тот же отчет, что и прямой подсчет"""
+        start_date, end_date = period_requests
+        service = ManagerService()
+
+        await request_stats_service.rebuild(test_session)
+
+        report = await service.get_period_report(test_session, tenant_id=0, start_date=start_date, end_date=end_date)
+        expected = await service.get_period_report_from_requests(test_session, tenant_id=0, start_date=start_date, end_date=end_date)
+        assert report == expected
+
+    @pytest.mark.asyncio
+    async def test_rollup_report_is_single_query(self, test_engine, test_session, period_requests):
+        """Отчет по rollup - один запрос"""
+        start_date, end_date = period_requests
+        await request_stats_service.rebuild(test_session)
+
+        with StatementCounter(test_engine) as counter:
+            await ManagerService().get_period_report(test_session, tenant_id=0, start_date=start_date, end_date=end_date)
+
+        assert counter.count == 1
@@ -0,0 +1,301 @@
+"""
+Unit тесты для NotificationOutbox и NotificationRelay
+
+Тестируемые методы:
+- enqueue_*() - запись уведомления в транзакции вызывающего кода
+- claim_batch() - захват пачки с арендой
+- NotificationRelay.run_once() - отправка и пометка отправленных / повтор
+- NotificationRelay.run_once() - ошибка Bot API не помечает строку отправленной
+- NotificationRelay.run_once() - аренда продлевается, пока пачка отправляется дольше аренды
+- NotificationRelay.purge_once() - удаление давно отправленных строк
+- NotificationRelay.run_once() - эскалация SLA не отправляется, если заявку уже взяли
+- NotificationRelay.run_once() - одно оповещение о низком остатке на все позиции тенанта
+- NotificationRelay.run_once() - при ошибке отправки позиции не отмечаются оповещенными
+"""
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+from sqlalchemy import select
+
+from bot.database.models import User, Request, NotificationOutboxMessage, WarehouseItem
+from bot.services.outbound_dispatcher import OutboundDispatcher
+from bot.services.notification_outbox import (
+    NotificationRelay,
+    notification_outbox,
+    KIND_REQUEST_STATUS_CHANGED,
+    KIND_URGENT_REQUEST_OVERDUE,
+    KIND_LOW_STOCK_ALERT,
+    RELAY_MAX_ATTEMPTS,
+    SENT_RETENTION_DAYS,
+)
+
+
+async def create_request(session_maker) -> int:
+    async with session_maker() as session:
+        session.add(User(id=100001, role="employee"))
+        request = Request(
+            tenant_id=0,
+            number="ЗХ-010126-001",
+            user_id=100001,
+            category="Ремонт",
+            description="Сломан стул",
+            priority="normal",
+            status="in_progress",
+        )
+        session.add(request)
+        await session.flush()
+        await notification_outbox.enqueue_request_status_changed(session, request, "В работе")
+        await session.commit()
+        return request.id
+
+
+async def get_outbox(session_maker) -> list[NotificationOutboxMessage]:
+    async with session_maker() as session:
+        result = await session.execute(select(NotificationOutboxMessage))
+        return list(result.scalars().all())
+
+
+class TestNotificationOutbox:
+    """Тесты записи в outbox"""
+
+    @pytest.mark.asyncio
+    async def test_enqueue_is_part_of_transaction(self, test_session_maker):
+        """Откат транзакции отменяет и уведомление"""
+        async with test_session_maker() as session:
+            request = Request(
+                tenant_id=0, number="ЗХ-010126-002", user_id=100001,
+                category="Ремонт", description="Тест", priority="normal", status="new"
+            )
+            session.add(request)
+            await session.flush()
+            await notification_outbox.enqueue_new_request(session, request)
+            await session.rollback()
+
+        assert await get_outbox(test_session_maker) == []
+
+    @pytest.mark.asyncio
+    async def test_enqueue_status_changed_payload(self, test_session_maker):
+        """Уведомление хранит ID заявки и текст статуса"""
+        request_id = await create_request(test_session_maker)
+
+        messages = await get_outbox(test_session_maker)
+
+        assert len(messages) == 1
+        assert messages[0].kind == KIND_REQUEST_STATUS_CHANGED
+        assert messages[0].payload == {"request_id": request_id, "status_text": "В работе"}
+        assert messages[0].status == "pending"
+
+    @pytest.mark.asyncio
+    async def test_claim_batch_takes_lease(self, test_session_maker):
+        """Захваченные строки не выдаются повторно до истечения аренды"""
+        await create_request(test_session_maker)
+
+        async with test_session_maker() as session:
+            claimed = await notification_outbox.claim_batch(session)
+        async with test_session_maker() as session:
+            claimed_again = await notification_outbox.claim_batch(session)
+
+        assert len(claimed) == 1
+        assert claimed[0].attempts == 1
+        assert claimed_again == []
+
+
+class TestNotificationRelay:
+    """Тесты relay"""
+
+    @pytest.mark.asyncio
+    async def test_run_once_delivers_and_marks_sent(self, test_session_maker, mock_bot):
+        """Уведомление отправляется и помечается sent"""
+        request_id = await create_request(test_session_maker)
+        relay = NotificationRelay(mock_bot)
+        relay.notification_service.notify_employee_request_status_changed = AsyncMock()
+
+        with patch("bot.services.notification_outbox.async_session_maker", test_session_maker):
+            processed = await relay.run_once()
+            processed_again = await relay.run_once()
+
+        assert processed == 1
+        assert processed_again == 0
+        notify = relay.notification_service.notify_employee_request_status_changed
+        notify.assert_awaited_once()
+        assert notify.call_args.args[0].id == request_id
+        assert notify.call_args.args[1] == "В работе"
+
+        messages = await get_outbox(test_session_maker)
+        assert messages[0].status == "sent"
+        assert messages[0].sent_at is not None
+
+    @pytest.mark.asyncio
+    async def test_run_once_reschedules_on_error(self, test_session_maker, mock_bot):
+        """Ошибка отправки - повтор позже, после исчерпания попыток - failed"""
+        await create_request(test_session_maker)
+        relay = NotificationRelay(mock_bot)
+        relay.notification_service.notify_employee_request_status_changed = AsyncMock(side_effect=RuntimeError("boom"))
+
+        with patch("bot.services.notification_outbox.async_session_maker", test_session_maker):
+            await relay.run_once()
+
+        message = (await get_outbox(test_session_maker))[0]
+        assert message.status == "pending"
+        assert message.last_error == "boom"
+        assert message.attempts == 1
+
+        # Последняя попытка
+        async with test_session_maker() as session:
+            stored = await session.get(NotificationOutboxMessage, message.id)
+            stored.attempts = RELAY_MAX_ATTEMPTS - 1
+            stored.available_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+            await session.commit()
+
+        with patch("bot.services.notification_outbox.async_session_maker", test_session_maker):
+            await relay.run_once()
+
+        message = (await get_outbox(test_session_maker))[0]
+        assert message.status == "failed"
+        assert relay.stats()["failed"] == 2
+
+    @pytest.mark.asyncio
+    async def test_bot_api_error_schedules_retry(self, test_session_maker, mock_bot):
+        """Ошибка самого Bot API доходит до relay: строка не помечается sent"""
+        await create_request(test_session_maker)
+        mock_bot.send_message = AsyncMock(side_effect=RuntimeError("chat not found"))
+        relay = NotificationRelay(mock_bot)
+
+        with patch("bot.services.notification_outbox.async_session_maker", test_session_maker):
+            await relay.run_once()
+
+        mock_bot.send_message.assert_awaited_once()
+        message = (await get_outbox(test_session_maker))[0]
+        assert message.status == "pending"
+        assert message.sent_at is None
+        assert message.last_error == "chat not found"
+        assert relay.stats()["sent"] == 0
+
+    @pytest.mark.asyncio
+    async def test_slow_batch_keeps_lease(self, test_file_session_maker, mock_bot):
+        """Отправка дольше аренды: другая реплика не захватывает строку повторно"""
+        await create_request(test_file_session_maker)
+        sending = asyncio.Event()
+
+        async def slow_notify(*args):
+            sending.set()
+            await asyncio.sleep(0.6)
+
+        relay = NotificationRelay(mock_bot)
+        relay.notification_service.notify_employee_request_status_changed = AsyncMock(side_effect=slow_notify)
+        other_relay = NotificationRelay(mock_bot)
+        other_relay.notification_service.notify_employee_request_status_changed = AsyncMock()
+
+        with patch("bot.services.notification_outbox.async_session_maker", test_file_session_maker), \
+                patch("bot.services.notification_outbox.RELAY_LEASE_SECONDS", 0.2), \
+                patch("bot.services.notification_outbox.RELAY_LEASE_RENEW_SECONDS", 0.05):
+            batch = asyncio.create_task(relay.run_once())
+            await sending.wait()
+            # Аренда из claim_batch уже истекла бы, но продлена
+            await asyncio.sleep(0.4)
+            claimed_by_other = await other_relay.run_once()
+            processed = await batch
+
+        assert processed == 1
+        assert claimed_by_other == 0
+        other_relay.notification_service.notify_employee_request_status_changed.assert_not_awaited()
+        message = (await get_outbox(test_file_session_maker))[0]
+        assert message.status == "sent"
+        assert message.attempts == 1
+
+    @pytest.mark.asyncio
+    async def test_purge_removes_old_sent_rows(self, test_session_maker, mock_bot):
+        """Удаляются только отправленные строки старше срока хранения"""
+        async with test_session_maker() as session:
+            old = datetime.now(timezone.utc) - timedelta(days=SENT_RETENTION_DAYS + 1)
+            session.add_all([
+                NotificationOutboxMessage(kind=KIND_REQUEST_STATUS_CHANGED, payload={}, status="sent", sent_at=old),
+                NotificationOutboxMessage(kind=KIND_REQUEST_STATUS_CHANGED, payload={}, status="sent", sent_at=datetime.now(timezone.utc)),
+                NotificationOutboxMessage(kind=KIND_REQUEST_STATUS_CHANGED, payload={}, status="failed"),
+                NotificationOutboxMessage(kind=KIND_REQUEST_STATUS_CHANGED, payload={}),
+            ])
+            await session.commit()
+        relay = NotificationRelay(mock_bot)
+
+        with patch("bot.services.notification_outbox.async_session_maker", test_session_maker):
+            assert await relay.purge_once() == 1
+
+        statuses = sorted(message.status for message in await get_outbox(test_session_maker))
+        assert statuses == ["failed", "pending", "sent"]
+
+    @pytest.mark.asyncio
+    async def test_overdue_skipped_if_request_taken(self, test_session_maker, mock_bot):
+        """Эскалация SLA уходит, только если заявка все еще новая"""
+        request_id = await create_request(test_session_maker)  # заявка уже в работе
+        async with test_session_maker() as session:
+            await notification_outbox.enqueue_urgent_request_overdue(session, request_id, tenant_id=0)
+            await session.commit()
+        relay = NotificationRelay(mock_bot)
+        relay.notification_service.notify_employee_request_status_changed = AsyncMock()
+        relay.notification_service.notify_manager_urgent_request_overdue = AsyncMock()
+
+        with patch("bot.services.notification_outbox.async_session_maker", test_session_maker):
+            await relay.run_once()
+
+        relay.notification_service.notify_manager_urgent_request_overdue.assert_not_awaited()
+        overdue = [message for message in await get_outbox(test_session_maker) if message.kind == KIND_URGENT_REQUEST_OVERDUE]
+        assert overdue[0].status == "sent"
+
+    @pytest.mark.asyncio
+    async def test_low_stock_alert_lists_unalerted_items(self, test_session_maker, mock_bot):
+        """Оповещение отправляет все неоповещенные позиции тенанта одним сообщением и отмечает их"""
+        async with test_session_maker() as session:
+            session.add_all([
+                WarehouseItem(tenant_id=0, name="Мыло", current_quantity=0, min_quantity=2),
+                WarehouseItem(tenant_id=0, name="Клей", current_quantity=1, min_quantity=1),
+                WarehouseItem(tenant_id=0, name="Бумага", current_quantity=50, min_quantity=5),
+            ])
+            await notification_outbox.enqueue_low_stock_alert(session, tenant_id=0)
+            await notification_outbox.enqueue_low_stock_alert(session, tenant_id=0)  # объединяется с первым
+            await session.flush()
+            for message in await session.execute(select(NotificationOutboxMessage)):
+                message[0].available_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+            await session.commit()
+
+        relay = NotificationRelay(mock_bot)
+        with patch("bot.services.notification_outbox.async_session_maker", test_session_maker):
+            assert await relay.run_once() == 1
+
+        mock_bot.send_message.assert_awaited_once()
+        call = mock_bot.send_message.call_args
+        assert call.kwargs["chat_id"] == 999001
+        assert "Мыло" in call.kwargs["text"] and "Клей" in call.kwargs["text"]
+        assert "Бумага" not in call.kwargs["text"]
+
+        async with test_session_maker() as session:
+            items = (await session.execute(select(WarehouseItem).where(WarehouseItem.current_quantity <= 1))).scalars().all()
+            assert all(item.low_stock_alerted_at is not None for item in items)
+
+    @pytest.mark.asyncio
+    async def test_low_stock_alert_failed_send_keeps_items_unalerted(self, test_session_maker, mock_bot):
+        """Ошибка отправки через очередь диспетчера: позиции остаются неоповещенными, строка outbox уходит на повтор"""
+        async with test_session_maker() as session:
+            session.add(WarehouseItem(tenant_id=0, name="Мыло", current_quantity=0, min_quantity=2))
+            await notification_outbox.enqueue_low_stock_alert(session, tenant_id=0)
+            message = (await session.execute(select(NotificationOutboxMessage))).scalar_one()
+            message.available_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+            await session.commit()
+
+        mock_bot.send_message = AsyncMock(side_effect=RuntimeError("bot was blocked"))
+        dispatcher = OutboundDispatcher(mock_bot, workers=1)
+        await dispatcher.start()
+        relay = NotificationRelay(mock_bot)
+        with patch("bot.services.notification_outbox.async_session_maker", test_session_maker), \
+                patch("bot.services.outbound_dispatcher._dispatcher", dispatcher):
+            await relay.run_once()
+        await dispatcher.stop()
+
+        mock_bot.send_message.assert_awaited_once()
+        message = (await get_outbox(test_session_maker))[0]
+        assert message.status == "pending"
+        assert message.last_error == "bot was blocked"
+
+        async with test_session_maker() as session:
+            item = (await session.execute(select(WarehouseItem))).scalar_one()
+            assert item.low_stock_alerted_at is None
@@ -54,8 +54,9 @@ class TestNotificationServiceWarehousemanNewRequest:
         assert call_args.kwargs['parse_mode'] == "HTML"
     
     @pytest.mark.asyncio
-    async def test_notify_warehouseman_new_request_handles_error(self, mock_bot, mock_config):
-        """Ошибка отправки не прерывает выполнение"""
+    async def test_notify_warehouseman_new_request_raises_on_error(self, mock_bot, mock_config):
+        """Ошибка отправки пробрасывается (relay outbox повторит уведомление)"""
+        mock_config.demo_mode = False
         service = NotificationService(mock_bot)
         service.config = mock_config
         
@@ -76,10 +77,39 @@ class TestNotificationServiceWarehousemanNewRequest:
         request.rejection_reason = None
         request.photos = []
         
-        with patch('bot.utils.request_formatter.format_request_full', return_value="Текст"):
-            with patch('bot.keyboards.inline.get_request_actions_keyboard', return_value=MagicMock()):
-                # Не должно выбрасывать исключение
-                await service.notify_warehouseman_new_request(request)
+        with patch.object(service, '_get_user_full_info', AsyncMock(return_value=("Иван", "@ivan"))):
+            with patch('bot.utils.request_formatter.format_request_full', return_value="Текст"):
+                with patch('bot.keyboards.inline.get_request_actions_keyboard', return_value=MagicMock()):
+                    with pytest.raises(Exception, match="Network error"):
+                        await service.notify_warehouseman_new_request(request)
+
+
+    @pytest.mark.asyncio
+    async def test_notify_warehouseman_new_request_sends_album(self, mock_bot, mock_config):
+        """Заявка с фото отправляется альбомом и сообщением с кнопками - 2 вызова API"""
+        mock_config.demo_mode = False
+        service = NotificationService(mock_bot)
+        service.config = mock_config
+        
+        request = MagicMock(spec=Request)
+        request.id = 1
+        request.user_id = 100001
+        request._cached_photo_file_ids = ["p1", "p2", "p3", "p4", "p5"]
+        keyboard = MagicMock()
+        
+        with patch.object(service, '_get_user_full_info', AsyncMock(return_value=("Иван", "@ivan"))):
+            with patch('bot.utils.request_formatter.format_request_full', return_value="Форматированная заявка"):
+                with patch('bot.keyboards.inline.get_request_actions_keyboard', return_value=keyboard):
+                    await service.notify_warehouseman_new_request(request)
+        
+        mock_bot.send_photo.assert_not_called()
+        mock_bot.send_media_group.assert_awaited_once()
+        media = mock_bot.send_media_group.call_args.kwargs['media']
+        assert len(media) == 5
+        assert "Новая заявка" in media[0].caption
+        
+        mock_bot.send_message.assert_awaited_once()
+        assert mock_bot.send_message.call_args.kwargs['reply_markup'] is keyboard
 
 
 class TestNotificationServiceManagerComplaint:
@@ -118,8 +148,9 @@ class TestNotificationServiceManagerComplaint:
         assert "⚠️" in call_args.kwargs['text'] or "Жалоба" in call_args.kwargs['text']
     
     @pytest.mark.asyncio
-    async def test_notify_manager_complaint_handles_error(self, mock_bot, mock_config):
-        """Ошибка не прерывает выполнение"""
+    async def test_notify_manager_complaint_raises_on_error(self, mock_bot, mock_config):
+        """Ошибка отправки пробрасывается (relay outbox повторит уведомление)"""
+        mock_config.demo_mode = False
         service = NotificationService(mock_bot)
         service.config = mock_config
         
@@ -141,8 +172,10 @@ class TestNotificationServiceManagerComplaint:
         request.description = "Тест"
         request.created_at = datetime.now()
         
-        with patch('bot.utils.request_formatter.format_request_short', return_value="Текст"):
-            await service.notify_manager_complaint(complaint, request)
+        with patch.object(service, '_get_user_name', AsyncMock(return_value="Иван")):
+            with patch('bot.utils.request_formatter.format_request_short', return_value="Текст"):
+                with pytest.raises(Exception, match="Error"):
+                    await service.notify_manager_complaint(complaint, request)
 
 
 class TestNotificationServiceWarehousemanComplaint:
@@ -227,8 +260,8 @@ class TestNotificationServiceEmployeeStatusChanged:
         assert "Нет в наличии" in call_args.kwargs['text']
     
     @pytest.mark.asyncio
-    async def test_notify_employee_handles_error(self, mock_bot, mock_config):
-        """Ошибка не прерывает выполнение"""
+    async def test_notify_employee_raises_on_error(self, mock_bot, mock_config):
+        """Ошибка отправки пробрасывается (relay outbox повторит уведомление)"""
         service = NotificationService(mock_bot)
         service.config = mock_config
         
@@ -244,4 +277,5 @@ class TestNotificationServiceEmployeeStatusChanged:
         request.rejection_reason = None
         
         with patch('bot.utils.request_formatter.format_request_short', return_value="Текст"):
-            await service.notify_employee_request_status_changed(request, "Выполнено")
+            with pytest.raises(Exception, match="Error"):
+                await service.notify_employee_request_status_changed(request, "Выполнено")
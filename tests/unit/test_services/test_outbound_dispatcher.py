@@ -0,0 +1,111 @@
+"""
+Unit тесты для OutboundDispatcher
+
+Тестируемые сценарии:
+- TokenBucket - выдача токенов и время ожидания
+- порядок сообщений в одном чате
+- повтор после TelegramRetryAfter
+- окончательная ошибка возвращается через Future
+- dispatch() без запущенного диспетчера отправляет сразу
+- deliver() ждет ответа через очередь и пробрасывает ошибку
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.services.outbound_dispatcher import OutboundDispatcher, TokenBucket, dispatch, deliver
+
+
+class TestTokenBucket:
+    """Тесты token bucket"""
+    
+    def test_burst_then_wait(self):
+        """После исчерпания пачки возвращается время ожидания"""
+        with patch("bot.services.outbound_dispatcher.time.monotonic", return_value=100.0):
+            bucket = TokenBucket(rate=1, capacity=2)
+            assert bucket.try_acquire() == 0
+            assert bucket.try_acquire() == 0
+            assert bucket.try_acquire() == pytest.approx(1.0)
+        
+        with patch("bot.services.outbound_dispatcher.time.monotonic", return_value=101.0):
+            assert bucket.try_acquire() == 0
+
+
+class TestOutboundDispatcher:
+    """Тесты диспетчера исходящих сообщений"""
+    
+    @pytest.mark.asyncio
+    async def test_messages_delivered_in_chat_order(self):
+        """Сообщения одного чата отправляются по порядку"""
+        bot = MagicMock()
+        sent = []
+        bot.send_message = AsyncMock(side_effect=lambda **kw: sent.append(kw["text"]))
+        dispatcher = OutboundDispatcher(bot, workers=4, per_chat_rate=1000, per_chat_burst=1000)
+        await dispatcher.start()
+        
+        futures = [dispatcher.enqueue("send_message", chat_id=1, text=str(i)) for i in range(10)]
+        await asyncio.gather(*futures)
+        await dispatcher.stop()
+        
+        assert sent == [str(i) for i in range(10)]
+        assert dispatcher.stats()["sent"] == 10
+    
+    @pytest.mark.asyncio
+    async def test_retry_after_requeues(self):
+        """TelegramRetryAfter приводит к повторной отправке"""
+        bot = MagicMock()
+        bot.send_message = AsyncMock(side_effect=[
+            TelegramRetryAfter(method=MagicMock(), message="Flood control", retry_after=0),
+            "ok",
+        ])
+        dispatcher = OutboundDispatcher(bot, workers=1)
+        await dispatcher.start()
+        
+        result = await dispatcher.enqueue("send_message", chat_id=1, text="тест")
+        await dispatcher.stop()
+        
+        assert result == "ok"
+        assert bot.send_message.await_count == 2
+        assert dispatcher.stats()["retried"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_error_propagates_to_future(self):
+        """Окончательная ошибка доступна через Future"""
+        bot = MagicMock()
+        bot.send_message = AsyncMock(side_effect=ValueError("bot was blocked"))
+        dispatcher = OutboundDispatcher(bot, workers=1)
+        await dispatcher.start()
+        
+        future = dispatcher.enqueue("send_message", chat_id=1, text="тест")
+        with pytest.raises(ValueError):
+            await future
+        await dispatcher.stop()
+        
+        assert dispatcher.stats()["failed"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_dispatch_without_dispatcher_sends_directly(self, mock_bot):
+        """Без запущенного диспетчера dispatch() вызывает Bot API сразу"""
+        await dispatch(mock_bot, "send_message", chat_id=5, text="привет")
+        
+        mock_bot.send_message.assert_awaited_once_with(chat_id=5, text="привет")
+    
+    @pytest.mark.asyncio
+    async def test_deliver_waits_for_queued_call(self):
+        """deliver() идет через очередь диспетчера, возвращает результат и пробрасывает ошибку"""
+        bot = MagicMock()
+        bot.send_message = AsyncMock(return_value="ok")
+        bot.send_photo = AsyncMock(side_effect=ValueError("bot was blocked"))
+        dispatcher = OutboundDispatcher(bot, workers=1)
+        await dispatcher.start()
+        
+        with patch("bot.services.outbound_dispatcher._dispatcher", dispatcher):
+            assert await deliver(bot, "send_message", chat_id=1, text="тест") == "ok"
+            with pytest.raises(ValueError):
+                await deliver(bot, "send_photo", chat_id=1, photo="p1")
+        await dispatcher.stop()
+        
+        assert dispatcher.stats()["sent"] == 1
+        assert dispatcher.stats()["failed"] == 1
@@ -0,0 +1,126 @@
+"""
+Unit тесты для RequestSearchService
+
+Тестируемые методы:
+- search() - поиск по номеру, категории и описанию (SQLite: подстрокой)
+- _full_text_search() - запрос PostgreSQL (tsvector + pg_trgm)
+- extract_terms() / normalize_query() - разбор запроса
+"""
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy.dialects import postgresql
+
+from bot.database.models import Request
+from bot.database.projections import RequestListRow, request_list_query
+from bot.services.request_search_service import (
+    RequestSearchService,
+    extract_terms,
+    normalize_query,
+    SEARCH_QUERY_MAX_LENGTH,
+)
+
+
+@pytest.fixture
+async def search_requests(test_session):
+    """Заявки двух тенантов с разными категориями и описаниями"""
+    now = datetime.now()
+    rows = [
+        (0, "ЗХ-170126-001", "Ремонт", "Течет кран на кухне"),
+        (0, "ЗХ-170126-002", "Ремонт", "Сломан стул в переговорной"),
+        (0, "ЗХ-180126-001", "Канцелярия", "Бумага для принтера, 100% белизна"),
+        (0, "ЗХ-180126-002", "Уборка", "Помыть окна"),
+        (1, "ЗХ-170126-001", "Ремонт", "Течет кран в другом офисе"),
+    ]
+    for index, (tenant_id, number, category, description) in enumerate(rows):
+        test_session.add(Request(
+            tenant_id=tenant_id, number=number, user_id=100001,
+            category=category, description=description, priority="normal", status="new",
+            created_at=now + timedelta(minutes=index)
+        ))
+    await test_session.flush()
+
+
+class TestRequestSearchServiceSearch:
+    """Тесты поиска (SQLite)"""
+
+    @pytest.mark.asyncio
+    async def test_search_by_description_word(self, test_session, search_requests):
+        """Слово из описания находит заявку только своего тенанта"""
+        page = await RequestSearchService().search(test_session, tenant_id=0, query="кран")
+
+        assert [row.number for row in page.items] == ["ЗХ-170126-001"]
+        assert isinstance(page.items[0], RequestListRow)
+
+    @pytest.mark.asyncio
+    async def test_search_by_number_part(self, test_session, search_requests):
+        """Часть номера находит все подходящие заявки, новые первыми"""
+        page = await RequestSearchService().search(test_session, tenant_id=0, query="170126")
+
+        assert [row.number for row in page.items] == ["ЗХ-170126-002", "ЗХ-170126-001"]
+
+    @pytest.mark.asyncio
+    async def test_all_terms_must_match(self, test_session, search_requests):
+        """Все слова запроса должны найтись (в любом из полей)"""
+        service = RequestSearchService()
+
+        found = await service.search(test_session, tenant_id=0, query="Ремонт стул")
+        not_found = await service.search(test_session, tenant_id=0, query="Ремонт окна")
+
+        assert [row.number for row in found.items] == ["ЗХ-170126-002"]
+        assert not_found.items == []
+
+    @pytest.mark.asyncio
+    async def test_like_wildcards_are_escaped(self, test_session, search_requests):
+        """Спецсимволы LIKE в запросе не работают как шаблон"""
+        service = RequestSearchService()
+
+        assert (await service.search(test_session, tenant_id=0, query="%")).items == []
+        assert [row.number for row in (await service.search(test_session, tenant_id=0, query="100%")).items] == ["ЗХ-180126-001"]
+
+    @pytest.mark.asyncio
+    async def test_pagination(self, test_session, search_requests):
+        """Страницы не пересекаются, has_next / has_prev выставлены"""
+        service = RequestSearchService()
+
+        first = await service.search(test_session, tenant_id=0, query="ЗХ", page_size=3)
+        second = await service.search(test_session, tenant_id=0, query="ЗХ", page=1, page_size=3)
+
+        assert len(first.items) == 3 and first.has_next and not first.has_prev
+        assert len(second.items) == 1 and not second.has_next and second.has_prev
+        assert not {row.id for row in first.items} & {row.id for row in second.items}
+
+    @pytest.mark.asyncio
+    async def test_empty_query(self, test_session, search_requests):
+        """Запрос без слов не выполняется"""
+        page = await RequestSearchService().search(test_session, tenant_id=0, query="  ?! ")
+
+        assert page.items == []
+        assert page.has_next is False
+
+
+class TestRequestSearchServiceFullText:
+    """Тесты запроса PostgreSQL"""
+
+    def test_full_text_query(self):
+        """Слова - префиксы в tsquery по search_vector, номер - ILIKE, сортировка по релевантности"""
+        query = "ЗХ-1701 кран"
+        stmt = RequestSearchService()._full_text_search(request_list_query(), query, extract_terms(query))
+        compiled = stmt.compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+        params = set(compiled.params.values())
+
+        assert "requests.search_vector @@ to_tsquery(" in sql
+        assert "requests.number ILIKE " in sql
+        assert "ts_rank_cd(requests.search_vector, to_tsquery(" in sql
+        assert {"russian", "ЗХ:* & 1701:* & кран:*", "%ЗХ-1701 кран%"} <= params
+
+
+class TestRequestSearchQueryParsing:
+    """Тесты разбора запроса"""
+
+    def test_extract_terms_drops_tsquery_operators(self):
+        assert extract_terms("Ремонт & (крыши) | !окна:*") == ["Ремонт", "крыши", "окна"]
+
+    def test_normalize_query(self):
+        assert normalize_query("  течет   кран ") == "течет кран"
+        assert len(normalize_query("а" * 500)) == SEARCH_QUERY_MAX_LENGTH
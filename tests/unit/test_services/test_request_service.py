@@ -3,10 +3,12 @@ Unit тесты для RequestService
 
 Тестируемые методы:
 - generate_request_number() - генерация уникальных номеров заявок
+- next_sequence_value() - дневной счетчик номеров (в т.ч. под параллельной нагрузкой)
 - create_request() - создание заявки с фото и без
 - get_user_requests() - получение заявок пользователя
 - get_request_by_id() - получение заявки по ID
 """
+import asyncio
 import pytest
 from datetime import datetime, timedelta
 from unittest.mock import patch, AsyncMock
@@ -71,6 +73,72 @@ class TestRequestServiceGenerateNumber:
         assert len(parts[2]) == 3  # №№№
 
 
+class TestRequestServiceNumberSequence:
+    """Тесты дневного счетчика номеров заявок"""
+    
+    @pytest.mark.asyncio
+    async def test_sequence_per_tenant(self, test_session):
+        """Счетчики тенантов и дней независимы"""
+        service = RequestService()
+        today = datetime.now().date()
+        yesterday = today - timedelta(days=1)
+        
+        values = [
+            await service.next_sequence_value(test_session, tenant_id=0, day=today),
+            await service.next_sequence_value(test_session, tenant_id=0, day=today),
+            await service.next_sequence_value(test_session, tenant_id=1, day=today),
+            await service.next_sequence_value(test_session, tenant_id=0, day=yesterday),
+        ]
+        
+        assert values == [1, 2, 1, 1]
+    
+    @pytest.mark.asyncio
+    async def test_rollback_leaves_no_gap(self, test_session_maker):
+        """Номер из откаченной транзакции выдается повторно"""
+        service = RequestService()
+        
+        async with test_session_maker() as session:
+            first = await service.generate_request_number(session, tenant_id=0)
+            await session.commit()
+        async with test_session_maker() as session:
+            await service.generate_request_number(session, tenant_id=0)
+            await session.rollback()
+        async with test_session_maker() as session:
+            second = await service.generate_request_number(session, tenant_id=0)
+        
+        assert first.endswith("-001")
+        assert second.endswith("-002")
+    
+    @pytest.mark.asyncio
+    async def test_parallel_create_request(self, test_file_session_maker):
+        """Стресс-тест: параллельные создания заявок получают номера 1..N без повторов и пропусков"""
+        service = RequestService()
+        per_tenant = 100
+        
+        async def create(tenant_id: int) -> tuple[int, str]:
+            async with test_file_session_maker() as session:
+                request = await service.create_request(
+                    session=session,
+                    tenant_id=tenant_id,
+                    user_id=100001,
+                    category="Ремонт",
+                    description="Параллельная заявка",
+                    priority="normal"
+                )
+                await session.commit()
+                return tenant_id, request.number
+        
+        results = await asyncio.gather(*(create(tenant_id) for tenant_id in (0, 1) for _ in range(per_tenant)))
+        
+        for tenant_id in (0, 1):
+            numbers = [number for owner, number in results if owner == tenant_id]
+            assert sorted(int(number.rsplit("-", 1)[1]) for number in numbers) == list(range(1, per_tenant + 1))
+        
+        async with test_file_session_maker() as session:
+            result = await session.execute(select(Request.tenant_id, Request.number))
+            assert len(set(result.all())) == 2 * per_tenant
+
+
 class TestRequestServiceCreate:
     """Тесты создания заявки"""
     
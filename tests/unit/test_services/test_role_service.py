@@ -5,6 +5,7 @@ Unit тесты для RoleService
 - get_role_by_id() - определение роли по Telegram ID
 - get_or_create_user() - получение или создание пользователя
 - is_role(), is_employee(), is_warehouseman(), is_manager() - проверка ролей
+- load_identity() - получение роли, активной роли и tenant_id одним запросом
 """
 import pytest
 from unittest.mock import patch, MagicMock
@@ -254,3 +255,89 @@ class TestRoleServiceEdgeCases:
         users = list(result.scalars().all())
         assert len(users) == 1
 
+
+
+class TestRoleServiceLoadIdentity:
+    """Тесты получения идентичности пользователя (SQLite-ветка и SQL для PostgreSQL)"""
+    
+    @staticmethod
+    def _service(mock_config, demo_mode: bool = False) -> RoleService:
+        mock_config.demo_mode = demo_mode
+        service = RoleService()
+        service.config = mock_config
+        return service
+    
+    @pytest.mark.asyncio
+    async def test_load_identity_creates_user(self, test_session, mock_config):
+        """Новый пользователь создается с ролью по ID"""
+        service = self._service(mock_config)
+        
+        identity = await service.load_identity(test_session, 700001, "new_user")
+        
+        assert identity.role == "employee"
+        assert identity.active_role == "employee"
+        assert identity.tenant_id == 0
+        user = (await test_session.execute(select(User).where(User.id == 700001))).scalar_one()
+        assert user.username == "new_user"
+    
+    @pytest.mark.asyncio
+    async def test_load_identity_uses_active_role(self, test_session, mock_config):
+        """Для руководителя возвращается активная роль"""
+        service = self._service(mock_config)
+        test_session.add(User(id=mock_config.manager_id, role="manager", active_role="employee"))
+        await test_session.flush()
+        
+        identity = await service.load_identity(test_session, mock_config.manager_id)
+        
+        assert identity.role == "manager"
+        assert identity.active_role == "employee"
+    
+    @pytest.mark.asyncio
+    async def test_load_identity_updates_changed_role(self, test_session, mock_config):
+        """Роль перезаписывается, если она не совпадает с вычисленной"""
+        service = self._service(mock_config)
+        test_session.add(User(id=mock_config.warehouseman_id, role="employee"))
+        await test_session.flush()
+        
+        identity = await service.load_identity(test_session, mock_config.warehouseman_id)
+        
+        assert identity.role == "warehouseman"
+        test_session.expire_all()
+        user = (await test_session.execute(
+            select(User).where(User.id == mock_config.warehouseman_id)
+        )).scalar_one()
+        assert user.role == "warehouseman"
+    
+    @pytest.mark.asyncio
+    async def test_load_identity_technician_in_demo(self, test_session, mock_config):
+        """В DEMO_MODE техник получает роль warehouseman и tenant_id руководителя"""
+        from bot.database.models import TechnicianAssignment
+        
+        service = self._service(mock_config, demo_mode=True)
+        test_session.add_all([
+            User(id=800001, role="manager"),
+            User(id=800002, role="manager", active_role="employee"),
+        ])
+        await test_session.flush()
+        test_session.add(TechnicianAssignment(manager_id=800001, technician_id=800002))
+        await test_session.flush()
+        
+        identity = await service.load_identity(test_session, 800002)
+        
+        assert identity.role == "warehouseman"
+        assert identity.active_role == "warehouseman"
+        assert identity.tenant_id == 800001
+        assert identity.manager_id == 800001
+    
+    def test_postgresql_statement_is_single_upsert(self, mock_config):
+        """Для PostgreSQL строится один запрос INSERT ... ON CONFLICT ... RETURNING"""
+        from sqlalchemy.dialects import postgresql
+        
+        service = self._service(mock_config, demo_mode=True)
+        
+        sql = str(service.build_identity_upsert(12345).compile(dialect=postgresql.dialect()))
+        
+        assert "ON CONFLICT (id) DO UPDATE" in sql
+        assert "WHERE users.role IS DISTINCT FROM excluded.role" in sql
+        assert "RETURNING" in sql
+        assert "LEFT OUTER JOIN tech" in sql
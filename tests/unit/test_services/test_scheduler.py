@@ -0,0 +1,250 @@
+"""
+Unit тесты для TaskScheduler
+
+Тестируемые методы:
+- run_job() - таймаут, ошибки и сохранение запуска в scheduled_job_runs
+- start() - пропущенное срабатывание выполняется сразу после перезапуска
+- start() - задачи выполняются параллельно
+- start() - задачи выполняет только лидер (advisory-блокировка), резерв перехватывает лидерство
+- start() - ошибка БД при захвате блокировки задачи - повтор, а не пропуск срабатывания
+"""
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+from sqlalchemy import select
+
+from bot.database.advisory_lock import AdvisoryLockError, try_advisory_lock
+from bot.database.models import ScheduledJobRun
+from bot.services.scheduler import (
+    TaskScheduler,
+    ScheduledJob,
+    RUN_STATUS_OK,
+    RUN_STATUS_FAILED,
+    RUN_STATUS_TIMEOUT,
+)
+from bot.utils.cron import CronSpec
+
+
+@pytest.fixture
+def scheduler_env(test_engine, test_session_maker):
+    """Планировщик работает с тестовой БД и часовым поясом Москвы"""
+    config = SimpleNamespace(timezone="Europe/Moscow", demo_mode=False, warehouseman_id=999001, manager_id=999002)
+    with patch("bot.services.scheduler.async_session_maker", test_session_maker), \
+         patch("bot.services.scheduler.engine", test_engine), \
+         patch("bot.services.scheduler.get_config", return_value=config), \
+         patch("bot.services.scheduler.LEADER_CHECK_INTERVAL_SECONDS", 0.01):
+        yield test_session_maker
+
+
+def make_job(name: str, run, expression: str = "0 9 * * *", timeout: float = 5) -> ScheduledJob:
+    return ScheduledJob(name, CronSpec.parse(expression), run, timeout=timeout)
+
+
+async def get_runs(session_maker) -> dict[str, ScheduledJobRun]:
+    async with session_maker() as session:
+        result = await session.execute(select(ScheduledJobRun))
+        return {run.job_name: run for run in result.scalars()}
+
+
+class TestTaskSchedulerRunJob:
+    """Тесты выполнения задачи"""
+
+    @pytest.mark.asyncio
+    async def test_run_is_recorded(self, scheduler_env, mock_bot):
+        """Успешный запуск сохраняется; повторный - обновляет строку"""
+        calls = []
+
+        async def job():
+            calls.append(1)
+
+        scheduler = TaskScheduler(mock_bot, jobs=[])
+        await scheduler.run_job(make_job("report", job))
+        started_at = await scheduler.run_job(make_job("report", job))
+
+        runs = await get_runs(scheduler_env)
+        assert len(calls) == 2
+        assert runs["report"].last_status == RUN_STATUS_OK
+        assert runs["report"].last_run_at.replace(tzinfo=timezone.utc) == started_at
+
+    @pytest.mark.asyncio
+    async def test_timeout_and_failure(self, scheduler_env, mock_bot):
+        """Зависшая задача прерывается по таймауту, ошибка задачи сохраняется"""
+        async def hangs():
+            await asyncio.sleep(10)
+
+        async def fails():
+            raise RuntimeError("boom")
+
+        scheduler = TaskScheduler(mock_bot, jobs=[])
+        await scheduler.run_job(make_job("hangs", hangs, timeout=0.05))
+        await scheduler.run_job(make_job("fails", fails))
+
+        runs = await get_runs(scheduler_env)
+        assert runs["hangs"].last_status == RUN_STATUS_TIMEOUT
+        assert runs["fails"].last_status == RUN_STATUS_FAILED
+        assert runs["fails"].last_error == "boom"
+
+
+class TestTaskSchedulerCatchUp:
+    """Тесты запуска пропущенных срабатываний"""
+
+    @pytest.mark.asyncio
+    async def test_missed_run_is_caught_up_once(self, scheduler_env, mock_bot):
+        """Срабатывание пропущено (бот был выключен) - задача выполняется сразу, один раз"""
+        async with scheduler_env() as session:
+            session.add(ScheduledJobRun(
+                job_name="hourly",
+                last_run_at=datetime.now(timezone.utc) - timedelta(hours=5),
+                last_status=RUN_STATUS_OK,
+            ))
+            session.add(ScheduledJobRun(
+                job_name="fresh",
+                last_run_at=datetime.now(timezone.utc),
+                last_status=RUN_STATUS_OK,
+            ))
+            await session.commit()
+
+        calls = []
+
+        def job(name):
+            async def run():
+                calls.append(name)
+            return run
+
+        scheduler = TaskScheduler(mock_bot, jobs=[
+            make_job("hourly", job("hourly"), "0 * * * *"),
+            make_job("fresh", job("fresh"), "0 * * * *"),
+            make_job("new", job("new"), "0 * * * *"),
+        ])
+        await scheduler.start()
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+
+        assert calls == ["hourly"]
+
+    @pytest.mark.asyncio
+    async def test_jobs_run_concurrently(self, scheduler_env, mock_bot):
+        """Медленная задача не задерживает остальные"""
+        past = datetime.now(timezone.utc) - timedelta(days=2)
+        async with scheduler_env() as session:
+            for name in ("slow", "fast"):
+                session.add(ScheduledJobRun(job_name=name, last_run_at=past, last_status=RUN_STATUS_OK))
+            await session.commit()
+
+        slow_started = asyncio.Event()
+        fast_done = asyncio.Event()
+
+        async def slow():
+            slow_started.set()
+            await asyncio.sleep(10)
+
+        async def fast():
+            await slow_started.wait()
+            fast_done.set()
+
+        scheduler = TaskScheduler(mock_bot, jobs=[make_job("slow", slow, timeout=30), make_job("fast", fast)])
+        await scheduler.start()
+        try:
+            await asyncio.wait_for(fast_done.wait(), timeout=2)
+        finally:
+            await scheduler.stop()
+
+
+class TestTaskSchedulerReplicas:
+    """Тесты работы нескольких реплик"""
+
+    @pytest.mark.asyncio
+    async def test_only_leader_runs_jobs(self, scheduler_env, mock_bot):
+        """Задачу выполняет одна реплика; после остановки лидера задачи переходят к резерву"""
+        async with scheduler_env() as session:
+            session.add(ScheduledJobRun(
+                job_name="hourly",
+                last_run_at=datetime.now(timezone.utc) - timedelta(hours=5),
+                last_status=RUN_STATUS_OK,
+            ))
+            await session.commit()
+
+        calls = []
+
+        def replica(name):
+            async def run():
+                calls.append(name)
+            return TaskScheduler(mock_bot, jobs=[make_job("hourly", run, "0 * * * *")])
+
+        first, second = replica("first"), replica("second")
+        await first.start()
+        await asyncio.sleep(0.05)
+        await second.start()
+        await asyncio.sleep(0.05)
+        try:
+            assert first.is_leader and not second.is_leader
+            assert calls == ["first"]
+
+            await first.stop()
+            await asyncio.sleep(0.05)
+
+            # Резерв стал лидером, но задача уже выполнена - повторного запуска нет
+            assert second.is_leader
+            assert calls == ["first"]
+        finally:
+            await first.stop()
+            await second.stop()
+
+    @pytest.mark.asyncio
+    async def test_lock_error_retries_instead_of_skipping(self, scheduler_env, mock_bot):
+        """Ошибка БД при захвате блокировки задачи не сдвигает срабатывание - запуск повторяется"""
+        async with scheduler_env() as session:
+            session.add(ScheduledJobRun(
+                job_name="hourly",
+                last_run_at=datetime.now(timezone.utc) - timedelta(hours=5),
+                last_status=RUN_STATUS_OK,
+            ))
+            await session.commit()
+
+        calls = []
+
+        async def run():
+            calls.append(1)
+
+        job = make_job("hourly", run, "0 * * * *")
+        scheduler = TaskScheduler(mock_bot, jobs=[job])
+        real_lock = try_advisory_lock
+        attempts = []
+
+        def flaky_lock(name, bind=None):
+            attempts.append(name)
+            if len(attempts) == 1:
+                raise AdvisoryLockError("connection refused")
+            return real_lock(name, bind)
+
+        with patch("bot.services.scheduler.try_advisory_lock", flaky_lock), \
+             patch("bot.services.scheduler.LOCK_RETRY_SECONDS", 0.01):
+            await scheduler.start()
+            await asyncio.sleep(0.1)
+            await scheduler.stop()
+
+        # Первая попытка - ошибка БД, вторая (после паузы) - запуск
+        assert len(attempts) == 2
+        assert calls == [1]
+
+    @pytest.mark.asyncio
+    async def test_run_skipped_if_done_by_other_replica(self, scheduler_env, mock_bot):
+        """Запуск пропускается, если после срабатывания задачу уже выполнила другая реплика"""
+        calls = []
+
+        async def run():
+            calls.append(1)
+
+        scheduler = TaskScheduler(mock_bot, jobs=[])
+        job = make_job("report", run, "0 * * * *")
+        other_run_at = datetime.now(timezone.utc)
+        async with scheduler_env() as session:
+            session.add(ScheduledJobRun(job_name="report", last_run_at=other_run_at, last_status=RUN_STATUS_OK))
+            await session.commit()
+
+        since = await scheduler._run_exclusive(job)
+
+        assert calls == []
+        assert since == other_run_at
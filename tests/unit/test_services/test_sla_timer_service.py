@@ -0,0 +1,152 @@
+"""
+Unit тесты для SLA-таймеров срочных заявок
+
+Тестируемые методы:
+- SlaTimerService.schedule() - таймер ставится в транзакции создания срочной заявки
+- SlaTimerService.cancel() - таймер снимается при выходе заявки из "Новая"
+- SlaTimerService.fire() - эскалация в outbox, не больше одного раза
+- SlaTimerRunner - восстановление heap из таблицы, срабатывание в срок
+"""
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from sqlalchemy import select
+
+from bot.database.models import User, SlaTimer, NotificationOutboxMessage
+from bot.services.notification_outbox import KIND_URGENT_REQUEST_OVERDUE
+from bot.services.request_service import RequestService
+from bot.services.warehouseman_service import WarehousemanService
+from bot.services.sla_timer_service import SlaTimerRunner, sla_timer_service, URGENT_SLA
+
+
+@pytest.fixture
+def runner(test_session_maker):
+    """Runner на тестовой БД, подключенный как запущенный в процессе"""
+    runner = SlaTimerRunner()
+    with patch("bot.services.sla_timer_service.async_session_maker", test_session_maker), \
+         patch("bot.services.sla_timer_service._runner", runner):
+        yield runner
+
+
+async def create_request(session_maker, priority: str = "urgent") -> int:
+    async with session_maker() as session:
+        if await session.get(User, 100001) is None:
+            session.add(User(id=100001, role="employee"))
+        request = await RequestService().create_request(
+            session, tenant_id=555, user_id=100001, category="Ремонт", description="Течет кран", priority=priority
+        )
+        await session.commit()
+        return request.id
+
+
+async def set_due(session_maker, request_id: int, due_at: datetime) -> None:
+    async with session_maker() as session:
+        timer = await session.get(SlaTimer, request_id)
+        timer.due_at = due_at
+        await session.commit()
+
+
+async def escalations(session_maker) -> list[NotificationOutboxMessage]:
+    async with session_maker() as session:
+        result = await session.execute(
+            select(NotificationOutboxMessage).where(NotificationOutboxMessage.kind == KIND_URGENT_REQUEST_OVERDUE)
+        )
+        return list(result.scalars().all())
+
+
+class TestSlaTimerService:
+    """Тесты записи и снятия таймеров"""
+
+    @pytest.mark.asyncio
+    async def test_urgent_request_gets_timer(self, runner, test_session_maker):
+        """Срочная заявка получает таймер в БД и в heap после commit; обычная - нет"""
+        started = datetime.now(timezone.utc)
+        urgent_id = await create_request(test_session_maker)
+        await create_request(test_session_maker, priority="normal")
+
+        async with test_session_maker() as session:
+            timers = (await session.execute(select(SlaTimer))).scalars().all()
+
+        assert [timer.request_id for timer in timers] == [urgent_id]
+        assert runner.stats()["pending"] == 1
+        assert started + URGENT_SLA <= runner._due[urgent_id] <= datetime.now(timezone.utc) + URGENT_SLA
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("transition", ["take", "complete", "reject"])
+    async def test_transition_cancels_timer(self, runner, test_session_maker, transition):
+        request_id = await create_request(test_session_maker)
+        service = WarehousemanService()
+
+        async with test_session_maker() as session:
+            if transition == "take":
+                await service.take_request_in_work(session, tenant_id=555, request_id=request_id)
+            elif transition == "complete":
+                await service.complete_request(session, tenant_id=555, request_id=request_id)
+            else:
+                await service.reject_request(session, tenant_id=555, request_id=request_id, reason="Дубль")
+            await session.commit()
+
+        async with test_session_maker() as session:
+            assert await session.get(SlaTimer, request_id) is None
+        assert runner.stats()["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_fire_escalates_once(self, runner, test_session_maker):
+        """Неистекший таймер не срабатывает; истекший - эскалирует один раз"""
+        request_id = await create_request(test_session_maker)
+
+        async with test_session_maker() as session:
+            assert await sla_timer_service.fire(session, request_id) is False
+
+        await set_due(test_session_maker, request_id, datetime.now(timezone.utc) - timedelta(seconds=1))
+        for expected in (True, False):
+            async with test_session_maker() as session:
+                assert await sla_timer_service.fire(session, request_id) is expected
+                await session.commit()
+
+        messages = await escalations(test_session_maker)
+        assert [(message.payload, message.tenant_id) for message in messages] == [({"request_id": request_id}, 555)]
+
+
+class TestSlaTimerRunner:
+    """Тесты фонового срабатывания"""
+
+    @pytest.mark.asyncio
+    async def test_reload_and_run_due(self, runner, test_session_maker):
+        """Heap восстанавливается из таблицы; срабатывают только истекшие и не снятые таймеры"""
+        expired, pending, cancelled = [await create_request(test_session_maker) for _ in range(3)]
+        past = datetime.now(timezone.utc) - timedelta(minutes=1)
+        await set_due(test_session_maker, expired, past)
+        await set_due(test_session_maker, cancelled, past)
+
+        restarted = SlaTimerRunner()
+        await restarted.reload()
+        assert restarted.stats()["pending"] == 3
+
+        restarted.discard(cancelled)
+        assert await restarted.run_due() == 1
+
+        messages = await escalations(test_session_maker)
+        assert [message.payload["request_id"] for message in messages] == [expired]
+        assert set(restarted._due) == {pending}
+
+    @pytest.mark.asyncio
+    async def test_fires_at_deadline(self, runner, test_session_maker):
+        """Запущенный runner срабатывает в момент истечения срока, а не при опросе"""
+        await runner.start()
+        try:
+            request_id = await create_request(test_session_maker)
+            due_at = datetime.now(timezone.utc) + timedelta(seconds=0.2)
+            await set_due(test_session_maker, request_id, due_at)
+            runner.push(request_id, due_at)
+
+            for _ in range(50):
+                if runner.escalated:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await runner.stop()
+
+        assert runner.escalated == 1
+        assert len(await escalations(test_session_maker)) == 1
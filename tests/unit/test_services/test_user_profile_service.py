@@ -0,0 +1,129 @@
+"""
+Unit тесты для UserProfileService
+
+Тестируемые методы:
+- remember() - пассивное обновление профиля из event_from_user
+- get_profiles() - получение профилей: кэш -> БД -> get_chat
+- get_profiles() - устаревший профиль подтверждается через get_chat один раз
+- get_info_map() - формат для format_request_list
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+from aiogram.types import User as TelegramUser
+from sqlalchemy import select
+
+from bot.database.models import User
+from bot.services.user_profile_service import UserProfileService, PROFILE_STALE_AFTER
+
+
+def _chat(first_name=None, last_name=None, username=None):
+    chat = MagicMock()
+    chat.first_name = first_name
+    chat.last_name = last_name
+    chat.username = username
+    return chat
+
+
+class TestUserProfileServiceRemember:
+    """Тесты пассивного обновления профиля"""
+    
+    @pytest.mark.asyncio
+    async def test_remember_updates_user(self, test_session):
+        """Имя и username записываются в users"""
+        test_session.add(User(id=300001, role="employee"))
+        await test_session.flush()
+        service = UserProfileService()
+        
+        await service.remember(
+            test_session,
+            TelegramUser(id=300001, is_bot=False, first_name="Иван", last_name="Петров", username="ivan"),
+        )
+        
+        test_session.expire_all()
+        user = (await test_session.execute(select(User).where(User.id == 300001))).scalar_one()
+        assert (user.first_name, user.last_name, user.username) == ("Иван", "Петров", "ivan")
+    
+    @pytest.mark.asyncio
+    async def test_remember_skips_db_when_unchanged(self):
+        """Повторное обновление с теми же данными не обращается к БД"""
+        service = UserProfileService()
+        session = MagicMock()
+        session.execute = AsyncMock()
+        telegram_user = TelegramUser(id=300002, is_bot=False, first_name="Анна")
+        
+        await service.remember(session, telegram_user)
+        await service.remember(session, telegram_user)
+        
+        assert session.execute.await_count == 1
+
+
+class TestUserProfileServiceGetProfiles:
+    """Тесты получения профилей"""
+    
+    @pytest.mark.asyncio
+    async def test_known_profiles_do_not_call_get_chat(self, test_session, mock_bot):
+        """Профили из БД возвращаются без обращения к Telegram API"""
+        test_session.add_all([
+            User(id=300011, role="employee", first_name="Олег", username="oleg"),
+            User(id=300012, role="employee", first_name="Мария", last_name="Иванова"),
+        ])
+        await test_session.flush()
+        mock_bot.get_chat = AsyncMock()
+        service = UserProfileService()
+        
+        info_map = await service.get_info_map(test_session, mock_bot, {300011, 300012})
+        
+        mock_bot.get_chat.assert_not_awaited()
+        assert info_map[300011] == ("Олег", "@oleg", None)
+        assert info_map[300012] == ("Мария Иванова", "ID: 300012", None)
+    
+    @pytest.mark.asyncio
+    async def test_unknown_profiles_fetched_and_saved(self, test_session, mock_bot):
+        """Неизвестные профили запрашиваются через get_chat и сохраняются"""
+        test_session.add(User(id=300021, role="employee"))
+        await test_session.flush()
+        mock_bot.get_chat = AsyncMock(return_value=_chat(first_name="Пётр", username="petr"))
+        service = UserProfileService()
+        
+        profile = await service.get_profile(test_session, mock_bot, 300021)
+        
+        assert profile.short_name == "Пётр"
+        test_session.expire_all()
+        user = (await test_session.execute(select(User).where(User.id == 300021))).scalar_one()
+        assert user.username == "petr"
+        
+        # Второй запрос обслуживается из кэша
+        await service.get_profile(test_session, mock_bot, 300021)
+        assert mock_bot.get_chat.await_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_get_chat_error_falls_back_to_id(self, test_session, mock_bot):
+        """Если Telegram API недоступен, используется ID"""
+        mock_bot.get_chat = AsyncMock(side_effect=Exception("chat not found"))
+        service = UserProfileService()
+        
+        info_map = await service.get_info_map(test_session, mock_bot, {300031})
+        
+        assert info_map[300031] == ("ID: 300031", "ID: 300031", None)
+    
+    @pytest.mark.asyncio
+    async def test_stale_profile_refreshed_once(self, test_session, mock_bot):
+        """Неизменившийся профиль после get_chat снова считается свежим"""
+        long_ago = datetime.now(timezone.utc) - PROFILE_STALE_AFTER - timedelta(days=1)
+        test_session.add(User(
+            id=300041, role="employee", first_name="Олег", username="oleg",
+            created_at=long_ago, profile_refreshed_at=long_ago,
+        ))
+        await test_session.flush()
+        mock_bot.get_chat = AsyncMock(return_value=_chat(first_name="Олег", username="oleg"))
+        
+        profile = await UserProfileService().get_profile(test_session, mock_bot, 300041)
+        # Новый экземпляр - промах кэша, профиль читается из БД
+        profile_again = await UserProfileService().get_profile(test_session, mock_bot, 300041)
+        
+        assert profile == profile_again
+        assert mock_bot.get_chat.await_count == 1
+        test_session.expire_all()
+        user = (await test_session.execute(select(User).where(User.id == 300041))).scalar_one()
+        assert user.profile_refreshed_at.replace(tzinfo=timezone.utc) > long_ago
@@ -0,0 +1,161 @@
+"""
+Unit тесты для WarehouseLedgerService
+
+Тестируемые методы:
+- WarehouseService.add_quantity() / subtract_quantity() - запись движений
+- get_stock_as_of() - остаток на дату
+- get_consumption() - расход за период
+- create_snapshots() - месячные снимки (чтение снимка + хвоста движений)
+"""
+import pytest
+from datetime import datetime
+from sqlalchemy import select, delete, func
+
+from bot.database.models import WarehouseItem, WarehouseMovement, WarehouseBalanceSnapshot
+from bot.services.warehouse_service import WarehouseService
+from bot.services.warehouse_ledger_service import (
+    WarehouseLedgerService,
+    REASON_RECEIPT,
+    REASON_WRITEOFF,
+    REASON_REQUEST,
+    month_start,
+)
+
+
+async def create_item(session, name: str = "Бумага", tenant_id: int = 0) -> WarehouseItem:
+    item = WarehouseItem(tenant_id=tenant_id, name=name, current_quantity=0, min_quantity=0)
+    session.add(item)
+    await session.flush()
+    return item
+
+
+def movement(item: WarehouseItem, delta: int, reason: str, created_at: datetime) -> WarehouseMovement:
+    return WarehouseMovement(
+        tenant_id=item.tenant_id, item_id=item.id, delta=delta, reason=reason, created_at=created_at
+    )
+
+
+@pytest.fixture
+async def ledger_history(test_session):
+    """Движения двух позиций за январь-март"""
+    paper = await create_item(test_session, "Бумага")
+    pens = await create_item(test_session, "Ручки")
+    test_session.add_all([
+        movement(paper, 100, REASON_RECEIPT, datetime(2026, 1, 5)),
+        movement(paper, -10, REASON_WRITEOFF, datetime(2026, 1, 20)),
+        movement(paper, -15, REASON_REQUEST, datetime(2026, 2, 3)),
+        movement(paper, 40, REASON_RECEIPT, datetime(2026, 2, 10)),
+        movement(paper, -5, REASON_REQUEST, datetime(2026, 3, 2)),
+        movement(pens, 20, REASON_RECEIPT, datetime(2026, 1, 10)),
+        movement(pens, -20, REASON_WRITEOFF, datetime(2026, 2, 28)),
+    ])
+    await test_session.flush()
+    return paper, pens
+
+
+class TestLedgerRecording:
+    """Тесты записи движений при изменении остатков"""
+
+    @pytest.mark.asyncio
+    async def test_mutations_write_movements(self, test_session, test_request):
+        """Приход и списания пишут движения; сумма движений равна остатку"""
+        service = WarehouseService()
+        item = await create_item(test_session)
+
+        await service.add_quantity(test_session, tenant_id=0, item_id=item.id, quantity=30, actor_id=999001)
+        await service.subtract_quantity(test_session, tenant_id=0, item_id=item.id, quantity=5, actor_id=999002)
+        await service.subtract_quantity(
+            test_session, tenant_id=0, item_id=item.id, quantity=7, request_id=test_request.id, actor_id=999001
+        )
+
+        result = await test_session.execute(
+            select(WarehouseMovement).where(WarehouseMovement.item_id == item.id).order_by(WarehouseMovement.id)
+        )
+        movements = list(result.scalars().all())
+
+        assert [(m.delta, m.reason, m.request_id, m.actor_id) for m in movements] == [
+            (30, REASON_RECEIPT, None, 999001),
+            (-5, REASON_WRITEOFF, None, 999002),
+            (-7, REASON_REQUEST, test_request.id, 999001),
+        ]
+        assert sum(m.delta for m in movements) == item.current_quantity == 18
+
+    @pytest.mark.asyncio
+    async def test_failed_writeoff_writes_nothing(self, test_session):
+        """Списание сверх остатка не попадает в журнал"""
+        service = WarehouseService()
+        item = await create_item(test_session)
+
+        assert await service.subtract_quantity(test_session, tenant_id=0, item_id=item.id, quantity=1) is None
+
+        result = await test_session.execute(select(func.count(WarehouseMovement.id)))
+        assert result.scalar() == 0
+
+
+class TestLedgerQueries:
+    """Тесты запросов по журналу"""
+
+    @pytest.mark.asyncio
+    async def test_stock_as_of(self, test_session, ledger_history):
+        """Остаток на дату - сумма движений до нее"""
+        paper, _ = ledger_history
+        ledger = WarehouseLedgerService()
+
+        assert await ledger.get_stock_as_of(test_session, 0, paper.id, datetime(2026, 1, 1)) == 0
+        assert await ledger.get_stock_as_of(test_session, 0, paper.id, datetime(2026, 2, 1)) == 90
+        assert await ledger.get_stock_as_of(test_session, 0, paper.id, datetime(2026, 2, 15)) == 115
+        assert await ledger.get_stock_as_of(test_session, 0, paper.id, datetime(2026, 4, 1)) == 110
+
+    @pytest.mark.asyncio
+    async def test_consumption(self, test_session, ledger_history):
+        """Расход за период считает только списания"""
+        paper, pens = ledger_history
+        ledger = WarehouseLedgerService()
+
+        february = await ledger.get_consumption(test_session, 0, datetime(2026, 2, 1), datetime(2026, 3, 1))
+        quarter = await ledger.get_consumption(test_session, 0, datetime(2026, 1, 1), datetime(2026, 4, 1))
+
+        assert february == {paper.id: 15, pens.id: 20}
+        assert quarter == {paper.id: 30, pens.id: 20}
+
+    @pytest.mark.asyncio
+    async def test_snapshots_replace_history(self, test_session, ledger_history):
+        """После снимков движения до них не читаются: результаты не меняются без старой истории"""
+        paper, pens = ledger_history
+        ledger = WarehouseLedgerService()
+
+        expected_stock = await ledger.get_stock_as_of(test_session, 0, paper.id, datetime(2026, 3, 15))
+        expected_consumption = await ledger.get_consumption(test_session, 0, datetime(2026, 2, 15), datetime(2026, 3, 15))
+
+        assert await ledger.create_snapshots(test_session, datetime(2026, 2, 1)) == 2
+        assert await ledger.create_snapshots(test_session, datetime(2026, 3, 1)) == 2
+
+        # Историю до февраля больше не нужно читать
+        await test_session.execute(delete(WarehouseMovement).where(WarehouseMovement.created_at < datetime(2026, 2, 1)))
+
+        assert await ledger.get_stock_as_of(test_session, 0, paper.id, datetime(2026, 3, 15)) == expected_stock
+        assert await ledger.get_consumption(
+            test_session, 0, datetime(2026, 2, 15), datetime(2026, 3, 15)
+        ) == expected_consumption
+
+        result = await test_session.execute(
+            select(WarehouseBalanceSnapshot.balance, WarehouseBalanceSnapshot.consumed)
+            .where(WarehouseBalanceSnapshot.item_id == pens.id)
+            .order_by(WarehouseBalanceSnapshot.period_start)
+        )
+        assert result.all() == [(20, 0), (0, 20)]
+
+    @pytest.mark.asyncio
+    async def test_snapshot_is_idempotent(self, test_session, ledger_history):
+        """Повторный снимок за тот же месяц перезаписывает значения"""
+        ledger = WarehouseLedgerService()
+
+        await ledger.create_snapshots(test_session, datetime(2026, 2, 1))
+        await ledger.create_snapshots(test_session, datetime(2026, 2, 1))
+
+        result = await test_session.execute(select(func.count(WarehouseBalanceSnapshot.id)))
+        assert result.scalar() == 2
+
+    def test_month_start(self):
+        """Начало месяца"""
+        assert month_start(datetime(2026, 3, 17, 15, 30)) == datetime(2026, 3, 1)
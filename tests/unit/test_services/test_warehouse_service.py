@@ -10,12 +10,17 @@ Unit тесты для WarehouseService
 - subtract_quantity() - списание
 - update_min_quantity() - обновление минимума
 - get_low_stock_items() - позиции с низким остатком
+- add_quantity() / subtract_quantity() под параллельной нагрузкой (атомарный UPDATE)
+- subtract_quantity() / update_min_quantity() - оповещение о пересечении минимума
 """
+import asyncio
 import pytest
 from sqlalchemy import select
 
 from bot.services.warehouse_service import WarehouseService, warehouse_service
-from bot.database.models import WarehouseItem
+from bot.database.models import WarehouseItem, NotificationOutboxMessage
+from bot.services.notification_outbox import KIND_LOW_STOCK_ALERT
+from tests.fixtures.database import StatementCounter
 
 
 class TestWarehouseServiceGetAll:
@@ -357,3 +362,151 @@ class TestWarehouseServiceEdgeCases:
         assert updated is not None
         assert updated.current_quantity == 50
 
+
+class TestWarehouseServiceAtomicUpdates:
+    """Тесты атомарного изменения остатков"""
+    
+    @pytest.mark.asyncio
+    async def test_subtract_is_single_update(self, test_engine, test_session):
+        """Списание - один UPDATE ... RETURNING (и INSERT в журнал движений), объект сессии обновлен"""
+        service = WarehouseService()
+        item = WarehouseItem(tenant_id=0, name="Бумага", current_quantity=10, min_quantity=2)
+        test_session.add(item)
+        await test_session.flush()
+        
+        with StatementCounter(test_engine) as counter:
+            updated = await service.subtract_quantity(test_session, tenant_id=0, item_id=item.id, quantity=4)
+        
+        assert counter.count == 2
+        assert updated is item
+        assert item.current_quantity == 6
+    
+    @pytest.mark.asyncio
+    async def test_other_tenant_not_updated(self, test_session):
+        """Позиция другого тенанта не меняется"""
+        service = WarehouseService()
+        item = WarehouseItem(tenant_id=1, name="Бумага", current_quantity=10, min_quantity=2)
+        test_session.add(item)
+        await test_session.flush()
+        
+        assert await service.add_quantity(test_session, tenant_id=0, item_id=item.id, quantity=5) is None
+        assert await service.subtract_quantity(test_session, tenant_id=0, item_id=item.id, quantity=5) is None
+        
+        refreshed = await service.get_item_by_id(test_session, tenant_id=1, item_id=item.id)
+        assert refreshed.current_quantity == 10
+    
+    @pytest.mark.asyncio
+    async def test_parallel_writeoffs(self, test_file_session_maker):
+        """Параллельные списания: ни одного потерянного обновления и остаток не уходит в минус"""
+        service = WarehouseService()
+        initial, attempts = 100, 150
+        
+        async with test_file_session_maker() as session:
+            item = WarehouseItem(tenant_id=0, name="Лампочки", current_quantity=initial, min_quantity=10)
+            session.add(item)
+            await session.commit()
+            item_id = item.id
+        
+        async def write_off() -> bool:
+            async with test_file_session_maker() as session:
+                updated = await service.subtract_quantity(session, tenant_id=0, item_id=item_id, quantity=1)
+                await session.commit()
+                return updated is not None
+        
+        results = await asyncio.gather(*(write_off() for _ in range(attempts)))
+        
+        async with test_file_session_maker() as session:
+            stored = await service.get_item_by_id(session, tenant_id=0, item_id=item_id)
+        
+        assert sum(results) == initial
+        assert stored.current_quantity == 0
+    
+    @pytest.mark.asyncio
+    async def test_parallel_additions_and_writeoffs(self, test_file_session_maker):
+        """Параллельные приходы и списания суммируются без потерь"""
+        service = WarehouseService()
+        
+        async with test_file_session_maker() as session:
+            item = WarehouseItem(tenant_id=0, name="Батарейки", current_quantity=100, min_quantity=10)
+            session.add(item)
+            await session.commit()
+            item_id = item.id
+        
+        async def change(quantity: int) -> None:
+            async with test_file_session_maker() as session:
+                if quantity > 0:
+                    await service.add_quantity(session, tenant_id=0, item_id=item_id, quantity=quantity)
+                else:
+                    await service.subtract_quantity(session, tenant_id=0, item_id=item_id, quantity=-quantity)
+                await session.commit()
+        
+        await asyncio.gather(*(change(3 if index % 2 else -2) for index in range(100)))
+        
+        async with test_file_session_maker() as session:
+            stored = await service.get_item_by_id(session, tenant_id=0, item_id=item_id)
+        
+        # Начального остатка хватает на все списания при любом порядке
+        assert stored.current_quantity == 100 + 50 * 3 - 50 * 2
+
+
+async def low_stock_alerts(session) -> list[NotificationOutboxMessage]:
+    result = await session.execute(
+        select(NotificationOutboxMessage).where(NotificationOutboxMessage.kind == KIND_LOW_STOCK_ALERT)
+    )
+    return list(result.scalars().all())
+
+
+class TestWarehouseServiceLowStockAlerts:
+    """Тесты оповещений о пересечении минимума"""
+    
+    @pytest.mark.asyncio
+    async def test_only_crossing_writeoff_alerts(self, test_session):
+        """Оповещение ставит только списание, опустившее остаток до минимума"""
+        service = WarehouseService()
+        item = WarehouseItem(tenant_id=0, name="Бумага", current_quantity=10, min_quantity=5)
+        test_session.add(item)
+        await test_session.flush()
+        
+        await service.subtract_quantity(test_session, tenant_id=0, item_id=item.id, quantity=3)
+        assert await low_stock_alerts(test_session) == []
+        
+        await service.subtract_quantity(test_session, tenant_id=0, item_id=item.id, quantity=3)
+        await service.subtract_quantity(test_session, tenant_id=0, item_id=item.id, quantity=1)
+        
+        alerts = await low_stock_alerts(test_session)
+        assert len(alerts) == 1
+        assert alerts[0].tenant_id == 0
+    
+    @pytest.mark.asyncio
+    async def test_burst_is_coalesced(self, test_session):
+        """Пересечения нескольких позиций тенанта, пока оповещение ждет отправки, - одна строка outbox"""
+        service = WarehouseService()
+        items = [
+            WarehouseItem(tenant_id=555, name=name, current_quantity=3, min_quantity=2)
+            for name in ("Мыло", "Клей", "Лампы")
+        ]
+        test_session.add_all(items)
+        await test_session.flush()
+        
+        for item in items:
+            await service.subtract_quantity(test_session, tenant_id=555, item_id=item.id, quantity=1)
+        
+        assert len(await low_stock_alerts(test_session)) == 1
+    
+    @pytest.mark.asyncio
+    async def test_min_raise_alerts_and_refill_resets(self, test_session):
+        """Повышение минимума тоже пересечение; пополнение выше минимума снимает отметку об оповещении"""
+        service = WarehouseService()
+        item = WarehouseItem(tenant_id=0, name="Бумага", current_quantity=4, min_quantity=2)
+        test_session.add(item)
+        await test_session.flush()
+        
+        await service.update_min_quantity(test_session, tenant_id=0, item_id=item.id, min_quantity=5)
+        assert len(await low_stock_alerts(test_session)) == 1
+        
+        await service.mark_low_stock_alerted(test_session, [item.id])
+        await service.add_quantity(test_session, tenant_id=0, item_id=item.id, quantity=1)
+        assert item.low_stock_alerted_at is not None  # 5 <= 5 - все еще низкий
+        
+        await service.add_quantity(test_session, tenant_id=0, item_id=item.id, quantity=1)
+        assert item.low_stock_alerted_at is None
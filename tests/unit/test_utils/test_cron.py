@@ -0,0 +1,96 @@
+"""
+Unit тесты для cron-расписаний
+
+Тестируемые методы:
+- CronSpec.parse() - разбор полей
+- CronSpec.next_after() - ближайшее срабатывание в часовом поясе
+"""
+import pytest
+import pytz
+from datetime import datetime, timezone
+
+from bot.utils.cron import CronSpec
+
+MOSCOW = pytz.timezone("Europe/Moscow")
+BERLIN = pytz.timezone("Europe/Berlin")
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class TestCronSpecParse:
+    """Тесты разбора выражения"""
+
+    def test_parse_lists_ranges_and_steps(self):
+        spec = CronSpec.parse("*/15 8-10,18 1 * 1-5")
+
+        assert spec.minutes == (0, 15, 30, 45)
+        assert spec.hours == (8, 9, 10, 18)
+        assert spec.days == {1}
+        assert spec.weekdays == {1, 2, 3, 4, 5}
+
+    def test_sunday_as_seven(self):
+        assert CronSpec.parse("0 0 * * 7").weekdays == {0}
+
+    @pytest.mark.parametrize("expression", ["0 9 * *", "60 9 * * *", "0 9 * * mon", "*/0 * * * *", "5-1 * * * *"])
+    def test_invalid_expression(self, expression):
+        with pytest.raises(ValueError):
+            CronSpec.parse(expression)
+
+
+class TestCronSpecNextAfter:
+    """Тесты вычисления времени срабатывания"""
+
+    def test_daily_in_configured_timezone(self):
+        """09:00 по Москве - 06:00 UTC"""
+        spec = CronSpec.parse("0 9 * * *")
+
+        assert spec.next_after(utc(2026, 3, 10, 5, 0), MOSCOW) == utc(2026, 3, 10, 6, 0)
+        assert spec.next_after(utc(2026, 3, 10, 6, 0), MOSCOW) == utc(2026, 3, 11, 6, 0)
+
+    def test_strictly_after(self):
+        """Срабатывание ровно в момент after не возвращается"""
+        spec = CronSpec.parse("0 * * * *")
+
+        assert spec.next_after(utc(2026, 3, 10, 6, 0, 0), pytz.utc) == utc(2026, 3, 10, 7, 0)
+        assert spec.next_after(utc(2026, 3, 10, 6, 59, 59), pytz.utc) == utc(2026, 3, 10, 7, 0)
+
+    def test_monthly(self):
+        """1-го числа в 0:05 - переход через месяц и год"""
+        spec = CronSpec.parse("5 0 1 * *")
+
+        assert spec.next_after(utc(2026, 12, 15, 12, 0), pytz.utc) == utc(2027, 1, 1, 0, 5)
+
+    def test_day_of_month_or_weekday(self):
+        """Если заданы и день месяца, и день недели - подходит любой"""
+        spec = CronSpec.parse("0 12 13 * 5")  # 13-го числа или по пятницам
+
+        # 2026-03-10 - вторник; ближайшая пятница 13 марта совпадает с 13-м
+        assert spec.next_after(utc(2026, 3, 10), pytz.utc) == utc(2026, 3, 13, 12, 0)
+        assert spec.next_after(utc(2026, 3, 13, 13, 0), pytz.utc) == utc(2026, 3, 20, 12, 0)
+
+    def test_spring_forward_gap_is_skipped(self):
+        """Несуществующее время (перевод часов вперед) пропускается"""
+        spec = CronSpec.parse("30 2 * * *")
+
+        # 29.03.2026 в Берлине 02:00 -> 03:00
+        result = spec.next_after(utc(2026, 3, 28, 12, 0), BERLIN)
+
+        assert result.astimezone(BERLIN).date().isoformat() == "2026-03-30"
+        assert (result.astimezone(BERLIN).hour, result.astimezone(BERLIN).minute) == (2, 30)
+
+    def test_fall_back_fires_once(self):
+        """Повторяющийся час (перевод часов назад) срабатывает один раз"""
+        spec = CronSpec.parse("30 2 * * *")
+
+        # 25.10.2026 в Берлине 03:00 -> 02:00
+        first = spec.next_after(utc(2026, 10, 24, 12, 0), BERLIN)
+        second = spec.next_after(first, BERLIN)
+
+        assert first == utc(2026, 10, 25, 0, 30)
+        assert second.astimezone(BERLIN).date().isoformat() == "2026-10-26"
+
+    def test_impossible_date(self):
+        with pytest.raises(ValueError):
+            CronSpec.parse("0 0 31 2 *").next_after(utc(2026, 1, 1), pytz.utc)
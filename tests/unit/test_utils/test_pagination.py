@@ -0,0 +1,113 @@
+"""
+Unit тесты для keyset-пагинации заявок
+
+Тестируемые функции:
+- PageCursor.encode() / decode() - callback data курсора
+- fetch_request_page() - страницы по (created_at, id) вперед и назад
+"""
+import pytest
+from datetime import datetime, timedelta
+from bot.database.models import Request
+from bot.database.projections import request_list_query
+from bot.utils.pagination import (
+    PageCursor,
+    fetch_request_page,
+    DIRECTION_NEXT,
+    DIRECTION_PREV,
+)
+
+
+@pytest.fixture
+async def paged_requests(test_session):
+    """7 заявок; у двух пар одинаковый created_at (порядок решает id)"""
+    base = datetime(2026, 1, 1, 12, 0, 0)
+    offsets = [0, 1, 1, 2, 3, 3, 4]
+    requests = [
+        Request(
+            tenant_id=0,
+            number=f"ЗХ-{index}",
+            user_id=100001,
+            category="Ремонт",
+            description="Тест",
+            priority="normal",
+            status="new",
+            created_at=base + timedelta(minutes=offset),
+        )
+        for index, offset in enumerate(offsets)
+    ]
+    test_session.add_all(requests)
+    await test_session.flush()
+    # От новых к старым: created_at desc, id desc
+    return sorted(requests, key=lambda r: (r.created_at, r.id), reverse=True)
+
+
+def base_query():
+    return request_list_query().where(Request.tenant_id == 0)
+
+
+class TestPageCursor:
+    """Тесты кодирования курсора"""
+
+    def test_round_trip(self):
+        """encode/decode возвращают тот же курсор"""
+        cursor = PageCursor(request_id=42, direction=DIRECTION_PREV)
+
+        data = cursor.encode("wh_all")
+
+        assert data == "wh_all:p:42"
+        assert PageCursor.decode(data) == cursor
+
+    @pytest.mark.parametrize("data", ["wh_all", "wh_all:x:1", "wh_all:n:abc", "wh_all:n:1:2"])
+    def test_decode_invalid(self, data):
+        """Некорректные данные - None"""
+        assert PageCursor.decode(data) is None
+
+
+class TestFetchRequestPage:
+    """Тесты выборки страниц"""
+
+    @pytest.mark.asyncio
+    async def test_walk_forward_and_back(self, test_session, paged_requests):
+        """Листание вперед проходит все заявки без пропусков и повторов, назад - возвращает те же страницы"""
+        expected_ids = [r.id for r in paged_requests]
+
+        first = await fetch_request_page(test_session, base_query(), page_size=3)
+        second = await fetch_request_page(test_session, base_query(), first.next_cursor, page_size=3)
+        third = await fetch_request_page(test_session, base_query(), second.next_cursor, page_size=3)
+
+        assert [r.id for r in first.items + second.items + third.items] == expected_ids
+        assert (first.has_prev, first.has_next) == (False, True)
+        assert (second.has_prev, second.has_next) == (True, True)
+        assert (third.has_prev, third.has_next) == (True, False)
+        assert first.prev_cursor is None
+        assert third.next_cursor is None
+
+        back = await fetch_request_page(test_session, base_query(), third.prev_cursor, page_size=3)
+        assert [r.id for r in back.items] == [r.id for r in second.items]
+        assert (back.has_prev, back.has_next) == (True, True)
+
+        back = await fetch_request_page(test_session, base_query(), back.prev_cursor, page_size=3)
+        assert [r.id for r in back.items] == [r.id for r in first.items]
+        assert back.has_prev is False
+
+    @pytest.mark.asyncio
+    async def test_filters_are_kept(self, test_session, paged_requests):
+        """Фильтры исходного запроса применяются к каждой странице"""
+        since = paged_requests[-1].created_at + timedelta(minutes=2)
+        query = base_query().where(Request.created_at >= since)
+
+        first = await fetch_request_page(test_session, query, page_size=2)
+        second = await fetch_request_page(test_session, query, first.next_cursor, page_size=2)
+
+        assert [r.id for r in first.items + second.items] == [r.id for r in paged_requests[:4]]
+        assert second.has_next is False
+
+    @pytest.mark.asyncio
+    async def test_cursor_direction_default(self, test_session, paged_requests):
+        """Курсор без направления листает к более старым"""
+        cursor = PageCursor(request_id=paged_requests[0].id)
+
+        page = await fetch_request_page(test_session, base_query(), cursor, page_size=10)
+
+        assert cursor.direction == DIRECTION_NEXT
+        assert [r.id for r in page.items] == [r.id for r in paged_requests[1:]]
@@ -0,0 +1,87 @@
+"""
+Unit тесты для photo_delivery
+
+Тестируемые функции:
+- send_request_photos() - отправка заявки с фото не более чем за 2 вызова API
+"""
+import pytest
+from unittest.mock import MagicMock
+
+from bot.utils.photo_delivery import send_request_photos, CAPTION_MAX_LENGTH, ACTIONS_PROMPT
+
+
+def api_calls(bot) -> int:
+    """Количество вызовов Telegram API"""
+    return bot.send_message.await_count + bot.send_photo.await_count + bot.send_media_group.await_count
+
+
+class TestSendRequestPhotos:
+    """Тесты отправки заявки с фото"""
+    
+    @pytest.mark.asyncio
+    async def test_without_photos_sends_text(self, mock_bot):
+        """Без фото - одно текстовое сообщение с кнопками"""
+        keyboard = MagicMock()
+        
+        await send_request_photos(mock_bot, chat_id=1, text="Заявка", photo_file_ids=[], reply_markup=keyboard)
+        
+        mock_bot.send_message.assert_awaited_once()
+        assert mock_bot.send_message.call_args.kwargs["reply_markup"] is keyboard
+        assert api_calls(mock_bot) == 1
+    
+    @pytest.mark.asyncio
+    async def test_single_photo_with_caption_and_keyboard(self, mock_bot):
+        """Одно фото - подпись и кнопки в одном сообщении"""
+        keyboard = MagicMock()
+        
+        await send_request_photos(mock_bot, chat_id=1, text="Заявка", photo_file_ids=["p1"], reply_markup=keyboard)
+        
+        mock_bot.send_photo.assert_awaited_once()
+        call_args = mock_bot.send_photo.call_args
+        assert call_args.kwargs["photo"] == "p1"
+        assert call_args.kwargs["caption"] == "Заявка"
+        assert call_args.kwargs["reply_markup"] is keyboard
+        assert api_calls(mock_bot) == 1
+    
+    @pytest.mark.asyncio
+    async def test_album_with_keyboard_in_follow_up(self, mock_bot):
+        """Несколько фото - альбом с подписью на первом фото, кнопки следующим сообщением"""
+        keyboard = MagicMock()
+        
+        await send_request_photos(
+            mock_bot, chat_id=1, text="Заявка",
+            photo_file_ids=["p1", "p2", "p3", "p4", "p5"], reply_markup=keyboard
+        )
+        
+        mock_bot.send_media_group.assert_awaited_once()
+        media = mock_bot.send_media_group.call_args.kwargs["media"]
+        assert [item.media for item in media] == ["p1", "p2", "p3", "p4", "p5"]
+        assert media[0].caption == "Заявка"
+        assert all(item.caption is None for item in media[1:])
+        
+        mock_bot.send_message.assert_awaited_once()
+        assert mock_bot.send_message.call_args.kwargs["text"] == ACTIONS_PROMPT
+        assert mock_bot.send_message.call_args.kwargs["reply_markup"] is keyboard
+        assert api_calls(mock_bot) == 2
+    
+    @pytest.mark.asyncio
+    async def test_album_without_keyboard(self, mock_bot):
+        """Альбом без кнопок - один вызов"""
+        await send_request_photos(mock_bot, chat_id=1, text="Заявка", photo_file_ids=["p1", "p2"])
+        
+        mock_bot.send_media_group.assert_awaited_once()
+        mock_bot.send_message.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_long_text_sent_after_album(self, mock_bot):
+        """Текст длиннее лимита подписи отправляется вместе с кнопками после альбома"""
+        text = "А" * (CAPTION_MAX_LENGTH + 1)
+        keyboard = MagicMock()
+        
+        await send_request_photos(mock_bot, chat_id=1, text=text, photo_file_ids=["p1", "p2"], reply_markup=keyboard)
+        
+        media = mock_bot.send_media_group.call_args.kwargs["media"]
+        assert all(item.caption is None for item in media)
+        assert mock_bot.send_message.call_args.kwargs["text"] == text
+        assert mock_bot.send_message.call_args.kwargs["reply_markup"] is keyboard
+        assert api_calls(mock_bot) == 2